@@ -0,0 +1,13 @@
+# coding=utf-8
+"""Micro-benchmarks for Pulp Smash.
+
+This package contains benchmarks for Pulp Smash's own machinery, such as the
+cost of fetching a configuration object. They do not talk to a Pulp server.
+Each module can be executed directly. For example::
+
+    python -m benchmarks.bench_config
+
+These benchmarks are entirely different from the tests in :mod:`tests` and
+:mod:`pulp_smash.tests`.
+"""
+from __future__ import unicode_literals
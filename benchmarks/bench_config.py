@@ -0,0 +1,71 @@
+# coding=utf-8
+"""Measure the per-call cost of fetching server configuration objects.
+
+Test cases fetch a configuration object in every ``setUpClass`` (and sometimes
+in every ``setUp``), and :func:`pulp_smash.utils.poll_task` fetches requests
+kwargs from that object on every poll. This module compares the costs of:
+
+* :func:`pulp_smash.config.get_config`, which returns a mutable copy, versus
+  :func:`pulp_smash.config.get_frozen_config`, which returns a shared object.
+* ``copy.deepcopy`` on a ``ServerConfig`` versus a ``FrozenServerConfig``.
+* ``get_requests_kwargs`` on a ``ServerConfig`` versus a
+  ``FrozenServerConfig``.
+"""
+from __future__ import print_function, unicode_literals
+
+import timeit
+from copy import deepcopy
+
+import mock
+
+from pulp_smash import config
+
+
+def _time(func, number=20000):
+    """Return the mean cost of calling ``func``, in microseconds."""
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main():
+    """Print a table of per-call costs."""
+    cfg = config.ServerConfig(
+        base_url='https://pulp.example.com',
+        auth=['alice', 'hackme'],
+        verify=False,
+        version='2.8',
+        cli_transport='ssh',
+    )
+    frozen = cfg.freeze()
+    rows = []
+    with mock.patch.object(config, '_CONFIG', frozen):
+        rows.append((
+            'get_config() vs get_frozen_config()',
+            _time(config.get_config),
+            _time(config.get_frozen_config),
+        ))
+    rows.append((
+        'deepcopy(cfg)',
+        _time(lambda: deepcopy(cfg)),
+        _time(lambda: deepcopy(frozen)),
+    ))
+    rows.append((
+        'cfg.get_requests_kwargs()',
+        _time(cfg.get_requests_kwargs),
+        _time(frozen.get_requests_kwargs),
+    ))
+    template = '{:<40} {:>14} {:>14} {:>8}'
+    print(template.format(
+        'operation', 'mutable (us)', 'frozen (us)', 'speedup'
+    ))
+    for name, mutable, frozen_ in rows:
+        print(template.format(
+            name,
+            '{:.3f}'.format(mutable),
+            '{:.3f}'.format(frozen_),
+            '{:.1f}x'.format(mutable / frozen_),
+        ))
+
+
+if __name__ == '__main__':
+    main()
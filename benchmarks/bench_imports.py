@@ -0,0 +1,114 @@
+# coding=utf-8
+"""Measure the cost of importing Pulp Smash's modules.
+
+Every test run, and every shard of a run spawned by :mod:`pulp_smash.runner`,
+starts by importing Pulp Smash. Several of Pulp Smash's dependencies are slow
+to import, and most runs need only a few of them. So, Pulp Smash imports
+``packaging``, ``plumbum``, ``requests`` and ``xdg`` where they are used,
+rather than at the top of every module that might use them.
+
+This module imports each module in :data:`MODULES` in a fresh interpreter, and
+prints how long the import took, as reported by ``python -X importtime``. (The
+time taken to start an interpreter that imports nothing is subtracted.) It
+also lists any heavy dependency that a module imports but should not. The exit
+code is non-zero if there is any such dependency.
+
+``-X importtime`` is only available on Python 3.7 and newer. On older
+versions, times are not reported, but dependencies are still checked.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import json
+import subprocess
+import sys
+
+#: Pairs of modules and the heavy dependencies that importing them must not
+#: import.
+MODULES = (
+    ('pulp_smash.__main__', ('packaging', 'plumbum', 'requests', 'xdg')),
+    ('pulp_smash.api', ('packaging', 'plumbum', 'xdg')),
+    ('pulp_smash.config', ('packaging', 'plumbum', 'requests', 'xdg')),
+    ('pulp_smash.profiling', ('packaging', 'plumbum', 'requests', 'xdg')),
+    ('pulp_smash.selectors', ('packaging', 'plumbum', 'requests', 'xdg')),
+    ('pulp_smash.tests', ('packaging', 'plumbum', 'requests', 'xdg')),
+    ('pulp_smash.utils', ('packaging', 'plumbum', 'xdg')),
+)
+
+
+def get_loaded(module, names):
+    """Import ``module`` in a fresh interpreter. Tell which ``names`` loaded.
+
+    :param module: The name of a module, such as ``pulp_smash.config``.
+    :param names: Names of top-level packages, such as ``requests``.
+    :returns: A sorted list of those ``names`` that were imported.
+    """
+    code = (
+        'import json, sys; import {}; '
+        'print(json.dumps(sorted(set(name.split(".")[0] '
+        'for name in sys.modules))))'.format(module)
+    )
+    output = subprocess.check_output((sys.executable, '-c', code))
+    loaded = json.loads(output.decode('utf-8').splitlines()[-1])
+    return sorted(set(names) & set(loaded))
+
+
+def parse_importtime(text):
+    """Return the total self time of the imports in ``-X importtime`` output.
+
+    :param text: The standard error of ``python -X importtime``. Each relevant
+        line looks like ``import time:  self [us] | cumulative | name``.
+    :returns: The sum of the self times, in microseconds.
+    """
+    total = 0
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us = line[len('import time:'):].split('|')[0].strip()
+        if self_us.isdigit():  # skip the header line
+            total += int(self_us)
+    return total
+
+
+def get_import_time(module, repeat=5):
+    """Return the time taken to import ``module``, in milliseconds.
+
+    The best of ``repeat`` runs is returned, less the cost of starting an
+    interpreter. ``None`` is returned if ``-X importtime`` is unsupported.
+    """
+    if sys.version_info < (3, 7):
+        return None
+
+    def measure(code):
+        """Return the best total import time of running ``code``."""
+        times = []
+        for _ in range(repeat):
+            process = subprocess.Popen(
+                (sys.executable, '-X', 'importtime', '-c', code),
+                stderr=subprocess.PIPE,
+            )
+            _, stderr = process.communicate()
+            times.append(parse_importtime(stderr.decode('utf-8')))
+        return min(times)
+
+    return (measure('import ' + module) - measure('pass')) / 1000
+
+
+def main():
+    """Print a table of import times. Return non-zero on unwanted imports."""
+    template = '{:<24} {:>10}  {}'
+    print(template.format('module', 'time (ms)', 'unwanted imports'))
+    failed = False
+    for module, names in MODULES:
+        unwanted = get_loaded(module, names)
+        failed = failed or bool(unwanted)
+        milliseconds = get_import_time(module)
+        print(template.format(
+            module,
+            'n/a' if milliseconds is None else '{:.1f}'.format(milliseconds),
+            ', '.join(unwanted) or '-',
+        ))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
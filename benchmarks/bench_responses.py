@@ -0,0 +1,164 @@
+# coding=utf-8
+"""Measure the memory held by responses that test cases save.
+
+Many test cases save responses in ``setUpClass``, and those responses live for
+as long as the test case class does, which is usually the whole run. This
+module builds the responses that such a suite might save, and measures with
+``tracemalloc`` how much memory stays allocated when they are kept as
+``requests.Response`` objects and when they are kept as
+:class:`pulp_smash.api.CompactResponse` records.
+
+The responses are built with the same machinery that Requests uses when it
+talks to a server, so each ``requests.Response`` holds a prepared request, a
+connection adapter and a raw urllib3 response, just like a real one. No
+server is contacted. The suite is modelled as ``--classes`` test case classes
+that each save ``--per-class`` responses. The bodies are those of
+:data:`BODIES`, in turn.
+
+``tracemalloc`` is only available on Python 3.4 and newer.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import gc
+import io
+import json
+import sys
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+from pulp_smash import api
+
+#: Pairs of names and JSON bodies, like those returned by Pulp. Test cases
+#: most often save search results, call reports and single resources.
+BODIES = (
+    ('search', [
+        {
+            '_href': '/pulp/api/v2/users/user-{}/'.format(i),
+            '_id': {'$oid': '{:024x}'.format(i)},
+            'id': '{:024x}'.format(i),
+            'login': 'user-{}'.format(i),
+            'name': 'user-{}'.format(i),
+            'roles': ['super-users'],
+        }
+        for i in range(20)
+    ]),
+    ('call report', {
+        'error': None,
+        'result': None,
+        'spawned_tasks': [{
+            '_href': '/pulp/api/v2/tasks/{:032x}/'.format(1),
+            'task_id': '{:032x}'.format(1),
+        }],
+    }),
+    ('resource', {
+        '_href': '/pulp/api/v2/repositories/repo-1/',
+        '_id': {'$oid': '{:024x}'.format(1)},
+        'content_unit_counts': {},
+        'description': None,
+        'display_name': 'repo-1',
+        'id': 'repo-1',
+        'last_unit_added': None,
+        'last_unit_removed': None,
+        'notes': {},
+        'scratchpad': {},
+    }),
+)
+
+# Headers much like those that Pulp's web server sends.
+_HEADERS = {
+    'Connection': 'Keep-Alive',
+    'Content-Type': 'application/json; charset=utf-8',
+    'Date': 'Tue, 05 Jan 2016 19:05:00 GMT',
+    'Keep-Alive': 'timeout=5, max=100',
+    'Server': 'Apache/2.4.6 (Red Hat Enterprise Linux) mod_wsgi/3.4',
+    'Vary': 'Accept-Encoding',
+}
+
+
+def make_response(adapter, index):
+    """Build a ``requests.Response`` as if it had been received.
+
+    :param adapter: A ``requests.adapters.HTTPAdapter``.
+    :param index: Which of :data:`BODIES` to use, modulo its length.
+    :returns: A ``requests.Response``, with its body read.
+    """
+    body = json.dumps(BODIES[index % len(BODIES)][1]).encode('utf-8')
+    headers = dict(_HEADERS, **{'Content-Length': str(len(body))})
+    request = requests.Request(
+        'POST',
+        'https://pulp.example.com/pulp/api/v2/users/search/',
+        auth=('admin', 'admin'),
+        json={'criteria': {}},
+    ).prepare()
+    raw = HTTPResponse(
+        body=io.BytesIO(body),
+        headers=headers,
+        status=200,
+        reason='OK',
+        preload_content=False,
+    )
+    response = adapter.build_response(request, raw)
+    response.content  # pylint:disable=pointless-statement
+    return response
+
+
+def measure(count, compact):
+    """Return the bytes held by ``count`` saved responses.
+
+    :param count: The number of responses to build and keep.
+    :param compact: Whether to keep a :class:`pulp_smash.api.CompactResponse`
+        instead of each response.
+    :returns: The bytes still allocated once the responses are built.
+    """
+    import tracemalloc  # pylint:disable=import-error
+    adapter = HTTPAdapter()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        kept = []
+        for i in range(count):
+            response = make_response(adapter, i)
+            kept.append(api.CompactResponse(response) if compact else response)
+        del response
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    del kept
+    return held
+
+
+def main():
+    """Print the memory held by full and compact responses."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--classes', type=int, default=200)
+    parser.add_argument('--per-class', type=int, default=10)
+    args = parser.parse_args()
+    if sys.version_info < (3, 4):
+        print('tracemalloc is unavailable on this version of Python.')
+        return 0
+    count = args.classes * args.per_class
+    full = measure(count, False)
+    compact = measure(count, True)
+    template = '{:<18} {:>12} {:>14}'
+    print('{} test case classes, {} saved responses each:'.format(
+        args.classes, args.per_class
+    ))
+    print(template.format('kind', 'total (KiB)', 'per response'))
+    rows = (('requests.Response', full), ('CompactResponse', compact))
+    for kind, held in rows:
+        print(template.format(
+            kind, '{:.1f}'.format(held / 1024), '{:.0f} B'.format(held / count)
+        ))
+    print('saved: {:.1f} KiB ({:.0%})'.format(
+        (full - compact) / 1024, (full - compact) / full if full else 0
+    ))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
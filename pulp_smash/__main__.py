@@ -5,8 +5,6 @@ from __future__ import print_function, unicode_literals
 import textwrap
 from os.path import join
 
-from xdg import BaseDirectory
-
 from pulp_smash.config import ServerConfig
 
 MESSAGE = tuple((
@@ -55,11 +53,23 @@ MESSAGE = tuple((
     documentation for test selection syntax, and consult the source code to see
     which test modules are available.
     ''',
+    '''\
+    If the configuration file has several sections, each describing a Pulp
+    server, the tests can be run against all of them concurrently with `python
+    -m pulp_smash.runner [section ...]`. A merged per-server report is printed.
+    ''',
+    '''\
+    If Pulp runs on several hosts, a section may have a `hosts` key, which maps
+    the names of services to lists of hostnames, like `"hosts":
+    {"pulp_workers": ["w1.example.com", "w2.example.com"]}`. Services are then
+    started and stopped on every listed host at once.
+    ''',
 ))
 
 
 def main():
     """Provide usage instructions to the user."""
+    from xdg import BaseDirectory
     cfg = ServerConfig()
     cfg_path = join(
         # pylint:disable=protected-access
@@ -80,6 +90,8 @@ def main():
         textwrap.dedent(MESSAGE[5].format(cfg._xdg_config_file))
     )
     message += '\n\n' + wrapper.fill(textwrap.dedent(MESSAGE[6]))
+    message += '\n\n' + wrapper.fill(textwrap.dedent(MESSAGE[7]))
+    message += '\n\n' + wrapper.fill(textwrap.dedent(MESSAGE[8]))
     print(message)
 
 
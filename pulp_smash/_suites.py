@@ -0,0 +1,31 @@
+# coding=utf-8
+"""Helpers for wrapping the test case classes in a test suite.
+
+They are shared by :mod:`pulp_smash.logs` and :mod:`pulp_smash.profiling`, and
+import nothing beyond the standard library.
+"""
+from __future__ import unicode_literals
+
+import unittest
+
+
+def iter_tests(suite):
+    """Yield each test in a ``unittest2.TestSuite``, recursively."""
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            for inner in iter_tests(test):
+                yield inner
+        else:
+            yield test
+
+
+def get_function(test_case, name):
+    """Return the function behind a test case class' own ``name`` method.
+
+    If ``test_case`` does not define ``name`` itself, return a function that
+    calls the inherited method instead.
+    """
+    attr = test_case.__dict__.get(name)
+    if attr is not None:
+        return getattr(attr, '__func__', attr)
+    return lambda obj, *args: getattr(super(test_case, obj), name)(*args)
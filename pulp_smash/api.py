@@ -1,8 +1,15 @@
 # coding=utf-8
 """Tools for working with Pulp's API."""
-from __future__ import unicode_literals
+from __future__ import division, unicode_literals
 
+import copy
+import os
+import random
+import time
 import warnings
+from collections import Counter
+from email.utils import mktime_tz, parsedate_tz
+from threading import Event, Lock
 try:  # try Python 3 import first
     from urllib.parse import urljoin
 except ImportError:  # pragma: no cover
@@ -10,11 +17,23 @@ except ImportError:  # pragma: no cover
 
 import requests
 
-from pulp_smash import utils
+from pulp_smash import throttle, utils
 
 
 _SENTINEL = object()
 
+#: HTTP methods which may safely be sent more than once.
+IDEMPOTENT_METHODS = frozenset(('DELETE', 'GET', 'HEAD', 'OPTIONS', 'PUT'))
+
+#: HTTP methods whose requests may be coalesced by :class:`SingleFlight`.
+COALESCABLE_METHODS = frozenset(('GET', 'HEAD'))
+
+# Exceptions raised by Requests which indicate a transient failure.
+_TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+# `get_retry_policy` uses this as a cache.
+_RETRY_POLICY = None
+
 
 def _check_http_202_content_type(response):
     """Issue a warning if the content-type is not application/json."""
@@ -80,6 +99,357 @@ def json_handler(server_config, response):
     return response.json()
 
 
+def compact_handler(server_config, response):
+    """Check status code, wait for tasks to complete, and return a record.
+
+    Raise an exception if the response has an HTTP 4XX or 5XX status code. Wait
+    for tasks to complete if the response has an HTTP Accepted status code.
+    Return a :class:`CompactResponse` made from the response.
+    """
+    response.raise_for_status()
+    _handle_202(server_config, response)
+    return CompactResponse(response)
+
+
+def compact_echo_handler(server_config, response):  # pylint:disable=W0613
+    """Immediately return a :class:`CompactResponse` made from ``response``."""
+    return CompactResponse(response)
+
+
+class CompactResponse(object):
+    """A small, read-only record of a ``requests.Response``.
+
+    Test cases often save responses in ``setUpClass`` and inspect them in
+    several test methods. A ``requests.Response`` holds a reference to its
+    request, its connection adapter, its raw urllib3 response and a
+    case-insensitive copy of every header, and saved responses live for as
+    long as the test case class does. This record keeps only what tests
+    usually look at:
+
+    * ``status_code``, ``reason`` and ``url``,
+    * the headers named in :data:`CompactResponse.HEADERS`, in a plain dict,
+    * the body, as bytes. It is decoded only when :meth:`json` or
+      :attr:`text` is used.
+
+    Like a ``requests.Response``, this record has a :meth:`json` and a
+    :meth:`raise_for_status` method, so it can be used in place of one by
+    most tests. Use :func:`compact_handler` to get these records from a
+    :class:`Client`.
+    """
+
+    #: The response headers that are kept. Others are dropped.
+    HEADERS = (
+        'Content-Length',
+        'Content-Type',
+        'ETag',
+        'Last-Modified',
+        'Location',
+        'Retry-After',
+    )
+
+    __slots__ = ('content', 'headers', 'reason', 'status_code', 'url')
+
+    def __init__(self, response):
+        """Copy the interesting parts of ``response``."""
+        self.content = response.content
+        self.headers = {
+            name: response.headers[name]
+            for name in self.HEADERS if name in response.headers
+        }
+        self.reason = response.reason
+        self.status_code = response.status_code
+        self.url = response.url
+
+    def __repr__(self):
+        """Return a string like ``<CompactResponse [200]>``."""
+        return '<CompactResponse [{}]>'.format(self.status_code)
+
+    @property
+    def text(self):
+        """Return the body, decoded as UTF-8."""
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        """Decode the body as JSON, and return the result.
+
+        The body is decoded on every call, and nothing is cached, so callers
+        may modify the result freely.
+        """
+        return requests.compat.json.loads(self.text)
+
+    def raise_for_status(self):
+        """Raise a ``requests.HTTPError`` for a 4XX or 5XX status code."""
+        if 400 <= self.status_code < 500:
+            kind = 'Client'
+        elif 500 <= self.status_code < 600:
+            kind = 'Server'
+        else:
+            return
+        raise requests.HTTPError(
+            '{} {} Error: {} for url: {}'.format(
+                self.status_code, kind, self.reason, self.url
+            ),
+            response=self,
+        )
+
+
+class RetryPolicy(object):
+    """Decide whether and when to retry HTTP requests that fail transiently.
+
+    A request is retried if:
+
+    * it is idempotent, as determined by ``methods`` or by the caller,
+    * it failed with a connection error or timeout, or its response has one of
+      the status codes in ``statuses``,
+    * it has been retried fewer than ``max_retries`` times, and
+    * fewer than ``budget`` retries have been made with this policy overall.
+
+    Before each retry, the policy sleeps. If the response has a
+    ``Retry-After`` header, it is obeyed. Otherwise, the policy uses
+    exponential backoff with "full jitter": before retry ``n``, sleep for a
+    random time between zero and ``backoff_factor * 2 ** n`` seconds. Either
+    way, no single sleep lasts longer than ``max_backoff`` seconds.
+
+    Each retry is counted in ``metrics``, a ``collections.Counter``. Its keys
+    are ``'retries'``, ``'retries.<METHOD>'``, ``'retries.status.<code>'`` and
+    ``'retries.error.<exception name>'``. The ``'exhausted'`` key counts
+    requests that failed even after ``max_retries`` retries, and the
+    ``'budget_exhausted'`` key counts retries denied by the budget.
+
+    All methods on this class are thread-safe, and one policy may be shared by
+    many :class:`Client` objects.
+
+    :param max_retries: The maximum number of times to retry one request.
+    :param backoff_factor: The base of the exponential backoff, in seconds.
+    :param max_backoff: The maximum time to sleep before a retry, in seconds.
+    :param statuses: HTTP status codes that indicate a transient failure.
+    :param methods: HTTP methods that are retried by default.
+    :param budget: The maximum number of retries across all requests, or
+        ``None`` for no limit.
+    """
+
+    def __init__(  # pylint:disable=too-many-arguments
+            self,
+            max_retries=3,
+            backoff_factor=0.5,
+            max_backoff=30,
+            statuses=(429, 502, 503, 504),
+            methods=IDEMPOTENT_METHODS,
+            budget=None):
+        """Initialize this object with needed instance attributes."""
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.budget = budget
+        self.metrics = Counter()
+        self._lock = Lock()
+
+    def is_retryable(self, method, response=None, error=None, idempotent=None):
+        """Tell whether a failed request may be retried.
+
+        :param method: The request's HTTP method.
+        :param response: The response, if one was received.
+        :param error: The exception raised instead of receiving a response.
+        :param idempotent: Whether the request may safely be sent twice. If
+            ``None``, this is decided by ``method``.
+        :returns: A boolean. This method does not consider retry counts.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in self.methods
+        if not idempotent:
+            return False
+        if error is not None:
+            return isinstance(error, _TRANSIENT_ERRORS)
+        return response.status_code in self.statuses
+
+    def get_delay(self, retry, response=None):
+        """Return the number of seconds to sleep before retry number ``retry``.
+
+        :param retry: The number of retries already made, starting at zero.
+        :param response: The response that is being retried, if any.
+        """
+        delay = _get_retry_after(response)
+        if delay is None:
+            delay = random.uniform(0, self.backoff_factor * 2 ** retry)
+        return max(0, min(delay, self.max_backoff))
+
+    def send(self, send, method, idempotent=None):
+        """Call ``send`` to send a request, and retry as needed.
+
+        :param send: A callable that sends a request and returns a response.
+        :param method: The request's HTTP method.
+        :param idempotent: See :meth:`is_retryable`.
+        :returns: The last response received.
+        :raises: The last exception raised by ``send``, if it raised one.
+        """
+        retry = 0
+        while True:
+            try:
+                response, error = send(), None
+            except _TRANSIENT_ERRORS as err:
+                response, error = None, err
+            if not self.is_retryable(method, response, error, idempotent):
+                break
+            if retry >= self.max_retries:
+                with self._lock:
+                    self.metrics['exhausted'] += 1
+                break
+            if not self._count_retry(method, response, error):
+                break
+            if response is not None:
+                response.close()
+            time.sleep(self.get_delay(retry, response))
+            retry += 1
+        if error is not None:
+            raise error
+        return response
+
+    def _count_retry(self, method, response, error):
+        """Update metrics for a retry. Return false if over budget."""
+        with self._lock:
+            retries = self.metrics['retries']
+            if self.budget is not None and retries >= self.budget:
+                self.metrics['budget_exhausted'] += 1
+                return False
+            self.metrics['retries'] += 1
+            self.metrics['retries.' + method.upper()] += 1
+            if error is not None:
+                self.metrics['retries.error.' + type(error).__name__] += 1
+            else:
+                self.metrics[
+                    'retries.status.{}'.format(response.status_code)
+                ] += 1
+        return True
+
+
+def _get_retry_after(response):
+    """Return the delay requested by a ``Retry-After`` header, or ``None``."""
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = parsedate_tz(value)  # an HTTP-date
+    if parsed is None:
+        return None
+    return mktime_tz(parsed) - time.time()
+
+
+def get_retry_policy():
+    """Return the :class:`RetryPolicy` shared by clients by default.
+
+    The policy is built the first time this function is called. The
+    ``PULP_SMASH_RETRIES`` environment variable sets its ``max_retries``, and
+    defaults to 0. So by default, no request is retried, and tests observe
+    every failure that the server reports. Set it to a positive number, such
+    as 3, to retry transient failures when running against a flaky server.
+    The ``PULP_SMASH_RETRY_BUDGET`` environment variable sets its ``budget``,
+    and defaults to 100. Thus, the budget applies to a whole test run.
+    """
+    global _RETRY_POLICY  # pylint:disable=global-statement
+    if _RETRY_POLICY is None:
+        _RETRY_POLICY = RetryPolicy(
+            max_retries=int(os.environ.get('PULP_SMASH_RETRIES', 0)),
+            budget=int(os.environ.get('PULP_SMASH_RETRY_BUDGET', 100)),
+        )
+    return _RETRY_POLICY
+
+
+class SingleFlight(object):
+    """Coalesce identical calls that are made concurrently.
+
+    When :meth:`do` is called with a key, and another call with the same key
+    is already in flight, the second call does not run its function. Instead,
+    it waits for the first call to complete and shares its outcome: the same
+    return value, or the same exception. Once a call completes, its key is
+    forgotten, so results are never cached.
+
+    Return values that are dicts or lists, such as decoded JSON bodies, are
+    copied before being handed to waiting callers, and the first caller gets
+    its own copy if any other caller waited, so that callers may modify them
+    freely. Other return values, such as ``requests.Response`` objects, are
+    shared.
+
+    :attr:`metrics` is a ``collections.Counter``. Its ``'calls'`` key counts
+    calls to :meth:`do`, and its ``'coalesced'`` key counts the calls that
+    shared another call's outcome. See :attr:`coalescing_ratio`.
+
+    The methods on this class are thread-safe.
+    """
+
+    def __init__(self):
+        """Initialize this object with needed instance attributes."""
+        self.metrics = Counter()
+        self._calls = {}  # Map keys to in-flight _Call objects.
+        self._lock = Lock()
+
+    @property
+    def coalescing_ratio(self):
+        """Return the fraction of calls that shared another call's outcome."""
+        with self._lock:
+            if not self.metrics['calls']:
+                return 0
+            return self.metrics['coalesced'] / self.metrics['calls']
+
+    def do(self, key, func):  # pylint:disable=invalid-name
+        """Call ``func``, unless a call with the same ``key`` is in flight.
+
+        :param key: A hashable object identifying the call.
+        :param func: A callable accepting no arguments.
+        :returns: What ``func`` returns.
+        :raises: What ``func`` raises.
+        """
+        with self._lock:
+            self.metrics['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.metrics['coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error  # pylint:disable=raising-bad-type
+            if isinstance(call.result, (dict, list)):
+                return copy.deepcopy(call.result)
+            return call.result
+        try:
+            result = func()
+        except Exception as err:  # pylint:disable=broad-except
+            call.error = err
+            raise
+        else:
+            call.result = result
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+            call.done.set()
+        # Waiters copy call.result, so the leader's caller must not get it.
+        if waiters and isinstance(result, (dict, list)):
+            return copy.deepcopy(result)
+        return result
+
+
+class _Call(object):  # pylint:disable=too-few-public-methods
+    """A call in flight in a :class:`SingleFlight`."""
+
+    def __init__(self):
+        """Initialize this object with needed instance attributes."""
+        self.done = Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0  # the number of calls sharing this call's outcome
+
+
 class Client(object):
     """A convenience object for working with an API.
 
@@ -172,6 +542,26 @@ class Client(object):
     payload for just one request. How can they do that? With ``client.post(url,
     None)``.
 
+    Requests that fail transiently may be retried as directed by
+    ``retry_policy``, which defaults to the policy returned by
+    :func:`get_retry_policy`. (See :class:`RetryPolicy`.) That policy retries
+    nothing unless the ``PULP_SMASH_RETRIES`` environment variable is set, as
+    most tests exist to observe how the server behaves, failures included.
+    Even then, POST and PATCH requests are not retried, as they may not be
+    idempotent. A caller that knows better can say so on a per-request basis:
+
+    >>> client.post('/pulp/api/v2/repositories/search/', {}, idempotent=True)
+
+    A client may be given a :class:`SingleFlight` object. If so, concurrent
+    GET and HEAD requests that are identical, and that would be handled by the
+    same response handler, share one HTTP request and its handled result. To
+    coalesce requests across clients, give each client the same object.
+    Streamed requests are never coalesced.
+
+    Requests are also subject to the limits of the
+    :class:`pulp_smash.throttle.Throttle` for the server's ``base_url``, which
+    is shared by all clients and processes talking to that server.
+
     .. _Pulp: http://www.pulpproject.org/
     .. _Requests: http://docs.python-requests.org/en/latest/
     """
@@ -181,6 +571,8 @@ class Client(object):
             server_config,
             response_handler=None,
             request_kwargs=None,
+            retry_policy=None,
+            single_flight=None,
     ):
         """Initialize this object with needed instance attributes."""
         self._cfg = server_config
@@ -193,6 +585,12 @@ class Client(object):
             self.response_handler = safe_handler
         else:
             self.response_handler = response_handler
+        if retry_policy is None:
+            self.retry_policy = get_retry_policy()
+        else:
+            self.retry_policy = retry_policy
+        self.throttle = throttle.get_throttle(server_config.base_url)
+        self.single_flight = single_flight
 
     def delete(self, url, **kwargs):
         """Send an HTTP DELETE request."""
@@ -235,7 +633,9 @@ class Client(object):
         """Send an HTTP request.
 
         Arguments passed directly in to this method override (but do not
-        overwrite!) arguments specified in ``self.request_kwargs``.
+        overwrite!) arguments specified in ``self.request_kwargs``. The
+        ``idempotent`` argument is special: it is not passed on to Requests,
+        but to :meth:`RetryPolicy.send`.
         """
         # The `self.request_kwargs` dict should *always* have a "url" argument.
         # This is enforced by `self.__init__`. This allows us to call the
@@ -243,10 +643,30 @@ class Client(object):
         #
         #     request(method, url, **kwargs)
         #
+        idempotent = kwargs.pop('idempotent', None)
         request_kwargs = self.request_kwargs.copy()
         request_kwargs['url'] = urljoin(request_kwargs['url'], url)
         request_kwargs.update(kwargs)
-        return self.response_handler(
-            self._cfg,
-            requests.request(method, **request_kwargs),
+
+        def send():
+            """Send the request once, within the throttle's limits."""
+            with self.throttle.limit(method):
+                return requests.request(method, **request_kwargs)
+
+        def handle():
+            """Send the request, with retries, and handle the response."""
+            return self.response_handler(
+                self._cfg,
+                self.retry_policy.send(send, method, idempotent),
+            )
+
+        if (self.single_flight is None or
+                method.upper() not in COALESCABLE_METHODS or
+                request_kwargs.get('stream')):
+            return handle()
+        key = (
+            method.upper(),
+            self.response_handler,
+            repr(sorted(request_kwargs.items())),
         )
+        return self.single_flight.do(key, handle)
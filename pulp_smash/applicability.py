@@ -0,0 +1,242 @@
+# coding=utf-8
+"""Regenerate content applicability for many consumers, and time it.
+
+Regenerating `content applicability`_ is one of Pulp's slowest operations, and
+its cost grows with the number of consumers and the size of their package
+profiles. This module builds a synthetic deployment to measure it:
+
+1. :func:`make_profile` makes an RPM package profile of any size. Packages
+   named in ``upgradable`` are given an old version, so that the newer
+   versions in a repository apply to them.
+2. :func:`register_consumers` registers many consumers at once, uploads the
+   profile for each, and binds each to one or more repositories.
+3. :func:`regenerate` asks Pulp to regenerate applicability, and waits for
+   all of the spawned tasks. Regeneration for repositories may be done in
+   parallel, in which case Pulp spawns a group of tasks. (See
+   :func:`poll_task_group`.)
+
+:func:`format_report` reports the throughput of each regeneration, in
+consumers per second, and how many tasks it fanned out to.
+
+>>> from pulp_smash import applicability, config
+>>> cfg = config.get_config()
+>>> consumers = applicability.register_consumers(
+...     cfg, 100, applicability.make_profile(1000), [(repo_id, dist_id)]
+... )
+>>> result = applicability.regenerate(
+...     cfg,
+...     'repos-parallel',
+...     len(consumers),
+...     applicability.REPO_REGENERATE_PATH,
+...     {'repo_criteria': {'filters': {'id': {'$in': [repo_id]}}},
+...      'parallel': True},
+... )
+>>> print(applicability.format_report([result]))
+
+.. _content applicability:
+    https://pulp.readthedocs.org/en/latest/dev-guide/integration/rest-api/consumer/applicability.html
+"""
+from __future__ import division, unicode_literals
+
+import time
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+try:  # try Python 3 import first
+    from urllib.parse import urljoin
+except ImportError:  # pragma: no cover
+    from urlparse import urljoin  # pylint:disable=C0411,E0401
+
+from pulp_smash import api, exceptions, perf, utils
+from pulp_smash.constants import CONSUMER_PATH
+
+#: The path to which requests to regenerate applicability for consumers are
+#: sent.
+CONSUMER_REGENERATE_PATH = urljoin(
+    CONSUMER_PATH,
+    'actions/content/regenerate_applicability/',
+)
+
+#: The path to which requests to regenerate applicability for repositories are
+#: sent.
+REPO_REGENERATE_PATH = (
+    '/pulp/api/v2/repositories/actions/content/regenerate_applicability/'
+)
+
+#: The number of consumers that :func:`register_consumers` registers at once.
+DEFAULT_WORKERS = 8
+
+# How many rounds of polling to do before giving up on regeneration. Rounds
+# are five seconds apart. Regenerating applicability for thousands of
+# consumers may take many minutes.
+_POLL_LIMIT = 360
+
+#: The outcome of :func:`regenerate`. ``consumers`` is the number of
+#: consumers whose applicability was regenerated. ``seconds`` is the time
+#: for which the spawned tasks ran, as reported by Pulp. ``tasks`` is a tuple
+#: of the bodies of the spawned tasks.
+Regeneration = namedtuple('Regeneration', 'name consumers seconds tasks')
+
+
+def make_profile(size, upgradable=()):
+    """Make an RPM package profile.
+
+    :param size: The number of packages in the profile.
+    :param upgradable: Names of packages to include with version ``0.1``, so
+        that any newer version applies to them. They count towards ``size``.
+    :returns: A list of dicts, as uploaded to a consumer's ``profiles/``.
+    """
+    names = list(upgradable)[:size]
+    names.extend(
+        'pulp-smash-synthetic-{}'.format(i) for i in range(size - len(names))
+    )
+    return [{
+        'name': name,
+        'epoch': 0,
+        'version': '0.1' if name in upgradable else '1.0',
+        'release': '1',
+        'arch': 'noarch',
+        'vendor': None,
+    } for name in names]
+
+
+def register_consumers(server_config, count, profile, bindings=(),
+                       workers=DEFAULT_WORKERS, created=None):
+    """Register consumers, upload their profiles, and bind them to repos.
+
+    ``workers`` consumers are set up at once. Bindings do not notify an agent,
+    as the consumers are not real. If a consumer cannot be set up, the others
+    are still set up, and then the first error is raised. Pass ``created`` to
+    learn which consumers were registered even so, and delete them.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :param count: The number of consumers to register.
+    :param profile: An RPM package profile, as returned by
+        :func:`make_profile`.
+    :param bindings: An iterable of ``(repo_id, distributor_id)`` pairs. Each
+        consumer is bound to each of them.
+    :param workers: The number of consumers to set up at once.
+    :param created: A list to which the consumers' bodies are appended as
+        they are registered. By default, a new list.
+    :returns: ``created``. Each consumer's body has an ``_href``.
+    :raises: ``requests.exceptions.HTTPError`` if a request fails.
+    """
+    if created is None:
+        created = []
+    bindings = tuple(bindings)
+    client = api.Client(server_config, api.json_handler)
+
+    def register(_):
+        """Register one consumer, and upload its profile and bindings.
+
+        Return the consumer, if it was registered, and an error, if any.
+        """
+        consumer = None
+        try:
+            consumer_id = utils.uuid4()
+            consumer = client.post(
+                CONSUMER_PATH,
+                {'id': consumer_id},
+            )['consumer']
+            consumer['_href'] = urljoin(CONSUMER_PATH, consumer_id + '/')
+            client.post(urljoin(consumer['_href'], 'profiles/'), {
+                'content_type': 'rpm',
+                'profile': profile,
+            })
+            for repo_id, distributor_id in bindings:
+                client.post(urljoin(consumer['_href'], 'bindings/'), {
+                    'repo_id': repo_id,
+                    'distributor_id': distributor_id,
+                    'notify_agent': False,
+                })
+        except Exception as err:  # pylint:disable=broad-except
+            return consumer, err
+        return consumer, None
+
+    errors = []
+    pool = ThreadPool(min(workers, count) or 1)
+    try:
+        for consumer, error in pool.imap_unordered(register, range(count)):
+            if consumer is not None:
+                created.append(consumer)
+            if error is not None:
+                errors.append(error)
+    finally:
+        pool.close()
+        pool.join()
+    if errors:
+        raise errors[0]
+    return created
+
+
+def regenerate(server_config, name, consumers, path, body):
+    """Ask Pulp to regenerate applicability, and wait until it is done.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :param name: A name for the regeneration, such as ``'repos-parallel'``.
+    :param consumers: The number of consumers affected.
+    :param path: Either :data:`CONSUMER_REGENERATE_PATH` or
+        :data:`REPO_REGENERATE_PATH`.
+    :param body: The request body, with criteria and, optionally,
+        ``'parallel': True``.
+    :returns: A :data:`Regeneration`.
+    :raises: ``requests.exceptions.HTTPError`` if a request fails.
+    """
+    report = api.Client(server_config, api.echo_handler).post(path, body)
+    report.raise_for_status()
+    report = report.json()
+    if 'group_id' in report:  # a group call report
+        tasks = poll_task_group(server_config, report['group_id'])
+    else:
+        tasks = tuple(utils.poll_tasks(
+            server_config,
+            [task['_href'] for task in report['spawned_tasks']],
+            poll_limit=_POLL_LIMIT,
+        ))
+    return Regeneration(name, consumers, perf.get_duration(tasks), tasks)
+
+
+def poll_task_group(server_config, group_id, poll_limit=_POLL_LIMIT):
+    """Wait for a group of tasks to complete, and return their bodies.
+
+    The group's ``state-summary/`` is polled every five seconds until every
+    task in it has stopped. Then, the tasks are found with a search.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :param group_id: The ID from a group call report.
+    :param poll_limit: The number of polls after which to give up.
+    :returns: A tuple of task bodies.
+    :raises pulp_smash.exceptions.TaskTimedOutError: If the tasks take too
+        long to complete.
+    """
+    client = api.Client(server_config, api.json_handler)
+    path = '/pulp/api/v2/task_groups/{}/state-summary/'.format(group_id)
+    for _ in range(poll_limit):
+        summary = client.get(path)
+        if sum(
+                summary.get(state, 0) for state in (
+                    'canceled', 'error', 'finished', 'skipped')
+        ) >= summary['total']:
+            break
+        time.sleep(5)
+    else:
+        raise exceptions.TaskTimedOutError(
+            'Task group {} is ongoing after {} polls.'
+            .format(group_id, poll_limit)
+        )
+    return tuple(client.post('/pulp/api/v2/tasks/search/', {
+        'criteria': {'filters': {'group_id': group_id}},
+    }))
+
+
+def format_report(regenerations):
+    """Return a human-readable summary of :data:`Regeneration` objects."""
+    return '\n'.join(
+        '{}: {:.2f}s for {} consumers ({:.1f} consumers/s), {} tasks'.format(
+            regeneration.name,
+            regeneration.seconds,
+            regeneration.consumers,
+            regeneration.consumers / (regeneration.seconds or float('inf')),
+            len(regeneration.tasks),
+        )
+        for regeneration in regenerations
+    )
@@ -0,0 +1,280 @@
+# coding=utf-8
+"""A content-addressed cache for files fetched by tests.
+
+Several tests download the same upstream files, such as RPMs and Puppet
+modules, over and over. An :class:`ArtifactCache` downloads each file once,
+and then hands back the path to a local copy:
+
+>>> from pulp_smash import artifacts
+>>> path = artifacts.get_path('https://example.com/bear-4.1-1.noarch.rpm')
+>>> with open(path, 'rb') as handle:
+...     rpm = handle.read()
+
+The cache lives under the XDG cache directory, in
+``$XDG_CACHE_HOME/pulp_smash/artifacts/``. It has three parts:
+
+``objects/``
+    File contents, named by their SHA-256 checksum. An object is written once,
+    to a temporary file that is then renamed into place, and is never
+    modified afterwards.
+``index/``
+    One small JSON file per URL, named by the SHA-256 checksum of the URL. Each
+    records the URL's object checksum, when it was last checked, and the
+    ``ETag`` and ``Last-Modified`` validators returned by the server.
+``tmp/``
+    Partially downloaded files.
+
+Index files are also replaced by renaming, so readers never need a lock, and
+several processes can share one cache. An entry younger than ``max_age`` is
+used without contacting the server. An older entry is revalidated with a
+conditional GET, and the file is downloaded again only if it has changed.
+
+The cache is bounded in size. Reading an object bumps its modification time,
+and when the cache grows beyond ``max_size``, the least recently used objects
+are deleted. The most recently used object is never deleted, so a single file
+larger than ``max_size`` is still cached, and the cache may then exceed
+``max_size`` until another object is used. The default maximum size can be set
+in bytes with the ``PULP_SMASH_ARTIFACT_CACHE_SIZE`` environment variable.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import time
+
+import requests
+
+# `get_cache` uses this as a cache.
+_CACHE = None
+
+_DEFAULT_MAX_SIZE = 1024 ** 3  # 1 GiB
+
+
+class ArtifactCache(object):
+    """A content-addressed cache for files fetched over HTTP.
+
+    :param directory: The directory in which to store the cache. Defaults to
+        ``$XDG_CACHE_HOME/pulp_smash/artifacts``.
+    :param max_size: The maximum total size of cached objects, in bytes.
+    :param max_age: The number of seconds for which a cached file is used
+        without being revalidated with the server.
+    :param session: A ``requests.Session`` used for downloads.
+    """
+
+    def __init__(self, directory=None, max_size=None, max_age=86400,
+                 session=None):
+        """Initialize this object with needed instance attributes."""
+        if directory is None:
+            from xdg import BaseDirectory
+            directory = os.path.join(
+                BaseDirectory.save_cache_path('pulp_smash'),
+                'artifacts',
+            )
+        if max_size is None:
+            max_size = int(os.environ.get(
+                'PULP_SMASH_ARTIFACT_CACHE_SIZE',
+                _DEFAULT_MAX_SIZE,
+            ))
+        if session is None:
+            session = requests.Session()
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        self.session = session
+        for subdir in ('index', 'objects', 'tmp'):
+            path = os.path.join(directory, subdir)
+            if not os.path.isdir(path):
+                try:
+                    os.makedirs(path)
+                except OSError:  # another process may have made it
+                    if not os.path.isdir(path):
+                        raise
+
+    def get_path(self, url):
+        """Return the path to a local copy of the file at ``url``.
+
+        The file is downloaded if it is not cached, or if the cached copy is
+        stale and the server reports that the file has changed.
+
+        :param url: The URL of a file.
+        :returns: The path to a file that must not be modified.
+        :raises: ``requests.exceptions.HTTPError`` if the download fails.
+        """
+        entry = self._read_entry(url)
+        headers = {}
+        if entry is not None:
+            path = self._get_object_path(entry['sha256'])
+            if os.path.isfile(path):
+                if time.time() - entry['checked'] < self.max_age:
+                    _touch(path)
+                    return path
+                if entry.get('etag'):
+                    headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    headers['If-Modified-Since'] = entry['last_modified']
+        response = self.session.get(url, headers=headers, stream=True)
+        try:  # Release the connection, even if the body is never read.
+            if response.status_code == 304:
+                entry['checked'] = time.time()
+                self._write_entry(url, entry)
+                _touch(path)
+                return path
+            response.raise_for_status()
+            checksum, size = self._write_object(response)
+        finally:
+            response.close()
+        self._write_entry(url, {
+            'url': url,
+            'sha256': checksum,
+            'size': size,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'checked': time.time(),
+        })
+        path = self._get_object_path(checksum)
+        self.evict(keep=(path,))
+        return path
+
+    def open(self, url):
+        """Return a read-only binary file object for the file at ``url``."""
+        return open(self.get_path(url), 'rb')
+
+    def mmap(self, url):
+        """Return a read-only memory map of the file at ``url``.
+
+        :raises: ``ValueError`` if the file is empty, as empty files cannot be
+            memory mapped.
+        """
+        with self.open(url) as handle:
+            return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def evict(self, keep=()):
+        """Delete the least recently used objects until the cache fits.
+
+        The most recently used object is never deleted, even if it alone is
+        larger than ``max_size``. Another process may have just fetched it.
+
+        :param keep: Paths to objects which must not be deleted, such as one
+            that is about to be handed to a caller.
+        :returns: The number of bytes freed.
+        """
+        objects = []
+        total = 0
+        objects_dir = os.path.join(self.directory, 'objects')
+        for prefix in os.listdir(objects_dir):
+            for name in os.listdir(os.path.join(objects_dir, prefix)):
+                path = os.path.join(objects_dir, prefix, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:  # deleted by another process
+                    continue
+                objects.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        freed = 0
+        for _, size, path in sorted(objects)[:-1]:
+            if total - freed <= self.max_size:
+                break
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            freed += size
+        return freed
+
+    def clear(self):
+        """Delete everything in the cache."""
+        for subdir in ('index', 'objects', 'tmp'):
+            path = os.path.join(self.directory, subdir)
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+
+    def _get_object_path(self, checksum):
+        """Return the path to the object with the given SHA-256 checksum."""
+        return os.path.join(self.directory, 'objects', checksum[:2], checksum)
+
+    def _get_entry_path(self, url):
+        """Return the path to the index entry for ``url``."""
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'index', key + '.json')
+
+    def _read_entry(self, url):
+        """Return the index entry for ``url``, or ``None`` if there is none."""
+        try:
+            with open(self._get_entry_path(url)) as handle:
+                entry = json.load(handle)
+        except (IOError, OSError, ValueError):
+            return None
+        if entry.get('url') != url:  # a hash collision, or a corrupt file
+            return None
+        return entry
+
+    def _write_entry(self, url, entry):
+        """Atomically write ``entry`` as the index entry for ``url``."""
+        path = self._get_entry_path(url)
+        handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(handle, 'w') as tmp_file:
+                json.dump(entry, tmp_file)
+            os.rename(tmp_path, path)
+        except:  # noqa pylint:disable=bare-except
+            os.remove(tmp_path)
+            raise
+
+    def _write_object(self, response):
+        """Write the body of ``response`` into the cache.
+
+        :returns: A ``(sha256 checksum, size)`` tuple.
+        """
+        checksum = hashlib.sha256()
+        size = 0
+        handle, tmp_path = tempfile.mkstemp(
+            dir=os.path.join(self.directory, 'tmp')
+        )
+        try:
+            with os.fdopen(handle, 'wb') as tmp_file:
+                for chunk in response.iter_content(64 * 1024):
+                    checksum.update(chunk)
+                    size += len(chunk)
+                    tmp_file.write(chunk)
+            path = self._get_object_path(checksum.hexdigest())
+            if not os.path.isdir(os.path.dirname(path)):
+                try:
+                    os.mkdir(os.path.dirname(path))
+                except OSError:  # another process may have made it
+                    pass
+            os.chmod(tmp_path, 0o444)
+            os.rename(tmp_path, path)
+        except:  # noqa pylint:disable=bare-except
+            os.remove(tmp_path)
+            raise
+        return checksum.hexdigest(), size
+
+
+def _touch(path):
+    """Bump the modification time of ``path``, if it still exists."""
+    try:
+        os.utime(path, None)
+    except OSError:  # evicted by another process
+        pass
+
+
+def get_cache():
+    """Return the global :class:`ArtifactCache` object."""
+    global _CACHE  # pylint:disable=global-statement
+    if _CACHE is None:
+        _CACHE = ArtifactCache()
+    return _CACHE
+
+
+def get_path(url):
+    """Return the path to a cached copy of ``url``, using the global cache.
+
+    See :meth:`ArtifactCache.get_path`.
+    """
+    return get_cache().get_path(url)
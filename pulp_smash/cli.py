@@ -4,10 +4,16 @@ from __future__ import unicode_literals
 
 import socket
 import subprocess
+import threading
+import time
+from collections import deque, namedtuple
+from multiprocessing.pool import ThreadPool
 from sys import version_info
 try:  # try Python 3 import first
+    from queue import Empty, Queue
     from urllib.parse import urlparse
 except ImportError:  # pragma: no cover
+    from Queue import Empty, Queue  # pylint:disable=C0411,E0401
     from urlparse import urlparse  # pylint:disable=C0411,E0401
 
 import plumbum
@@ -15,6 +21,16 @@ import plumbum
 from pulp_smash import exceptions
 
 
+#: The number of characters of each output stream that
+#: :meth:`pulp_smash.cli.Client.stream` keeps, by default.
+DEFAULT_KEEP = 64 * 1024
+
+# How many seconds a command run with a timeout may ignore SIGTERM before
+# SIGKILL is sent, and how much longer Pulp Smash waits before killing the
+# local process, such as ``ssh``, that runs the command.
+_KILL_AFTER = 10
+_GRACE = 5
+
 # A dict mapping hostnames to *nix service managers.
 #
 # For example: {'old.example.com': 'sysv', 'new.example.com', 'systemd'}
@@ -152,14 +168,17 @@ class Client(object):  # pylint:disable=too-few-public-methods
         system on which commands will be executed.
     :param response_handler: A callback function. Defaults to
         :func:`pulp_smash.cli.code_handler`.
+    :param hostname: The host on which to execute commands. Defaults to the
+        hostname in ``server_config.base_url``. See :class:`Cluster`.
 
     .. _Plumbum: http://plumbum.readthedocs.org/en/latest/index.html
     """
 
-    def __init__(self, server_config, response_handler=None):
+    def __init__(self, server_config, response_handler=None, hostname=None):
         """Initialize this object with needed instance attributes."""
         # How do we make requests?
-        hostname = _get_hostname(server_config.base_url)
+        if hostname is None:
+            hostname = _get_hostname(server_config.base_url)
         if server_config.cli_transport is None:
             transport = 'local' if hostname == socket.getfqdn() else 'ssh'
         else:
@@ -200,6 +219,173 @@ class Client(object):  # pylint:disable=too-few-public-methods
         completed_process = CompletedProcess(args, code, stdout, stderr)
         return self.response_handler(completed_process)
 
+    def stream(self, args, timeout=None, keep=DEFAULT_KEEP):
+        """Run a command, and read its output as it is produced.
+
+        Unlike :meth:`run`, this method returns at once, with a
+        :class:`StreamingProcess`. Iterate over it to get each line of output
+        as it arrives, and then call its ``wait`` method to get the result of
+        ``self.response_handler``:
+
+        >>> from pulp_smash import cli, config
+        >>> client = cli.Client(config.get_config())
+        >>> process = client.stream(('pulp-manage-db',), timeout=3600)
+        >>> for name, line in process:
+        ...     print(name, line, end='')
+        >>> completed_process = process.wait()
+
+        Only the last ``keep`` characters of each of standard output and
+        standard error are kept for the :class:`CompletedProcess`, so that
+        commands with much output use bounded memory.
+
+        :param args: The command to run, such as ``('pulp-manage-db',)``.
+        :param timeout: A number of seconds. If the command is still running
+            after this long, it is sent SIGTERM, and SIGKILL a little later.
+            This is done on the target system, with ``timeout(1)``, so the
+            command is killed even if it runs over SSH. Its exit code is then
+            124 or 137. Defaults to no timeout.
+        :param keep: The number of characters of each output stream to keep,
+            or ``None`` to keep everything.
+        :returns: A :class:`StreamingProcess`.
+        """
+        if timeout is not None:
+            args = (
+                'timeout', '--kill-after={}'.format(_KILL_AFTER), str(timeout)
+            ) + tuple(args)
+        popen = self.machine[args[0]][tuple(args[1:])].popen()
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout + _KILL_AFTER + _GRACE
+        return StreamingProcess(self, args, popen, keep, deadline)
+
+
+class StreamingProcess(object):
+    """A running process, as returned by :meth:`Client.stream`.
+
+    Iterating over this object yields ``(name, line)`` tuples, where ``name``
+    is ``'stdout'`` or ``'stderr'``, and ``line`` is a line of output,
+    including its trailing newline, if any. Lines from the two streams are
+    yielded in the order in which they are read.
+
+    :param client: The :class:`Client` that started the process.
+    :param args: The command being run.
+    :param popen: A ``subprocess.Popen``-like object, with ``stdout`` and
+        ``stderr`` pipes.
+    :param keep: The number of characters of each output stream to keep for
+        :meth:`wait`, or ``None`` to keep everything.
+    :param deadline: A time, in seconds since the epoch, after which
+        ``popen`` is killed. ``None`` for no deadline.
+    """
+
+    def __init__(self, client, args, popen, keep, deadline=None):
+        """Start reading the process' output."""
+        self.args = args
+        self._client = client
+        self._popen = popen
+        self._deadline = deadline
+        self._buffers = {
+            'stdout': _RingBuffer(keep),
+            'stderr': _RingBuffer(keep),
+        }
+        self._lines = Queue()
+        self._open = 2  # The number of pipes not yet at EOF.
+        for name in ('stdout', 'stderr'):
+            thread = threading.Thread(
+                target=_read_lines,
+                args=(getattr(popen, name), name, self._lines),
+            )
+            thread.daemon = True
+            thread.start()
+
+    def __iter__(self):
+        """Yield ``(name, line)`` tuples until the process closes its output.
+
+        Each line is also kept for :meth:`wait`.
+        """
+        while self._open:
+            try:
+                if self._deadline is None:
+                    name, line = self._lines.get()
+                else:
+                    name, line = self._lines.get(
+                        timeout=max(0, self._deadline - time.time())
+                    )
+            except Empty:
+                self._popen.kill()  # Closing the pipes ends the readers.
+                self._deadline = None
+                continue
+            if line is None:
+                self._open -= 1
+                continue
+            self._buffers[name].append(line)
+            yield name, line
+
+    def kill(self):
+        """Kill the local process, such as ``ssh``, that runs the command.
+
+        The pipes are closed, so iteration soon stops. A remote command is not
+        killed directly, but is sent SIGPIPE when it next writes output.
+        """
+        self._popen.kill()
+
+    def wait(self):
+        """Wait for the process to finish.
+
+        Output not yet read is read and kept, but not yielded.
+
+        :returns: The result of the client's ``response_handler``, given a
+            :class:`CompletedProcess` whose ``stdout`` and ``stderr`` hold the
+            output that was kept.
+        """
+        for _ in self:
+            pass
+        returncode = self._popen.wait()
+        return self._client.response_handler(CompletedProcess(
+            self.args,
+            returncode,
+            self._buffers['stdout'].getvalue(),
+            self._buffers['stderr'].getvalue(),
+        ))
+
+
+class _RingBuffer(object):
+    """Keep the last ``max_size`` characters appended, or all if ``None``."""
+
+    def __init__(self, max_size):
+        """Initialize this object with needed instance attributes."""
+        self.max_size = max_size
+        self._chunks = deque()
+        self._size = 0
+
+    def append(self, text):
+        """Append ``text``, and discard the oldest text that does not fit."""
+        self._chunks.append(text)
+        self._size += len(text)
+        while self.max_size is not None and self._size > self.max_size:
+            excess = self._size - self.max_size
+            oldest = self._chunks.popleft()
+            if len(oldest) > excess:
+                self._chunks.appendleft(oldest[excess:])
+                self._size -= excess
+            else:
+                self._size -= len(oldest)
+
+    def getvalue(self):
+        """Return the text that has been kept."""
+        return ''.join(self._chunks)
+
+
+def _read_lines(pipe, name, lines):
+    """Put ``(name, line)`` tuples from ``pipe`` into ``lines``.
+
+    ``(name, None)`` is put when ``pipe`` reaches EOF.
+    """
+    try:
+        for line in iter(pipe.readline, b''):
+            lines.put((name, line.decode('utf-8', 'replace')))
+    finally:
+        lines.put((name, None))
+
 
 class Service(object):
     """A service on a system.
@@ -237,18 +423,20 @@ class Service(object):
     :param pulp_smash.config.ServerConfig server_config: Information about the
         target system.
     :param service: A string identifying the service. For example: ``'httpd'``.
+    :param hostname: The host on which the service runs. Defaults to the
+        hostname in ``server_config.base_url``. See :class:`Cluster`.
     :raises pulp_smash.exceptions.NoKnownServiceManagerError: If unable to find
         any service manager on the target system.
     """
 
-    def __init__(self, server_config, service):
+    def __init__(self, server_config, service, hostname=None):
         """Initialize a new object."""
-        self._client = Client(server_config)
+        self._client = Client(server_config, hostname=hostname)
         self._command_builder = None
 
         # Set `self._command_builder`.
-        service_manager = self._get_service_manager(server_config)
-        prefix = self._get_prefix(server_config)
+        service_manager = self._get_service_manager(server_config, hostname)
+        prefix = self._get_prefix(server_config, hostname)
         if service_manager == 'systemd':
             self._command_builder = lambda verb: prefix + (
                 'systemctl', verb, service
@@ -260,27 +448,29 @@ class Service(object):
         assert self._command_builder is not None
 
     @staticmethod
-    def _get_prefix(server_config):
+    def _get_prefix(server_config, hostname=None):
         """Determine whether to prefix commands with "sudo"."""
-        if Client(server_config).run(('id', '-u')).stdout.strip() == '0':
+        client = Client(server_config, hostname=hostname)
+        if client.run(('id', '-u')).stdout.strip() == '0':
             return ()
         else:
             return ('sudo',)
 
     @staticmethod
-    def _get_service_manager(server_config):
+    def _get_service_manager(server_config, hostname=None):
         """Talk to the target system and determine the type of service manager.
 
         Return "systemd" or "sysv" if the service manager appears to be one of
         those. Raise an exception otherwise.
         """
-        hostname = _get_hostname(server_config.base_url)
+        if hostname is None:
+            hostname = _get_hostname(server_config.base_url)
         try:
             return _SERVICE_MANAGERS[hostname]
         except KeyError:
             pass
 
-        client = Client(server_config, echo_handler)
+        client = Client(server_config, echo_handler, hostname)
         commands_managers = (
             ('which systemctl', 'systemd'),
             ('which service', 'sysv'),
@@ -309,3 +499,119 @@ class Service(object):
         :rtype: pulp_smash.cli.CompletedProcess
         """
         return self._client.run(self._command_builder('stop'))
+
+
+#: The outcome of running something on one host with a :class:`Cluster`.
+#: ``result`` is the return value, such as a :class:`CompletedProcess`, and
+#: ``seconds`` is how long it took.
+HostResult = namedtuple('HostResult', 'hostname result seconds')
+
+
+class Cluster(object):
+    """Run commands and service actions on several hosts at once.
+
+    A Pulp deployment may span several hosts. For example, ``pulp_workers``
+    may run on several nodes. The hosts are described by the ``hosts`` option
+    of a :class:`pulp_smash.config.ServerConfig`, which maps the names of host
+    groups to lists of hostnames:
+
+    .. code-block:: json
+
+        {"default": {
+            "base_url": "https://pulp.example.com",
+            "hosts": {"pulp_workers": ["w1.example.com", "w2.example.com"]}
+        }}
+
+    A group named after a service lists the hosts on which that service runs.
+    A group that is not listed has one host: the one named in ``base_url``.
+    Thus, a :class:`Cluster` works with single-host deployments, too:
+
+    >>> from pulp_smash import cli, config
+    >>> cluster = cli.Cluster(config.get_config())
+    >>> for result in cluster.service(('httpd', 'pulp_workers'), 'stop'):
+    ...     print(result.hostname, result.result.args, result.seconds)
+    >>> results = cluster.run('pulp_workers', ('rpm', '-q', 'pulp-server'))
+
+    Each method acts on every host concurrently, and waits for all of them to
+    finish. If any host raises an exception, the first such exception is
+    raised once all hosts are done.
+
+    :param pulp_smash.config.ServerConfig server_config: Information about the
+        Pulp deployment.
+    :param workers: The number of hosts to act on at once. Defaults to all of
+        them.
+    """
+
+    def __init__(self, server_config, workers=None):
+        """Initialize this object with needed instance attributes."""
+        self.cfg = server_config
+        self.workers = workers
+
+    def get_hosts(self, group):
+        """Return a tuple of the hostnames in ``group``."""
+        hosts = dict(self.cfg.hosts or {})
+        if group in hosts:
+            return tuple(hosts[group])
+        return (_get_hostname(self.cfg.base_url),)
+
+    def map(self, func, hostnames):
+        """Call ``func(hostname)`` for each of ``hostnames`` concurrently.
+
+        :returns: A list of :data:`HostResult` objects, in the same order as
+            ``hostnames``.
+        """
+        return self._map(func, [(host, host) for host in hostnames])
+
+    def run(self, group, args, response_handler=None):
+        """Run a command on every host in ``group``.
+
+        :param group: The name of a host group.
+        :param args: The command to run. See :meth:`Client.run`.
+        :param response_handler: See :class:`Client`.
+        :returns: A list of :data:`HostResult` objects.
+        """
+        return self.map(
+            lambda hostname: Client(
+                self.cfg, response_handler, hostname
+            ).run(args),
+            self.get_hosts(group),
+        )
+
+    def service(self, services, action):
+        """Start or stop services on every host on which they run.
+
+        :param services: An iterable of service names, such as
+            :data:`pulp_smash.constants.PULP_SERVICES`. Each service is acted
+            on on the hosts in the group with the same name.
+        :param action: Either ``'start'`` or ``'stop'``.
+        :returns: A list of :data:`HostResult` objects. Each ``result`` is a
+            :class:`CompletedProcess`, whose ``args`` name the service.
+        """
+        return self._map(
+            lambda pair: getattr(Service(self.cfg, *pair), action)(),
+            [
+                ((service, hostname), hostname)
+                for service in sorted(services)
+                for hostname in self.get_hosts(service)
+            ],
+        )
+
+    def _map(self, func, jobs):
+        """Call ``func(arg)`` for each ``(arg, hostname)`` job concurrently.
+
+        :returns: A list of :data:`HostResult` objects, in the same order as
+            ``jobs``.
+        """
+        def call(job):
+            """Call ``func``, and time it."""
+            arg, hostname = job
+            start = time.time()
+            result = func(arg)
+            return HostResult(hostname, result, time.time() - start)
+
+        pool = ThreadPool(self.workers or len(jobs) or 1)
+        try:
+            return pool.map(call, jobs)
+        finally:
+            pool.close()
+            pool.join()
@@ -11,20 +11,40 @@ from __future__ import unicode_literals
 
 import json
 import os
+import stat
+import tempfile
+from contextlib import contextmanager
 from copy import deepcopy
 from threading import Lock
-
-from packaging.version import Version
-from xdg import BaseDirectory
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # pylint:disable=invalid-name
 
 from pulp_smash import exceptions
 
+# The `packaging` and `xdg` libraries are imported by the functions that use
+# them, so that importing this module is cheap. See `benchmarks.bench_imports`.
+
 
 # `get_config` uses this as a cache. It is intentionally a global. This design
 # lets us do interesting things like flush the cache at run time or completely
 # avoid a config file by fetching values from the UI.
 _CONFIG = None
 
+# A dict mapping (xdg_config_dir, xdg_config_file) tuples to the paths returned
+# by `_get_config_file_path`. Used by `_find_config_file`.
+_PATH_CACHE = {}
+
+# A dict mapping configuration file paths to (stat key, parsed contents)
+# tuples. Used by `_read_config_file` and `_write_config_file`. The parsed
+# contents are shared, and must not be modified.
+_FILE_CACHE = {}
+
+# Used to lock access to configuration files within this process. Across
+# processes, see `_lock_config_dir`.
+_FILE_LOCK = Lock()
+
 
 def _public_attrs(obj):
     """Return a copy of the public elements in ``vars(obj)``."""
@@ -41,13 +61,35 @@ def get_config():
     file is parsed and the cache is populated. Otherwise, a copy of the cached
     configuration object is returned.
 
+    Callers that do not need to modify the returned object should prefer
+    :func:`get_frozen_config`, which does not make a copy.
+
     :returns: A copy of the global server configuration object.
     :rtype: pulp_smash.config.ServerConfig
     """
+    return get_frozen_config().thaw()
+
+
+def get_frozen_config():
+    """Return the global ``FrozenServerConfig`` object.
+
+    This method makes use of the same cache as :func:`get_config`. Unlike that
+    function, it returns the cached object itself. This is safe because the
+    object is immutable, and it is cheap enough to call from every ``setUp``
+    method.
+
+    The "default" section of the configuration file is read, unless the
+    ``PULP_SMASH_CONFIG_SECTION`` environment variable names another section.
+    :mod:`pulp_smash.runner` uses this to point each worker at a server.
+
+    :returns: The global server configuration object.
+    :rtype: pulp_smash.config.FrozenServerConfig
+    """
     global _CONFIG  # pylint:disable=global-statement
     if _CONFIG is None:
-        _CONFIG = ServerConfig().read()
-    return deepcopy(_CONFIG)
+        section = os.environ.get('PULP_SMASH_CONFIG_SECTION')
+        _CONFIG = ServerConfig().read(section).freeze()
+    return _CONFIG
 
 
 class ServerConfig(object):  # pylint:disable=too-many-instance-attributes
@@ -101,6 +143,10 @@ class ServerConfig(object):  # pylint:disable=too-many-instance-attributes
     set, the environment variable should be a file name like ``settings2.json``
     (or a relative path), *not* an absolute path.
 
+    Parsed configuration files are cached, and a file is parsed again only if
+    its modification time, size or inode changes. Thus, many calls to
+    :meth:`read` and :meth:`sections` cost one parse.
+
     :param base_url: A string. A protocol, hostname and optionally a port. For
         example, ``'http://example.com:250'``. Do not append a trailing slash.
     :param auth: A two-tuple. Credentials to use when communicating with the
@@ -112,6 +158,11 @@ class ServerConfig(object):  # pylint:disable=too-many-instance-attributes
         library's ``packaging.version.Version`` class.
     :param cli_transport: Either 'local' or 'ssh'. See
         :class:`pulp_smash.cli.Client` for details.
+    :param hosts: A dict mapping the names of host groups to lists of
+        hostnames, for Pulp deployments that span several hosts. For example,
+        ``{'pulp_workers': ['w1.example.com', 'w2.example.com']}``. A group
+        named after a service lists the hosts on which that service runs. See
+        :class:`pulp_smash.cli.Cluster` for details.
 
     .. _packaging: https://packaging.pypa.io/en/latest/
     """
@@ -125,26 +176,25 @@ class ServerConfig(object):  # pylint:disable=too-many-instance-attributes
     # file. And the few API options that live here, like `verify`, just
     # shouldn't be code.
 
-    # Used to lock access to the configuration file when performing destructive
-    # operations, such as saving.
-    _file_lock = Lock()
-
     def __init__(  # pylint:disable=too-many-arguments
             self,
             base_url=None,
             auth=None,
             verify=None,
             version=None,
-            cli_transport=None):
+            cli_transport=None,
+            hosts=None):
         """Initialize this object with needed instance attributes."""
         self.base_url = base_url
         self.auth = auth
         self.verify = verify
+        from packaging.version import Version
         if version is None:
             self.version = Version('1!0')
         else:
             self.version = Version(version)
         self.cli_transport = cli_transport
+        self.hosts = hosts
 
         self._section = 'default'
         self._xdg_config_file = os.environ.get(
@@ -164,7 +214,9 @@ class ServerConfig(object):  # pylint:disable=too-many-instance-attributes
     def save(self, section=None, xdg_config_file=None, xdg_config_dir=None):
         """Save ``self`` as a top-level section of a configuration file.
 
-        This method is thread-safe.
+        This method is safe to call from several threads or processes at once.
+        The configuration file is replaced atomically, so readers never see a
+        partially written file.
 
         :param section: A string. An identifier for the current configuration.
             If no top-level section named ``section`` exists in the
@@ -185,29 +237,28 @@ class ServerConfig(object):  # pylint:disable=too-many-instance-attributes
             xdg_config_file = self._xdg_config_file
         if xdg_config_dir is None:
             xdg_config_dir = self._xdg_config_dir
+        from xdg import BaseDirectory
         path = os.path.join(
             BaseDirectory.save_config_path(xdg_config_dir),
             xdg_config_file
         )
 
         # Lock, write, unlock.
-        self._file_lock.acquire()
-        try:
+        with _lock_config_dir(os.path.dirname(path)):
             try:
-                with open(path) as config_file:
-                    config = json.load(config_file)
-            except IOError:
+                config = dict(_read_config_file(path))
+            except (IOError, OSError):
                 config = {}
             config[section] = attrs
-            with open(path, 'w') as config_file:
-                json.dump(config, config_file)
-        finally:
-            self._file_lock.release()
+            _write_config_file(path, config)
+        _PATH_CACHE.pop((xdg_config_dir, xdg_config_file), None)
 
     def delete(self, section=None, xdg_config_file=None, xdg_config_dir=None):
         """Delete a top-level section from a configuration file.
 
-        This method is thread safe.
+        This method is safe to call from several threads or processes at once.
+        The configuration file is replaced atomically, so readers never see a
+        partially written file.
 
         :param section: A string. The name of the section to be deleted.
         :param xdg_config_file: A string. The name of the file to manipulate.
@@ -224,18 +275,13 @@ class ServerConfig(object):  # pylint:disable=too-many-instance-attributes
             xdg_config_file = self._xdg_config_file
         if xdg_config_dir is None:
             xdg_config_dir = self._xdg_config_dir
-        path = _get_config_file_path(xdg_config_dir, xdg_config_file)
+        path = _find_config_file(xdg_config_dir, xdg_config_file)
 
         # Lock, delete, unlock.
-        self._file_lock.acquire()
-        try:
-            with open(path) as config_file:
-                config = json.load(config_file)
+        with _lock_config_dir(os.path.dirname(path)):
+            config = dict(_read_config_file(path))
             del config[section]
-            with open(path, 'w') as config_file:
-                json.dump(config, config_file)
-        finally:
-            self._file_lock.release()
+            _write_config_file(path, config)
 
     def sections(self, xdg_config_file=None, xdg_config_dir=None):
         """Read a configuration file and return its top-level sections.
@@ -251,11 +297,10 @@ class ServerConfig(object):  # pylint:disable=too-many-instance-attributes
             xdg_config_file = self._xdg_config_file
         if xdg_config_dir is None:
             xdg_config_dir = self._xdg_config_dir
-        path = _get_config_file_path(xdg_config_dir, xdg_config_file)
+        path = _find_config_file(xdg_config_dir, xdg_config_file)
 
-        with open(path) as config_file:
-            # keys() returns a list in Python 2 and a view in Python 3.
-            return set(json.load(config_file).keys())
+        # keys() returns a list in Python 2 and a view in Python 3.
+        return set(_read_config_file(path).keys())
 
     def read(self, section=None, xdg_config_file=None, xdg_config_dir=None):
         """Read a section from a configuration file.
@@ -277,13 +322,13 @@ class ServerConfig(object):  # pylint:disable=too-many-instance-attributes
             xdg_config_file = self._xdg_config_file
         if xdg_config_dir is None:
             xdg_config_dir = self._xdg_config_dir
-        path = _get_config_file_path(xdg_config_dir, xdg_config_file)
+        path = _find_config_file(xdg_config_dir, xdg_config_file)
 
         # Instantiate a config and populate it with values from the settings
         # file. We tell the config object which file it has been populated from
         # so calls to its `save` method and other methods hit the same file.
-        with open(path) as config_file:
-            cfg = type(self)(**json.load(config_file)[section])
+        # The parsed file is shared, so don't let the config alias its values.
+        cfg = type(self)(**deepcopy(_read_config_file(path)[section]))
         # pylint:disable=protected-access
         cfg._section = section
         cfg._xdg_config_file = xdg_config_file
@@ -315,12 +360,221 @@ class ServerConfig(object):  # pylint:disable=too-many-instance-attributes
         gains or loses attributes.
         """
         attrs = _public_attrs(self)
-        for key in ('base_url', 'cli_transport', 'version'):
+        for key in ('base_url', 'cli_transport', 'hosts', 'version'):
             del attrs[key]
         if attrs['auth'] is not None:
             attrs['auth'] = tuple(attrs['auth'])
         return attrs
 
+    def freeze(self):
+        """Return an immutable copy of this object.
+
+        :rtype: pulp_smash.config.FrozenServerConfig
+        """
+        attrs = _public_attrs(self)
+        attrs.update({
+            key: val for key, val in vars(self).items()
+            if key in FrozenServerConfig.__slots__
+        })
+        return FrozenServerConfig(**attrs)
+
+
+class FrozenServerConfig(object):
+    """An immutable variant of :class:`pulp_smash.config.ServerConfig`.
+
+    A ``ServerConfig`` must be copied before it is handed to code that might
+    modify it, and copying it with ``deepcopy`` is relatively expensive. An
+    instance of this class cannot be modified, so a single instance can be
+    shared by any number of test cases and threads. It has the same public
+    attributes as a ``ServerConfig``, and it can be used wherever a
+    ``ServerConfig`` is only read from, such as by
+    :class:`pulp_smash.api.Client` and :class:`pulp_smash.cli.Client`.
+
+    >>> from pulp_smash.config import ServerConfig
+    >>> cfg = ServerConfig('https://pulp.example.com', ['alice', 'hackme'])
+    >>> frozen = cfg.freeze()
+    >>> frozen.auth
+    ('alice', 'hackme')
+    >>> frozen.base_url = 'https://pulp.example.org'
+    Traceback (most recent call last):
+      ...
+    AttributeError: FrozenServerConfig objects are immutable.
+
+    To get a modified copy, call :meth:`evolve`. To get a mutable copy, call
+    :meth:`thaw`.
+
+    Instances use ``__slots__``, and the kwargs returned by
+    :meth:`get_requests_kwargs` are computed once, when the object is created.
+
+    :param base_url: See :class:`pulp_smash.config.ServerConfig`.
+    :param auth: See :class:`pulp_smash.config.ServerConfig`. This is stored as
+        a tuple.
+    :param verify: See :class:`pulp_smash.config.ServerConfig`.
+    :param version: A string or a ``packaging.version.Version``. See
+        :class:`pulp_smash.config.ServerConfig`.
+    :param cli_transport: See :class:`pulp_smash.config.ServerConfig`.
+    :param hosts: See :class:`pulp_smash.config.ServerConfig`. This is stored
+        as a sorted tuple of ``(group, hostnames)`` tuples, where
+        ``hostnames`` is a tuple. Pass it to ``dict`` to get a dict.
+    """
+
+    __slots__ = (
+        'base_url',
+        'auth',
+        'verify',
+        'version',
+        'cli_transport',
+        'hosts',
+        '_section',
+        '_xdg_config_file',
+        '_xdg_config_dir',
+        '_requests_kwargs',
+    )
+
+    def __init__(  # pylint:disable=too-many-arguments
+            self,
+            base_url=None,
+            auth=None,
+            verify=None,
+            version=None,
+            cli_transport=None,
+            hosts=None,
+            _section='default',
+            _xdg_config_file=None,
+            _xdg_config_dir='pulp_smash'):
+        """Initialize this object with needed instance attributes."""
+        if auth is not None:
+            auth = tuple(auth)
+        from packaging.version import Version
+        if version is None:
+            version = Version('1!0')
+        elif not isinstance(version, Version):
+            version = Version(version)
+        if hosts is not None:
+            hosts = tuple(sorted(
+                (group, tuple(hostnames))
+                for group, hostnames in dict(hosts).items()
+            ))
+        if _xdg_config_file is None:
+            _xdg_config_file = os.environ.get(
+                'PULP_SMASH_CONFIG_FILE',
+                'settings.json'
+            )
+        setattr_ = super(FrozenServerConfig, self).__setattr__
+        setattr_('base_url', base_url)
+        setattr_('auth', auth)
+        setattr_('verify', verify)
+        setattr_('version', version)
+        setattr_('cli_transport', cli_transport)
+        setattr_('hosts', hosts)
+        setattr_('_section', _section)
+        setattr_('_xdg_config_file', _xdg_config_file)
+        setattr_('_xdg_config_dir', _xdg_config_dir)
+        setattr_('_requests_kwargs', {'auth': auth, 'verify': verify})
+
+    def __setattr__(self, name, value):
+        """Refuse to set attributes."""
+        raise AttributeError(
+            '{} objects are immutable.'.format(type(self).__name__)
+        )
+
+    def __delattr__(self, name):
+        """Refuse to delete attributes."""
+        raise AttributeError(
+            '{} objects are immutable.'.format(type(self).__name__)
+        )
+
+    def __copy__(self):
+        """Return ``self``. There is no need to copy an immutable object."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Return ``self``. There is no need to copy an immutable object."""
+        return self
+
+    def __eq__(self, other):  # noqa
+        if type(self) is not type(other):
+            return NotImplemented
+        # pylint:disable=protected-access
+        return self._astuple() == other._astuple()
+
+    def __ne__(self, other):  # noqa
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):  # noqa
+        return hash(self._astuple())
+
+    def __repr__(self):  # noqa
+        attrs = self._public_attrs()
+        attrs['version'] = type('')(attrs['version'])
+        str_kwargs = ', '.join(
+            '{}={}'.format(key, repr(value)) for key, value in attrs.items()
+        )
+        return '{}({})'.format(type(self).__name__, str_kwargs)
+
+    def evolve(self, **changes):
+        """Return a copy of this object, with the given attributes changed.
+
+        >>> from pulp_smash.config import get_frozen_config
+        >>> cfg = get_frozen_config().evolve(verify=False)
+
+        :param changes: Attributes to change, such as ``base_url``. Any
+            argument accepted by this class' constructor may be given.
+        :rtype: pulp_smash.config.FrozenServerConfig
+        """
+        attrs = {
+            key: getattr(self, key)
+            for key in self.__slots__ if key != '_requests_kwargs'
+        }
+        attrs.update(changes)
+        return type(self)(**attrs)
+
+    def thaw(self):
+        """Return a mutable copy of this object.
+
+        :rtype: pulp_smash.config.ServerConfig
+        """
+        cfg = ServerConfig(
+            self.base_url,
+            None if self.auth is None else list(self.auth),
+            self.verify,
+            None,
+            self.cli_transport,
+            None if self.hosts is None else {
+                group: list(hostnames) for group, hostnames in self.hosts
+            },
+        )
+        cfg.version = self.version
+        # pylint:disable=protected-access
+        cfg._section = self._section
+        cfg._xdg_config_file = self._xdg_config_file
+        cfg._xdg_config_dir = self._xdg_config_dir
+        return cfg
+
+    def get_requests_kwargs(self):
+        """Get kwargs for use by the Requests functions.
+
+        See :meth:`pulp_smash.config.ServerConfig.get_requests_kwargs`. The
+        returned dict is a shallow copy of a dict that was computed when this
+        object was created, and callers may modify it.
+        """
+        return self._requests_kwargs.copy()
+
+    def _public_attrs(self):
+        """Return a dict of this object's public attributes."""
+        return {
+            key: getattr(self, key)
+            for key in self.__slots__ if not key.startswith('_')
+        }
+
+    def _astuple(self):
+        """Return a tuple of this object's attributes, except kwargs."""
+        return tuple(
+            getattr(self, key)
+            for key in self.__slots__ if key != '_requests_kwargs'
+        )
+
 
 def _get_config_file_path(xdg_config_dir, xdg_config_file):
     """Search ``XDG_CONFIG_DIRS`` for a config file and return the first found.
@@ -338,6 +592,7 @@ def _get_config_file_path(xdg_config_dir, xdg_config_file):
     :raises pulp_smash.exceptions.ConfigFileNotFoundError: If the requested
         configuration file cannot be found.
     """
+    from xdg import BaseDirectory
     paths = [
         os.path.join(config_dir, xdg_config_file)
         for config_dir in BaseDirectory.load_config_paths(xdg_config_dir)
@@ -349,3 +604,98 @@ def _get_config_file_path(xdg_config_dir, xdg_config_file):
         'Pulp Smash is unable to find a configuration file. The following '
         '(XDG compliant) paths have been searched: ' + ', '.join(paths)
     )
+
+
+def _find_config_file(xdg_config_dir, xdg_config_file):
+    """Like ``_get_config_file_path``, but remember the paths found.
+
+    A remembered path is forgotten if it no longer points to a file, or if
+    :meth:`pulp_smash.config.ServerConfig.save` writes to a configuration file
+    of the same name.
+    """
+    key = (xdg_config_dir, xdg_config_file)
+    path = _PATH_CACHE.get(key)
+    if path is None or not os.path.isfile(path):
+        path = _get_config_file_path(xdg_config_dir, xdg_config_file)
+        _PATH_CACHE[key] = path
+    return path
+
+
+def _stat_key(stat_result):
+    """Return a tuple that changes whenever a file's contents change.
+
+    The tuple includes the file's modification time, size and inode number.
+    The inode number changes whenever the file is atomically replaced.
+    """
+    mtime = getattr(stat_result, 'st_mtime_ns', stat_result.st_mtime)
+    return (mtime, stat_result.st_size, stat_result.st_ino)
+
+
+def _read_config_file(path):
+    """Return the parsed contents of the configuration file at ``path``.
+
+    The file is parsed only if it has changed since it was last parsed. The
+    returned dict is shared by all callers, and it must not be modified.
+
+    :raises: ``IOError`` or ``OSError`` if the file cannot be read.
+    """
+    cached = _FILE_CACHE.get(path)
+    if cached is not None and cached[0] == _stat_key(os.stat(path)):
+        return cached[1]
+    with open(path) as config_file:
+        key = _stat_key(os.fstat(config_file.fileno()))
+        config = json.load(config_file)
+    _FILE_CACHE[path] = (key, config)
+    return config
+
+
+def _write_config_file(path, config):
+    """Atomically replace the configuration file at ``path`` with ``config``.
+
+    Write ``config`` to a temporary file in the same directory, and rename the
+    temporary file to ``path``. Readers see either the old file or the new
+    file, never a partially written file, so they need no locks. The file's
+    permissions are preserved. The caller should hold a lock from
+    ``_lock_config_dir``.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        mode = None
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path),
+        prefix='.' + os.path.basename(path),
+        suffix='.tmp',
+    )
+    try:
+        with os.fdopen(fd, 'w') as config_file:
+            json.dump(config, config_file)
+            config_file.flush()
+            os.fsync(config_file.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.rename(tmp_path, path)
+    except:  # noqa pylint:disable=bare-except
+        os.remove(tmp_path)
+        raise
+    _FILE_CACHE[path] = (_stat_key(os.stat(path)), config)
+
+
+@contextmanager
+def _lock_config_dir(config_dir):
+    """Lock the directory ``config_dir`` against concurrent modification.
+
+    The lock is held against other threads in this process and, where
+    ``fcntl`` is available, against other processes. It is advisory, and it is
+    only needed by code that writes configuration files.
+    """
+    with _FILE_LOCK:
+        if fcntl is None:  # pragma: no cover
+            yield
+            return
+        fd = os.open(config_dir, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # releases the lock
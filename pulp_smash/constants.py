@@ -10,6 +10,13 @@ CALL_REPORT_KEYS = frozenset(('error', 'result', 'spawned_tasks'))
     http://pulp.readthedocs.org/en/latest/dev-guide/conventions/sync-v-async.html#call-report
 """
 
+CONSUMER_PATH = '/pulp/api/v2/consumers/'
+"""See: `Consumer APIs`_.
+
+.. _Consumer APIs:
+    https://pulp.readthedocs.org/en/latest/dev-guide/integration/rest-api/consumer/index.html
+"""
+
 CONTENT_UPLOAD_PATH = '/pulp/api/v2/content/uploads/'
 """See: `Creating an Upload Request`_.
 
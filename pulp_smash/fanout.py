@@ -0,0 +1,181 @@
+# coding=utf-8
+"""Copy one repository's content into many repositories, and publish them.
+
+:func:`fan_out` copies the content of a source repository into several target
+repositories, adds a distributor to each target, and publishes each target. It
+does this in three phases, and within each phase, it sends all requests at
+once:
+
+1. Send an ``actions/associate/`` request to every target, and wait for all
+   of the spawned tasks together.
+2. Add a distributor to every target.
+3. Send an ``actions/publish/`` request to every target, and wait for all of
+   the spawned tasks together.
+
+Each phase is timed as a whole, and per target. Comparing the time taken to
+publish one target with the time taken to publish many shows how well a Pulp
+server's publishing scales with its number of workers.
+
+>>> from pulp_smash import config, fanout
+>>> result = fanout.fan_out(config.get_config(), source, targets, gen_dist)
+>>> print(fanout.format_report(result))
+"""
+from __future__ import division, unicode_literals
+
+import time
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+try:  # try Python 3 import first
+    from urllib.parse import urljoin
+except ImportError:  # pragma: no cover
+    from urlparse import urljoin  # pylint:disable=C0411,E0401
+
+from pulp_smash import api, perf, utils
+
+
+#: The timings of one phase of :func:`fan_out`. ``name`` is one of
+#: ``associate``, ``distribute`` and ``publish``. ``seconds`` is the time taken
+#: by the whole phase. ``targets`` is a dict mapping each target's ``_href`` to
+#: the number of seconds its tasks ran for, as reported by Pulp, or to the
+#: latency of its request if no tasks were spawned. A target whose tasks lack
+#: timestamps maps to ``None``.
+Phase = namedtuple('Phase', 'name seconds targets')
+
+#: The outcome of :func:`fan_out`. ``distributors`` is a list of the bodies of
+#: the created distributors, in the same order as the targets. ``tasks`` is a
+#: dict mapping phase names to tuples of task bodies. ``phases`` is a list of
+#: :data:`Phase` objects.
+FanOutResult = namedtuple('FanOutResult', 'distributors tasks phases')
+
+
+def fan_out(server_config, source_repo, target_repos, gen_distributor,
+            workers=None):
+    """Copy content into many repositories, and publish them.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :param source_repo: A dict with the source repository's ``id``.
+    :param target_repos: A list of dicts, each with a target repository's
+        ``_href``.
+    :param gen_distributor: A callable that returns the body of a new
+        distributor each time it is called.
+    :param workers: The number of requests that may be in flight at once.
+        Defaults to the number of targets.
+    :returns: A :data:`FanOutResult`.
+    :raises: ``requests.exceptions.HTTPError`` if a request fails.
+    """
+    target_repos = list(target_repos)
+    pool = ThreadPool(workers or len(target_repos) or 1)
+    try:
+        associate, associate_tasks = _run_tasks(
+            server_config,
+            pool,
+            'associate',
+            [(urljoin(repo['_href'], 'actions/associate/'),
+              {'source_repo_id': source_repo['id']})
+             for repo in target_repos],
+            target_repos,
+        )
+
+        start = time.time()
+        responses = _post_all(
+            server_config,
+            pool,
+            [(urljoin(repo['_href'], 'distributors/'), gen_distributor())
+             for repo in target_repos],
+        )
+        distributors = [response.json() for response, _ in responses]
+        distribute = Phase('distribute', time.time() - start, {
+            repo['_href']: seconds
+            for repo, (_, seconds) in zip(target_repos, responses)
+        })
+
+        publish, publish_tasks = _run_tasks(
+            server_config,
+            pool,
+            'publish',
+            [(urljoin(repo['_href'], 'actions/publish/'),
+              {'id': distributor['id']})
+             for repo, distributor in zip(target_repos, distributors)],
+            target_repos,
+        )
+    finally:
+        pool.close()
+        pool.join()
+    return FanOutResult(
+        distributors,
+        {'associate': associate_tasks, 'publish': publish_tasks},
+        [associate, distribute, publish],
+    )
+
+
+def _post_all(server_config, pool, requests_):
+    """POST several requests at once.
+
+    :param requests_: A list of ``(path, body)`` tuples.
+    :returns: A list of ``(response, seconds)`` tuples, in the same order.
+    """
+    client = api.Client(server_config, api.echo_handler)
+
+    def post(request):
+        """POST one request, and time it."""
+        start = time.time()
+        response = client.post(*request)
+        response.raise_for_status()
+        return response, time.time() - start
+
+    return pool.map(post, requests_)
+
+
+def _run_tasks(server_config, pool, name, requests_, target_repos):
+    """POST several requests at once, and wait for all spawned tasks.
+
+    :returns: A ``(phase, tasks)`` tuple.
+    """
+    start = time.time()
+    owners = {}  # Map task hrefs to target hrefs.
+    for repo, (response, _) in zip(
+            target_repos, _post_all(server_config, pool, requests_)):
+        for task in response.json()['spawned_tasks']:
+            owners[task['_href']] = repo['_href']
+    tasks = []
+    by_target = {repo['_href']: [] for repo in target_repos}
+    for task in utils.poll_tasks(server_config, list(owners)):
+        owner = owners[task['_href']]
+        by_target[owner].append(task)
+        for child in task['spawned_tasks']:
+            owners[child['_href']] = owner
+        tasks.append(task)
+    seconds = time.time() - start
+    targets = {}
+    for href, target_tasks in by_target.items():
+        try:
+            targets[href] = perf.get_duration(target_tasks)
+        except ValueError:
+            targets[href] = None
+    return Phase(name, seconds, targets), tuple(tasks)
+
+
+def format_report(result):
+    """Return a human-readable summary of a :data:`FanOutResult`."""
+    lines = []
+    for phase in result.phases:
+        seconds = [
+            value for value in phase.targets.values() if value is not None
+        ]
+        if seconds:
+            lines.append(
+                '{}: {:.2f}s for {} targets (per target: min {:.2f}s, '
+                'mean {:.2f}s, max {:.2f}s)'.format(
+                    phase.name,
+                    phase.seconds,
+                    len(phase.targets),
+                    min(seconds),
+                    sum(seconds) / len(seconds),
+                    max(seconds),
+                )
+            )
+        else:
+            lines.append('{}: {:.2f}s for {} targets'.format(
+                phase.name, phase.seconds, len(phase.targets)
+            ))
+    return '\n'.join(lines)
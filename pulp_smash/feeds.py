@@ -0,0 +1,515 @@
+# coding=utf-8
+r"""Tools for serving sync feeds from a local mirror.
+
+Many tests sync content from the internet. For example, RPM tests sync
+``https://repos.fedorapeople.org/...``, and Puppet tests sync
+``http://forge.puppetlabs.com``. As a result, those tests run no faster than
+the network allows, and they cannot run on air-gapped systems.
+
+This module lets those tests sync content from a local mirror instead. A
+mirror is a directory laid out like so::
+
+    <root>/<hostname>/<path>
+
+For example, the RPM feed above is mirrored at
+``<root>/repos.fedorapeople.org/repos/pulp/pulp/demo_repos/zoo/``. A mirror can
+be populated with :func:`mirror_file`, :func:`mirror_yum_repo` and
+:func:`mirror_forge`, and a ``PULP_MANIFEST`` file can be generated for ISO and
+Puppet directory feeds with :func:`write_manifest`. A mirror can be served over
+HTTP with :class:`FeedServer`.
+
+Tests pass each feed URL through :func:`resolve`. If the
+``PULP_SMASH_FEED_MIRROR`` environment variable is set, URLs are rewritten to
+point at the mirror. Otherwise, they are returned unchanged. The variable
+should be set to the mirror's base URL *as seen by the Pulp server*, such as
+``http://mirror.example.com:8000``. For example::
+
+    python -m pulp_smash.feeds mirror-yum ~/mirror \
+        https://repos.fedorapeople.org/repos/pulp/pulp/demo_repos/zoo/
+    python -m pulp_smash.feeds mirror-forge ~/mirror \
+        http://forge.puppetlabs.com pulp-pulp
+    python -m pulp_smash.feeds serve ~/mirror --port 8000 &
+    PULP_SMASH_FEED_MIRROR=http://$(hostname):8000 \
+        python -m unittest2 discover pulp_smash.tests
+
+Query strings are dropped when a URL is mapped to a file. Pulp queries a
+Puppet Forge for the modules it syncs, so a Forge mirror must be served by
+:class:`FeedServer`, which answers those queries. (See
+:func:`get_forge_response`.) Any other static file server may serve the rest
+of a mirror.
+
+OSTree feeds are not resolved, and OSTree tests always sync from the internet,
+as this module cannot populate a mirror with an OSTree repository.
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import sys
+import tempfile
+from threading import Thread
+from xml.etree import ElementTree
+try:  # try Python 3 import first
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qsl, unquote, urljoin, urlparse
+except ImportError:  # pragma: no cover
+    # pylint:disable=C0411,E0401
+    from BaseHTTPServer import HTTPServer
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+    from urlparse import parse_qsl, urljoin, urlparse
+
+import requests
+
+# XML namespaces used by yum repository metadata.
+_REPO_NS = {'repo': 'http://linux.duke.edu/metadata/repo'}
+_COMMON_NS = {'common': 'http://linux.duke.edu/metadata/common'}
+
+# Matches the paths from which Pulp downloads modules from a Forge.
+_FORGE_FILE = re.compile(r'^(.*/)?system/releases/[^/]+/[^/]+/([^/]+)$')
+
+
+def resolve(url):
+    """Return the URL from which the content at ``url`` should be fetched.
+
+    :param url: An upstream URL, such as a repository's feed.
+    :returns: ``url`` rewritten to point at the mirror named by the
+        ``PULP_SMASH_FEED_MIRROR`` environment variable, or ``url`` itself if
+        that variable is unset.
+    """
+    mirror = os.environ.get('PULP_SMASH_FEED_MIRROR')
+    if not mirror:
+        return url
+    parts = urlparse(url)
+    resolved = '{}/{}{}'.format(mirror.rstrip('/'), parts.netloc, parts.path)
+    if parts.query:
+        resolved += '?' + parts.query
+    return resolved
+
+
+def get_path(root, url):
+    """Return the path at which the content at ``url`` is mirrored.
+
+    :param root: The mirror's root directory.
+    :param url: An upstream URL.
+    :returns: A path within ``root``. Query strings are ignored.
+    :raises: ``ValueError`` if ``url`` would map to a path outside of
+        ``root``.
+    """
+    parts = urlparse(url)
+    relpath = posixpath.normpath(unquote(parts.netloc + parts.path))
+    if relpath.startswith('..') or posixpath.isabs(relpath):
+        raise ValueError('Refusing to mirror {} outside of {}.'.format(
+            url, root
+        ))
+    return os.path.join(root, *relpath.split('/'))
+
+
+def mirror_file(root, url, session=None):
+    """Download the file at ``url`` into the mirror at ``root``.
+
+    The file is downloaded to a temporary file and then renamed into place, so
+    a concurrently running :class:`FeedServer` never serves a partial file.
+
+    :param root: The mirror's root directory.
+    :param url: The URL of the file to download.
+    :param session: A ``requests.Session``. Reusing a session across many
+        calls lets connections be reused.
+    :returns: The path to the downloaded file.
+    :raises: ``requests.exceptions.HTTPError`` if the download fails.
+    """
+    if session is None:
+        session = requests.Session()
+    path = get_path(root, url)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    response = session.get(url, stream=True)
+    response.raise_for_status()
+    _write(path, response.iter_content(64 * 1024))
+    return path
+
+
+def _write(path, chunks):
+    """Write ``chunks`` of bytes to a temporary file, then move it to ``path``.
+
+    The directory containing ``path`` must exist.
+    """
+    handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(handle, 'wb') as tmp_file:
+            for chunk in chunks:
+                tmp_file.write(chunk)
+        os.rename(tmp_path, path)
+    except:  # noqa pylint:disable=bare-except
+        os.remove(tmp_path)
+        raise
+
+
+def mirror_yum_repo(root, url, session=None):
+    """Mirror the yum repository at ``url`` into the mirror at ``root``.
+
+    The repository's ``repodata/repomd.xml`` file, every metadata file it
+    lists, and every package listed in the primary metadata are downloaded.
+
+    :param root: The mirror's root directory.
+    :param url: The URL of a yum repository, such as
+        ``https://repos.fedorapeople.org/repos/pulp/pulp/demo_repos/zoo/``.
+    :param session: A ``requests.Session``.
+    :returns: A list of paths to downloaded files.
+    """
+    if session is None:
+        session = requests.Session()
+    if not url.endswith('/'):
+        url += '/'
+    paths = [mirror_file(root, urljoin(url, 'repodata/repomd.xml'), session)]
+    primary = None
+    for data in ElementTree.parse(paths[0]).getroot().findall(
+            'repo:data', _REPO_NS):
+        href = data.find('repo:location', _REPO_NS).get('href')
+        paths.append(mirror_file(root, urljoin(url, href), session))
+        if data.get('type') == 'primary':
+            primary = paths[-1]
+    if primary is not None:
+        opener = gzip.open if primary.endswith('.gz') else open
+        with opener(primary, 'rb') as handle:
+            packages = ElementTree.parse(handle).getroot()
+        for package in packages.findall('common:package', _COMMON_NS):
+            href = package.find('common:location', _COMMON_NS).get('href')
+            paths.append(mirror_file(root, urljoin(url, href), session))
+    return paths
+
+
+def mirror_forge(root, url, modules, session=None):
+    """Mirror modules from the Puppet Forge at ``url`` into ``root``.
+
+    Each module's releases are listed with the Forge's v3 API, and each
+    release's tarball is downloaded. The list of releases is saved at
+    ``v3/releases/<author>-<name>.json`` within the Forge's directory in the
+    mirror, so that :class:`FeedServer` can answer the queries that Pulp
+    makes of a Forge.
+
+    :param root: The mirror's root directory.
+    :param url: The URL of a Puppet Forge, such as
+        ``http://forge.puppetlabs.com``.
+    :param modules: An iterable of module names, such as ``pulp-pulp`` or
+        ``pulp/pulp``.
+    :param session: A ``requests.Session``.
+    :returns: A list of paths to downloaded files.
+    """
+    if session is None:
+        session = requests.Session()
+    url = url.rstrip('/')
+    paths = []
+    for module in modules:
+        module = module.replace('/', '-')
+        releases = []
+        page = '/v3/releases?module={}&limit=100'.format(module)
+        while page:
+            response = session.get(url + page)
+            response.raise_for_status()
+            body = response.json()
+            releases.extend(body['results'])
+            page = body['pagination']['next']
+        for release in releases:
+            paths.append(mirror_file(root, url + release['file_uri'], session))
+        path = get_path(root, '{}/v3/releases/{}.json'.format(url, module))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        _write(path, (json.dumps(releases).encode('utf-8'),))
+        paths.append(path)
+    return paths
+
+
+def _get_forge_releases(directory):
+    """Return the releases of each module in a mirrored Forge.
+
+    :param directory: The Forge's directory in a mirror.
+    :returns: A dict mapping module names, such as ``pulp-pulp``, to lists of
+        release bodies, as returned by the Forge's v3 API. ``None`` if
+        ``directory`` holds no Forge.
+    """
+    directory = os.path.join(directory, 'v3', 'releases')
+    if not os.path.isdir(directory):
+        return None
+    modules = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name), 'rb') as handle:
+                modules[name[:-5]] = json.loads(handle.read().decode('utf-8'))
+    return modules
+
+
+def get_forge_response(directory, path, params):
+    """Answer a query made of a Forge mirrored by :func:`mirror_forge`.
+
+    Two queries are answered. Pulp's importer fetches ``modules.json?q=...``
+    from the Forge's v1 API, and lists modules whose ``<author>-<name>``
+    contains the query, ignoring the difference between ``-``, ``_`` and
+    ``/``. The v3 API's ``v3/releases?module=...`` lists a module's releases.
+
+    :param directory: The Forge's directory in a mirror.
+    :param path: The path of the query, relative to the Forge, such as
+        ``modules.json``.
+    :param params: A dict mapping query string parameters to values.
+    :returns: A JSON-serializable response body, or ``None`` if ``directory``
+        holds no Forge or ``path`` is not a known query.
+    """
+    modules = _get_forge_releases(directory)
+    if modules is None:
+        return None
+    if path == 'modules.json':
+        query = params.get('q', '').replace('_', '-').replace('/', '-')
+        body = []
+        for module, releases in sorted(modules.items()):
+            if query not in module or not releases:
+                continue
+            latest = releases[0]  # The Forge lists the newest release first.
+            body.append({
+                'author': latest['module']['owner']['username'],
+                'desc': latest['metadata'].get('summary', ''),
+                'full_name': module.replace('-', '/', 1),
+                'name': latest['module']['name'],
+                'releases': [
+                    {'version': release['version']} for release in releases
+                ],
+                'tag_list': latest['metadata'].get('tags', []),
+                'version': latest['version'],
+            })
+        return body
+    if path == 'v3/releases':
+        releases = modules.get(params.get('module', '').replace('/', '-'), [])
+        return {
+            'pagination': {
+                'limit': len(releases),
+                'next': None,
+                'offset': 0,
+                'total': len(releases),
+            },
+            'results': releases,
+        }
+    return None
+
+
+def write_manifest(directory):
+    """Write a ``PULP_MANIFEST`` file listing the files in ``directory``.
+
+    ISO repositories and Puppet directory feeds are described by such a file.
+    Each line has the form ``name,sha256 checksum,size``. Subdirectories and
+    hidden files are ignored.
+
+    :param directory: A directory of ISO files or Puppet modules.
+    :returns: The path to the manifest.
+    """
+    lines = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name == 'PULP_MANIFEST' or name.startswith('.'):
+            continue
+        if not os.path.isfile(path):
+            continue
+        checksum = hashlib.sha256()
+        with open(path, 'rb') as handle:
+            for chunk in iter(lambda: handle.read(64 * 1024), b''):
+                checksum.update(chunk)
+        lines.append('{},{},{}\n'.format(
+            name, checksum.hexdigest(), os.path.getsize(path)
+        ))
+    manifest = os.path.join(directory, 'PULP_MANIFEST')
+    with open(manifest, 'w') as handle:
+        handle.writelines(lines)
+    return manifest
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """An HTTP server that handles each request in a new thread."""
+
+    daemon_threads = True
+
+
+class FeedServer(object):
+    """Serve a mirror over HTTP in a background thread.
+
+    >>> from pulp_smash.feeds import FeedServer
+    >>> server = FeedServer('/srv/mirror', port=8000)
+    >>> server.start()
+    >>> server.url
+    'http://0.0.0.0:8000'
+    >>> server.stop()
+
+    :param root: The mirror's root directory.
+    :param host: The address to listen on. Listen on all addresses by default,
+        so that a remote Pulp server can reach the mirror.
+    :param port: The port to listen on. If zero, pick a free port.
+    """
+
+    def __init__(self, root, host='0.0.0.0', port=0):
+        """Initialize this object with needed instance attributes."""
+        self.root = os.path.abspath(root)
+
+        class Handler(_FeedRequestHandler):  # pylint:disable=R0903
+            """Serve files from this server's root."""
+
+            root = self.root
+
+        self._server = _ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        """The base URL at which this server listens."""
+        return 'http://{}:{}'.format(*self._server.server_address[:2])
+
+    def serve_forever(self):
+        """Serve requests in this thread until :meth:`stop` is called."""
+        self._server.serve_forever()
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        self._thread = Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving requests, and close the listening socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+
+class _FeedRequestHandler(SimpleHTTPRequestHandler):
+    """Serve files from ``root`` instead of the current working directory.
+
+    Queries made of a Forge mirrored by :func:`mirror_forge` are answered by
+    :func:`get_forge_response`.
+    """
+
+    root = None
+
+    def do_GET(self):  # pylint:disable=invalid-name
+        """Answer a Forge query, or serve a file."""
+        body = self._get_forge_response()
+        if body is None:
+            SimpleHTTPRequestHandler.do_GET(self)
+            return
+        body = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def translate_path(self, path):
+        """Map a request path to a path within ``root``.
+
+        Pulp downloads a module from a Forge at
+        ``system/releases/<letter>/<author>/<file>``, which is mapped to the
+        path at which :func:`mirror_forge` saves it, ``v3/files/<file>``.
+        """
+        relpath = self._get_relpath()
+        if relpath is None:
+            return os.path.join(self.root, '.forbidden')
+        match = _FORGE_FILE.match(relpath)
+        if match is not None:
+            relpath = '{}v3/files/{}'.format(
+                match.group(1) or '',
+                match.group(2),
+            )
+        return os.path.join(self.root, *relpath.split('/'))
+
+    def log_message(self, *args):  # pylint:disable=arguments-differ
+        """Don't log each request to stderr."""
+
+    def _get_relpath(self):
+        """Return the request's path relative to ``root``, or ``None``."""
+        relpath = posixpath.normpath(unquote(urlparse(self.path).path))
+        relpath = relpath.lstrip('/')
+        if relpath.startswith('..'):
+            return None
+        return relpath
+
+    def _get_forge_response(self):
+        """Return the body answering a Forge query, or ``None``."""
+        relpath = self._get_relpath()
+        if relpath is None:
+            return None
+        for query in ('modules.json', 'v3/releases'):
+            if relpath == query or relpath.endswith('/' + query):
+                directory = relpath[:-len(query)].rstrip('/')
+                return get_forge_response(
+                    os.path.join(self.root, *directory.split('/')),
+                    query,
+                    dict(parse_qsl(urlparse(self.path).query)),
+                )
+        return None
+
+
+def _get_parser():
+    """Return an argument parser for :func:`main`."""
+    parser = argparse.ArgumentParser(
+        prog='python -m pulp_smash.feeds',
+        description='Populate and serve a local mirror of sync feeds.',
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    subparser = subparsers.add_parser('serve', help='Serve a mirror.')
+    subparser.add_argument('root')
+    subparser.add_argument('--host', default='0.0.0.0')
+    subparser.add_argument('--port', type=int, default=8000)
+    subparser = subparsers.add_parser('mirror', help='Mirror files.')
+    subparser.add_argument('root')
+    subparser.add_argument('urls', nargs='+')
+    subparser = subparsers.add_parser('mirror-yum', help='Mirror yum repos.')
+    subparser.add_argument('root')
+    subparser.add_argument('urls', nargs='+')
+    subparser = subparsers.add_parser(
+        'mirror-forge',
+        help='Mirror Puppet modules from a Forge.',
+    )
+    subparser.add_argument('root')
+    subparser.add_argument('url')
+    subparser.add_argument('modules', nargs='+')
+    subparser = subparsers.add_parser(
+        'manifest',
+        help='Write a PULP_MANIFEST file for a directory.',
+    )
+    subparser.add_argument('directory')
+    return parser
+
+
+def main(argv=None):
+    """Populate or serve a mirror, as directed by command line arguments."""
+    args = _get_parser().parse_args(argv)
+    if args.command == 'serve':
+        server = FeedServer(args.root, args.host, args.port)
+        print('Serving {} at {}'.format(server.root, server.url))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+    elif args.command in ('mirror', 'mirror-yum'):
+        session = requests.Session()
+        func = mirror_file if args.command == 'mirror' else mirror_yum_repo
+        for url in args.urls:
+            func(args.root, url, session)
+    elif args.command == 'mirror-forge':
+        mirror_forge(args.root, args.url, args.modules)
+    elif args.command == 'manifest':
+        print(write_manifest(args.directory))
+    else:
+        _get_parser().print_help()
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
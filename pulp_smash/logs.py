@@ -0,0 +1,389 @@
+# coding=utf-8
+"""Collect the server logs written while a failing test case class ran.
+
+When a test fails, the Pulp server's logs often tell why. A
+:class:`LogCollector` saves that trip to the server. Before each test case
+class sets up, it marks the current end of every log of the services in
+:data:`pulp_smash.constants.PULP_SERVICES`, on every host on which they run
+(see :class:`pulp_smash.cli.Cluster`):
+
+* A cursor into the systemd journal, which is read with ``journalctl``. The
+  journal entries of each service's units are collected. (See
+  :data:`JOURNAL_UNITS`.)
+* The size of each log file that a service writes to directly, such as those
+  of ``httpd``. (See :data:`LOG_FILES`.) Hosts without a journal also have the
+  size of ``/var/log/messages`` marked.
+
+Marking costs one short command per host. If any of the class' tests fail or
+error, including in ``setUpClass``, only what was logged since the mark is
+fetched, with one more command per host. The log slices are compressed on the
+server, are at most ``max_bytes`` long each, and are appended to the
+tracebacks of the class' failures and errors. Nothing is tailed while tests
+run, and nothing more is fetched for passing classes.
+
+>>> from pulp_smash import config, logs
+>>> import unittest2
+>>> suite = unittest2.defaultTestLoader.loadTestsFromName(
+...     'pulp_smash.tests.rpm.api_v2.test_sync_publish'
+... )
+>>> collector = logs.LogCollector(config.get_config())
+>>> unittest2.TextTestRunner().run(collector.watch(suite))
+
+:mod:`pulp_smash.runner` does this if it is given ``--collect-logs``.
+"""
+from __future__ import unicode_literals
+
+import base64
+import re
+import unittest
+import zlib
+from collections import namedtuple
+
+import unittest2
+
+from pulp_smash import _suites, cli
+from pulp_smash.constants import PULP_SERVICES
+
+#: The default number of bytes to fetch from the end of each log slice.
+DEFAULT_MAX_BYTES = 256 * 1024
+
+#: Maps services to the systemd units whose journal entries are collected.
+#: Patterns may be used. A service that is not listed has one unit of the same
+#: name.
+JOURNAL_UNITS = {'pulp_workers': ('pulp_worker-*',)}
+
+#: Maps services to the log files that they write to directly.
+LOG_FILES = {
+    'httpd': ('/var/log/httpd/error_log', '/var/log/httpd/ssl_error_log'),
+}
+
+# Run as `sh -c _MARK_SCRIPT logs <path>...`. Prints the journal's cursor as a
+# "CURSOR" line, and the size of each readable file as a "SIZE" line. If there
+# is no journal, /var/log/messages is marked too.
+_MARK_SCRIPT = """\
+if [ "$(id -u)" = 0 ]; then sudo=; else sudo='sudo -n'; fi
+cursor=$($sudo journalctl -q -n 1 --show-cursor 2>/dev/null \\
+  | sed -n 's/^-- cursor: //p')
+if [ -n "$cursor" ]; then
+  echo "CURSOR $cursor"
+else
+  set -- "$@" /var/log/messages
+fi
+for path in "$@"; do
+  size=$($sudo stat -c %s "$path" 2>/dev/null) && echo "SIZE $size $path"
+done
+exit 0
+"""
+
+# Run as `sh -c _COLLECT_SCRIPT logs <max_bytes> <cursor> <unit>... --
+# <path> <offset>...`, where <cursor> is "-" if there is no journal. Prints
+# each log slice after a "==> name <==" header, compressed and base64-encoded.
+# A file smaller than its offset has been rotated, and is read from its start.
+_COLLECT_SCRIPT = """\
+set -f
+if [ "$(id -u)" = 0 ]; then sudo=; else sudo='sudo -n'; fi
+max=$1
+cursor=$2
+shift 2
+units=
+while [ $# -gt 0 ] && [ "$1" != -- ]; do
+  units="$units -u $1"
+  shift
+done
+shift
+{
+  if [ "$cursor" != - ]; then
+    echo '==> journal <=='
+    $sudo journalctl --no-pager -o short-iso --after-cursor="$cursor" $units \\
+      | tail -c "$max"
+  fi
+  while [ $# -gt 1 ]; do
+    path=$1
+    offset=$2
+    shift 2
+    size=$($sudo stat -c %s "$path" 2>/dev/null) || continue
+    [ "$size" -lt "$offset" ] && offset=0
+    echo "==> $path <=="
+    $sudo tail -c +$((offset + 1)) "$path" | tail -c "$max"
+  done
+} | gzip -c | base64
+"""
+
+_HEADER = re.compile(r'^==> (.*) <==$', re.MULTILINE)
+
+# Exceptions that skip a test case class, rather than failing it.
+_SKIPS = (unittest.SkipTest, unittest2.SkipTest)
+
+#: The end of the logs on one host, as marked by :meth:`LogCollector.mark`.
+#: ``services`` is a tuple of the services that run on the host. ``cursor`` is
+#: a journal cursor, or ``None`` if the host has no journal. ``offsets`` is a
+#: tuple of ``(path, size)`` pairs.
+Mark = namedtuple('Mark', 'hostname services cursor offsets')
+
+#: What was logged on one host since it was marked. ``source`` is either
+#: ``journal`` or the path to a log file.
+LogSlice = namedtuple('LogSlice', 'hostname source text')
+
+
+class LogCollector(object):
+    """Mark the end of a Pulp deployment's logs, and collect what follows.
+
+    :param pulp_smash.config.ServerConfig server_config: Information about the
+        Pulp deployment.
+    :param services: The services whose logs are collected.
+    :param max_bytes: The number of bytes to fetch from the end of each log
+        slice.
+    """
+
+    def __init__(
+            self,
+            server_config,
+            services=PULP_SERVICES,
+            max_bytes=DEFAULT_MAX_BYTES):
+        """Initialize this object with needed instance attributes."""
+        self.cfg = server_config
+        self.services = services
+        self.max_bytes = max_bytes
+        self._cluster = cli.Cluster(server_config)
+        self._result = None
+        self._classes = {}  # test case classes which are running
+        self._pending = None  # logs for a class which failed to set up
+        self._active = set()  # test case classes whose fixtures are running
+
+    def get_hosts(self):
+        """Return a dict mapping hostnames to the services that run on them."""
+        hosts = {}
+        for service in sorted(self.services):
+            for hostname in self._cluster.get_hosts(service):
+                hosts.setdefault(hostname, []).append(service)
+        return {hostname: tuple(svcs) for hostname, svcs in hosts.items()}
+
+    def mark(self):
+        """Mark the end of the logs on every host.
+
+        :returns: A list of :data:`Mark` objects, one per host.
+        """
+        hosts = self.get_hosts()
+        return [
+            host_result.result for host_result in self._cluster.map(
+                lambda hostname: self._mark(hostname, hosts[hostname]),
+                sorted(hosts),
+            )
+        ]
+
+    def collect(self, marks):
+        """Fetch what was logged on each host since it was marked.
+
+        :param marks: A list of :data:`Mark` objects, as returned by
+            :meth:`mark`.
+        :returns: A list of :data:`LogSlice` objects.
+        """
+        marks = {mark.hostname: mark for mark in marks}
+        slices = []
+        for host_result in self._cluster.map(
+                lambda hostname: self._collect(marks[hostname]),
+                sorted(marks)):
+            slices.extend(host_result.result)
+        return slices
+
+    def watch(self, suite):
+        """Collect logs for the test case classes in ``suite`` that fail.
+
+        The ``setUpClass`` and ``tearDownClass`` methods of each test case
+        class in ``suite`` are wrapped, so that they mark and collect logs.
+
+        :param suite: A ``unittest2.TestSuite``.
+        :returns: A callable which runs ``suite`` with a ``unittest2``
+            test result, just like ``suite`` itself. Pass it to a test runner.
+        """
+        for test_case in {type(test) for test in _suites.iter_tests(suite)}:
+            self._wrap(test_case)
+
+        def run(result):
+            """Run ``suite``, and remember ``result``."""
+            self._result = result
+            try:
+                return suite(result)
+            finally:
+                self._attach_pending()
+                self._result = None
+        return run
+
+    def _mark(self, hostname, services):
+        """Mark the end of the logs on one host."""
+        paths = tuple(
+            path for service in services for path in LOG_FILES.get(service, ())
+        )
+        completed_proc = cli.Client(self.cfg, hostname=hostname).run(
+            ('sh', '-c', _MARK_SCRIPT, 'logs') + paths
+        )
+        return parse_mark(hostname, services, completed_proc.stdout)
+
+    def _collect(self, mark):
+        """Fetch what was logged on one host since it was marked."""
+        units = tuple(
+            unit
+            for service in mark.services
+            for unit in JOURNAL_UNITS.get(service, (service,))
+        )
+        args = ['sh', '-c', _COLLECT_SCRIPT, 'logs', str(self.max_bytes)]
+        args.append('-' if mark.cursor is None else mark.cursor)
+        args.extend(units)
+        args.append('--')
+        for path, size in mark.offsets:
+            args.extend((path, str(size)))
+        completed_proc = cli.Client(self.cfg, hostname=mark.hostname).run(
+            tuple(args)
+        )
+        return parse_slices(mark.hostname, completed_proc.stdout)
+
+    def _wrap(self, test_case):
+        """Wrap the class-level fixtures of a test case class.
+
+        Each wrapper calls the function that ``test_case`` defines, or the
+        inherited method, with whatever class it is called on. A wrapper that
+        is called through ``super`` by another just calls that function.
+        """
+        set_up_class = _suites.get_function(test_case, 'setUpClass')
+        tear_down_class = _suites.get_function(test_case, 'tearDownClass')
+
+        def wrapped_set_up_class(cls):
+            """Mark the logs, then set up the class."""
+            if cls in self._active:
+                return set_up_class(cls)
+            self._active.add(cls)
+            try:
+                self._attach_pending()
+                self._begin(cls)
+                try:
+                    set_up_class(cls)
+                except _SKIPS:
+                    self._classes.pop(cls, None)
+                    raise
+                except Exception:
+                    self._end(cls, set_up_failed=True)
+                    raise
+            finally:
+                self._active.discard(cls)
+
+        def wrapped_tear_down_class(cls):
+            """Tear down the class, then collect logs if it failed."""
+            if cls in self._active:
+                return tear_down_class(cls)
+            self._active.add(cls)
+            try:
+                tear_down_class(cls)
+            finally:
+                self._active.discard(cls)
+                self._end(cls)
+
+        test_case.setUpClass = classmethod(wrapped_set_up_class)
+        test_case.tearDownClass = classmethod(wrapped_tear_down_class)
+
+    def _begin(self, test_case):
+        """Mark the logs for a test case class that is about to be set up."""
+        if self._result is None:
+            return
+        try:
+            marks = self.mark()
+        except Exception as err:  # pylint:disable=broad-except
+            marks = err
+        self._classes[test_case] = (
+            marks,
+            len(self._result.failures),
+            len(self._result.errors),
+        )
+
+    def _end(self, test_case, set_up_failed=False):
+        """Collect logs for a test case class that is done, if it failed.
+
+        If the class failed to set up, its error has not been recorded yet, so
+        its logs are attached by :meth:`_attach_pending`.
+        """
+        if test_case not in self._classes:
+            return
+        marks, failures, errors = self._classes.pop(test_case)
+        if set_up_failed:
+            self._pending = (self._get_text(marks), len(self._result.errors))
+            return
+        if (len(self._result.failures) == failures and
+                len(self._result.errors) == errors):
+            return
+        text = self._get_text(marks)
+        _append(self._result.failures, failures, text)
+        _append(self._result.errors, errors, text)
+
+    def _attach_pending(self):
+        """Attach logs to the error of a class which failed to set up."""
+        if self._pending is None or self._result is None:
+            return
+        text, errors = self._pending
+        self._pending = None
+        _append(self._result.errors, errors, text)
+
+    def _get_text(self, marks):
+        """Collect logs since ``marks``, and return them as text."""
+        if isinstance(marks, Exception):
+            return 'Cannot mark the server logs: {}'.format(marks)
+        try:
+            return format_slices(self.collect(marks))
+        except Exception as err:  # pylint:disable=broad-except
+            return 'Cannot collect the server logs: {}'.format(err)
+
+
+def _append(outcomes, start, text):
+    """Append ``text`` to each traceback in ``outcomes[start:]``.
+
+    :param outcomes: A list of ``(test, traceback)`` tuples, such as
+        ``unittest2.TestResult.failures``. It is updated in place.
+    """
+    for i in range(start, len(outcomes)):
+        test, traceback = outcomes[i]
+        outcomes[i] = (test, traceback + '\n' + text)
+
+
+def parse_mark(hostname, services, stdout):
+    """Parse the output of the command run by :meth:`LogCollector.mark`.
+
+    :returns: A :data:`Mark`.
+    """
+    cursor = None
+    offsets = []
+    for line in stdout.splitlines():
+        kind, _, value = line.partition(' ')
+        if kind == 'CURSOR':
+            cursor = value
+        elif kind == 'SIZE':
+            size, _, path = value.partition(' ')
+            offsets.append((path, int(size)))
+    return Mark(hostname, tuple(services), cursor, tuple(offsets))
+
+
+def parse_slices(hostname, stdout):
+    """Parse the output of the command run by :meth:`LogCollector.collect`.
+
+    :returns: A list of :data:`LogSlice` objects.
+    """
+    data = base64.b64decode(''.join(stdout.split()).encode('ascii'))
+    # 16 tells zlib to expect a gzip header.
+    text = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    text = text.decode('utf-8', 'replace')
+    parts = _HEADER.split(text)
+    return [
+        LogSlice(hostname, source, body.lstrip('\n'))
+        for source, body in zip(parts[1::2], parts[2::2])
+    ]
+
+
+def format_slices(slices):
+    """Return log slices as text, suitable for appending to a traceback."""
+    lines = ['Server logs written while this test case class ran:']
+    for log_slice in slices:
+        if log_slice.text.strip():
+            lines.append(
+                '--- {} {}'.format(log_slice.hostname, log_slice.source)
+            )
+            lines.append(log_slice.text.rstrip('\n'))
+    if len(lines) == 1:
+        lines.append('(none)')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,520 @@
+# coding=utf-8
+"""Tools for recording and comparing the performance of Pulp.
+
+The ``test_benchmark`` modules in :mod:`pulp_smash.tests` time common
+operations, such as creating, syncing and publishing repositories. They are
+skipped unless the ``PULP_SMASH_BENCHMARKS`` environment variable is set, as
+they are slow. (See :func:`skip_unless_enabled`.)
+
+Each benchmark is a subclass of :class:`BenchmarkTestCase`. Operations that
+spawn tasks are timed with the ``start_time`` and ``finish_time`` fields of
+those tasks, as reported by Pulp. (See :func:`get_duration`.) As a result, the
+measurements exclude the time spent polling tasks. Operations that do not spawn
+tasks, such as creating a repository or downloading a file, are timed by the
+client.
+
+Measurements are saved in an SQLite database along with the version of the
+Pulp server under test. (See :class:`History`.) By default, the database is
+``$XDG_DATA_HOME/pulp_smash/benchmarks.db``. Measurements accumulate across
+runs, and may be compared across Pulp versions with the ``report`` command::
+
+    python -m pulp_smash.perf report
+
+For each benchmarked operation, the report compares each pair of consecutive
+Pulp versions with Welch's t-test, and flags statistically significant
+slowdowns. The command exits non-zero if any regressions are found.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import calendar
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import wraps
+
+import unittest2
+from packaging.version import Version
+from xdg import BaseDirectory
+
+from pulp_smash import api, config, teardown, utils
+
+# Matches timestamps like "2016-01-05T19:04:56Z" and "2016-01-05T19:04:56.5Z".
+_TIMESTAMP = re.compile(
+    r'^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?(Z|[+-]00:?00)?$'
+)
+
+Comparison = namedtuple('Comparison', (
+    'benchmark',
+    'operation',
+    'old_version',
+    'new_version',
+    'old_mean',
+    'new_mean',
+    'p_value',
+    'regression',
+))
+"""A comparison of one operation's durations across two Pulp versions.
+
+``regression`` is true if the operation is slower on ``new_version``, and the
+difference is statistically significant.
+"""
+
+
+def skip_unless_enabled():
+    """Raise ``unittest2.SkipTest`` unless benchmarks are enabled.
+
+    Benchmarks are enabled by setting the ``PULP_SMASH_BENCHMARKS`` environment
+    variable to a non-empty value. Call this from ``setUpModule``.
+    """
+    if not os.environ.get('PULP_SMASH_BENCHMARKS'):
+        raise unittest2.SkipTest(
+            'Set the PULP_SMASH_BENCHMARKS environment variable to run '
+            'benchmarks.'
+        )
+
+
+def parse_timestamp(timestamp):
+    """Parse a UTC timestamp from a task body.
+
+    :param timestamp: A string like ``'2016-01-05T19:04:56Z'``.
+    :returns: The number of seconds since the epoch, as a float.
+    :raises: ``ValueError`` if the timestamp cannot be parsed.
+    """
+    match = _TIMESTAMP.match(timestamp or '')
+    if match is None:
+        raise ValueError('Cannot parse timestamp: {}'.format(timestamp))
+    seconds = calendar.timegm(time.strptime(
+        match.group(1),
+        '%Y-%m-%dT%H:%M:%S',
+    ))
+    return seconds + float(match.group(2) or 0)
+
+
+def get_duration(tasks):
+    """Return the number of seconds for which a group of tasks ran.
+
+    :param tasks: An iterable of task bodies.
+    :returns: The time between the earliest ``start_time`` and the latest
+        ``finish_time``, in seconds.
+    :raises: ``ValueError`` if no tasks are given, or if a task lacks a
+        timestamp.
+    """
+    tasks = tuple(tasks)
+    if not tasks:
+        raise ValueError('Cannot compute the duration of zero tasks.')
+    start = min(parse_timestamp(task['start_time']) for task in tasks)
+    finish = max(parse_timestamp(task['finish_time']) for task in tasks)
+    return finish - start
+
+
+def welch_t_test(sample_a, sample_b):
+    """Compare the means of two samples with Welch's t-test.
+
+    :param sample_a: A sequence of at least two numbers.
+    :param sample_b: A sequence of at least two numbers.
+    :returns: A two-sided p-value. A small value means that the means of the
+        two samples probably differ.
+    :raises: ``ValueError`` if either sample has fewer than two numbers.
+    """
+    if len(sample_a) < 2 or len(sample_b) < 2:
+        raise ValueError('Each sample must contain at least two numbers.')
+    mean_a, var_a = _mean_var(sample_a)
+    mean_b, var_b = _mean_var(sample_b)
+    se_a = var_a / len(sample_a)
+    se_b = var_b / len(sample_b)
+    if se_a + se_b == 0:
+        return 1.0 if mean_a == mean_b else 0.0
+    t_stat = (mean_a - mean_b) / math.sqrt(se_a + se_b)
+    dof = (se_a + se_b) ** 2 / (
+        se_a ** 2 / (len(sample_a) - 1) + se_b ** 2 / (len(sample_b) - 1)
+    )
+    return _betainc(dof / 2, 0.5, dof / (dof + t_stat ** 2))
+
+
+class History(object):
+    """A database of benchmark measurements.
+
+    :param path: The path to an SQLite database. It is created if it does not
+        exist. Defaults to ``$XDG_DATA_HOME/pulp_smash/benchmarks.db``.
+    """
+
+    def __init__(self, path=None):
+        """Initialize this object with needed instance attributes."""
+        if path is None:
+            path = os.path.join(
+                BaseDirectory.save_data_path('pulp_smash'),
+                'benchmarks.db',
+            )
+        self.path = path
+        # Several processes may write at once. See `pulp_smash.runner`.
+        self._conn = sqlite3.connect(path, timeout=60)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS measurements ('
+                'timestamp REAL NOT NULL, '
+                'base_url TEXT NOT NULL, '
+                'version TEXT NOT NULL, '
+                'benchmark TEXT NOT NULL, '
+                'operation TEXT NOT NULL, '
+                'seconds REAL NOT NULL)'
+            )
+
+    def close(self):
+        """Close the database."""
+        self._conn.close()
+
+    def record(self, server_config, benchmark, durations, timestamp=None):
+        """Save measurements taken against a Pulp server.
+
+        :param pulp_smash.config.ServerConfig server_config: Information about
+            the Pulp server that was benchmarked.
+        :param benchmark: The name of a benchmark, such as ``'rpm'``.
+        :param durations: A dict mapping operation names, such as ``'sync'``,
+            to numbers of seconds.
+        :param timestamp: The time at which the measurements were taken.
+            Defaults to the current time.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._conn:
+            self._conn.executemany(
+                'INSERT INTO measurements VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (
+                        timestamp,
+                        server_config.base_url,
+                        type('')(server_config.version),
+                        benchmark,
+                        operation,
+                        seconds,
+                    )
+                    for operation, seconds in sorted(durations.items())
+                ],
+            )
+
+    def get_samples(self):
+        """Return all measurements, grouped by operation and version.
+
+        :returns: A dict mapping ``(benchmark, operation)`` tuples to dicts,
+            each of which maps version strings to lists of durations.
+        """
+        samples = {}
+        for benchmark, operation, version, seconds in self._conn.execute(
+                'SELECT benchmark, operation, version, seconds '
+                'FROM measurements ORDER BY timestamp'):
+            (samples
+             .setdefault((benchmark, operation), {})
+             .setdefault(version, [])
+             .append(seconds))
+        return samples
+
+
+class BenchmarkTestCase(unittest2.TestCase):
+    """A base class for benchmarks.
+
+    Subclasses should set :attr:`benchmark`, and perform and time operations
+    in ``setUpClass`` with :meth:`time_request` and :meth:`time_tasks`. The
+    durations are saved to the default :class:`History` database when the
+    test case is torn down. The tests on this class check that each timed task
+    finished successfully, as a benchmark of a failed operation is meaningless.
+
+    If the ``PULP_SMASH_SAMPLER`` environment variable is set to a number of
+    seconds, the server's resource usage is sampled at that interval, and a
+    report of the resources used by each timed operation is written to
+    standard error when the test case is torn down. (See
+    :mod:`pulp_smash.sampler`.) Operations timed by other means should be
+    enclosed in :meth:`span`, so that their resource usage is reported too.
+
+    ``tearDownClass`` is not called if ``setUpClass`` fails, so subclasses
+    should decorate ``setUpClass`` with :func:`tear_down_on_error`. Otherwise,
+    the sampler and the created resources are leaked.
+    """
+
+    #: The name under which measurements are saved, such as ``'rpm'``.
+    benchmark = None
+
+    @classmethod
+    def setUpClass(cls):
+        """Provide a server config, and places to store measurements."""
+        cls.cfg = config.get_frozen_config()
+        cls.resources = set()  # a set of _href paths
+        cls.durations = {}  # a dict mapping operations to seconds
+        cls.tasks = {}  # a dict mapping operations to task bodies
+        cls.sampler = None
+        interval = os.environ.get('PULP_SMASH_SAMPLER')
+        if interval:
+            from pulp_smash import sampler
+            cls.sampler = sampler.Sampler(cls.cfg, float(interval))
+            cls.sampler.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Save measurements, and delete created resources."""
+        if cls.sampler is not None:
+            from pulp_smash import sampler
+            cls.sampler.stop()
+            sys.stderr.write('\n{} resource usage:\n{}\n'.format(
+                cls.benchmark,
+                sampler.format_report(cls.sampler),
+            ))
+        if cls.durations:
+            record(cls.cfg, cls.benchmark, cls.durations)
+        teardown.delete(cls.cfg, cls.resources)
+
+    @classmethod
+    @contextmanager
+    def span(cls, operation):
+        """Record the time taken by the enclosed code as a sampler span.
+
+        Does nothing if the server's resource usage is not being sampled.
+
+        :param operation: A name for the operation, such as ``'register'``.
+        """
+        if cls.sampler is None:
+            yield
+        else:
+            with cls.sampler.span(operation):
+                yield
+
+    @classmethod
+    def time_request(cls, operation, method, url, **kwargs):
+        """Make an HTTP request, and record how long it takes.
+
+        :param operation: A name for the operation, such as ``'create'``.
+        :param method: An HTTP method, such as ``'POST'``.
+        :param url: A URL or path.
+        :param kwargs: Passed on to :meth:`pulp_smash.api.Client.request`.
+        :returns: The response.
+        :raises: ``requests.exceptions.HTTPError`` if the request fails.
+        """
+        client = api.Client(cls.cfg)
+        start = time.time()
+        response = client.request(method, url, **kwargs)
+        end = time.time()
+        cls.durations[operation] = end - start
+        if cls.sampler is not None:
+            cls.sampler.add_span(operation, start, end)
+        return response
+
+    @classmethod
+    def time_tasks(cls, operation, path, body):
+        """POST ``body`` to ``path``, and record how long the tasks run.
+
+        :param operation: A name for the operation, such as ``'sync'``.
+        :param path: A path to which a POST request spawns tasks, such as a
+            repository's ``actions/sync/`` path.
+        :param body: A JSON-serializable request body.
+        :returns: A tuple of task bodies.
+        :raises: ``requests.exceptions.HTTPError`` if the request fails.
+        """
+        start = time.time()
+        response = api.Client(cls.cfg, api.echo_handler).post(path, body)
+        response.raise_for_status()
+        hrefs = [task['_href'] for task in response.json()['spawned_tasks']]
+        tasks = tuple(utils.poll_tasks(cls.cfg, hrefs))
+        if cls.sampler is not None:
+            cls.sampler.add_span(operation, start, time.time())
+        cls.tasks[operation] = tasks
+        cls.durations[operation] = get_duration(tasks)
+        return tasks
+
+    def test_tasks(self):
+        """Assert each timed task finished without errors."""
+        for operation, tasks in self.tasks.items():
+            for i, task in enumerate(tasks):
+                with self.subTest((operation, i)):
+                    self.assertEqual(task['state'], 'finished')
+                    self.assertIsNone(task['error'])
+
+
+def tear_down_on_error(set_up_class):
+    """Decorate a benchmark's ``setUpClass`` to clean up if it fails.
+
+    If ``set_up_class`` raises an exception, the sampler is stopped and the
+    created resources are deleted, and the exception is re-raised. Nothing is
+    recorded. Use this decorator below ``classmethod``:
+
+    >>> class MyBenchmarkTestCase(BenchmarkTestCase):
+    ...     @classmethod
+    ...     @tear_down_on_error
+    ...     def setUpClass(cls):
+    ...         super(MyBenchmarkTestCase, cls).setUpClass()
+    """
+    @wraps(set_up_class)
+    def wrapper(cls):
+        """Call ``set_up_class``, and clean up if it fails."""
+        try:
+            set_up_class(cls)
+        except:  # noqa pylint:disable=bare-except
+            if getattr(cls, 'sampler', None) is not None:
+                cls.sampler.stop()
+            if getattr(cls, 'resources', None):
+                teardown.delete(cls.cfg, cls.resources)
+            raise
+    return wrapper
+
+
+def record(server_config, benchmark, durations):
+    """Save measurements to the default :class:`History` database.
+
+    See :meth:`History.record`.
+    """
+    history = History()
+    try:
+        history.record(server_config, benchmark, durations)
+    finally:
+        history.close()
+
+
+def compare(history, alpha=0.05):
+    """Compare each operation's durations across consecutive Pulp versions.
+
+    Versions with fewer than two measurements are not compared.
+
+    :param pulp_smash.perf.History history: The measurements to compare.
+    :param alpha: The significance level.
+    :returns: A list of :class:`Comparison` objects.
+    """
+    comparisons = []
+    for (benchmark, operation), by_version in sorted(
+            history.get_samples().items()):
+        versions = sorted(
+            (version for version, seconds in by_version.items()
+             if len(seconds) >= 2),
+            key=Version,
+        )
+        for old, new in zip(versions, versions[1:]):
+            old_mean = _mean_var(by_version[old])[0]
+            new_mean = _mean_var(by_version[new])[0]
+            p_value = welch_t_test(by_version[old], by_version[new])
+            comparisons.append(Comparison(
+                benchmark=benchmark,
+                operation=operation,
+                old_version=old,
+                new_version=new,
+                old_mean=old_mean,
+                new_mean=new_mean,
+                p_value=p_value,
+                regression=new_mean > old_mean and p_value < alpha,
+            ))
+    return comparisons
+
+
+def format_report(comparisons):
+    """Return a human-readable table of :class:`Comparison` objects."""
+    row = '{:<10} {:<10} {:>10} {:>10} {:>9} {:>9} {:>7}  {}'
+    lines = [row.format(
+        'benchmark', 'operation', 'old', 'new', 'old mean', 'new mean',
+        'p', '',
+    )]
+    for comparison in comparisons:
+        lines.append(row.format(
+            comparison.benchmark,
+            comparison.operation,
+            comparison.old_version,
+            comparison.new_version,
+            '{:.2f}s'.format(comparison.old_mean),
+            '{:.2f}s'.format(comparison.new_mean),
+            '{:.3f}'.format(comparison.p_value),
+            'REGRESSION' if comparison.regression else '',
+        ))
+    return '\n'.join(lines)
+
+
+def _mean_var(sample):
+    """Return the mean and unbiased variance of ``sample``."""
+    mean = sum(sample) / len(sample)
+    if len(sample) < 2:
+        return mean, 0.0
+    var = sum((value - mean) ** 2 for value in sample) / (len(sample) - 1)
+    return mean, var
+
+
+def _betainc(a, b, x):
+    """Return the regularized incomplete beta function I_x(a, b)."""
+    # pylint:disable=invalid-name
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) +
+        a * math.log(x) + b * math.log(1 - x)
+    )
+    # The continued fraction converges quickly for x < (a + 1) / (a + b + 2).
+    # Otherwise, use the symmetry I_x(a, b) = 1 - I_(1-x)(b, a).
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1 - front * _betacf(b, a, 1 - x) / b
+
+
+def _betacf(a, b, x):
+    """Evaluate the continued fraction for the incomplete beta function.
+
+    This is the modified Lentz method, as described in *Numerical Recipes*.
+    """
+    # pylint:disable=invalid-name
+    tiny = 1e-300
+    c = 1.0
+    d = 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 300):
+        for numerator in (
+                m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            delta = c * d
+            result *= delta
+        if abs(delta - 1) < 1e-12:
+            break
+    return result
+
+
+def _get_parser():
+    """Return an argument parser for :func:`main`."""
+    parser = argparse.ArgumentParser(
+        prog='python -m pulp_smash.perf',
+        description='Inspect the history of Pulp Smash benchmarks.',
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    subparser = subparsers.add_parser(
+        'report',
+        help='Compare benchmark results across Pulp versions.',
+    )
+    subparser.add_argument('--db', help='The path to a history database.')
+    subparser.add_argument(
+        '--alpha',
+        type=float,
+        default=0.05,
+        help='The significance level. Default: 0.05.',
+    )
+    return parser
+
+
+def main(argv=None):
+    """Print a report, and return non-zero if regressions are found."""
+    args = _get_parser().parse_args(argv)
+    if args.command != 'report':
+        _get_parser().print_help()
+        return 1
+    history = History(args.db)
+    try:
+        comparisons = compare(history, args.alpha)
+    finally:
+        history.close()
+    print(format_report(comparisons))
+    return 1 if any(comp.regression for comp in comparisons) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,510 @@
+# coding=utf-8
+"""Profile Pulp Smash itself, one test case class at a time.
+
+Pulp Smash spends much of a test run waiting for Pulp, but it also spends time
+of its own: sending requests with :meth:`pulp_smash.api.Client.request`,
+decoding JSON, polling tasks with :func:`pulp_smash.utils.poll_task` and
+copying configurations with :func:`pulp_smash.config.get_config`. This module
+finds where that time goes. It is enabled by setting the ``PULP_SMASH_PROFILE``
+environment variable to a comma-separated list of profilers:
+
+``sample``
+    A sampling profiler. Every :data:`SAMPLE_INTERVAL` seconds, a background
+    thread records the stack of the thread running the tests. Its overhead is
+    low, and does not depend on how many functions are called.
+``cprofile``
+    Python's deterministic profiler, :mod:`cProfile`. It counts every call,
+    which slows down call-heavy code.
+
+For example, to profile the classes in one test module with both:
+
+.. code-block:: sh
+
+    export PULP_SMASH_PROFILE=sample,cprofile
+    export PULP_SMASH_PROFILE_CLASSES='pulp_smash.tests.rpm.api_v2.test_sync*'
+    python -m pulp_smash.runner
+
+``PULP_SMASH_PROFILE_CLASSES`` is a comma-separated list of shell-style
+patterns, which are matched against the dotted names of test case classes. By
+default, every class is profiled. Each class is profiled while its
+``setUpClass``, tests and ``tearDownClass`` run, and its profiles are written
+to ``PULP_SMASH_PROFILE_DIR``, which defaults to
+``$XDG_DATA_HOME/pulp_smash/profiles``:
+
+``<section>.<class>.folded``
+    Sampled stacks, in the "folded" format read by `FlameGraph`_ and
+    `speedscope`_. Frames are named like ``pulp_smash.api:request``.
+``<section>.<class>.prof``
+    :mod:`cProfile` statistics, which may be read with :mod:`pstats`.
+
+:mod:`pulp_smash.runner` merges the profiles of all classes once it is done.
+(See :func:`merge`.) They may also be merged by hand::
+
+    python -m pulp_smash.profiling [directory]
+
+.. _FlameGraph: https://github.com/brendangregg/FlameGraph
+.. _speedscope: https://www.speedscope.app
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import cProfile
+import fnmatch
+import hashlib
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from xml.sax.saxutils import escape
+
+from pulp_smash import _suites
+
+#: The number of seconds between samples taken by :class:`StackSampler`.
+SAMPLE_INTERVAL = 0.005
+
+#: The profilers that may be named in ``PULP_SMASH_PROFILE``.
+PROFILERS = ('cprofile', 'sample')
+
+# The names of the files written by `merge`.
+_MERGED_FOLDED = 'merged.folded'
+_MERGED_PROF = 'merged.prof'
+_FLAMEGRAPH = 'flamegraph.svg'
+
+# The dimensions of a flame graph, in pixels.
+_WIDTH = 1200
+_FRAME_HEIGHT = 16
+_MIN_FRAME_WIDTH = 0.1
+
+
+class StackSampler(object):
+    """Periodically record the stack of one thread.
+
+    :param thread_id: The ID of the thread to sample. Defaults to the thread
+        that calls :meth:`start`.
+    :param interval: The number of seconds between samples.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        """Initialize this object with needed instance attributes."""
+        self.thread_id = thread_id
+        self.interval = interval
+        #: A ``Counter`` mapping folded stacks to numbers of samples.
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling in a background thread."""
+        if self.thread_id is None:
+            self.thread_id = threading.current_thread().ident
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling, and wait for the background thread to exit."""
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _sample(self):
+        """Record a stack every ``interval`` seconds until stopped."""
+        while not self._stop.wait(self.interval):
+            # pylint:disable=protected-access
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[fold(frame)] += 1
+
+
+def fold(frame):
+    """Return a frame's stack, outermost first, as a ``;``-separated string."""
+    names = []
+    while frame is not None:
+        names.append('{}:{}'.format(
+            frame.f_globals.get('__name__', '?'),
+            frame.f_code.co_name,
+        ))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class ClassProfile(object):
+    """The profiles of one test case class.
+
+    :param profilers: An iterable of names from :data:`PROFILERS`.
+    """
+
+    def __init__(self, profilers):
+        """Initialize this object with needed instance attributes."""
+        self.sampler = StackSampler() if 'sample' in profilers else None
+        self.profile = cProfile.Profile() if 'cprofile' in profilers else None
+        self._depth = 0
+
+    @property
+    def active(self):
+        """Tell whether profiling is enabled."""
+        return self._depth > 0
+
+    def enable(self):
+        """Start profiling the calling thread.
+
+        Calls may be nested. Only the outermost call starts profiling.
+        """
+        self._depth += 1
+        if self._depth > 1:
+            return
+        if self.sampler is not None:
+            self.sampler.thread_id = None
+            self.sampler.start()
+        if self.profile is not None:
+            self.profile.enable()
+
+    def disable(self):
+        """Stop profiling, if this matches the outermost call to enable."""
+        self._depth -= 1
+        if self._depth > 0:
+            return
+        if self.profile is not None:
+            self.profile.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def save(self, path_prefix):
+        """Write profiles to ``path_prefix`` plus ``.folded`` or ``.prof``."""
+        if self.sampler is not None:
+            write_folded(path_prefix + '.folded', self.sampler.stacks)
+        if self.profile is not None:
+            self.profile.dump_stats(path_prefix + '.prof')
+
+
+class Profiler(object):
+    """Profile each test case class in a test suite.
+
+    :param profilers: An iterable of names from :data:`PROFILERS`.
+    :param directory: The directory to which profiles are written.
+    :param patterns: Shell-style patterns. Only test case classes whose dotted
+        names match one are profiled. By default, all are profiled.
+    :param prefix: A string to prepend to the names of the files written.
+    :raises: ``ValueError`` if a profiler is not known.
+    """
+
+    def __init__(self, profilers, directory, patterns=('*',), prefix=''):
+        """Initialize this object with needed instance attributes."""
+        unknown = set(profilers) - set(PROFILERS)
+        if unknown:
+            raise ValueError(
+                'Unknown profilers: {}. Choose from: {}'
+                .format(', '.join(sorted(unknown)), ', '.join(PROFILERS))
+            )
+        self.profilers = tuple(profilers)
+        self.directory = directory
+        self.patterns = tuple(patterns)
+        self.prefix = prefix
+        self._profiles = {}
+        self._wrapped = set()
+
+    def watch(self, suite):
+        """Profile the test case classes in ``suite`` when it is run.
+
+        The ``setUpClass``, ``run`` and ``tearDownClass`` methods of each
+        matching class are wrapped, so that they are profiled. A class'
+        profiles are written once it is torn down, or if it cannot be set up.
+
+        :param suite: A ``unittest2.TestSuite``.
+        """
+        for test in _suites.iter_tests(suite):
+            test_case = type(test)
+            name = '{}.{}'.format(test_case.__module__, test_case.__name__)
+            if (test_case not in self._wrapped and
+                    any(fnmatch.fnmatch(name, pat) for pat in self.patterns)):
+                self._wrap(test_case)
+
+    def get_path_prefix(self, test_case):
+        """Return where to write a class' profiles, less a file extension."""
+        return os.path.join(self.directory, '{}{}.{}'.format(
+            self.prefix,
+            test_case.__module__,
+            test_case.__name__,
+        ))
+
+    def _wrap(self, test_case):
+        """Wrap the methods of a test case class, so that they're profiled.
+
+        Each wrapper calls the function that ``test_case`` defines, or the
+        inherited method, with whatever class or test it is called on. So a
+        subclass that calls ``super(...).setUpClass()`` still sets up the
+        subclass, even if the parent class is wrapped too.
+        """
+        set_up_class = _suites.get_function(test_case, 'setUpClass')
+        tear_down_class = _suites.get_function(test_case, 'tearDownClass')
+        run = _suites.get_function(test_case, 'run')
+
+        def wrapped_set_up_class(cls):
+            """Profile ``setUpClass``. Save the profiles if it fails."""
+            try:
+                self._call(cls, set_up_class, cls)
+            except:  # noqa pylint:disable=bare-except
+                self._save(cls)
+                raise
+
+        def wrapped_tear_down_class(cls):
+            """Profile ``tearDownClass``, then save the profiles."""
+            try:
+                self._call(cls, tear_down_class, cls)
+            finally:
+                self._save(cls)
+
+        def wrapped_run(self_, result=None):
+            """Profile one test, including ``setUp`` and ``tearDown``."""
+            return self._call(type(self_), run, self_, result)
+
+        test_case.setUpClass = classmethod(wrapped_set_up_class)
+        test_case.tearDownClass = classmethod(wrapped_tear_down_class)
+        test_case.run = wrapped_run
+        self._wrapped.add(test_case)
+
+    def _call(self, test_case, func, *args):
+        """Call ``func(*args)`` while profiling ``test_case``.
+
+        ``test_case`` may be a subclass that inherits a wrapped method, but
+        that is not itself profiled. If so, ``func`` is just called.
+        """
+        if test_case not in self._wrapped:
+            return func(*args)
+        if test_case not in self._profiles:
+            self._profiles[test_case] = ClassProfile(self.profilers)
+        profile = self._profiles[test_case]
+        profile.enable()
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+
+    def _save(self, test_case):
+        """Write the profiles of a test case class, and forget them.
+
+        Nothing is done while the class is still being profiled, as when a
+        wrapped ``tearDownClass`` is called through ``super`` by another.
+        """
+        profile = self._profiles.get(test_case)
+        if profile is not None and not profile.active:
+            del self._profiles[test_case]
+            profile.save(self.get_path_prefix(test_case))
+
+
+def get_directory():
+    """Return the directory named by ``PULP_SMASH_PROFILE_DIR``.
+
+    Defaults to ``$XDG_DATA_HOME/pulp_smash/profiles``. The directory is made
+    if it does not exist.
+    """
+    directory = os.environ.get('PULP_SMASH_PROFILE_DIR')
+    if not directory:
+        from xdg import BaseDirectory
+        directory = os.path.join(
+            BaseDirectory.save_data_path('pulp_smash'),
+            'profiles',
+        )
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:  # another process may have made it
+            if not os.path.isdir(directory):
+                raise
+    return directory
+
+
+def get_profiler(section=None):
+    """Return a :class:`Profiler` as configured by environment variables.
+
+    :param section: The configuration file section under test. It prefixes
+        the names of the files written.
+    :returns: A :class:`Profiler`, or ``None`` if ``PULP_SMASH_PROFILE`` is
+        not set.
+    """
+    profilers = _split(os.environ.get('PULP_SMASH_PROFILE', ''))
+    if not profilers:
+        return None
+    return Profiler(
+        profilers,
+        get_directory(),
+        _split(os.environ.get('PULP_SMASH_PROFILE_CLASSES', '')) or ('*',),
+        '{}.'.format(section) if section else '',
+    )
+
+
+def _split(text):
+    """Split a comma-separated list, and drop empty items."""
+    return tuple(item.strip() for item in text.split(',') if item.strip())
+
+
+def write_folded(path, stacks):
+    """Write stacks to ``path`` in the folded format.
+
+    :param stacks: A dict mapping folded stacks to numbers of samples.
+    """
+    with io.open(path, 'w', encoding='utf-8') as handle:
+        for stack, count in sorted(stacks.items()):
+            handle.write('{} {}\n'.format(stack, count))
+
+
+def read_folded(path):
+    """Read stacks in the folded format from ``path``.
+
+    :returns: A ``Counter`` mapping folded stacks to numbers of samples.
+    """
+    stacks = Counter()
+    with io.open(path, encoding='utf-8') as handle:
+        for line in handle:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def merge(directory, since=None):
+    """Merge the profiles of all test case classes in ``directory``.
+
+    Writes ``merged.folded`` and a flame graph of it, ``flamegraph.svg``, if
+    any stacks were sampled, and ``merged.prof``, if any classes were profiled
+    with :mod:`cProfile`.
+
+    :param since: If given, profiles last written before this time, in seconds
+        since the epoch, are left out. They are left over from earlier runs.
+    :returns: A list of the paths written.
+    """
+    written = []
+    names = sorted(
+        name for name in os.listdir(directory)
+        if since is None or
+        os.path.getmtime(os.path.join(directory, name)) >= since
+    )
+    stacks = Counter()
+    for name in names:
+        if name.endswith('.folded') and name != _MERGED_FOLDED:
+            stacks.update(read_folded(os.path.join(directory, name)))
+    if stacks:
+        written.append(os.path.join(directory, _MERGED_FOLDED))
+        write_folded(written[-1], stacks)
+        written.append(os.path.join(directory, _FLAMEGRAPH))
+        with io.open(written[-1], 'w', encoding='utf-8') as handle:
+            handle.write(render_flamegraph(stacks))
+    prof_paths = [
+        os.path.join(directory, name) for name in names
+        if name.endswith('.prof') and name != _MERGED_PROF
+    ]
+    if prof_paths:
+        written.append(os.path.join(directory, _MERGED_PROF))
+        pstats.Stats(*prof_paths).dump_stats(written[-1])
+    return written
+
+
+def _build_tree(stacks):
+    """Turn folded stacks into a tree of ``[samples, children]`` lists."""
+    root = [0, {}]
+    for stack, count in stacks.items():
+        root[0] += count
+        node = root
+        for name in stack.split(';'):
+            node = node[1].setdefault(name, [0, {}])
+            node[0] += count
+    return root
+
+
+def render_flamegraph(stacks, title='Pulp Smash'):
+    """Render folded stacks as an SVG flame graph.
+
+    Each frame is a box as wide as the share of samples in which it appears,
+    on top of the frame that called it. Hover over a box to see its full name.
+
+    :param stacks: A dict mapping folded stacks to numbers of samples.
+    :returns: An SVG document, as a string.
+    """
+    root = _build_tree(stacks)
+    boxes = []
+    depth = _render(root, 0, 0, _WIDTH / (root[0] or 1), boxes)
+    height = (depth + 2) * _FRAME_HEIGHT
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<svg xmlns="http://www.w3.org/2000/svg" width="{}" height="{}" '
+        'font-family="monospace" font-size="11">'.format(_WIDTH, height),
+        '<text x="{}" y="{}" text-anchor="middle">{} ({} samples)</text>'
+        .format(_WIDTH / 2, _FRAME_HEIGHT - 4, escape(title), root[0]),
+    ]
+    for name, samples, x_pos, level, width in boxes:
+        y_pos = height - (level + 1) * _FRAME_HEIGHT
+        lines.append(
+            '<g><title>{name} ({samples} samples, {share:.2f}%)</title>'
+            '<rect x="{x:.1f}" y="{y}" width="{width:.1f}" height="{height}" '
+            'fill="{fill}"/>'
+            '<text x="{text_x:.1f}" y="{text_y}">{label}</text></g>'.format(
+                name=escape(name),
+                samples=samples,
+                share=samples / root[0] * 100,
+                x=x_pos,
+                y=y_pos,
+                width=width,
+                height=_FRAME_HEIGHT - 1,
+                fill=_get_color(name),
+                text_x=x_pos + 2,
+                text_y=y_pos + _FRAME_HEIGHT - 4,
+                label=escape(name[:int(width / 7)]),
+            )
+        )
+    lines.append('</svg>')
+    return '\n'.join(lines) + '\n'
+
+
+def _render(node, level, x_pos, scale, boxes):
+    """Lay out the children of ``node``, and return the tree's depth.
+
+    Each box is appended to ``boxes`` as a ``(name, samples, x, level,
+    width)`` tuple.
+    """
+    depth = level
+    for name, child in sorted(node[1].items()):
+        width = child[0] * scale
+        if width >= _MIN_FRAME_WIDTH:
+            boxes.append((name, child[0], x_pos, level, width))
+            depth = max(depth, _render(child, level + 1, x_pos, scale, boxes))
+        x_pos += width
+    return depth
+
+
+def _get_color(name):
+    """Return a warm color for a frame. A frame's color never changes."""
+    digest = bytearray(hashlib.md5(name.encode('utf-8')).digest())
+    return 'rgb({},{},{})'.format(
+        205 + digest[0] % 50,
+        digest[1] % 230,
+        digest[2] % 55,
+    )
+
+
+def main(argv=None):
+    """Merge the profiles in a directory, and print the paths written."""
+    parser = argparse.ArgumentParser(
+        prog='python -m pulp_smash.profiling',
+        description='Merge the profiles of Pulp Smash test case classes.',
+    )
+    parser.add_argument(
+        'directory',
+        nargs='?',
+        help='The directory holding the profiles. Defaults to '
+        'PULP_SMASH_PROFILE_DIR or $XDG_DATA_HOME/pulp_smash/profiles.',
+    )
+    args = parser.parse_args(argv)
+    written = merge(args.directory or get_directory())
+    for path in written:
+        print(path)
+    if not written:
+        print('No profiles found.', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# coding=utf-8
+"""Tools for watching the progress of running tasks.
+
+While a task such as a sync or publish runs, Pulp reports its progress in the
+task's ``progress_report``. The structure of that report varies from plugin to
+plugin. For example, the yum importer reports::
+
+    {"yum_importer": {"content": {
+        "items_total": 32, "items_left": 10,
+        "size_total": 1024, "size_left": 256,
+        ...
+    }, ...}}
+
+This module reduces a progress report to four numbers: units done, units
+total, bytes done and bytes total. (See :func:`summarize`.) It then derives
+live metrics from successive reports, such as units per second, bytes per
+second and the estimated time remaining. (See :class:`ProgressMonitor`.)
+
+There are two ways to watch a task. The first is to iterate over
+:func:`stream`, which polls a task and yields a :class:`Progress` object each
+time:
+
+>>> from pulp_smash import config, progress
+>>> for report in progress.stream(config.get_config(), task_href):
+...     print(report.units_per_second, report.eta)
+
+The second is to pass a :class:`ProgressMonitor` to
+:func:`pulp_smash.utils.poll_task` or :func:`pulp_smash.utils.poll_tasks`, and
+to inspect it afterwards, or from a ``callback`` of its own:
+
+>>> from pulp_smash import progress, utils
+>>> monitor = progress.ProgressMonitor()
+>>> tuple(utils.poll_tasks(cfg, hrefs, callback=monitor))
+>>> monitor.history[hrefs[0]]  # a list of Progress objects
+"""
+from __future__ import division, unicode_literals
+
+import time
+from collections import namedtuple
+from threading import Lock
+try:  # try Python 3 import first
+    from urllib.parse import urljoin
+except ImportError:  # pragma: no cover
+    from urlparse import urljoin  # pylint:disable=C0411,E0401
+
+import requests
+
+from pulp_smash import exceptions, utils
+
+_TASK_END_STATES = utils._TASK_END_STATES  # pylint:disable=protected-access
+
+# Pairs of keys in a progress report. Each is a (total key, done key, left key,
+# is bytes) tuple. Exactly one of the done and left keys is set.
+_COUNTERS = (
+    ('items_total', None, 'items_left', False),  # yum importer
+    ('size_total', None, 'size_left', True),  # yum importer
+    ('total_count', 'finished_count', None, False),  # puppet importer
+    ('num_isos', 'num_isos_finished', None, False),  # iso importer
+    ('total_bytes', 'finished_bytes', None, True),  # iso importer
+)
+
+
+Progress = namedtuple('Progress', (
+    'href',
+    'state',
+    'elapsed',
+    'units_done',
+    'units_total',
+    'bytes_done',
+    'bytes_total',
+    'units_delta',
+    'bytes_delta',
+    'units_per_second',
+    'bytes_per_second',
+    'eta',
+))
+"""A snapshot of a task's progress, and metrics derived from it.
+
+``elapsed`` is the number of seconds since the task was first seen. The
+``*_delta`` fields are the change since the previous snapshot, and the
+``*_per_second`` fields are averages since the first snapshot. ``eta`` is the
+estimated number of seconds remaining, or ``None`` if it cannot be estimated.
+"""
+
+
+def summarize(progress_report):
+    """Reduce a task's progress report to a few numbers.
+
+    The progress report is searched recursively for known counters, and the
+    counters are summed.
+
+    :param progress_report: The ``progress_report`` from a task body.
+    :returns: A ``(units_done, units_total, bytes_done, bytes_total)`` tuple.
+    """
+    totals = [0, 0, 0, 0]
+    pending = [progress_report]
+    while pending:
+        report = pending.pop()
+        if isinstance(report, list):
+            pending.extend(report)
+            continue
+        if not isinstance(report, dict):
+            continue
+        for total_key, done_key, left_key, is_bytes in _COUNTERS:
+            total = report.get(total_key)
+            if not isinstance(total, int) or isinstance(total, bool):
+                continue
+            if done_key is not None:
+                done = report.get(done_key, 0)
+            else:
+                done = total - report.get(left_key, total)
+            index = 2 if is_bytes else 0
+            totals[index] += done
+            totals[index + 1] += total
+        pending.extend(report.values())
+    return tuple(totals)
+
+
+class ProgressMonitor(object):
+    """Turn a series of task bodies into a series of :class:`Progress`.
+
+    An instance of this class is callable, and may be passed as the
+    ``callback`` argument to :func:`pulp_smash.utils.poll_task` or
+    :func:`pulp_smash.utils.poll_tasks`. It is thread-safe.
+
+    :param callback: A callable. If given, it is called with each
+        :class:`Progress` object as it is produced.
+    """
+
+    def __init__(self, callback=None):
+        """Initialize this object with needed instance attributes."""
+        self.callback = callback
+        self.history = {}  # a dict mapping task hrefs to lists of Progress
+        self._start = {}  # a dict mapping task hrefs to start times
+        self._lock = Lock()
+
+    def __call__(self, task, now=None):
+        """Record a task body, and return a :class:`Progress` object.
+
+        :param task: A task body, as returned by Pulp.
+        :param now: The time at which the task body was received. Defaults to
+            the current time.
+        """
+        if now is None:
+            now = time.time()
+        href = task.get('_href')
+        units_done, units_total, bytes_done, bytes_total = summarize(
+            task.get('progress_report') or {}
+        )
+        with self._lock:
+            start = self._start.setdefault(href, now)
+            history = self.history.setdefault(href, [])
+            previous = history[-1] if history else None
+            elapsed = now - start
+            units_rate = units_done / elapsed if elapsed > 0 else None
+            bytes_rate = bytes_done / elapsed if elapsed > 0 else None
+            report = Progress(
+                href=href,
+                state=task.get('state'),
+                elapsed=elapsed,
+                units_done=units_done,
+                units_total=units_total,
+                bytes_done=bytes_done,
+                bytes_total=bytes_total,
+                units_delta=units_done - (
+                    previous.units_done if previous else 0
+                ),
+                bytes_delta=bytes_done - (
+                    previous.bytes_done if previous else 0
+                ),
+                units_per_second=units_rate,
+                bytes_per_second=bytes_rate,
+                eta=_get_eta(
+                    (bytes_total - bytes_done, bytes_rate),
+                    (units_total - units_done, units_rate),
+                ),
+            )
+            history.append(report)
+        if self.callback is not None:
+            self.callback(report)
+        return report
+
+
+def stream(server_config, href, interval=1, poll_limit=120):
+    """Poll the task at ``href``, and yield its progress until it ends.
+
+    Unlike :func:`pulp_smash.utils.poll_task`, this function yields a
+    :class:`Progress` object after every poll, not just after the task ends.
+    Spawned tasks are not followed.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :param href: The path to a task.
+    :param interval: The number of seconds to sleep between polls.
+    :param poll_limit: The maximum number of polls.
+    :returns: A generator yielding :class:`Progress` objects.
+    :raises pulp_smash.exceptions.TaskTimedOutError: If the task is ongoing
+        after ``poll_limit`` polls.
+    """
+    monitor = ProgressMonitor()
+    for _ in range(poll_limit):
+        response = requests.get(
+            urljoin(server_config.base_url, href),
+            **server_config.get_requests_kwargs()
+        )
+        response.raise_for_status()
+        task = response.json()
+        yield monitor(task)
+        if task['state'] in _TASK_END_STATES:
+            return
+        time.sleep(interval)
+    raise exceptions.TaskTimedOutError(
+        'Task {} is ongoing after {} polls.'.format(href, poll_limit)
+    )
+
+
+def _get_eta(*estimates):
+    """Return the first computable estimate of the time remaining.
+
+    :param estimates: ``(amount remaining, rate)`` tuples.
+    :returns: A number of seconds, or ``None``.
+    """
+    for remaining, rate in estimates:
+        if rate:
+            return remaining / rate
+    return None
@@ -0,0 +1,228 @@
+# coding=utf-8
+"""A cache of test results, for running only the tests that may have changed.
+
+:mod:`pulp_smash.runner` runs test modules and test case classes. (See
+:func:`pulp_smash.runner.get_graph`.) When it is given a :class:`ResultCache`,
+it saves the result of each one it runs, together with a key describing
+everything that result depends on:
+
+* The source code of the test module and of the ``pulp_smash`` package. (See
+  :func:`get_source_hash`.)
+* The Pulp server: its ``version`` as configured, and the versions of the Pulp
+  packages installed on it, as listed by ``rpm``. (See
+  :func:`get_server_fingerprint`.)
+
+A result also lists the status of every bug at https://pulp.plan.io that was
+looked up while it was produced, such as by
+:func:`pulp_smash.selectors.bug_is_untestable`.
+
+On a later run, a saved result is reused instead of running its tests again if
+its key is unchanged, if it has no failures or errors, and if every bug it
+lists still has the same status. The cache lives under
+``$XDG_CACHE_HOME/pulp_smash/results/``, with one small JSON file per server
+and test module or class. Files are replaced by renaming, so several processes
+can share one cache.
+
+If the Pulp packages installed on a server cannot be listed, nothing is reused
+for that server, as it might have been upgraded.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import tempfile
+import warnings
+
+from pulp_smash import selectors
+
+# `_get_library_hash` uses this as a cache.
+_LIBRARY_HASH = None
+
+
+class ResultCache(object):
+    """A cache of the results of test modules and test case classes.
+
+    :param directory: The directory in which to store the cache. Defaults to
+        ``$XDG_CACHE_HOME/pulp_smash/results``.
+    """
+
+    def __init__(self, directory=None):
+        """Initialize this object with needed instance attributes."""
+        if directory is None:
+            from xdg import BaseDirectory
+            directory = os.path.join(
+                BaseDirectory.save_cache_path('pulp_smash'),
+                'results',
+            )
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:  # another process may have made it
+                if not os.path.isdir(directory):
+                    raise
+        self.directory = directory
+
+    def get(self, server_config, node, key):
+        """Return a saved result which may be reused, or ``None``.
+
+        :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+        :param node: The name of a test module or test case class.
+        :param key: A dict, as returned by :func:`get_key`.
+        :returns: A result dict, as produced by :mod:`pulp_smash.runner`.
+        """
+        entry = self._read_entry(server_config, node)
+        if entry is None or entry['key'] != key:
+            return None
+        result = entry['result']
+        if result['failures'] or result['errors']:
+            return None
+        if not _bugs_are_unchanged(result.get('bugs', {})):
+            return None
+        return result
+
+    def put(self, server_config, node, key, result):
+        """Save the result of running a test module or test case class.
+
+        :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+        :param node: The name of a test module or test case class.
+        :param key: A dict, as returned by :func:`get_key`.
+        :param result: A result dict, as produced by :mod:`pulp_smash.runner`.
+        """
+        path = self._get_entry_path(server_config, node)
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(handle, 'w') as tmp_file:
+                json.dump({
+                    'base_url': server_config.base_url,
+                    'node': node,
+                    'key': key,
+                    'result': result,
+                }, tmp_file)
+            os.rename(tmp_path, path)
+        except:  # noqa pylint:disable=bare-except
+            os.remove(tmp_path)
+            raise
+
+    def clear(self):
+        """Delete everything in the cache."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+
+    def _get_entry_path(self, server_config, node):
+        """Return the path to the entry for ``node`` on a server."""
+        digest = hashlib.sha256(
+            '{} {}'.format(server_config.base_url, node).encode('utf-8')
+        ).hexdigest()
+        return os.path.join(self.directory, digest + '.json')
+
+    def _read_entry(self, server_config, node):
+        """Return the entry for ``node`` on a server, or ``None``."""
+        try:
+            with open(self._get_entry_path(server_config, node)) as handle:
+                entry = json.load(handle)
+        except (IOError, OSError, ValueError):
+            return None
+        if (entry.get('base_url'), entry.get('node')) != (
+                server_config.base_url, node):  # a hash collision
+            return None
+        return entry
+
+
+def _bugs_are_unchanged(bugs):
+    """Tell whether each bug in ``bugs`` still has the given status.
+
+    :param bugs: A dict mapping bug IDs, as strings, to statuses.
+    """
+    import requests
+    for bug_id, status in bugs.items():
+        try:
+            current = selectors.get_bug_status(int(bug_id))
+        except requests.exceptions.RequestException:
+            return False
+        if current != status:
+            return False
+    return True
+
+
+def get_server_fingerprint(server_config):
+    """Describe the software on a Pulp server.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :returns: A dict with keys ``version`` and ``packages``. ``packages`` is a
+        sorted list of the names, versions and releases of the installed Pulp
+        packages, or ``None`` if they cannot be listed.
+    """
+    from pulp_smash import cli
+    try:
+        completed_proc = cli.Client(server_config, cli.echo_handler).run(
+            ('rpm', '-qa', '*pulp*')
+        )
+    except Exception as err:  # pylint:disable=broad-except
+        completed_proc = None
+        message = err
+    else:
+        message = completed_proc.stderr
+    if completed_proc is None or completed_proc.returncode != 0:
+        warnings.warn(
+            'Cannot list the Pulp packages installed on {}. No test results '
+            'will be reused. Error: {}'
+            .format(server_config.base_url, message),
+            RuntimeWarning
+        )
+        packages = None
+    else:
+        packages = sorted(completed_proc.stdout.split())
+    return {'version': str(server_config.version), 'packages': packages}
+
+
+def get_source_hash(node):
+    """Return a checksum of the source code that a test node depends on.
+
+    :param node: The name of an imported test module or test case class.
+    :returns: The SHA-256 checksum of the test module's source code and of
+        the ``pulp_smash`` package's other modules, as a hex string.
+    """
+    module = sys.modules.get(node) or sys.modules[node.rsplit('.', 1)[0]]
+    checksum = hashlib.sha256(_get_library_hash().encode('utf-8'))
+    with open(inspect.getsourcefile(module), 'rb') as handle:
+        checksum.update(handle.read())
+    return checksum.hexdigest()
+
+
+def _get_library_hash():
+    """Return a checksum of the modules in the ``pulp_smash`` package.
+
+    Test modules, in ``pulp_smash.tests``, are not included.
+    """
+    global _LIBRARY_HASH  # pylint:disable=global-statement
+    if _LIBRARY_HASH is None:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        checksum = hashlib.sha256()
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.py'):
+                with open(os.path.join(directory, name), 'rb') as handle:
+                    checksum.update(name.encode('utf-8'))
+                    checksum.update(handle.read())
+        _LIBRARY_HASH = checksum.hexdigest()
+    return _LIBRARY_HASH
+
+
+def get_key(fingerprint, node):
+    """Return the key under which the result of ``node`` is cached.
+
+    :param fingerprint: A dict, as returned by :func:`get_server_fingerprint`.
+    :param node: The name of an imported test module or test case class.
+    :returns: A dict, or ``None`` if the result of ``node`` should not be
+        reused.
+    """
+    if fingerprint['packages'] is None:
+        return None
+    try:
+        source = get_source_hash(node)
+    except (KeyError, IOError, OSError, TypeError):
+        return None
+    return {'server': fingerprint, 'source': source}
@@ -0,0 +1,550 @@
+# coding=utf-8
+"""Run the Pulp Smash test suite against several servers at once.
+
+A configuration file may contain several sections, each describing a Pulp
+server. (See :class:`pulp_smash.config.ServerConfig`.) Normally, the test suite
+targets the "default" section. This module runs the test suite against many
+sections concurrently, and then prints a merged report. For example, to test
+two Pulp servers described by the sections "pulp27" and "pulp28"::
+
+    python -m pulp_smash.runner pulp27 pulp28
+
+If no sections are named, every section in the configuration file is tested.
+
+Each section gets its own pool of worker processes, and each worker runs one
+test module at a time. A worker targets a section by way of the
+``PULP_SMASH_CONFIG_SECTION`` environment variable, which
+:func:`pulp_smash.config.get_config` respects. By default, each pool has one
+worker, because some tests (such as those that reset Pulp) interfere with
+other tests running against the same server. Use ``--workers`` to change this.
+
+Before any worker is started, test modules and classes that declare
+requirements with :func:`pulp_smash.selectors.skip_unless` are checked against
+each section. A module that would be skipped entirely, because its
+``setUpModule`` or every one of its test case classes would be skipped, is
+pruned: no worker is started for it. Skipped classes in other modules still
+cost no server work, as they are skipped before ``setUpClass`` runs. The
+report lists every pruned module and class, and why it was pruned.
+
+Test case classes may declare that they assume other test case classes pass,
+with :func:`pulp_smash.selectors.depends_on`. The test modules and classes to
+be run form a graph, in which the classes of a module that declares such
+dependencies are nodes of their own, and every other module is one node. (See
+:func:`get_graph`.) Each node is run by one worker, as soon as all of the nodes
+it depends on are done, so independent branches of the graph run concurrently.
+If a node has failures or errors, the nodes that depend on it, directly or
+not, are not run at all. The report lists these short-circuited nodes, and the
+node whose failure caused each to be skipped.
+
+With ``--incremental``, the result of each node is saved, and a node is not
+run again if nothing it depends on has changed since it last passed. (See
+:mod:`pulp_smash.results`.) The report lists the nodes whose results were
+reused.
+
+With ``--collect-logs``, the server logs written while a test case class ran
+are appended to the output of its failures and errors. (See
+:mod:`pulp_smash.logs`.) Workers learn of this from the
+``PULP_SMASH_COLLECT_LOGS`` environment variable.
+
+If the ``PULP_SMASH_PROFILE`` environment variable is set, workers profile
+each test case class, and the profiles are merged once all sections are done.
+(See :mod:`pulp_smash.profiling`.)
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import importlib
+import json
+import os
+import pkgutil
+import subprocess
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+try:  # try Python 3 import first
+    from queue import Queue
+except ImportError:  # pragma: no cover
+    from Queue import Queue  # pylint:disable=C0411,E0401
+
+import unittest2
+
+from pulp_smash import config, results, selectors
+
+# The keys in a result dict, as produced by `_run_modules`.
+_COUNTERS = ('tests_run', 'failures', 'errors', 'skipped')
+
+
+def get_test_modules(package='pulp_smash.tests'):
+    """Return the names of all test modules in ``package``, sorted.
+
+    :param package: The dotted name of a package containing test modules.
+    :returns: A tuple of dotted module names, like
+        ``'pulp_smash.tests.platform.api_v2.test_login'``.
+    """
+    path = importlib.import_module(package).__path__
+    return tuple(sorted(
+        name
+        for _, name, is_pkg in pkgutil.walk_packages(path, package + '.')
+        if not is_pkg and name.rsplit('.', 1)[-1].startswith('test_')
+    ))
+
+
+def run_section(section, modules, workers=1, cache=None):
+    """Run ``modules`` against the server described by ``section``.
+
+    :param section: The name of a configuration file section.
+    :param modules: An iterable of dotted test module names.
+    :param workers: The number of worker processes to use.
+    :param cache: A :class:`pulp_smash.results.ResultCache`, or ``None`` to
+        run every node.
+    :returns: A dict with keys ``tests_run``, ``failures``, ``errors``,
+        ``skipped``, ``duration``, ``modules``, ``pruned``,
+        ``short_circuited`` and ``reused``. ``modules`` is a dict mapping the
+        names of the nodes that were run, as returned by :func:`get_graph`, to
+        per-node result dicts, each of which also has an ``output`` key.
+        ``pruned`` is as returned by :func:`prune`, and ``short_circuited`` as
+        returned by :func:`schedule`. ``reused`` is a sorted list of the nodes
+        whose results were taken from ``cache``, rather than run.
+    """
+    start = time.time()
+    try:
+        server_config = config.ServerConfig().read(section)
+    except Exception:  # pylint:disable=broad-except
+        # Let the workers report the problem.
+        server_config = cache = None
+        modules, pruned = tuple(modules), {}
+    else:
+        modules, pruned = prune(server_config, modules)
+    reused = []
+    if cache is not None:
+        fingerprint = results.get_server_fingerprint(server_config)
+
+    def func(node):
+        """Reuse the cached result of ``node``, or run it."""
+        if cache is None:
+            return _spawn(section, node)
+        key = results.get_key(fingerprint, node)
+        result = None if key is None else cache.get(server_config, node, key)
+        if result is not None:
+            reused.append(node)
+            return result
+        result = _spawn(section, node)
+        if key is not None:
+            cache.put(server_config, node, key, result)
+        return result
+
+    node_results, short_circuited = schedule(
+        get_graph(modules, pruned),
+        func,
+        workers,
+    )
+    report = {counter: 0 for counter in _COUNTERS}
+    for result in node_results.values():
+        for counter in _COUNTERS:
+            report[counter] += result[counter]
+    report['duration'] = time.time() - start
+    report['modules'] = node_results
+    report['pruned'] = pruned
+    report['short_circuited'] = short_circuited
+    report['reused'] = sorted(reused)
+    return report
+
+
+def prune(server_config, modules):
+    """Find the test modules and classes that would be skipped.
+
+    Requirements declared with :func:`pulp_smash.selectors.skip_unless` are
+    checked. Other reasons for skipping tests, such as a call to
+    ``unittest2.TestCase.skipTest``, are not found.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :param modules: An iterable of dotted test module names.
+    :returns: A ``(modules, pruned)`` tuple. ``modules`` is a tuple of the
+        modules that should be run. ``pruned`` is a dict mapping the names of
+        skipped modules and classes to the reasons why they are skipped. A
+        module is pruned if its ``setUpModule`` or all of its test case
+        classes are skipped. In the first case, its classes are not listed.
+    """
+    selected = []
+    pruned = {}
+    for module_name in modules:
+        try:
+            module = importlib.import_module(module_name)
+            reason = selectors.get_skip_reason(module, server_config)
+            reasons = {
+                '{}.{}'.format(module_name, test_case.__name__):
+                selectors.get_skip_reason(test_case, server_config)
+                for test_case in _get_test_cases(module)
+            } if reason is None else {}
+        except Exception:  # pylint:disable=broad-except
+            # Let the worker report the problem.
+            selected.append(module_name)
+            continue
+        if reason is not None:
+            pruned[module_name] = reason
+            continue
+        skipped = {
+            name: reason for name, reason in reasons.items()
+            if reason is not None
+        }
+        pruned.update(skipped)
+        if not reasons or len(skipped) < len(reasons):
+            selected.append(module_name)
+    return tuple(selected), pruned
+
+
+def _get_test_cases(module):
+    """Return the test case classes with tests defined in ``module``."""
+    return [
+        obj for obj in vars(module).values()
+        if isinstance(obj, type) and
+        issubclass(obj, unittest2.TestCase) and
+        obj.__module__ == module.__name__ and
+        unittest2.defaultTestLoader.getTestCaseNames(obj)
+    ]
+
+
+def get_graph(modules, pruned=None):
+    """Return the graph of dependencies between ``modules`` and their classes.
+
+    A module that contains a test case class with prerequisites, as declared
+    with :func:`pulp_smash.selectors.depends_on`, is split into one node per
+    test case class, like ``'pulp_smash.tests.foo.test_bar.BazTestCase'``.
+    Every other module is a single node. A prerequisite that is not in the
+    graph, such as a class in a module that is not being run, is assumed to
+    hold true.
+
+    :param modules: An iterable of dotted test module names.
+    :param pruned: A dict whose keys include the names of test case classes
+        which should not be run, such as the one returned by :func:`prune`.
+    :returns: A dict mapping each node's name to a set of the names of the
+        nodes it depends on.
+    """
+    pruned = pruned or {}
+    prerequisites = {}  # Map nodes to tuples of test case classes.
+    for module_name in modules:
+        try:
+            test_cases = _get_test_cases(importlib.import_module(module_name))
+        except Exception:  # pylint:disable=broad-except
+            # Let the worker report the problem.
+            test_cases = []
+        if not any(selectors.get_prerequisites(cls) for cls in test_cases):
+            prerequisites[module_name] = ()
+            continue
+        for test_case in test_cases:
+            name = _get_name(test_case)
+            if name not in pruned:
+                prerequisites[name] = selectors.get_prerequisites(test_case)
+    graph = {}
+    for node, test_cases in prerequisites.items():
+        graph[node] = set()
+        for test_case in test_cases:
+            for name in (_get_name(test_case), test_case.__module__):
+                if name in prerequisites:
+                    graph[node].add(name)
+                    break
+    return graph
+
+
+def _get_name(test_case):
+    """Return the dotted name of a test case class."""
+    return '{}.{}'.format(test_case.__module__, test_case.__name__)
+
+
+def schedule(graph, func, workers=1):
+    """Call ``func`` on each node of ``graph``, after the nodes it depends on.
+
+    Up to ``workers`` nodes are run at once. If a node's result has failures or
+    errors, the nodes that depend on it, directly or not, are not run.
+
+    :param graph: A dict, as returned by :func:`get_graph`.
+    :param func: A function that accepts the name of a node and returns a
+        result dict, as produced by :func:`_spawn`.
+    :param workers: The number of nodes to run at once.
+    :returns: A ``(results, short_circuited)`` tuple. ``results`` is a dict
+        mapping the nodes that were run to their results. ``short_circuited``
+        is a dict mapping the nodes that were not run to the reasons why.
+    :raises: ``ValueError`` if ``graph`` has a cycle.
+    """
+    order = _sort_topologically(graph)
+    dependents = {node: set() for node in graph}
+    for node, prerequisites in graph.items():
+        for prerequisite in prerequisites:
+            dependents[prerequisite].add(node)
+    waiting = {node: set(prereqs) for node, prereqs in graph.items()}
+    results = {}
+    short_circuited = {}
+    done = Queue()
+
+    def call(node):
+        """Run ``node``. Return ``(node, result, exception)``."""
+        try:
+            return node, func(node), None
+        except Exception as err:  # pylint:disable=broad-except
+            return node, None, err
+
+    pool = ThreadPool(max(1, min(workers, len(graph))))
+    try:
+        running = 0
+        for node in order:
+            if not waiting[node]:
+                pool.apply_async(call, (node,), callback=done.put)
+                running += 1
+        while running:
+            node, result, err = done.get()
+            running -= 1
+            if err is not None:
+                raise err
+            results[node] = result
+            if result['failures'] or result['errors']:
+                reason = '{} failed'.format(node)
+                stack = list(dependents[node])
+                while stack:
+                    dependent = stack.pop()
+                    if dependent not in short_circuited:
+                        short_circuited[dependent] = reason
+                        stack.extend(dependents[dependent])
+            for dependent in sorted(dependents[node]):
+                waiting[dependent].discard(node)
+                if not waiting[dependent] and \
+                        dependent not in short_circuited:
+                    pool.apply_async(call, (dependent,), callback=done.put)
+                    running += 1
+    finally:
+        pool.close()
+        pool.join()
+    return results, short_circuited
+
+
+def _sort_topologically(graph):
+    """Return the nodes of ``graph``, each after the nodes it depends on.
+
+    :raises: ``ValueError`` if ``graph`` has a cycle.
+    """
+    order = []
+    waiting = {node: set(prereqs) for node, prereqs in graph.items()}
+    while waiting:
+        ready = sorted(node for node in waiting if not waiting[node])
+        if not ready:
+            raise ValueError(
+                'These nodes depend on each other: {}'
+                .format(', '.join(sorted(waiting)))
+            )
+        for node in ready:
+            del waiting[node]
+        for pending in waiting.values():
+            pending.difference_update(ready)
+        order.extend(ready)
+    return order
+
+
+def run_matrix(sections, modules, workers=1, cache=None):
+    """Run ``modules`` against each of ``sections`` concurrently.
+
+    :param sections: An iterable of configuration file section names.
+    :param modules: An iterable of dotted test module names.
+    :param workers: The number of worker processes to use per section.
+    :param cache: A :class:`pulp_smash.results.ResultCache`, or ``None``.
+    :returns: A dict mapping section names to the dicts returned by
+        :func:`run_section`.
+    """
+    sections = tuple(sections)
+    modules = tuple(modules)
+    if not sections:
+        return {}
+    pool = ThreadPool(len(sections))
+    try:
+        reports = pool.map(
+            lambda section: run_section(section, modules, workers, cache),
+            sections,
+        )
+    finally:
+        pool.close()
+        pool.join()
+    return dict(zip(sections, reports))
+
+
+def format_report(reports):
+    """Return a human-readable summary of the dict from :func:`run_matrix`.
+
+    The pruned modules and classes are listed after the summary table, then
+    the short-circuited nodes, then the nodes whose results were reused, and
+    then the output from each failing node.
+    """
+    row = '{:<20} {:>6} {:>9} {:>7} {:>8} {:>7} {:>10}'
+    lines = [row.format(
+        'section', 'tests', 'failures', 'errors', 'skipped', 'pruned',
+        'duration'
+    )]
+    for section in sorted(reports):
+        report = reports[section]
+        lines.append(row.format(
+            section,
+            report['tests_run'],
+            report['failures'],
+            report['errors'],
+            report['skipped'],
+            len(report['pruned']),
+            '{:.1f}s'.format(report['duration']),
+        ))
+    for section in sorted(reports):
+        pruned = reports[section]['pruned']
+        if pruned:
+            lines.extend(('', '== {} pruned'.format(section)))
+            lines.extend(
+                '{}: {}'.format(name, reason)
+                for name, reason in sorted(pruned.items())
+            )
+    for section in sorted(reports):
+        short_circuited = reports[section].get('short_circuited', {})
+        if short_circuited:
+            lines.extend(('', '== {} short-circuited'.format(section)))
+            lines.extend(
+                '{}: {}'.format(name, reason)
+                for name, reason in sorted(short_circuited.items())
+            )
+    for section in sorted(reports):
+        reused = reports[section].get('reused', [])
+        if reused:
+            lines.extend(('', '== {} reused'.format(section)))
+            lines.extend(reused)
+    for section in sorted(reports):
+        for module, result in sorted(reports[section]['modules'].items()):
+            if result['failures'] or result['errors']:
+                lines.extend(('', '== {} {}'.format(section, module)))
+                lines.append(result['output'].rstrip())
+    return '\n'.join(lines)
+
+
+def _spawn(section, module):
+    """Run ``module`` against ``section`` in a child process.
+
+    ``module`` may also be the dotted name of a test case class.
+
+    :returns: A result dict, as produced by :func:`_run_modules`, plus an
+        ``output`` key holding the child's standard error.
+    """
+    env = os.environ.copy()
+    env['PULP_SMASH_CONFIG_SECTION'] = section
+    proc = subprocess.Popen(
+        (sys.executable, '-m', 'pulp_smash.runner', '--worker', module),
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    stdout, stderr = proc.communicate()
+    output = stderr.decode('utf-8', 'replace')
+    try:
+        result = json.loads(stdout.decode('utf-8').splitlines()[-1])
+    except (IndexError, ValueError):
+        # The worker died before it could report. Count it as one error.
+        result = {counter: 0 for counter in _COUNTERS}
+        result['tests_run'] = result['errors'] = 1
+    result['output'] = output
+    return result
+
+
+def _run_modules(modules):
+    """Run ``modules`` in this process, and return a result dict."""
+    suite = unittest2.defaultTestLoader.loadTestsFromNames(modules)
+    if os.environ.get('PULP_SMASH_PROFILE'):
+        from pulp_smash import profiling
+        profiling.get_profiler(
+            os.environ.get('PULP_SMASH_CONFIG_SECTION')
+        ).watch(suite)
+    if os.environ.get('PULP_SMASH_COLLECT_LOGS'):
+        from pulp_smash import logs  # imports plumbum
+        suite = logs.LogCollector(config.get_config()).watch(suite)
+    result = unittest2.TextTestRunner(stream=sys.stderr).run(suite)
+    return {
+        'tests_run': result.testsRun,
+        'failures': len(result.failures) + len(result.unexpectedSuccesses),
+        'errors': len(result.errors),
+        'skipped': len(result.skipped),
+        # See `pulp_smash.results.ResultCache.get`.
+        'bugs': {
+            str(bug_id): status for bug_id, status
+            in selectors.get_bug_statuses().items()
+        },
+    }
+
+
+def _get_parser():
+    """Return an argument parser for :func:`main`."""
+    parser = argparse.ArgumentParser(
+        prog='python -m pulp_smash.runner',
+        description='Run the Pulp Smash test suite against many servers.',
+    )
+    parser.add_argument(
+        'sections',
+        nargs='*',
+        help='Configuration file sections to test. Defaults to all sections.',
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='The number of worker processes per section. Default: 1.',
+    )
+    parser.add_argument(
+        '--module',
+        action='append',
+        dest='modules',
+        help='A test module to run. May be repeated. Default: all modules.',
+    )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='Print the report as JSON.',
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Reuse the results of tests that passed, if nothing they depend '
+        'on has changed.',
+    )
+    parser.add_argument(
+        '--collect-logs',
+        action='store_true',
+        help='Append the server logs written while a test case class ran to '
+        'the output of its failures.',
+    )
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    """Parse arguments, run the test matrix and print a report.
+
+    :returns: An exit code. Zero if all tests passed, and one otherwise.
+    """
+    args = _get_parser().parse_args(argv)
+    if args.worker:
+        print(json.dumps(_run_modules((args.worker,))))
+        return 0
+    if args.collect_logs:
+        os.environ['PULP_SMASH_COLLECT_LOGS'] = '1'  # see `_spawn`
+    sections = args.sections or sorted(config.ServerConfig().sections())
+    start = time.time()
+    reports = run_matrix(
+        sections,
+        args.modules or get_test_modules(),
+        args.workers,
+        results.ResultCache() if args.incremental else None,
+    )
+    if os.environ.get('PULP_SMASH_PROFILE'):
+        from pulp_smash import profiling
+        for path in profiling.merge(profiling.get_directory(), start):
+            print('Wrote {}'.format(path), file=sys.stderr)
+    if args.json:
+        print(json.dumps(reports, indent=2, sort_keys=True))
+    else:
+        print(format_report(reports))
+    failed = any(
+        report['failures'] or report['errors'] for report in reports.values()
+    )
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,329 @@
+# coding=utf-8
+"""Sample a Pulp server's resource usage while tests run.
+
+When an operation such as a sync is slow, it helps to know whether the server
+was short of CPU, busy waiting for its disks, or busy in one service, such as
+MongoDB. A :class:`Sampler` runs a single long-lived shell loop on the server
+(see :meth:`pulp_smash.cli.Client.stream`), which prints the following every
+``interval`` seconds:
+
+* The CPU time counters in ``/proc/stat``, which give the share of time spent
+  in user code, in the kernel, waiting for I/O and idle.
+* The load average, from ``/proc/loadavg``.
+* The number of kilobytes paged in from and out to disk, from
+  ``/proc/vmstat``.
+* The resident memory and CPU time of every process, from ``ps``. Processes
+  are attributed to services with :data:`SERVICES`.
+
+Only one command is started, so sampling costs one SSH connection, however
+many samples are taken. Meanwhile, the code under test marks named spans of
+time with :meth:`Sampler.span`. Afterwards, :func:`format_report` summarizes
+the samples taken during each span:
+
+>>> from pulp_smash import config, sampler
+>>> with sampler.Sampler(config.get_config()) as smp:
+...     with smp.span('sync'):
+...         pass  # sync a repository
+>>> print(sampler.format_report(smp))
+
+Samples are timestamped with the local clock when they are received, so that
+they line up with spans even if the server's clock is wrong.
+
+The benchmarks in :mod:`pulp_smash.tests` sample the server if the
+``PULP_SMASH_SAMPLER`` environment variable is set to an interval in seconds.
+(See :class:`pulp_smash.perf.BenchmarkTestCase`.)
+"""
+from __future__ import division, unicode_literals
+
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from pulp_smash import cli
+
+#: Pairs of services and strings. A process belongs to the first service with
+#: a string that appears in its command line.
+SERVICES = (
+    ('pulp_workers', 'reserved_resource_worker'),
+    ('pulp_resource_manager', 'resource_manager'),
+    ('pulp_celerybeat', 'celerybeat'),
+    ('httpd', 'httpd'),
+    ('mongod', 'mongod'),
+    ('qpidd', 'qpidd'),
+    ('rabbitmq', 'rabbit'),
+)
+
+# The shell loop run on the server. "$1" is the interval. Each sample starts
+# with a "T" line and ends with an "END" line.
+_SCRIPT = """\
+while :; do
+  echo T
+  head -n 1 /proc/stat
+  echo "LOAD $(cat /proc/loadavg)"
+  grep -E '^pgpg(in|out) ' /proc/vmstat
+  ps -eo rss=,time=,args= | sed 's/^/PS /'
+  echo END
+  sleep "$1"
+done
+"""
+
+#: One sample of a server's resource usage. ``timestamp`` is when it was
+#: received, in seconds since the epoch. ``cpu`` is a dict mapping ``user``,
+#: ``system``, ``iowait`` and ``idle`` to cumulative CPU time, in clock ticks.
+#: ``load`` is the one-minute load average. ``paged_in`` and ``paged_out`` are
+#: cumulative kilobytes. ``services`` is a dict mapping services to
+#: ``(rss, cpu_seconds)`` tuples, where ``rss`` is in kilobytes and
+#: ``cpu_seconds`` is cumulative.
+Sample = namedtuple(
+    'Sample',
+    'timestamp cpu load paged_in paged_out services',
+)
+
+#: A named span of time, in seconds since the epoch.
+Span = namedtuple('Span', 'name start end')
+
+
+class SpanStats(namedtuple('SpanStats', (
+        'span',
+        'samples',
+        'cpu',
+        'load',
+        'read_mb_per_second',
+        'write_mb_per_second',
+        'services'))):
+    """A summary of the samples taken during one span.
+
+    :param span: A :data:`Span`.
+    :param samples: The number of samples taken during the span.
+    :param cpu: A dict mapping ``user``, ``system``, ``iowait`` and ``idle``
+        to the percentage of CPU time so spent.
+    :param load: The highest one-minute load average.
+    :param read_mb_per_second: Megabytes paged in from disk per second.
+    :param write_mb_per_second: Megabytes paged out to disk per second.
+    :param services: A dict mapping services to ``(max_rss_mb, cpu_percent)``
+        tuples. ``cpu_percent`` is relative to one CPU.
+    """
+
+    __slots__ = ()
+
+
+class Sampler(object):
+    """Sample a server's resource usage in the background.
+
+    :param pulp_smash.config.ServerConfig server_config: Information about the
+        server to sample.
+    :param interval: The number of seconds between samples.
+    :param hostname: The host to sample. Defaults to the one in
+        ``server_config.base_url``.
+    """
+
+    def __init__(self, server_config, interval=1, hostname=None):
+        """Initialize this object with needed instance attributes."""
+        self.cfg = server_config
+        self.interval = interval
+        self.hostname = hostname
+        self.samples = []
+        self.spans = []
+        self._process = None
+        self._thread = None
+
+    def __enter__(self):
+        """Start sampling."""
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop sampling."""
+        self.stop()
+
+    def start(self):
+        """Start the remote loop, and a thread that reads its samples."""
+        client = cli.Client(self.cfg, cli.echo_handler, self.hostname)
+        self._process = client.stream(
+            ('sh', '-c', _SCRIPT, 'sampler', str(self.interval)),
+            keep=1024,
+        )
+        self._thread = threading.Thread(target=self._read)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the remote loop, and wait for the last samples."""
+        if self._process is None:
+            return
+        self._process.kill()
+        self._thread.join()
+        self._process.wait()
+        self._process = self._thread = None
+
+    @contextmanager
+    def span(self, name):
+        """Record the time taken by the enclosed code as a :data:`Span`."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.time())
+
+    def add_span(self, name, start, end):
+        """Record a span of time, in seconds since the epoch."""
+        self.spans.append(Span(name, start, end))
+
+    def _read(self):
+        """Parse samples from the remote loop until it stops."""
+        lines = []
+        timestamp = None
+        for name, line in self._process:
+            if name != 'stdout':
+                continue
+            line = line.rstrip('\n')
+            if line == 'T':
+                timestamp = time.time()
+                lines = []
+            elif line == 'END' and timestamp is not None:
+                try:
+                    self.samples.append(parse_sample(timestamp, lines))
+                except (IndexError, ValueError):  # a partial sample
+                    pass
+            else:
+                lines.append(line)
+
+
+def parse_sample(timestamp, lines):
+    """Parse the output of one iteration of the remote loop.
+
+    :param timestamp: The time at which the sample was taken.
+    :param lines: The lines between the ``T`` and ``END`` markers.
+    :returns: A :data:`Sample`.
+    :raises: ``ValueError`` or ``IndexError`` if ``lines`` are malformed.
+    """
+    cpu = load = None
+    paged = {}
+    services = {}
+    for line in lines:
+        fields = line.split()
+        if fields[0] == 'cpu':
+            ticks = [int(field) for field in fields[1:]]
+            cpu = {
+                'user': ticks[0] + ticks[1],  # user + nice
+                # system + irq + softirq + steal
+                'system': sum(ticks[2:3] + ticks[5:8]),
+                'idle': ticks[3],
+                'iowait': ticks[4],
+            }
+        elif fields[0] == 'LOAD':
+            load = float(fields[1])
+        elif fields[0] in ('pgpgin', 'pgpgout'):
+            paged[fields[0]] = int(fields[1])
+        elif fields[0] == 'PS':
+            service = get_service(' '.join(fields[3:]))
+            if service is not None:
+                rss, cpu_seconds = services.get(service, (0, 0))
+                services[service] = (
+                    rss + int(fields[1]),
+                    cpu_seconds + _parse_cputime(fields[2]),
+                )
+    if cpu is None or load is None:
+        raise ValueError('Incomplete sample: {}'.format(lines))
+    return Sample(
+        timestamp,
+        cpu,
+        load,
+        paged.get('pgpgin', 0),
+        paged.get('pgpgout', 0),
+        services,
+    )
+
+
+def get_service(args):
+    """Return the service that a process belongs to, or ``None``.
+
+    :param args: A process' command line.
+    """
+    for service, needle in SERVICES:
+        if needle in args:
+            return service
+    return None
+
+
+def _parse_cputime(text):
+    """Parse a CPU time from ``ps``, like ``01:02:03`` or ``1-01:02:03``."""
+    days, _, clock = text.rpartition('-')
+    seconds = 0
+    for part in clock.split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds + int(days or 0) * 86400
+
+
+def summarize(samples, span):
+    """Summarize the samples taken during ``span``.
+
+    Counters are compared between the last sample taken before the span began
+    (or the first sample in it) and the last sample taken during it.
+
+    :param samples: A list of :data:`Sample` objects, sorted by time.
+    :param span: A :data:`Span`.
+    :returns: A :class:`SpanStats`, or ``None`` if fewer than two samples
+        cover the span.
+    """
+    before = [sample for sample in samples if sample.timestamp <= span.start]
+    during = [
+        sample for sample in samples
+        if span.start < sample.timestamp <= span.end
+    ]
+    window = before[-1:] + during
+    if len(window) < 2:
+        return None
+    first, last = window[0], window[-1]
+    seconds = last.timestamp - first.timestamp
+    ticks = {key: last.cpu[key] - first.cpu[key] for key in last.cpu}
+    total_ticks = sum(ticks.values()) or 1
+    services = {}
+    for service in last.services:
+        old_cpu = first.services.get(service, (0, 0))[1]
+        services[service] = (
+            max(
+                sample.services.get(service, (0, 0))[0] for sample in window
+            ) / 1024,
+            (last.services[service][1] - old_cpu) / seconds * 100,
+        )
+    return SpanStats(
+        span,
+        len(during),
+        {key: value / total_ticks * 100 for key, value in ticks.items()},
+        max(sample.load for sample in window),
+        (last.paged_in - first.paged_in) / 1024 / seconds,
+        (last.paged_out - first.paged_out) / 1024 / seconds,
+        services,
+    )
+
+
+def format_report(sampler):
+    """Return a human-readable summary of each span of a :class:`Sampler`."""
+    samples = sorted(sampler.samples, key=lambda sample: sample.timestamp)
+    lines = []
+    for span in sampler.spans:
+        stats = summarize(samples, span)
+        header = '{} ({:.1f}s)'.format(span.name, span.end - span.start)
+        if stats is None:
+            lines.append(header + ': too short to sample')
+            continue
+        lines.append(
+            '{}: cpu user {:.0f}% system {:.0f}% iowait {:.0f}% idle {:.0f}%, '
+            'load {:.2f}, disk read {:.1f} MB/s write {:.1f} MB/s'.format(
+                header,
+                stats.cpu['user'],
+                stats.cpu['system'],
+                stats.cpu['iowait'],
+                stats.cpu['idle'],
+                stats.load,
+                stats.read_mb_per_second,
+                stats.write_mb_per_second,
+            )
+        )
+        for service, (rss, cpu) in sorted(stats.services.items()):
+            lines.append('    {:<24} rss {:>8.1f} MB  cpu {:>5.0f}%'.format(
+                service, rss, cpu
+            ))
+    return '\n'.join(lines)
@@ -0,0 +1,267 @@
+# coding=utf-8
+"""Measure how search latency grows with the number of resources.
+
+The tests in :mod:`pulp_smash.tests.platform.api_v2.test_search` check that
+Pulp's `searches`_ return the right results, and do so against a handful of
+resources. This module measures how long the same searches take as the number
+of resources grows:
+
+1. :func:`populate` creates resources, many at once.
+2. :func:`measure` times each search in :data:`SHAPES`, several times each,
+   both with GET and with POST where Pulp allows it.
+3. :func:`format_report` tabulates the median latency of each search at each
+   size, and estimates how latency grows with size. (See
+   :func:`fit_exponent`.)
+
+For example, to measure user searches at 1,000 and 10,000 users:
+
+>>> from pulp_smash import config, scaling
+>>> from pulp_smash.constants import USER_PATH
+>>> from pulp_smash.utils import uuid4
+>>> cfg = config.get_config()
+>>> created, latencies = [], {}
+>>> for size in (1000, 10000):
+...     created.extend(scaling.populate(
+...         cfg, USER_PATH, lambda: {'login': uuid4()}, size - len(created)
+...     ))
+...     ids = [resource['id'] for resource in created]
+...     latencies[size] = scaling.measure(cfg, USER_PATH + 'search/', ids)
+>>> print(scaling.format_report(latencies))
+
+.. _searches:
+    https://pulp.readthedocs.org/en/latest/dev-guide/conventions/criteria.html
+"""
+from __future__ import division, unicode_literals
+
+import json
+import math
+import random
+import time
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+from pulp_smash import api
+
+#: The number of resources that :func:`populate` creates at once.
+DEFAULT_WORKERS = 16
+
+#: The number of times that :func:`measure` runs each search, by default.
+DEFAULT_REPEAT = 5
+
+# The number of results asked for by searches that page through results, and
+# the number of IDs asked for by searches that filter on several IDs.
+_PAGE = 100
+
+
+class Shape(namedtuple('Shape', 'name get_params criteria')):
+    """A kind of search, as exercised by ``test_search``.
+
+    :param name: A short name, such as ``'sort'``.
+    :param get_params: A callable that accepts a size and a list of resource
+        IDs, and returns the query parameters of an equivalent GET search. Or
+        ``None``, if there is no GET equivalent.
+    :param criteria: A callable that accepts a size and a list of resource
+        IDs, and returns the criteria of a POST search.
+    """
+
+    __slots__ = ()
+
+
+#: The kinds of search that :func:`measure` times. The ``skip-deep`` search
+#: asks for the last page of all resources, which makes the server skip over
+#: nearly all of them. With POST, the resources are sorted by ID. GET searches
+#: are not sorted, so the server skips resources in their natural order.
+SHAPES = (
+    Shape('minimal', lambda size, ids: {}, lambda size, ids: {}),
+    Shape(
+        'sort',
+        None,
+        lambda size, ids: {'sort': [['id', 'ascending']]},
+    ),
+    Shape(
+        'field',
+        lambda size, ids: {'field': 'login'},
+        lambda size, ids: {'fields': ['login']},
+    ),
+    Shape(
+        'fields',
+        lambda size, ids: {'field': ['login', 'roles']},
+        lambda size, ids: {'fields': ['login', 'roles']},
+    ),
+    Shape(
+        'filters-id',
+        lambda size, ids: {'filters': json.dumps({'id': ids[0]})},
+        lambda size, ids: {'filters': {'id': ids[0]}},
+    ),
+    Shape(
+        'filters-ids',
+        lambda size, ids: {
+            'filters': json.dumps({'id': {'$in': ids[:_PAGE]}}),
+        },
+        lambda size, ids: {'filters': {'id': {'$in': ids[:_PAGE]}}},
+    ),
+    Shape(
+        'limit',
+        lambda size, ids: {'limit': _PAGE},
+        lambda size, ids: {'limit': _PAGE},
+    ),
+    Shape(
+        'skip-deep',
+        lambda size, ids: {'limit': _PAGE, 'skip': max(size - _PAGE, 0)},
+        lambda size, ids: {
+            'sort': [['id', 'ascending']],
+            'limit': _PAGE,
+            'skip': max(size - _PAGE, 0),
+        },
+    ),
+)
+
+
+def populate(server_config, path, gen_body, count, workers=DEFAULT_WORKERS,
+             created=None):
+    """Create ``count`` resources, ``workers`` at a time.
+
+    If a resource cannot be created, the others are still created, and then
+    the first error is raised. Pass ``created`` to learn which resources were
+    created even so, and delete them.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :param path: The path to POST to, such as
+        :data:`pulp_smash.constants.USER_PATH`.
+    :param gen_body: A callable that returns the body of a new resource each
+        time it is called.
+    :param count: The number of resources to create.
+    :param workers: The number of requests that may be in flight at once.
+    :param created: A list to which the created resources' bodies are
+        appended as they are created. By default, a new list.
+    :returns: ``created``.
+    :raises: ``requests.exceptions.HTTPError`` if a request fails.
+    """
+    if created is None:
+        created = []
+    if count <= 0:
+        return created
+    client = api.Client(server_config, api.json_handler)
+
+    def create(body):
+        """Create a resource, and return its body or an error."""
+        try:
+            return client.post(path, body), None
+        except Exception as err:  # pylint:disable=broad-except
+            return None, err
+
+    errors = []
+    pool = ThreadPool(min(workers, count))
+    try:
+        for resource, error in pool.imap_unordered(
+                create,
+                [gen_body() for _ in range(count)]):
+            if error is None:
+                created.append(resource)
+            else:
+                errors.append(error)
+    finally:
+        pool.close()
+        pool.join()
+    if errors:
+        raise errors[0]
+    return created
+
+
+def measure(server_config, search_path, ids, shapes=SHAPES,
+            repeat=DEFAULT_REPEAT):
+    """Time each search in ``shapes``.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :param search_path: A search path, such as ``USER_PATH + 'search/'``.
+    :param ids: The IDs of the resources being searched. Their number is taken
+        to be the size of the population. They are shuffled, so that searches
+        for some IDs do not favour the oldest or newest resources.
+    :param shapes: An iterable of :class:`Shape` objects.
+    :param repeat: The number of times to run each search.
+    :returns: A dict mapping ``(shape name, method)`` tuples, where ``method``
+        is ``'get'`` or ``'post'``, to the median latency, in seconds.
+    :raises: ``requests.exceptions.HTTPError`` if a search fails.
+    """
+    size = len(ids)
+    ids = random.sample(ids, size)
+    client = api.Client(server_config, api.echo_handler)
+    latencies = {}
+    for shape in shapes:
+        requests_ = [('post', {
+            'json': {'criteria': shape.criteria(size, ids)},
+        })]
+        if shape.get_params is not None:
+            requests_.append(('get', {
+                'params': shape.get_params(size, ids),
+            }))
+        for method, kwargs in requests_:
+            samples = []
+            for _ in range(repeat):
+                start = time.time()
+                response = client.request(method, search_path, **kwargs)
+                samples.append(time.time() - start)
+                response.raise_for_status()
+            latencies[(shape.name, method)] = _median(samples)
+    return latencies
+
+
+def _median(numbers):
+    """Return the median of a non-empty sequence of numbers."""
+    numbers = sorted(numbers)
+    middle = len(numbers) // 2
+    if len(numbers) % 2:
+        return numbers[middle]
+    return (numbers[middle - 1] + numbers[middle]) / 2
+
+
+def fit_exponent(points):
+    """Estimate how fast latency grows with size.
+
+    A line is fitted to ``log(latency)`` against ``log(size)`` by least
+    squares. Its slope ``k`` means that latency grows like ``size ** k``: zero
+    means constant time, and one means linear time.
+
+    :param points: An iterable of ``(size, latency)`` pairs.
+    :returns: ``k``, or ``None`` if fewer than two distinct, positive sizes
+        are given.
+    """
+    logs = [
+        (math.log(size), math.log(latency))
+        for size, latency in points if size > 0 and latency > 0
+    ]
+    if len(set(x for x, _ in logs)) < 2:
+        return None
+    mean_x = sum(x for x, _ in logs) / len(logs)
+    mean_y = sum(y for _, y in logs) / len(logs)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in logs)
+    variance = sum((x - mean_x) ** 2 for x, _ in logs)
+    return covariance / variance
+
+
+def format_report(latencies):
+    """Tabulate search latencies by size, with the growth of each search.
+
+    :param latencies: A dict mapping sizes to dicts, as returned by
+        :func:`measure`.
+    :returns: A string.
+    """
+    sizes = sorted(latencies)
+    keys = sorted(set(key for by_key in latencies.values() for key in by_key))
+    lines = ['{:<12} {:<6}'.format('search', 'method') + ''.join(
+        '{:>10}'.format('n={}'.format(size)) for size in sizes
+    ) + '  growth']
+    for key in keys:
+        points = [
+            (size, latencies[size][key]) for size in sizes
+            if key in latencies[size]
+        ]
+        exponent = fit_exponent(points)
+        lines.append('{:<12} {:<6}'.format(*key) + ''.join(
+            '{:>10}'.format(
+                '{:.3f}s'.format(latencies[size][key])
+                if key in latencies[size] else '-'
+            )
+            for size in sizes
+        ) + '  ' + ('-' if exponent is None else 'n^{:.2f}'.format(exponent)))
+    return '\n'.join(lines)
@@ -1,14 +1,30 @@
 # coding=utf-8
-"""Tools for selecting and deselecting tests."""
+"""Tools for selecting and deselecting tests.
+
+Most of the tools in this module are used while a test runs. In contrast,
+:func:`skip_unless` declares what a whole test case class or test module
+needs, and the declaration is checked before ``setUpClass`` or ``setUpModule``
+does any work. The declarations can also be inspected without running any
+tests, as :mod:`pulp_smash.runner` does. See :func:`get_skip_reason`.
+"""
 from __future__ import unicode_literals
 
 import warnings
+from collections import namedtuple
 from functools import wraps
 
-import requests
-from packaging.version import Version
+import unittest2
+
+from pulp_smash import config, exceptions
+
+#: The name of the attribute in which :func:`skip_unless` stores requirements.
+REQUIREMENTS_ATTR = 'pulp_smash_requirements'
+
+#: The requirements declared with :func:`skip_unless`.
+Requirements = namedtuple('Requirements', 'version bugs plugins')
 
-from pulp_smash import exceptions
+#: The name of the attribute in which :func:`depends_on` stores prerequisites.
+DEPENDS_ON_ATTR = 'pulp_smash_depends_on'
 
 # These are all possible values for a bug's "status" field.
 #
@@ -41,6 +57,10 @@ _TESTABLE_BUGS = frozenset((
 #
 _BUG_STATUS_CACHE = {}
 
+# A mapping between base URLs and the content unit types supported by each Pulp
+# server. Used by `get_plugins`.
+_PLUGIN_CACHE = {}
+
 
 def _get_bug_status(bug_id):
     """Fetch information about bug ``bug_id`` from https://pulp.plan.io."""
@@ -67,6 +87,7 @@ def _get_bug_status(bug_id):
         pass
 
     # Get, cache and return bug status.
+    import requests
     response = requests.get(
         'https://pulp.plan.io/issues/{}.json'.format(bug_id)
     )
@@ -75,6 +96,28 @@ def _get_bug_status(bug_id):
     return _BUG_STATUS_CACHE[bug_id]
 
 
+def get_bug_status(bug_id):
+    """Return the status of bug ``bug_id``, as reported by the bug tracker.
+
+    Statuses are cached, so the bug tracker is asked about each bug once.
+
+    :param bug_id: An integer bug ID, taken from https://pulp.plan.io.
+    :returns: A status, such as ``'NEW'``.
+    :raises: ``TypeError`` if ``bug_id`` is not an integer.
+    :raises: ``requests.exceptions.RequestException`` if the bug tracker
+        cannot be asked.
+    """
+    return _get_bug_status(bug_id)
+
+
+def get_bug_statuses():
+    """Return the statuses of the bugs looked up so far.
+
+    :returns: A new dict mapping integer bug IDs to statuses.
+    """
+    return dict(_BUG_STATUS_CACHE)
+
+
 def bug_is_testable(bug_id):
     """Tell the caller whether bug ``bug_id`` should be tested.
 
@@ -86,6 +129,7 @@ def bug_is_testable(bug_id):
     :raises: BugTrackerUnavailableWarning: If the bug tracker cannot be
         contacted.
     """
+    import requests
     try:
         status = _get_bug_status(bug_id)
     except requests.exceptions.ConnectionError as err:
@@ -139,6 +183,7 @@ def require(version_string):
     """
     # Running the test suite can take a long time. Let's parse the version
     # string now instead of waiting until the test is running.
+    from packaging.version import Version
     min_version = Version(version_string)
 
     def plain_decorator(test_method):
@@ -156,3 +201,172 @@ def require(version_string):
             return test_method(self, *args, **kwargs)
         return new_test_method
     return plain_decorator
+
+
+def skip_unless(version=None, bugs=(), plugins=()):
+    """A decorator for skipping whole test case classes or test modules.
+
+    Decorate a test case class like so:
+
+    >>> from pulp_smash import selectors
+    >>> from unittest2 import TestCase
+    >>> @selectors.skip_unless(version='2.8', bugs=(1440,), plugins=('rpm',))
+    ... class MyTestCase(TestCase):
+    ...
+    ...     @classmethod
+    ...     def setUpClass(cls):
+    ...         pass  # Create repositories, sync them, and so on.
+
+    Before ``setUpClass`` runs, the requirements are checked against
+    :func:`pulp_smash.config.get_frozen_config`. If any is not met,
+    ``unittest2.SkipTest`` is raised, and the whole class is skipped without
+    doing any work. Subclasses of a decorated class inherit its requirements,
+    provided that their ``setUpClass`` calls ``super`` first.
+
+    To skip a whole test module, decorate its ``setUpModule`` function:
+
+    >>> @selectors.skip_unless(version='2.8')
+    ... def setUpModule():
+    ...     pass
+
+    :param version: A PEP 440 compatible version string. The minimum version
+        of Pulp required.
+    :param bugs: Integer bug IDs from https://pulp.plan.io. Each must be
+        testable. (See :func:`bug_is_testable`.)
+    :param plugins: Content unit type IDs, such as ``rpm`` or
+        ``puppet_module``. Each must be supported by the Pulp server. (See
+        :func:`get_plugins`.)
+    """
+    from packaging.version import Version
+    requirements = Requirements(
+        None if version is None else Version(version),
+        tuple(bugs),
+        frozenset(plugins),
+    )
+
+    def check():
+        """Raise ``SkipTest`` if a requirement is not met."""
+        reason = _check(requirements, config.get_frozen_config())
+        if reason is not None:
+            raise unittest2.SkipTest(reason)
+
+    def decorator(obj):
+        """Wrap a class's ``setUpClass`` method, or a function."""
+        if not isinstance(obj, type):
+            @wraps(obj)
+            def set_up_module(*args, **kwargs):
+                """Check requirements, then set up the module."""
+                check()
+                return obj(*args, **kwargs)
+            setattr(set_up_module, REQUIREMENTS_ATTR, (requirements,))
+            return set_up_module
+
+        original = obj.__dict__.get('setUpClass')
+
+        def set_up_class(cls):
+            """Check requirements, then set up the class."""
+            check()
+            if original is None:
+                super(obj, cls).setUpClass()
+            else:
+                original.__get__(None, cls)()
+        obj.setUpClass = classmethod(set_up_class)
+        setattr(obj, REQUIREMENTS_ATTR, (
+            getattr(obj, REQUIREMENTS_ATTR, ()) + (requirements,)
+        ))
+        return obj
+    return decorator
+
+
+def get_skip_reason(obj, server_config):
+    """Tell why ``obj`` would be skipped, without running it.
+
+    :param obj: A test case class, a ``setUpModule`` function or a test
+        module, which may have been decorated with :func:`skip_unless`.
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :returns: A string explaining why ``obj`` would be skipped, or ``None`` if
+        it would not be skipped.
+    """
+    if not isinstance(obj, type) and hasattr(obj, 'setUpModule'):
+        obj = obj.setUpModule
+    for requirements in getattr(obj, REQUIREMENTS_ATTR, ()):
+        reason = _check(requirements, server_config)
+        if reason is not None:
+            return reason
+    return None
+
+
+def get_plugins(server_config):
+    """Return the content unit type IDs supported by a Pulp server.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :returns: A set of content unit type IDs, such as ``{'rpm', 'iso'}``.
+    """
+    if server_config.base_url not in _PLUGIN_CACHE:
+        from pulp_smash import api
+        types = api.Client(server_config, api.json_handler).get(
+            '/pulp/api/v2/plugins/types/'
+        )
+        _PLUGIN_CACHE[server_config.base_url] = frozenset(
+            type_['id'] for type_ in types
+        )
+    return _PLUGIN_CACHE[server_config.base_url]
+
+
+def _check(requirements, server_config):
+    """Return a reason to skip, or ``None`` if all requirements are met."""
+    if (requirements.version is not None and
+            server_config.version < requirements.version):
+        return (
+            'These tests require Pulp {} or later, but Pulp {} is being '
+            'tested.'.format(requirements.version, server_config.version)
+        )
+    for bug_id in requirements.bugs:
+        if bug_is_untestable(bug_id):
+            return 'https://pulp.plan.io/issues/{}'.format(bug_id)
+    if requirements.plugins:
+        missing = requirements.plugins - get_plugins(server_config)
+        if missing:
+            return 'These tests require these Pulp plugins: {}'.format(
+                ', '.join(sorted(missing))
+            )
+    return None
+
+
+def depends_on(*test_cases):
+    """A decorator for declaring that a test case class assumes others pass.
+
+    Many test modules describe a tree of assumptions in their docstrings. This
+    decorator makes such a tree machine-readable:
+
+    >>> from pulp_smash import selectors
+    >>> from unittest2 import TestCase
+    >>> class CreateTestCase(TestCase):
+    ...     pass
+    >>> @selectors.depends_on(CreateTestCase)
+    ... class ReadTestCase(TestCase):
+    ...     pass
+
+    When tests are run by :mod:`pulp_smash.runner`, ``ReadTestCase`` is run
+    only after ``CreateTestCase`` has passed, and test case classes that do
+    not depend on each other may run concurrently. Other test runners ignore
+    this decorator.
+
+    Prerequisites are not inherited by subclasses. (See
+    :func:`get_prerequisites`.)
+
+    :param test_cases: The test case classes which must pass first.
+    """
+    def decorator(test_case):
+        """Record the prerequisites of ``test_case``."""
+        setattr(test_case, DEPENDS_ON_ATTR, test_cases)
+        return test_case
+    return decorator
+
+
+def get_prerequisites(test_case):
+    """Return the prerequisites that :func:`depends_on` declared for a class.
+
+    :returns: A tuple of test case classes.
+    """
+    return test_case.__dict__.get(DEPENDS_ON_ATTR, ())
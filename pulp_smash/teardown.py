@@ -0,0 +1,241 @@
+# coding=utf-8
+"""Tools for deleting the resources created by tests.
+
+Most test cases create resources such as repositories and users in
+``setUpClass``, and they delete those resources in ``tearDownClass``. Deleting
+resources one at a time is slow. Many deletions return an HTTP 202, and waiting
+for each deletion's tasks to complete before starting the next deletion places
+several seconds of sleep between every pair of test cases.
+
+A :class:`Reaper` solves this problem. It queues up resource paths, issues
+deletions concurrently, and then waits for the spawned tasks all at once. The
+:func:`delete` function is a thin wrapper that test cases can call from
+``tearDownClass``:
+
+>>> from pulp_smash import teardown
+>>> teardown.delete(cls.cfg, cls.resources)
+
+The ``PULP_SMASH_TEARDOWN`` environment variable controls when resources are
+actually deleted. It may be set to one of the following:
+
+``immediate``
+    Delete the resources right away. This is the default.
+``background``
+    Delete the resources in a background thread, so that the next test case
+    may start while resources are being deleted.
+``exit``
+    Queue the resources, and delete all of them when the Python interpreter
+    exits.
+
+No matter which mode is used, all queued resources are deleted before the
+interpreter exits. Errors encountered while deleting resources in the
+background are reported as warnings at that time.
+"""
+from __future__ import unicode_literals
+
+import atexit
+import os
+import warnings
+from multiprocessing.pool import ThreadPool
+from threading import Lock, Thread
+
+from pulp_smash import api, utils
+
+
+_MODES = ('immediate', 'background', 'exit')
+
+# A dict mapping base URLs to `Reaper` objects. Used by `get_reaper`.
+_REAPERS = {}
+_REAPERS_LOCK = Lock()
+
+
+class Reaper(object):
+    """A queue of resources to delete from a Pulp server.
+
+    Resources may be queued from many test cases, and they are deleted in
+    batches. Each batch is deleted by issuing up to ``max_workers`` concurrent
+    HTTP DELETE requests, and then waiting for all of the spawned tasks at once
+    with :func:`pulp_smash.utils.poll_tasks`. A resource that is already gone
+    (HTTP 404) is considered to have been deleted successfully, but a warning
+    is issued.
+
+    All methods on this class are thread-safe.
+
+    :param pulp_smash.config.ServerConfig server_config: Information about the
+        Pulp server from which resources are deleted.
+    :param max_workers: The maximum number of concurrent HTTP requests.
+    """
+
+    def __init__(self, server_config, max_workers=4):
+        """Initialize this object with needed instance attributes."""
+        self._cfg = server_config
+        self.max_workers = max_workers
+        self.errors = []  # exceptions raised in the background
+        self._queue = []
+        self._lock = Lock()
+        self._thread = None
+
+    def add(self, href):
+        """Queue the resource at ``href`` for deletion."""
+        with self._lock:
+            self._queue.append(href)
+
+    def update(self, hrefs):
+        """Queue each of the resources in ``hrefs`` for deletion."""
+        with self._lock:
+            self._queue.extend(hrefs)
+
+    def reap(self):
+        """Delete all queued resources and wait for spawned tasks to finish.
+
+        Every queued resource is deleted, and the tasks spawned by every
+        successful deletion are polled, before any error is raised.
+
+        :returns: A tuple of task bodies, one per completed deletion task.
+        :raises: ``requests.exceptions.HTTPError`` if a deletion fails, or
+            anything :func:`pulp_smash.utils.poll_tasks` raises. If several
+            deletions fail, the first failure is raised.
+        """
+        with self._lock:
+            hrefs, self._queue = self._queue, []
+        if not hrefs:
+            return ()
+        pool = ThreadPool(min(self.max_workers, len(hrefs)))
+        try:
+            outcomes = pool.map(self._try_delete, hrefs)
+        finally:
+            pool.close()
+            pool.join()
+        task_hrefs = [
+            task['_href']
+            for response, _ in outcomes
+            if response is not None and response.status_code == 202
+            for task in response.json()['spawned_tasks']
+        ]
+        tasks = tuple(utils.poll_tasks(self._cfg, task_hrefs))
+        errors = [error for _, error in outcomes if error is not None]
+        if errors:
+            raise errors[0]
+        return tasks
+
+    def reap_in_background(self):
+        """Delete all queued resources in a background thread.
+
+        If a background thread is already running, it picks up the newly queued
+        resources when it finishes its current batch. Exceptions raised in the
+        background thread are appended to ``self.errors``.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = Thread(target=self._reap_until_empty)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def flush(self):
+        """Wait for the background thread, then delete all queued resources.
+
+        :returns: Nothing.
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.reap()
+
+    def _reap_until_empty(self):
+        """Call :meth:`reap` until the queue is empty."""
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._thread = None
+                    return
+            try:
+                self.reap()
+            except Exception as err:  # pylint:disable=broad-except
+                self.errors.append(err)
+
+    def _try_delete(self, href):
+        """Call :meth:`_delete`, and return a ``(response, error)`` tuple.
+
+        One of ``response`` and ``error`` is ``None``. So the tasks spawned by
+        every successful deletion can be polled, even if another deletion
+        fails.
+        """
+        try:
+            return self._delete(href), None
+        except Exception as err:  # pylint:disable=broad-except
+            return None, err
+
+    def _delete(self, href):
+        """Delete the resource at ``href``. Return the raw response."""
+        response = api.Client(self._cfg, api.echo_handler).delete(href)
+        if response.status_code == 404:
+            warnings.warn(
+                'The resource at {} could not be deleted, because it does not '
+                'exist. Was it deleted twice?'.format(href),
+                RuntimeWarning
+            )
+            return response
+        response.raise_for_status()
+        if response.status_code == 202:  # "Accepted"
+            api._check_http_202_content_type(response)  # pylint:disable=W0212
+        return response
+
+
+def get_reaper(server_config):
+    """Return the shared :class:`Reaper` for the server ``server_config``.
+
+    There is one reaper per distinct ``server_config.base_url``.
+    """
+    with _REAPERS_LOCK:
+        if server_config.base_url not in _REAPERS:
+            _REAPERS[server_config.base_url] = Reaper(server_config)
+        return _REAPERS[server_config.base_url]
+
+
+def delete(server_config, hrefs):
+    """Delete the resources at ``hrefs``, as allowed by the teardown mode.
+
+    See :mod:`pulp_smash.teardown` for a description of the teardown modes.
+
+    :param pulp_smash.config.ServerConfig server_config: Information about the
+        Pulp server from which resources are deleted.
+    :param hrefs: An iterable of paths to resources, such as repositories.
+    :returns: Nothing.
+    :raises: ``ValueError`` if ``PULP_SMASH_TEARDOWN`` is set to an unknown
+        teardown mode.
+    """
+    mode = os.environ.get('PULP_SMASH_TEARDOWN', 'immediate')
+    if mode not in _MODES:
+        raise ValueError(
+            'The PULP_SMASH_TEARDOWN environment variable is set to {}, but '
+            'it should be one of {}.'.format(mode, _MODES)
+        )
+    reaper = get_reaper(server_config)
+    reaper.update(hrefs)
+    if mode == 'immediate':
+        reaper.reap()
+    elif mode == 'background':
+        reaper.reap_in_background()
+
+
+@atexit.register
+def flush():
+    """Delete all resources queued by any reaper.
+
+    This function is called when the Python interpreter exits. Errors raised by
+    background threads are reported as warnings.
+
+    :returns: Nothing.
+    """
+    with _REAPERS_LOCK:
+        reapers = tuple(_REAPERS.values())
+    for reaper in reapers:
+        reaper.flush()
+        for err in reaper.errors:
+            warnings.warn(
+                'Failed to delete a resource in the background: {}'
+                .format(err),
+                RuntimeWarning,
+            )
+        del reaper.errors[:]
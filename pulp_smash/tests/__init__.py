@@ -20,8 +20,10 @@ explicitly stated that they want insecure HTTPS connections and they are
 pestered about that fact, the user is effectively trained to ignore warnings.
 
 Thus, when this module is imported, it suppresses
-``requests.packages.urllib3.exceptions.InsecureRequestWarning``. This filtering
-does not affect whether SSL verification is performed. If an insecure
+``requests.packages.urllib3.exceptions.InsecureRequestWarning``. The warning is
+matched by its message rather than its class, so that importing this package
+does not import Requests. This filtering does not affect whether SSL
+verification is performed. If an insecure
 connection is attempted and ``verify=True`` or is unspecified, the connection
 is not made.
 
@@ -36,11 +38,6 @@ problem, as it is thread-unsafe.
 """
 from __future__ import unicode_literals
 
-from warnings import simplefilter
+from warnings import filterwarnings
 
-import requests
-
-simplefilter(
-    'ignore',
-    requests.packages.urllib3.exceptions.InsecureRequestWarning,
-)
+filterwarnings('ignore', message='Unverified HTTPS request')
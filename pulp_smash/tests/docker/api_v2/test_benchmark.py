@@ -0,0 +1,66 @@
+# coding=utf-8
+"""Benchmark the Docker plugin.
+
+The test case in this module creates a repository with a feed, syncs it, syncs
+it again and publishes it. The time taken by each operation is saved. See
+:mod:`pulp_smash.perf` for details, including how to enable these benchmarks.
+"""
+from __future__ import unicode_literals
+
+try:  # try Python 3 import first
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin  # pylint:disable=C0411,E0401
+
+from pulp_smash import perf, selectors, utils
+from pulp_smash.constants import REPOSITORY_PATH
+
+
+_DOCKER_FEED = 'https://registry-1.docker.io'
+_DOCKER_UPSTREAM_NAME = 'busybox'
+
+
+def setUpModule():  # pylint:disable=invalid-name
+    """Skip these benchmarks unless they are enabled."""
+    perf.skip_unless_enabled()
+
+
+@selectors.skip_unless(version='2.8')
+class DockerBenchmarkTestCase(perf.BenchmarkTestCase):
+    """Benchmark a Docker repository."""
+
+    benchmark = 'docker'
+
+    @classmethod
+    @perf.tear_down_on_error
+    def setUpClass(cls):
+        """Create, sync, re-sync and publish a repository."""
+        super(DockerBenchmarkTestCase, cls).setUpClass()
+        distributor = {
+            'auto_publish': False,
+            'distributor_id': utils.uuid4(),
+            'distributor_type_id': 'docker_distributor_web',
+            'distributor_config': {},
+        }
+        repo = cls.time_request('create', 'POST', REPOSITORY_PATH, json={
+            'distributors': [distributor],
+            'id': utils.uuid4(),
+            'importer_config': {
+                'feed': _DOCKER_FEED,
+                'upstream_name': _DOCKER_UPSTREAM_NAME,
+            },
+            'importer_type_id': 'docker_importer',
+            'notes': {'_repo-type': 'docker-repo'},
+        }).json()
+        cls.resources.add(repo['_href'])
+        for operation in ('sync', 'resync'):
+            cls.time_tasks(
+                operation,
+                urljoin(repo['_href'], 'actions/sync/'),
+                {'override_config': {}},
+            )
+        cls.time_tasks(
+            'publish',
+            urljoin(repo['_href'], 'actions/publish/'),
+            {'id': distributor['distributor_id']},
+        )
@@ -7,9 +7,8 @@ also contain read, update, and delete tests.
 from __future__ import unicode_literals
 
 import unittest2
-from packaging.version import Version
 
-from pulp_smash import api, config, utils
+from pulp_smash import api, config, selectors, teardown, utils
 from pulp_smash.constants import REPOSITORY_PATH
 
 
@@ -25,23 +24,20 @@ def _gen_docker_repo_body():
     }
 
 
+@selectors.skip_unless(version='2.8')
 class _BaseTestCase(unittest2.TestCase):
     """Provide a server config, and tear down created resources."""
 
     @classmethod
     def setUpClass(cls):
         """Provide a server config and an iterable of resources to delete."""
-        cls.cfg = config.get_config()
+        cls.cfg = config.get_frozen_config()
         cls.resources = set()
-        if cls.cfg.version < Version('2.8'):
-            raise unittest2.SkipTest('These tests require at least Pulp 2.8.')
 
     @classmethod
     def tearDownClass(cls):
         """Delete created resources."""
-        client = api.Client(cls.cfg)
-        for resource in cls.resources:
-            client.delete(resource)
+        teardown.delete(cls.cfg, cls.resources)
 
 
 class CreateTestCase(_BaseTestCase):
@@ -0,0 +1,69 @@
+# coding=utf-8
+"""Benchmark the OSTree plugin.
+
+The test case in this module creates a repository with a feed, syncs it, syncs
+it again and publishes it. The time taken by each operation is saved. See
+:mod:`pulp_smash.perf` for details, including how to enable these benchmarks.
+"""
+from __future__ import unicode_literals
+
+try:  # try Python 3 import first
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin  # pylint:disable=C0411,E0401
+
+import unittest2
+
+from pulp_smash import perf, utils
+from pulp_smash.constants import REPOSITORY_PATH
+
+_FEED = 'http://dl.fedoraproject.org/pub/fedora/linux/atomic/21/'
+_BRANCHES = ('fedora-atomic/f21/x86_64/updates/docker-host',)
+
+
+def setUpModule():  # pylint:disable=invalid-name
+    """Skip these benchmarks unless they are enabled.
+
+    Like :mod:`pulp_smash.tests.ostree.api_v2.test_sync_publish`, these
+    benchmarks are temporarily skipped due to partial availability of the
+    plugin.
+    """
+    perf.skip_unless_enabled()
+    raise unittest2.SkipTest('https://github.com/PulpQE/pulp-smash/issues/84')
+
+
+class OSTreeBenchmarkTestCase(perf.BenchmarkTestCase):
+    """Benchmark an OSTree repository."""
+
+    benchmark = 'ostree'
+
+    @classmethod
+    @perf.tear_down_on_error
+    def setUpClass(cls):
+        """Create, sync, re-sync and publish a repository."""
+        super(OSTreeBenchmarkTestCase, cls).setUpClass()
+        distributor = {
+            'auto_publish': False,
+            'distributor_id': utils.uuid4(),
+            'distributor_type_id': 'ostree_web_distributor',
+            'distributor_config': {},
+        }
+        repo = cls.time_request('create', 'POST', REPOSITORY_PATH, json={
+            'distributors': [distributor],
+            'id': utils.uuid4(),
+            'importer_config': {'feed': _FEED, 'branches': _BRANCHES},
+            'importer_type_id': 'ostree_web_importer',
+            'notes': {'_repo-type': 'OSTREE'},
+        }).json()
+        cls.resources.add(repo['_href'])
+        for operation in ('sync', 'resync'):
+            cls.time_tasks(
+                operation,
+                urljoin(repo['_href'], 'actions/sync/'),
+                {'override_config': {}},
+            )
+        cls.time_tasks(
+            'publish',
+            urljoin(repo['_href'], 'actions/publish/'),
+            {'id': distributor['distributor_id']},
+        )
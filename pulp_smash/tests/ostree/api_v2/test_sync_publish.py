@@ -29,7 +29,7 @@ except ImportError:
 
 import unittest2
 
-from pulp_smash import api, config, utils
+from pulp_smash import api, config, selectors, teardown, utils
 from pulp_smash.constants import REPOSITORY_PATH
 
 _FEED = 'http://dl.fedoraproject.org/pub/fedora/linux/atomic/21/'
@@ -81,15 +81,13 @@ class _BaseTestCase(unittest2.TestCase):
     @classmethod
     def setUpClass(cls):
         """Provide a server config and an iterable of resources to delete."""
-        cls.cfg = config.get_config()
+        cls.cfg = config.get_frozen_config()
         cls.resources = set()
 
     @classmethod
     def tearDownClass(cls):
         """Delete created resources."""
-        client = api.Client(cls.cfg)
-        for resource in cls.resources:
-            client.delete(resource)
+        teardown.delete(cls.cfg, cls.resources)
 
 
 class _SyncFailedMixin(object):
@@ -187,6 +185,7 @@ class CreateTestCase(_BaseTestCase):
                 self.assertEqual(importers[0][key], body['importer_' + key])
 
 
+@selectors.depends_on(CreateTestCase)
 class SyncTestCase(_BaseTestCase):
     """Create an OSTree repository with a valid feed and branch, and sync it.
 
@@ -222,6 +221,7 @@ class SyncTestCase(_BaseTestCase):
                     self.assertEqual(action['error_details'], [])
 
 
+@selectors.depends_on(CreateTestCase)
 class SyncInvalidFeedTestCase(
         _SyncFailedMixin,
         _SyncImportFailedMixin,
@@ -239,6 +239,7 @@ class SyncInvalidFeedTestCase(
         cls.resources.add(repo_href)
 
 
+@selectors.depends_on(CreateTestCase)
 class SyncInvalidBranchesTestCase(
         _SyncFailedMixin,
         _SyncImportFailedMixin,
@@ -256,6 +257,7 @@ class SyncInvalidBranchesTestCase(
         cls.resources.add(repo_href)
 
 
+@selectors.depends_on(CreateTestCase)
 class SyncMissingAttrsTestCase(_SyncFailedMixin, _BaseTestCase):
     """Create an OSTree repository with no feed or branches and sync it."""
 
@@ -0,0 +1,80 @@
+# coding=utf-8
+"""Benchmark Pulp's searches as the number of resources grows.
+
+The test case in this module creates users, many at a time, until there are
+as many as each size in ``PULP_SMASH_SEARCH_SIZES``. At each size, it times
+every kind of search exercised by
+:mod:`pulp_smash.tests.platform.api_v2.test_search`, with GET and with POST,
+including a search that skips nearly all users. (See
+:mod:`pulp_smash.scaling`.) The median latency of each search at each size is
+saved. See :mod:`pulp_smash.perf` for details, including how to enable these
+benchmarks.
+"""
+from __future__ import unicode_literals
+
+import os
+import sys
+
+from pulp_smash import perf, scaling
+from pulp_smash.constants import USER_PATH
+from pulp_smash.utils import uuid4
+
+
+def setUpModule():  # pylint:disable=invalid-name
+    """Skip these benchmarks unless they are enabled."""
+    perf.skip_unless_enabled()
+
+
+class SearchBenchmarkTestCase(perf.BenchmarkTestCase):
+    """Benchmark user searches at several numbers of users.
+
+    The sizes are read from the ``PULP_SMASH_SEARCH_SIZES`` environment
+    variable, which holds a comma-separated list of numbers, and defaults to
+    ``1000,10000,100000``. Each search is run ``PULP_SMASH_SEARCH_REPEAT``
+    times at each size, which defaults to 5. A table of latencies, and of how
+    each search's latency grows with the number of users, is written to
+    standard error.
+    """
+
+    benchmark = 'search'
+
+    @classmethod
+    @perf.tear_down_on_error
+    def setUpClass(cls):
+        """Create users in steps, and time searches after each step."""
+        super(SearchBenchmarkTestCase, cls).setUpClass()
+        sizes = sorted(int(size) for size in os.environ.get(
+            'PULP_SMASH_SEARCH_SIZES', '1000,10000,100000'
+        ).split(','))
+        repeat = int(os.environ.get(
+            'PULP_SMASH_SEARCH_REPEAT', scaling.DEFAULT_REPEAT
+        ))
+        users = []
+        latencies = {}
+        for size in sizes:
+            created = []
+            try:
+                scaling.populate(
+                    cls.cfg,
+                    USER_PATH,
+                    lambda: {'login': uuid4()},
+                    size - len(users),
+                    created=created,
+                )
+            finally:
+                users.extend(created)
+                cls.resources.update(user['_href'] for user in created)
+            with cls.span('search-n{}'.format(size)):
+                latencies[size] = scaling.measure(
+                    cls.cfg,
+                    USER_PATH + 'search/',
+                    [user['id'] for user in users],
+                    repeat=repeat,
+                )
+            for (shape, method), seconds in latencies[size].items():
+                key = '{}-{}-n{}'.format(shape, method, size)
+                cls.durations[key] = seconds
+        sys.stderr.write('\n{} latency:\n{}\n'.format(
+            cls.benchmark,
+            scaling.format_report(latencies),
+        ))
@@ -32,7 +32,7 @@ class _SuccessTestCase(TestCase):
     @classmethod
     def setUpClass(cls):
         """Provide a server config and an empty set of responses."""
-        cls.cfg = config.get_config()
+        cls.cfg = config.get_frozen_config()
         cls.responses = {}
 
     def test_status_code(self):
@@ -53,7 +53,7 @@ class SeriesTestCase(_SuccessTestCase):
     def setUpClass(cls):
         """Make calls to the server and save the responses."""
         super(SeriesTestCase, cls).setUpClass()
-        client = api.Client(cls.cfg, api.echo_handler)
+        client = api.Client(cls.cfg, api.compact_echo_handler)
         for key, path in _PATHS.items():
             cls.responses[key] = client.post(path, {key + '_criteria': {}})
 
@@ -76,7 +76,7 @@ class ParallelTestCase(_SuccessTestCase):
     def setUpClass(cls):
         """Make calls to the server and save the responses."""
         super(ParallelTestCase, cls).setUpClass()
-        client = api.Client(cls.cfg, api.echo_handler)
+        client = api.Client(cls.cfg, api.compact_echo_handler)
         for key in {'repo'}:
             json = {key + '_criteria': {}, 'parallel': True}
             cls.responses[key] = client.post(_PATHS[key], json)
@@ -105,7 +105,10 @@ class FailureTestCase(TestCase):
     @classmethod
     def setUpClass(cls):
         """Make calls to the server and save the responses."""
-        client = api.Client(config.get_config(), api.echo_handler)
+        client = api.Client(
+            config.get_frozen_config(),
+            api.compact_echo_handler,
+        )
         cls.responses = {
             key: client.post(path, {key + '_criteriaa': {}})
             for key, path in _PATHS.items()
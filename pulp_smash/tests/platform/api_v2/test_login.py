@@ -18,7 +18,7 @@ class LoginSuccessTestCase(TestCase):
     @classmethod
     def setUpClass(cls):
         """Successfully log in to the server."""
-        cls.response = api.Client(config.get_config()).post(LOGIN_PATH)
+        cls.response = api.Client(config.get_frozen_config()).post(LOGIN_PATH)
 
     def test_status_code(self):
         """Assert that the response has an HTTP 200 status code."""
@@ -35,7 +35,7 @@ class LoginFailureTestCase(TestCase):
     @classmethod
     def setUpClass(cls):
         """Unsuccessfully log in to the server."""
-        client = api.Client(config.get_config(), api.echo_handler)
+        client = api.Client(config.get_frozen_config(), api.echo_handler)
         cls.response = client.post(LOGIN_PATH, auth=('', ''))
 
     def test_status_code(self):
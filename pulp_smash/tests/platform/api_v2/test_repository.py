@@ -24,7 +24,7 @@ except ImportError:
 import unittest2
 from packaging.version import Version
 
-from pulp_smash import api, config, utils
+from pulp_smash import api, config, selectors, teardown, utils
 from pulp_smash.constants import REPOSITORY_PATH, ERROR_KEYS
 from pulp_smash.selectors import bug_is_untestable, require
 
@@ -35,15 +35,13 @@ class _BaseTestCase(unittest2.TestCase):
     @classmethod
     def setUpClass(cls):
         """Provide a server config and an empty set of resources to delete."""
-        cls.cfg = config.get_config()
+        cls.cfg = config.get_frozen_config()
         cls.resources = set()  # a set of _href paths
 
     @classmethod
     def tearDownClass(cls):
         """For each resource in ``cls.resources``, delete that resource."""
-        client = api.Client(cls.cfg)
-        for resource in cls.resources:
-            client.delete(resource)
+        teardown.delete(cls.cfg, cls.resources)
 
 
 class CreateSuccessTestCase(_BaseTestCase):
@@ -57,7 +55,7 @@ class CreateSuccessTestCase(_BaseTestCase):
         second with all available attributes except importers and distributors.
         """
         super(CreateSuccessTestCase, cls).setUpClass()
-        client = api.Client(cls.cfg)
+        client = api.Client(cls.cfg, api.compact_handler)
         cls.bodies = [{'id': utils.uuid4()}]
         cls.bodies.append({
             'description': utils.uuid4(),
@@ -96,6 +94,7 @@ class CreateSuccessTestCase(_BaseTestCase):
                 self.assertEqual(body, attrs)
 
 
+@selectors.depends_on(CreateSuccessTestCase)
 class CreateFailureTestCase(_BaseTestCase):
     """Establish that repositories are not created in documented scenarios."""
 
@@ -111,7 +110,7 @@ class CreateFailureTestCase(_BaseTestCase):
         repo = client.post(REPOSITORY_PATH, {'id': utils.uuid4()})
         cls.resources.add(repo['_href'])
 
-        client.response_handler = api.echo_handler
+        client.response_handler = api.compact_echo_handler
         cls.bodies = (
             {'id': None},  # 400
             ['Incorrect data type'],  # 400
@@ -157,6 +156,7 @@ class CreateFailureTestCase(_BaseTestCase):
                 self.assertEqual(response_keys, ERROR_KEYS)
 
 
+@selectors.depends_on(CreateSuccessTestCase)
 class ReadUpdateDeleteTestCase(_BaseTestCase):
     """Establish we can read, update and delete repositories.
 
@@ -174,7 +174,7 @@ class ReadUpdateDeleteTestCase(_BaseTestCase):
             for _ in range(3)
         ))
         cls.responses = {}
-        client.response_handler = api.safe_handler
+        client.response_handler = api.compact_handler
 
         # Read the first repo
         path = cls.repos[0]['_href']
@@ -32,7 +32,7 @@ import random
 
 import unittest2
 
-from pulp_smash import api, config
+from pulp_smash import api, config, selectors, teardown
 from pulp_smash.constants import USER_PATH
 from pulp_smash.utils import uuid4
 
@@ -53,7 +53,7 @@ class _BaseTestCase(unittest2.TestCase):
     @classmethod
     def setUpClass(cls):
         """Provide a server config and an empty set of resources to delete."""
-        cls.cfg = config.get_config()
+        cls.cfg = config.get_frozen_config()
         cls.resources = set()  # a set of _href paths
         cls.searches = {}
 
@@ -66,9 +66,7 @@ class _BaseTestCase(unittest2.TestCase):
     @classmethod
     def tearDownClass(cls):
         """For each resource in ``cls.resources``, delete that resource."""
-        client = api.Client(cls.cfg)
-        for resource in cls.resources:
-            client.delete(resource)
+        teardown.delete(cls.cfg, cls.resources)
 
 
 class MinimalTestCase(_BaseTestCase):
@@ -84,7 +82,7 @@ class MinimalTestCase(_BaseTestCase):
     def setUpClass(cls):
         """Create one user. Execute searches."""
         super(MinimalTestCase, cls).setUpClass()
-        client = api.Client(cls.cfg)
+        client = api.Client(cls.cfg, api.compact_handler)
         cls.user = _create_users(cls.cfg, 1)[0]
         cls.searches = {
             'get': client.get(_SEARCH_PATH),
@@ -100,6 +98,7 @@ class MinimalTestCase(_BaseTestCase):
                 self.assertIn(self.user['login'], logins)
 
 
+@selectors.depends_on(MinimalTestCase)
 class SortTestCase(_BaseTestCase):
     """Ask for sorted search results.
 
@@ -116,7 +115,7 @@ class SortTestCase(_BaseTestCase):
         """Create two users. Execute searches."""
         super(SortTestCase, cls).setUpClass()
         cls.resources = {user['_href'] for user in _create_users(cls.cfg, 2)}
-        client = api.Client(cls.cfg)
+        client = api.Client(cls.cfg, api.compact_handler)
         for order in {'ascending', 'descending'}:
             json = {'criteria': {'sort': [['id', order]]}}
             cls.searches['post_' + order] = client.post(_SEARCH_PATH, json)
@@ -134,6 +133,7 @@ class SortTestCase(_BaseTestCase):
         self.assertEqual(ids, sorted(ids, reverse=True))
 
 
+@selectors.depends_on(MinimalTestCase)
 @unittest2.skip('See: https://pulp.plan.io/issues/1332')
 class FieldTestCase(_BaseTestCase):
     """Ask for a single field in search results.
@@ -149,7 +149,7 @@ class FieldTestCase(_BaseTestCase):
         """Create one user. Execute searches."""
         super(FieldTestCase, cls).setUpClass()
         cls.resources = {_create_users(cls.cfg, 1)[0]['_href']}
-        client = api.Client(cls.cfg)
+        client = api.Client(cls.cfg, api.compact_handler)
         cls.searches = {
             'get': client.get(_SEARCH_PATH, params={'field': 'name'}),
             'post': client.post(
@@ -166,6 +166,7 @@ class FieldTestCase(_BaseTestCase):
                     self.assertEqual(set(result.keys()), {'name'})
 
 
+@selectors.depends_on(MinimalTestCase)
 @unittest2.skip('See: https://pulp.plan.io/issues/1332')
 class FieldsTestCase(_BaseTestCase):
     """Ask for several fields in search results.
@@ -181,7 +182,7 @@ class FieldsTestCase(_BaseTestCase):
         """Create one user. Execute searches."""
         super(FieldsTestCase, cls).setUpClass()
         cls.resources = {_create_users(cls.cfg, 1)[0]['_href']}
-        client = api.Client(cls.cfg)
+        client = api.Client(cls.cfg, api.compact_handler)
         cls.searches = {
             'get': client.get(_SEARCH_PATH, params='?field=login&field=roles'),
             'post': client.post(
@@ -198,6 +199,7 @@ class FieldsTestCase(_BaseTestCase):
                     self.assertEqual(set(result.keys()), {'login', 'roles'})
 
 
+@selectors.depends_on(MinimalTestCase)
 class FiltersIdTestCase(_BaseTestCase):
     """Ask for a resource with a specific ID.
 
@@ -217,7 +219,8 @@ class FiltersIdTestCase(_BaseTestCase):
         cls.resources = {user['_href'] for user in users}
         cls.user = random.choice(users)  # search for this user
         json = {'criteria': {'filters': {'id': cls.user['id']}}}
-        cls.searches['post'] = api.Client(cls.cfg).post(_SEARCH_PATH, json)
+        client = api.Client(cls.cfg, api.compact_handler)
+        cls.searches['post'] = client.post(_SEARCH_PATH, json)
 
     def test_result_ids(self):
         """Assert the search results contain the correct IDs."""
@@ -227,6 +230,7 @@ class FiltersIdTestCase(_BaseTestCase):
                 self.assertEqual({self.user['id']}, ids)
 
 
+@selectors.depends_on(FiltersIdTestCase)
 class FiltersIdsTestCase(_BaseTestCase):
     """Ask for resources with one of several IDs.
 
@@ -245,7 +249,8 @@ class FiltersIdsTestCase(_BaseTestCase):
         users = _create_users(cls.cfg, 3)
         cls.resources = {user['_href'] for user in users}
         cls.user_ids = [user['id'] for user in random.sample(users, 2)]  # noqa pylint:disable=unsubscriptable-object
-        cls.searches['post'] = api.Client(cls.cfg).post(
+        client = api.Client(cls.cfg, api.compact_handler)
+        cls.searches['post'] = client.post(
             _SEARCH_PATH,
             {'criteria': {'filters': {'id': {'$in': cls.user_ids}}}},
         )
@@ -258,6 +263,7 @@ class FiltersIdsTestCase(_BaseTestCase):
                 self.assertEqual(set(self.user_ids), ids)
 
 
+@selectors.depends_on(FiltersIdsTestCase)
 class LimitSkipTestCase(_BaseTestCase):
     """Ask for search results to be limited or skipped.
 
@@ -278,7 +284,7 @@ class LimitSkipTestCase(_BaseTestCase):
         users = _create_users(cls.cfg, 2)
         cls.resources = {user['_href'] for user in users}
         cls.user_ids = [user['id'] for user in users]
-        client = api.Client(cls.cfg)
+        client = api.Client(cls.cfg, api.compact_handler)
         for criterion in {'limit', 'skip'}:
             key = 'post_' + criterion
             query = {'filters': {'id': {'$in': cls.user_ids}}, criterion: 1}
@@ -17,7 +17,7 @@ from __future__ import unicode_literals
 
 from unittest2 import TestCase
 
-from pulp_smash import api, config, utils
+from pulp_smash import api, config, selectors, teardown, utils
 from pulp_smash.constants import LOGIN_PATH, USER_PATH
 
 
@@ -32,15 +32,13 @@ class _BaseTestCase(TestCase):
     @classmethod
     def setUpClass(cls):
         """Provide a server config and an empty set of resources to delete."""
-        cls.cfg = config.get_config()
+        cls.cfg = config.get_frozen_config()
         cls.resources = set()  # a set of _href paths
 
     @classmethod
     def tearDownClass(cls):
         """For each resource in ``cls.resources``, delete that resource."""
-        client = api.Client(cls.cfg)
-        for resource in cls.resources:
-            client.delete(resource)
+        teardown.delete(cls.cfg, cls.resources)
 
 
 class CreateTestCase(_BaseTestCase):
@@ -54,7 +52,7 @@ class CreateTestCase(_BaseTestCase):
         all available attributes.
         """
         super(CreateTestCase, cls).setUpClass()
-        client = api.Client(cls.cfg)
+        client = api.Client(cls.cfg, api.compact_handler)
         cls.bodies = (
             {'login': utils.uuid4()},
             {key: utils.uuid4() for key in {'login', 'password', 'name'}},
@@ -92,6 +90,7 @@ class CreateTestCase(_BaseTestCase):
                 self.assertEqual(body, attrs)
 
 
+@selectors.depends_on(CreateTestCase)
 class ReadUpdateDeleteTestCase(_BaseTestCase):
     """Establish that we can read, update and delete users.
 
@@ -112,7 +111,7 @@ class ReadUpdateDeleteTestCase(_BaseTestCase):
         ]
 
         # Read, update and delete the users, and save the raw responses.
-        client.response_handler = api.safe_handler
+        client.response_handler = api.compact_handler
         cls.update_body = {'delta': {
             'name': utils.uuid4(),
             'password': utils.uuid4(),
@@ -124,7 +123,7 @@ class ReadUpdateDeleteTestCase(_BaseTestCase):
         cls.responses['delete'] = client.delete(hrefs[2])
 
         # Read, update and delete the deleted user, and save the raw responses.
-        client.response_handler = api.echo_handler
+        client.response_handler = api.compact_echo_handler
         cls.responses['read deleted'] = client.get(hrefs[2])
         cls.responses['update deleted'] = client.put(hrefs[2], {})
         cls.responses['delete deleted'] = client.delete(hrefs[2])
@@ -177,6 +176,7 @@ class ReadUpdateDeleteTestCase(_BaseTestCase):
         self.assertEqual(response.status_code, 409)
 
 
+@selectors.depends_on(ReadUpdateDeleteTestCase)
 class SearchTestCase(_BaseTestCase):
     """Establish we can search for users.
 
@@ -205,7 +205,7 @@ class SearchTestCase(_BaseTestCase):
         cls.user = client.get(cls.user['_href'])
 
         # Formulate and execute searches, and save raw responses.
-        client.response_handler = api.safe_handler
+        client.response_handler = api.compact_handler
         cls.searches = tuple((
             {'criteria': {}},
             {'criteria': {'filters': {'roles': ['super-users']}}},
@@ -0,0 +1,80 @@
+# coding=utf-8
+"""Benchmark the Puppet plugin.
+
+The test case in this module creates a repository with a feed, syncs it, syncs
+it again, publishes it and downloads a module. The time taken by each operation
+is saved. See :mod:`pulp_smash.perf` for details, including how to enable these
+benchmarks.
+"""
+from __future__ import unicode_literals
+
+try:  # try Python 3 import first
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin  # pylint:disable=C0411,E0401
+
+from pulp_smash import api, feeds, perf, utils
+from pulp_smash.constants import REPOSITORY_PATH
+
+
+_PUPPET_FEED = feeds.resolve('http://forge.puppetlabs.com')
+_PUPPET_MODULE = {'author': 'pulp', 'name': 'pulp'}
+_PUPPET_QUERY = _PUPPET_MODULE['author'] + '-' + _PUPPET_MODULE['name']
+
+
+def setUpModule():  # pylint:disable=invalid-name
+    """Skip these benchmarks unless they are enabled."""
+    perf.skip_unless_enabled()
+
+
+class PuppetBenchmarkTestCase(perf.BenchmarkTestCase):
+    """Benchmark a Puppet repository."""
+
+    benchmark = 'puppet'
+
+    @classmethod
+    @perf.tear_down_on_error
+    def setUpClass(cls):
+        """Create, sync, re-sync and publish a repo. Download a module."""
+        super(PuppetBenchmarkTestCase, cls).setUpClass()
+        distributor = {
+            'auto_publish': False,
+            'distributor_id': utils.uuid4(),
+            'distributor_type_id': 'puppet_distributor',
+            'distributor_config': {
+                'serve_http': True,
+                'serve_https': True,
+                'relative_url': '/' + utils.uuid4(),
+            },
+        }
+        repo = cls.time_request('create', 'POST', REPOSITORY_PATH, json={
+            'distributors': [distributor],
+            'id': utils.uuid4(),
+            'importer_config': {
+                'feed': _PUPPET_FEED,
+                'queries': [_PUPPET_QUERY],
+            },
+            'importer_type_id': 'puppet_importer',
+            'notes': {'_repo-type': 'puppet-repo'},
+        }).json()
+        cls.resources.add(repo['_href'])
+        for operation in ('sync', 'resync'):
+            cls.time_tasks(
+                operation,
+                urljoin(repo['_href'], 'actions/sync/'),
+                {'override_config': {}},
+            )
+        cls.time_tasks(
+            'publish',
+            urljoin(repo['_href'], 'actions/publish/'),
+            {'id': distributor['distributor_id']},
+        )
+
+        # Find the module's path with an (untimed) query, and download it.
+        author_name = _PUPPET_MODULE['author'] + '/' + _PUPPET_MODULE['name']
+        releases = api.Client(cls.cfg, api.json_handler).get(
+            '/pulp_puppet/forge/repository/{}/api/v1/releases.json'
+            .format(repo['id']),
+            params={'module': author_name},
+        )
+        cls.time_request('download', 'GET', releases[author_name][0]['file'])
@@ -43,14 +43,22 @@ except ImportError:
 import unittest2
 from packaging.version import Version
 
-from pulp_smash import api, config, selectors, utils
+from pulp_smash import (
+    api,
+    artifacts,
+    config,
+    feeds,
+    selectors,
+    teardown,
+    utils,
+)
 from pulp_smash.constants import (
     CALL_REPORT_KEYS,
     CONTENT_UPLOAD_PATH,
     REPOSITORY_PATH,
 )
 
-_PUPPET_FEED = 'http://forge.puppetlabs.com'
+_PUPPET_FEED = feeds.resolve('http://forge.puppetlabs.com')
 _PUPPET_MODULE = {
     'author': 'pulp',
     'name': 'pulp',
@@ -83,15 +91,13 @@ class _BaseTestCase(unittest2.TestCase):
     @classmethod
     def setUpClass(cls):
         """Provide a server config and an iterable of resources to delete."""
-        cls.cfg = config.get_config()
+        cls.cfg = config.get_frozen_config()
         cls.resources = set()
 
     @classmethod
     def tearDownClass(cls):
         """Delete created resources."""
-        client = api.Client(cls.cfg)
-        for resource in cls.resources:
-            client.delete(resource)
+        teardown.delete(cls.cfg, cls.resources)
 
 
 class CreateTestCase(_BaseTestCase):
@@ -147,6 +153,7 @@ class CreateTestCase(_BaseTestCase):
                 self.assertEqual(body['importer_' + key], importers[0][key])
 
 
+@selectors.depends_on(CreateTestCase)
 class SyncValidFeedTestCase(_BaseTestCase):
     """Create puppet repositories with valid feeds.
 
@@ -203,6 +210,7 @@ class SyncValidFeedTestCase(_BaseTestCase):
                 )
 
 
+@selectors.depends_on(CreateTestCase)
 class SyncInvalidFeedTestCase(_BaseTestCase):
     """If an invalid feed is given a sync should complete with errors."""
 
@@ -243,6 +251,7 @@ class SyncInvalidFeedTestCase(_BaseTestCase):
         )
 
 
+@selectors.depends_on(CreateTestCase)
 class PublishTestCase(_BaseTestCase):
     """Test repository syncing, publishing and data integrity.
 
@@ -275,8 +284,9 @@ class PublishTestCase(_BaseTestCase):
         repos = [client.post(REPOSITORY_PATH, _gen_repo()) for _ in range(2)]
         for repo in repos:
             cls.resources.add(repo['_href'])
-        client.response_handler = api.safe_handler
-        cls.modules.append(client.get(_PUPPET_MODULE_URL).content)
+        client.response_handler = api.compact_handler
+        with artifacts.get_cache().open(_PUPPET_MODULE_URL) as handle:
+            cls.modules.append(handle.read())
 
         # Begin an upload request, upload a puppet module, move the puppet
         # module into a repository, and end the upload request.
@@ -0,0 +1,295 @@
+# coding=utf-8
+"""Benchmark the RPM and ISO plugins.
+
+Most test cases in this module create a repository with a feed, sync it, sync
+it again, publish it and download a unit. The fan-out test case copies a
+repository into several others and publishes them all at once. (See
+:mod:`pulp_smash.fanout`.) The applicability test case regenerates content
+applicability for many synthetic consumers. (See
+:mod:`pulp_smash.applicability`.) The time taken by each operation is saved.
+See :mod:`pulp_smash.perf` for details, including how to enable these
+benchmarks.
+"""
+from __future__ import unicode_literals
+
+import os
+import sys
+import time
+try:  # try Python 3 import first
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin  # pylint:disable=C0411,E0401
+
+from packaging.version import Version
+
+from pulp_smash import api, applicability, fanout, feeds, perf, utils
+from pulp_smash.constants import REPOSITORY_PATH
+
+
+_RPM_FEED_URL = feeds.resolve(
+    'https://repos.fedorapeople.org/repos/pulp/pulp/demo_repos/zoo/'
+)
+_RPM = 'bear-4.1-1.noarch.rpm'
+# Packages in the RPM feed. Consumers have old versions of them installed.
+_RPM_NAMES = (
+    'bear', 'camel', 'cat', 'dog', 'duck', 'elephant', 'giraffe', 'lion',
+    'penguin', 'walrus', 'whale', 'wolf', 'zebra',
+)
+_ISO_FEED_URL = feeds.resolve(
+    'https://repos.fedorapeople.org/repos/pulp/pulp/fixtures/file/'
+)
+_ISO = '1.iso'
+
+
+def setUpModule():  # pylint:disable=invalid-name
+    """Skip these benchmarks unless they are enabled."""
+    perf.skip_unless_enabled()
+
+
+class RPMBenchmarkTestCase(perf.BenchmarkTestCase):
+    """Benchmark an RPM repository."""
+
+    benchmark = 'rpm'
+
+    @classmethod
+    @perf.tear_down_on_error
+    def setUpClass(cls):
+        """Create, sync, re-sync and publish a repository. Download an RPM."""
+        super(RPMBenchmarkTestCase, cls).setUpClass()
+        distributor = {
+            'auto_publish': False,
+            'distributor_id': utils.uuid4(),
+            'distributor_type_id': 'yum_distributor',
+            'distributor_config': {
+                'http': True,
+                'https': True,
+                'relative_url': utils.uuid4() + '/',
+            },
+        }
+        repo = cls.time_request('create', 'POST', REPOSITORY_PATH, json={
+            'distributors': [distributor],
+            'id': utils.uuid4(),
+            'importer_config': {'feed': _RPM_FEED_URL},
+            'importer_type_id': 'yum_importer',
+            'notes': {'_repo-type': 'rpm-repo'},
+        }).json()
+        cls.resources.add(repo['_href'])
+        for operation in ('sync', 'resync'):
+            cls.time_tasks(
+                operation,
+                urljoin(repo['_href'], 'actions/sync/'),
+                {'override_config': {}},
+            )
+        cls.time_tasks(
+            'publish',
+            urljoin(repo['_href'], 'actions/publish/'),
+            {'id': distributor['distributor_id']},
+        )
+        path = urljoin('/pulp/repos/', distributor['distributor_config'][
+            'relative_url'
+        ])
+        cls.time_request('download', 'GET', urljoin(path, _RPM))
+
+
+class ISOBenchmarkTestCase(perf.BenchmarkTestCase):
+    """Benchmark an ISO repository."""
+
+    benchmark = 'iso'
+
+    @classmethod
+    @perf.tear_down_on_error
+    def setUpClass(cls):
+        """Create, sync, re-sync and publish a repository. Download an ISO."""
+        super(ISOBenchmarkTestCase, cls).setUpClass()
+        distributor = {
+            'auto_publish': False,
+            'distributor_id': utils.uuid4(),
+            'distributor_type_id': 'iso_distributor',
+            'distributor_config': {'serve_http': True, 'serve_https': True},
+        }
+        repo = cls.time_request('create', 'POST', REPOSITORY_PATH, json={
+            'distributors': [distributor],
+            'id': utils.uuid4(),
+            'importer_config': {'feed': _ISO_FEED_URL},
+            'importer_type_id': 'iso_importer',
+            'notes': {'_repo-type': 'iso-repo'},
+        }).json()
+        cls.resources.add(repo['_href'])
+        for operation in ('sync', 'resync'):
+            cls.time_tasks(
+                operation,
+                urljoin(repo['_href'], 'actions/sync/'),
+                {'override_config': {}},
+            )
+        cls.time_tasks(
+            'publish',
+            urljoin(repo['_href'], 'actions/publish/'),
+            {'id': distributor['distributor_id']},
+        )
+        path = '/pulp/isos/{}/{}'.format(repo['id'], _ISO)
+        cls.time_request('download', 'GET', path)
+
+
+class RPMFanOutBenchmarkTestCase(perf.BenchmarkTestCase):
+    """Benchmark copying an RPM repository into many others and publishing.
+
+    The number of target repositories is read from the
+    ``PULP_SMASH_FANOUT_TARGETS`` environment variable, and defaults to 4. It
+    is included in the name of each operation, so that measurements taken
+    with different numbers of targets are not compared with each other. Each
+    phase is recorded as a whole, and by its slowest target, and a report of
+    the per-target timings is written to standard error.
+    """
+
+    benchmark = 'rpm-fanout'
+
+    @classmethod
+    @perf.tear_down_on_error
+    def setUpClass(cls):
+        """Create and sync a source repo, and fan it out to target repos."""
+        super(RPMFanOutBenchmarkTestCase, cls).setUpClass()
+        count = int(os.environ.get('PULP_SMASH_FANOUT_TARGETS', 4))
+        client = api.Client(cls.cfg, api.json_handler)
+        source = client.post(REPOSITORY_PATH, {
+            'id': utils.uuid4(),
+            'importer_config': {'feed': _RPM_FEED_URL},
+            'importer_type_id': 'yum_importer',
+            'notes': {'_repo-type': 'rpm-repo'},
+        })
+        cls.resources.add(source['_href'])
+        client.post(
+            urljoin(source['_href'], 'actions/sync/'),
+            {'override_config': {}},
+        )
+        targets = []
+        for _ in range(count):
+            targets.append(client.post(REPOSITORY_PATH, {
+                'id': utils.uuid4(),
+                'importer_config': {},
+                'importer_type_id': 'yum_importer',
+                'notes': {'_repo-type': 'rpm-repo'},
+            }))
+            cls.resources.add(targets[-1]['_href'])
+        with cls.span('fanout-x{}'.format(count)):
+            result = fanout.fan_out(cls.cfg, source, targets, lambda: {
+                'auto_publish': False,
+                'distributor_id': utils.uuid4(),
+                'distributor_type_id': 'yum_distributor',
+                'distributor_config': {
+                    'http': True,
+                    'https': True,
+                    'relative_url': utils.uuid4() + '/',
+                },
+            })
+        for phase in result.phases:
+            name = '{}-x{}'.format(phase.name, count)
+            cls.durations[name] = phase.seconds
+            seconds = [
+                value for value in phase.targets.values() if value is not None
+            ]
+            if seconds:
+                cls.durations[name + '-slowest-target'] = max(seconds)
+        for name, tasks in result.tasks.items():
+            cls.tasks['{}-x{}'.format(name, count)] = tasks
+        sys.stderr.write('\n{} ({} targets):\n{}\n'.format(
+            cls.benchmark,
+            count,
+            fanout.format_report(result),
+        ))
+
+
+class RPMApplicabilityBenchmarkTestCase(perf.BenchmarkTestCase):
+    """Benchmark regenerating content applicability for many consumers.
+
+    Consumers with large RPM package profiles are registered and bound to a
+    synced repository, several at a time. Then, applicability is regenerated
+    for the consumers, for the repository in series, and, on Pulp 2.8 and
+    later, for the repository in parallel. A report of the throughput and task
+    fan-out of each regeneration is written to standard error.
+
+    The number of consumers and the number of packages in each profile are
+    read from the ``PULP_SMASH_APPLICABILITY_CONSUMERS`` and
+    ``PULP_SMASH_APPLICABILITY_PACKAGES`` environment variables, and default
+    to 100 and 1000. Both are included in the name of each operation, so that
+    measurements taken at different scales are not compared with each other.
+    """
+
+    benchmark = 'rpm-applicability'
+
+    @classmethod
+    @perf.tear_down_on_error
+    def setUpClass(cls):
+        """Register and bind consumers, and regenerate their applicability."""
+        super(RPMApplicabilityBenchmarkTestCase, cls).setUpClass()
+        count = int(os.environ.get('PULP_SMASH_APPLICABILITY_CONSUMERS', 100))
+        size = int(os.environ.get('PULP_SMASH_APPLICABILITY_PACKAGES', 1000))
+        suffix = '-x{}-p{}'.format(count, size)
+        client = api.Client(cls.cfg, api.json_handler)
+        distributor = {
+            'auto_publish': False,
+            'distributor_id': utils.uuid4(),
+            'distributor_type_id': 'yum_distributor',
+            'distributor_config': {
+                'http': True,
+                'https': True,
+                'relative_url': utils.uuid4() + '/',
+            },
+        }
+        repo = client.post(REPOSITORY_PATH, {
+            'distributors': [distributor],
+            'id': utils.uuid4(),
+            'importer_config': {'feed': _RPM_FEED_URL},
+            'importer_type_id': 'yum_importer',
+            'notes': {'_repo-type': 'rpm-repo'},
+        })
+        cls.resources.add(repo['_href'])
+        client.post(
+            urljoin(repo['_href'], 'actions/sync/'),
+            {'override_config': {}},
+        )
+
+        start = time.time()
+        consumers = []
+        try:
+            with cls.span('register' + suffix):
+                applicability.register_consumers(
+                    cls.cfg,
+                    count,
+                    applicability.make_profile(size, _RPM_NAMES),
+                    [(repo['id'], distributor['distributor_id'])],
+                    created=consumers,
+                )
+        finally:
+            cls.resources.update(consumer['_href'] for consumer in consumers)
+        cls.durations['register' + suffix] = time.time() - start
+
+        repo_criteria = {'filters': {'id': {'$in': [repo['id']]}}}
+        jobs = [
+            ('consumers-series', applicability.CONSUMER_REGENERATE_PATH, {
+                'consumer_criteria': {'filters': {'id': {
+                    '$in': [consumer['id'] for consumer in consumers]
+                }}},
+            }),
+            ('repos-series', applicability.REPO_REGENERATE_PATH, {
+                'repo_criteria': repo_criteria,
+            }),
+        ]
+        if cls.cfg.version >= Version('2.8'):
+            jobs.append((
+                'repos-parallel',
+                applicability.REPO_REGENERATE_PATH,
+                {'repo_criteria': repo_criteria, 'parallel': True},
+            ))
+        regenerations = []
+        for name, path, body in jobs:
+            with cls.span(name + suffix):
+                regenerations.append(applicability.regenerate(
+                    cls.cfg, name, count, path, body
+                ))
+            cls.durations[name + suffix] = regenerations[-1].seconds
+            cls.tasks[name + suffix] = regenerations[-1].tasks
+        sys.stderr.write('\n{} ({} packages per profile):\n{}\n'.format(
+            cls.benchmark,
+            size,
+            applicability.format_report(regenerations),
+        ))
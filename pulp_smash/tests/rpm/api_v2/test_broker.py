@@ -33,11 +33,13 @@ except ImportError:
 
 import unittest2
 
-from pulp_smash import api, cli, config, utils
+from pulp_smash import api, artifacts, cli, config, feeds, utils
 from pulp_smash.constants import PULP_SERVICES, REPOSITORY_PATH
 
 
-_FEED_URL = 'https://repos.fedorapeople.org/repos/pulp/pulp/demo_repos/zoo/'
+_FEED_URL = feeds.resolve(
+    'https://repos.fedorapeople.org/repos/pulp/pulp/demo_repos/zoo/'
+)
 _RPM = 'bear-4.1-1.noarch.rpm'
 
 
@@ -69,17 +71,15 @@ class BrokerTestCase(unittest2.TestCase):
     """Test Pulp's support for broker connections and reconnections."""
 
     def setUp(self):
-        """Provide a server config and Pulp services to stop and start."""
-        self.cfg = config.get_config()
+        """Provide a server config, and a broker and cluster to manage."""
+        self.cfg = config.get_frozen_config()
         self.broker = utils.get_broker(self.cfg)
-        self.services = tuple((
-            cli.Service(self.cfg, service) for service in PULP_SERVICES
-        ))
+        self.cluster = cli.Cluster(self.cfg)  # Pulp may span several hosts.
 
     def tearDown(self):
         """Ensure Pulp services are running."""
-        for service in self.services + (self.broker,):
-            service.start()
+        self.cluster.service(PULP_SERVICES, 'start')
+        self.broker.start()
 
     def test_broker_connect(self):
         """Test Pulp's support for initially connecting to a broker.
@@ -92,10 +92,9 @@ class BrokerTestCase(unittest2.TestCase):
            distributor, publish it, and download an RPM.
         """
         # Step 1 and 2.
-        for service in self.services + (self.broker,):
-            service.stop()
-        for service in self.services:
-            service.start()
+        self.cluster.service(PULP_SERVICES, 'stop')
+        self.broker.stop()
+        self.cluster.service(PULP_SERVICES, 'start')
         time.sleep(15)  # Let services try to connect to the dead broker.
         self.broker.start()
         self.health_check()  # Step 3.
@@ -140,5 +139,6 @@ class BrokerTestCase(unittest2.TestCase):
         pulp_rpm = client.get(url).content
 
         # Does this RPM match the original RPM?
-        rpm = client.get(urljoin(_FEED_URL, _RPM)).content
+        with artifacts.get_cache().open(urljoin(_FEED_URL, _RPM)) as handle:
+            rpm = handle.read()
         self.assertEqual(rpm, pulp_rpm)
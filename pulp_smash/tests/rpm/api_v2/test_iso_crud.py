@@ -10,7 +10,7 @@ except ImportError:
 import unittest2
 from packaging.version import Version
 
-from pulp_smash import api, config, selectors, utils
+from pulp_smash import api, config, selectors, teardown, utils
 from pulp_smash.constants import REPOSITORY_PATH
 
 
@@ -48,15 +48,13 @@ class _BaseTestCase(unittest2.TestCase):
     @classmethod
     def setUpClass(cls):
         """Provide a server config and an empty set of resources to delete."""
-        cls.cfg = config.get_config()
+        cls.cfg = config.get_frozen_config()
         cls.resources = set()  # a set of _href paths
 
     @classmethod
     def tearDownClass(cls):
         """For each resource in ``cls.resources``, delete that resource."""
-        client = api.Client(cls.cfg)
-        for resource in cls.resources:
-            client.delete(resource)
+        teardown.delete(cls.cfg, cls.resources)
 
 
 class CreateTestCase(_BaseTestCase):
@@ -151,7 +149,7 @@ class ReadUpdateDeleteTestCase(_BaseTestCase):
             cls.resources.add(repos[key]['_href'])
 
         # Read, update and delete the repositories.
-        client.response_handler = api.safe_handler
+        client.response_handler = api.compact_handler
         cls.responses['read'] = client.get(repos['read']['_href'])
         for key in {'importers', 'distributors', 'details'}:
             cls.responses['read_' + key] = client.get(
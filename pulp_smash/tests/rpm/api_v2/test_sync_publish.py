@@ -17,11 +17,13 @@ following trees of assumptions are explored in this module::
         first repository, publish the first repository, and download the
         original RPM. (PublishTestCase)
 
+    It is possible to create an RPM repository without a feed, and to upload a
+    directory of RPM files to it. (UploadDirectoryTestCase)
+
 Assertions not explored in this module include:
 
 * Given an RPM repository without a feed, sync requests fail.
 * It is impossible to create two RPM repositories with the same relative URL.
-* It is possible to upload a directory of RPM files to an RPM repository.
 * It is possible to upload an ISO of RPM files to an RPM repository.
 * It is possible to upload content and copy it into multiple repositories.
 * It is possible to get content into a repository via a sync and publish it.
@@ -31,6 +33,8 @@ Assertions not explored in this module include:
 """
 from __future__ import unicode_literals
 
+import shutil
+import tempfile
 from itertools import product
 try:  # try Python 3 import first
     from urllib.parse import urljoin
@@ -40,7 +44,16 @@ except ImportError:
 import unittest2
 from packaging.version import Version
 
-from pulp_smash import api, config, selectors, utils
+from pulp_smash import (
+    api,
+    artifacts,
+    config,
+    feeds,
+    selectors,
+    teardown,
+    upload,
+    utils,
+)
 from pulp_smash.constants import (
     CALL_REPORT_KEYS,
     CONTENT_UPLOAD_PATH,
@@ -48,7 +61,9 @@ from pulp_smash.constants import (
 )
 
 
-_FEED_URL = 'https://repos.fedorapeople.org/repos/pulp/pulp/demo_repos/zoo/'
+_FEED_URL = feeds.resolve(
+    'https://repos.fedorapeople.org/repos/pulp/pulp/demo_repos/zoo/'
+)
 _RPM = 'bear-4.1-1.noarch.rpm'
 _REPO_PUBLISH_PATH = '/pulp/repos/'  # + relative_url + unit_name.rpm.arch
 
@@ -83,15 +98,13 @@ class _BaseTestCase(unittest2.TestCase):
     @classmethod
     def setUpClass(cls):
         """Provide a server config and an iterable of resources to delete."""
-        cls.cfg = config.get_config()
+        cls.cfg = config.get_frozen_config()
         cls.resources = set()
 
     @classmethod
     def tearDownClass(cls):
         """Delete created resources."""
-        client = api.Client(cls.cfg)
-        for resource in cls.resources:
-            client.delete(resource)
+        teardown.delete(cls.cfg, cls.resources)
 
 
 class CreateTestCase(_BaseTestCase):
@@ -143,6 +156,7 @@ class CreateTestCase(_BaseTestCase):
                 self.assertEqual(importers[0][key], body['importer_' + key])
 
 
+@selectors.depends_on(CreateTestCase)
 class SyncValidFeedTestCase(_BaseTestCase):
     """Create an RPM repository with a valid feed and sync it.
 
@@ -213,6 +227,7 @@ class SyncValidFeedTestCase(_BaseTestCase):
                 self.assertEqual(counts.get(unit_type), count)
 
 
+@selectors.depends_on(CreateTestCase)
 class SyncInvalidFeedTestCase(_BaseTestCase):
     """Create an RPM repository with an invalid feed and sync it.
 
@@ -263,6 +278,7 @@ class SyncInvalidFeedTestCase(_BaseTestCase):
         self.assertEqual(len(self.tasks), 1)
 
 
+@selectors.depends_on(CreateTestCase)
 class PublishTestCase(_BaseTestCase):
     """Upload an RPM to a repo, copy it to another, publish, and download."""
 
@@ -288,8 +304,9 @@ class PublishTestCase(_BaseTestCase):
         repos = [client.post(REPOSITORY_PATH, _gen_repo()) for _ in range(2)]
         for repo in repos:
             cls.resources.add(repo['_href'])
-        client.response_handler = api.safe_handler
-        cls.rpms.append(client.get(urljoin(_FEED_URL, _RPM)).content)
+        client.response_handler = api.compact_handler
+        with artifacts.get_cache().open(urljoin(_FEED_URL, _RPM)) as handle:
+            cls.rpms.append(handle.read())
 
         # Begin an upload request, upload an RPM, move the RPM into a
         # repository, and end the upload request.
@@ -437,3 +454,43 @@ class PublishTestCase(_BaseTestCase):
         for i, module in enumerate(self.rpms[1:]):
             with self.subTest(i=i):
                 self.assertEqual(self.rpms[0], module)
+
+
+class UploadDirectoryTestCase(_BaseTestCase):
+    """Upload a directory of RPM files into an RPM repository."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Create an RPM repository and upload a directory of RPMs into it.
+
+        The RPMs are those in the repository at :data:`_FEED_URL`.
+        """
+        super(UploadDirectoryTestCase, cls).setUpClass()
+        client = api.Client(cls.cfg, api.json_handler)
+        repo = client.post(REPOSITORY_PATH, _gen_repo())
+        cls.resources.add(repo['_href'])
+        directory = tempfile.mkdtemp()
+        try:
+            feeds.mirror_yum_repo(directory, _FEED_URL)
+            cls.paths = upload.get_paths(directory)
+            cls.report = upload.BulkUploader(cls.cfg, repo['_href']).upload(
+                cls.paths
+            )
+        finally:
+            shutil.rmtree(directory)
+        cls.repo = client.get(repo['_href'])
+
+    def test_report(self):
+        """Assert every file was uploaded, and every import succeeded."""
+        self.assertEqual(self.report.files, len(self.paths))
+        self.assertEqual(self.report.errors, ())
+
+    def test_unit_count(self):
+        """Assert the repository contains one RPM per uploaded file."""
+        if (self.cfg.version >= Version('2.8') and
+                selectors.bug_is_untestable(1570)):
+            self.skipTest('https://pulp.plan.io/issues/1570')
+        self.assertEqual(
+            self.repo['content_unit_counts'].get('rpm'),
+            len(self.paths),
+        )
@@ -0,0 +1,281 @@
+# coding=utf-8
+"""Limit the load that Pulp Smash puts on a Pulp server.
+
+A :class:`Throttle` applies two limits to the requests sent to one Pulp
+server: a token bucket, which limits the rate at which requests are sent, and
+a governor, which limits how many requests may be in flight at once. Requests
+are split into two endpoint classes, each with its own limits:
+
+``read``
+    GET, HEAD and OPTIONS requests. These are cheap.
+``write``
+    All other requests. These include the POST and DELETE requests that spawn
+    tasks on the server, and are expensive.
+
+Limits are configured with the ``PULP_SMASH_THROTTLE`` environment variable,
+which holds a JSON object. For example, to send at most 20 reads per second
+(with bursts of up to 40) and to allow at most two writes in flight:
+
+.. code-block:: sh
+
+    export PULP_SMASH_THROTTLE='{
+        "read": {"rate": 20, "burst": 40},
+        "write": {"max_in_flight": 2}
+    }'
+
+A missing limit is not enforced. If ``PULP_SMASH_THROTTLE`` is unset, nothing
+is throttled.
+
+All :class:`pulp_smash.api.Client` objects that share a ``base_url`` obey the
+same limits, even if they are in different processes. This is done with a
+small state file per server, under ``$XDG_CACHE_HOME/pulp_smash/throttle/``,
+which is locked with ``flock(2)`` whenever it is read or written. The state
+file records which processes have requests in flight, and entries left behind
+by processes that have died are discarded. Where ``fcntl`` is unavailable, the
+state file is only locked against other threads in the same process.
+"""
+from __future__ import division, unicode_literals
+
+import errno
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from threading import Lock
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # pylint:disable=invalid-name
+
+#: HTTP methods in the ``read`` endpoint class.
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+# `get_throttle` uses this as a cache. It maps base URLs to throttles.
+_THROTTLES = {}
+
+# Locks state files against other threads where `fcntl` is unavailable.
+_FALLBACK_LOCK = Lock()
+
+# How long to wait before checking again whether a request may be sent, if
+# too many requests are in flight.
+_POLL_INTERVAL = 0.05
+
+
+class Limit(namedtuple('Limit', 'rate burst max_in_flight')):
+    """The limits placed on one class of endpoints.
+
+    :param rate: The number of requests per second that may be sent, or
+        ``None`` for no limit.
+    :param burst: The number of requests that may be sent at once before
+        ``rate`` applies. Defaults to ``rate``, or one, whichever is larger.
+    :param max_in_flight: The number of requests that may be in flight at
+        once, or ``None`` for no limit.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, rate=None, burst=None, max_in_flight=None):
+        """Fill in a default ``burst``."""
+        if burst is None and rate is not None:
+            burst = max(rate, 1)
+        return super(Limit, cls).__new__(cls, rate, burst, max_in_flight)
+
+
+def get_endpoint_class(method):
+    """Return the endpoint class of an HTTP method: ``read`` or ``write``."""
+    return 'read' if method.upper() in READ_METHODS else 'write'
+
+
+def parse_limits(text):
+    """Parse a JSON string like the one in ``PULP_SMASH_THROTTLE``.
+
+    :returns: A dict mapping endpoint classes to :class:`Limit` objects.
+    :raises: ``ValueError`` if ``text`` is not valid.
+    """
+    limits = {}
+    for endpoint_class, kwargs in json.loads(text).items():
+        if endpoint_class not in ('read', 'write'):
+            raise ValueError(
+                'Unknown endpoint class: {}'.format(endpoint_class)
+            )
+        try:
+            limits[endpoint_class] = Limit(**kwargs)
+        except TypeError as err:
+            raise ValueError(
+                'Bad limits for {}: {}'.format(endpoint_class, err)
+            )
+    return limits
+
+
+class Throttle(object):
+    """Apply rate and concurrency limits to requests sent to one server.
+
+    :param key: A string identifying the server, such as its base URL.
+        Throttles with the same key and directory share their limits.
+    :param limits: A dict mapping endpoint classes to :class:`Limit` objects.
+    :param directory: The directory in which to keep state files. Defaults to
+        ``$XDG_CACHE_HOME/pulp_smash/throttle``.
+    """
+
+    def __init__(self, key, limits, directory=None):
+        """Initialize this object with needed instance attributes."""
+        if directory is None and limits:
+            from xdg import BaseDirectory
+            directory = os.path.join(
+                BaseDirectory.save_cache_path('pulp_smash'),
+                'throttle',
+            )
+            if not os.path.isdir(directory):
+                try:
+                    os.makedirs(directory)
+                except OSError as err:  # another process made it
+                    if err.errno != errno.EEXIST:
+                        raise
+        self.key = key
+        self.limits = limits
+        self.directory = directory
+
+    @contextmanager
+    def limit(self, method):
+        """Wait until a request may be sent, and track it while it is sent.
+
+        :param method: The request's HTTP method.
+        """
+        endpoint_class = get_endpoint_class(method)
+        if endpoint_class not in self.limits:
+            yield
+            return
+        self.acquire(endpoint_class)
+        try:
+            yield
+        finally:
+            self.release(endpoint_class)
+
+    def acquire(self, endpoint_class):
+        """Block until a request of the given class may be sent."""
+        limit = self.limits[endpoint_class]
+        while True:
+            with self._lock() as state:
+                delay = _take(
+                    state.setdefault(endpoint_class, {}),
+                    limit,
+                    time.time(),
+                )
+            if delay is None:
+                return
+            time.sleep(delay)
+
+    def release(self, endpoint_class):
+        """Record that a request of the given class is no longer in flight."""
+        if self.limits[endpoint_class].max_in_flight is None:
+            return
+        pid = str(os.getpid())
+        with self._lock() as state:
+            in_flight = state.setdefault(endpoint_class, {}).get(
+                'in_flight', {}
+            )
+            if in_flight.get(pid, 0) > 1:
+                in_flight[pid] -= 1
+            else:
+                in_flight.pop(pid, None)
+
+    def get_path(self):
+        """Return the path to this throttle's state file."""
+        digest = hashlib.sha256(self.key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.json')
+
+    @contextmanager
+    def _lock(self):
+        """Lock the state file, and yield its contents for modification.
+
+        The state file is opened anew each time, so that threads in one
+        process exclude each other just as processes do. Where ``fcntl`` is
+        unavailable, a lock that is local to this process is held instead.
+        """
+        if fcntl is None:  # pragma: no cover
+            with _FALLBACK_LOCK:
+                with self._open() as state:
+                    yield state
+            return
+        with self._open(lambda fd: fcntl.flock(fd, fcntl.LOCK_EX)) as state:
+            yield state
+
+    @contextmanager
+    def _open(self, lock=None):
+        """Open the state file, and yield its contents for modification.
+
+        :param lock: A callable that is passed the state file's descriptor
+            before the file is read. Closing the descriptor releases any lock
+            taken.
+        """
+        fd = os.open(self.get_path(), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if lock is not None:
+                lock(fd)
+            with os.fdopen(os.dup(fd), 'r+') as handle:
+                try:
+                    state = json.loads(handle.read())
+                except ValueError:  # empty or damaged
+                    state = {}
+                yield state
+                handle.seek(0)
+                handle.truncate()
+                handle.write(json.dumps(state))
+        finally:
+            os.close(fd)  # also releases the lock
+
+
+def _take(state, limit, now):
+    """Try to take permission to send a request.
+
+    :param state: A dict holding the state of one endpoint class. It is
+        updated in place.
+    :param limit: A :class:`Limit`.
+    :param now: The current time, in seconds since the epoch.
+    :returns: ``None`` if the request may be sent, or else a number of seconds
+        to wait before trying again.
+    """
+    in_flight = state.setdefault('in_flight', {})
+    if limit.max_in_flight is not None:
+        for pid in list(in_flight):
+            if not _is_alive(int(pid)):
+                del in_flight[pid]
+        if sum(in_flight.values()) >= limit.max_in_flight:
+            return _POLL_INTERVAL
+    if limit.rate is not None:
+        tokens = state.get('tokens', limit.burst)
+        elapsed = max(0, now - state.get('updated', now))
+        tokens = min(limit.burst, tokens + elapsed * limit.rate)
+        state['updated'] = now
+        if tokens < 1:
+            state['tokens'] = tokens
+            return (1 - tokens) / limit.rate
+        state['tokens'] = tokens - 1
+    if limit.max_in_flight is not None:
+        pid = str(os.getpid())
+        in_flight[pid] = in_flight.get(pid, 0) + 1
+    return None
+
+
+def _is_alive(pid):
+    """Tell whether the process with the given ID exists."""
+    try:
+        os.kill(pid, 0)
+    except OSError as err:
+        return err.errno == errno.EPERM
+    return True
+
+
+def get_throttle(base_url):
+    """Return the :class:`Throttle` for the server at ``base_url``.
+
+    Limits are read from the ``PULP_SMASH_THROTTLE`` environment variable. One
+    throttle is made per base URL, and it is reused on later calls.
+    """
+    if base_url not in _THROTTLES:
+        text = os.environ.get('PULP_SMASH_THROTTLE')
+        limits = parse_limits(text) if text else {}
+        _THROTTLES[base_url] = Throttle(base_url, limits)
+    return _THROTTLES[base_url]
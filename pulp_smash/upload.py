@@ -0,0 +1,416 @@
+# coding=utf-8
+"""Upload many files into a Pulp repository at once.
+
+Uploading one file into a repository takes four steps: create an upload
+request (`malloc`_), upload the file's contents, import the upload into the
+repository, and delete the upload request (free). The import is done by a
+task, and the upload request may only be deleted once that task is done.
+
+A :class:`BulkUploader` pipelines these steps. Several worker threads create
+upload requests, upload files and start import tasks. Meanwhile, the import
+tasks of all sent files are polled together, and each upload request is
+deleted as soon as its tasks are done. As a result, file N+1 is uploaded while
+the import task for file N runs.
+
+>>> from pulp_smash import config, upload
+>>> uploader = upload.BulkUploader(config.get_config(), repo['_href'])
+>>> report = uploader.upload(upload.get_paths('/srv/rpms/'))
+>>> print(upload.format_report(report))
+
+RPM, ISO and Puppet module files can be uploaded. The unit type of each file
+is guessed from its name. (See :func:`get_unit_type`.) This module can also be
+run as a script:
+
+.. code-block:: sh
+
+    python -m pulp_smash.upload /pulp/api/v2/repositories/foo/ /srv/rpms/
+
+.. _malloc:
+    http://pulp.readthedocs.org/en/latest/dev-guide/integration/rest-api/content/upload.html#creating-an-upload-request
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+from threading import BoundedSemaphore, Event
+from time import sleep
+try:  # try Python 3 import first
+    from queue import Empty, Queue
+    from urllib.parse import urljoin
+except ImportError:  # pragma: no cover
+    from Queue import Empty, Queue  # pylint:disable=C0411,E0401
+    from urlparse import urljoin  # pylint:disable=C0411,E0401
+
+from pulp_smash import api, config, exceptions, utils
+from pulp_smash.constants import CONTENT_UPLOAD_PATH
+
+#: Map file name suffixes to unit type IDs. See :func:`get_unit_type`.
+UNIT_TYPES = (
+    ('.rpm', 'rpm'),
+    ('.iso', 'iso'),
+    ('.tar.gz', 'puppet_module'),
+)
+
+_DEFAULT_CHUNK_SIZE = 1024 ** 2  # 1 MiB
+
+# The number of seconds between rounds of polling import tasks. Import tasks
+# are usually short, so poll more often than pulp_smash.utils.poll_tasks.
+_POLL_INTERVAL = 0.5
+
+# The number of rounds after which to give up on a file's import tasks.
+_POLL_LIMIT = 240
+
+_TASK_END_STATES = utils._TASK_END_STATES  # pylint:disable=protected-access
+
+
+class UploadReport(namedtuple('UploadReport', 'files bytes seconds tasks')):
+    """The outcome of a bulk upload.
+
+    :param files: The number of files uploaded.
+    :param bytes: The number of bytes uploaded.
+    :param seconds: The time taken by the whole upload.
+    :param tasks: A tuple of the final bodies of all import tasks.
+    """
+
+    __slots__ = ()
+
+    @property
+    def files_per_second(self):
+        """Return the number of files uploaded and imported per second."""
+        return self.files / self.seconds if self.seconds else 0
+
+    @property
+    def megabytes_per_second(self):
+        """Return the number of megabytes uploaded and imported per second."""
+        return self.bytes / 10 ** 6 / self.seconds if self.seconds else 0
+
+    @property
+    def errors(self):
+        """Return the bodies of the import tasks that did not finish."""
+        return tuple(
+            task for task in self.tasks if task['state'] != 'finished'
+        )
+
+
+def get_unit_type(path):
+    """Guess the unit type ID of a file from its name.
+
+    :param path: The path to a file, such as ``bear-4.1-1.noarch.rpm``.
+    :returns: A unit type ID from :data:`UNIT_TYPES`, such as ``rpm``.
+    :raises: ``ValueError`` if the unit type cannot be guessed.
+    """
+    for suffix, unit_type_id in UNIT_TYPES:
+        if path.endswith(suffix):
+            return unit_type_id
+    raise ValueError('Cannot guess the unit type of {}'.format(path))
+
+
+def get_paths(directory):
+    """Return the sorted paths to all uploadable files under ``directory``."""
+    paths = []
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            try:
+                get_unit_type(filename)
+            except ValueError:
+                continue
+            paths.append(os.path.join(dirpath, filename))
+    return sorted(paths)
+
+
+class BulkUploader(object):
+    """Upload many files into one repository, with bounded parallelism.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :param repo_href: The path to the repository to upload files into.
+    :param workers: The number of files that may be uploading at once. No
+        more than this many files may be uploading or importing at once.
+    :param chunk_size: The size of each chunk of a file that is uploaded, in
+        bytes.
+    """
+
+    def __init__(self, server_config, repo_href, workers=4,
+                 chunk_size=_DEFAULT_CHUNK_SIZE):
+        """Initialize this object with needed instance attributes."""
+        self.cfg = server_config
+        self.repo_href = repo_href
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._client = api.Client(server_config, api.echo_handler)
+
+    def upload(self, paths, unit_type_id=None):
+        """Upload and import the given files.
+
+        Files are sent by a pool of ``workers`` threads. Meanwhile, the
+        calling thread polls the import tasks of all sent files together, and
+        deletes each file's upload request as soon as its tasks are done. No
+        more than ``workers`` files may be between being sent and being
+        finished, so the server is never left with more than that many open
+        upload requests.
+
+        :param paths: An iterable of paths to files.
+        :param unit_type_id: The unit type of every file. If ``None``, it is
+            guessed from each file's name.
+        :returns: An :class:`UploadReport`.
+        :raises: ``requests.exceptions.HTTPError`` if a request fails, and
+            ``ValueError`` if a unit type cannot be guessed. Any import tasks
+            already started are waited for, and their upload requests deleted,
+            before the exception is raised.
+        """
+        jobs = [
+            (path, unit_type_id or get_unit_type(path)) for path in paths
+        ]
+        start = time.time()
+        slots = BoundedSemaphore(self.workers)
+        stopping = Event()
+        sent = Queue()
+
+        def send(job):
+            """Send a file once a slot is free, and queue the outcome."""
+            slots.acquire()
+            if stopping.is_set():
+                slots.release()
+                return
+            outcome, error = self._try_send(job)
+            if error is not None:
+                slots.release()
+            sent.put((outcome, error))
+
+        imports = []  # Files which are sent but not finished.
+        finished = []
+        errors = []
+        received = 0
+        send_pool = ThreadPool(self.workers)
+        try:
+            send_pool.map_async(send, jobs)
+            while received < len(jobs) or imports:
+                while received < len(jobs):
+                    try:
+                        outcome, error = sent.get(block=not imports)
+                    except Empty:
+                        break
+                    received += 1
+                    if error is not None:
+                        errors.append(error)
+                        continue
+                    imports.append(_Import(*outcome))
+                for import_ in self._poll(imports):
+                    imports.remove(import_)
+                    slots.release()
+                    if import_.error is not None:
+                        errors.append(import_.error)
+                    else:
+                        finished.append(import_)
+                if imports:
+                    sleep(_POLL_INTERVAL)
+        except:  # noqa pylint:disable=bare-except
+            # Let blocked senders give up, and free every upload request.
+            stopping.set()
+            for _ in imports:
+                slots.release()
+            send_pool.close()
+            send_pool.join()
+            while not sent.empty():
+                outcome, _ = sent.get()
+                if outcome is not None:
+                    imports.append(_Import(*outcome))
+            for import_ in imports:
+                self._client.delete(import_.upload_href)
+            raise
+        send_pool.close()
+        send_pool.join()
+        if errors:
+            raise errors[0]
+        return UploadReport(
+            len(finished),
+            sum(import_.size for import_ in finished),
+            time.time() - start,
+            tuple(task for import_ in finished for task in import_.tasks),
+        )
+
+    def _try_send(self, job):
+        """Call :meth:`_send`, and return an ``(outcome, error)`` tuple.
+
+        One of ``outcome`` and ``error`` is ``None``. So every file's upload
+        can be finished, even if another file's cannot be sent.
+        """
+        try:
+            return self._send(job), None
+        except Exception as err:  # pylint:disable=broad-except
+            return None, err
+
+    def _send(self, job):
+        """Create an upload request, upload a file and start its import.
+
+        :param job: A ``(path, unit_type_id)`` tuple.
+        :returns: A ``(upload_href, call_report, size)`` tuple.
+        """
+        path, unit_type_id = job
+        response = self._client.post(CONTENT_UPLOAD_PATH)
+        response.raise_for_status()
+        malloc = response.json()
+        try:
+            checksum = hashlib.sha256()
+            size = 0
+            with open(path, 'rb') as handle:
+                while True:
+                    chunk = handle.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    self._client.put(
+                        urljoin(malloc['_href'], '{}/'.format(size)),
+                        data=chunk,
+                    ).raise_for_status()
+                    checksum.update(chunk)
+                    size += len(chunk)
+            if unit_type_id == 'iso':
+                unit_key = {
+                    'checksum': checksum.hexdigest(),
+                    'name': os.path.basename(path),
+                    'size': size,
+                }
+            else:
+                unit_key = {}
+            response = self._client.post(
+                urljoin(self.repo_href, 'actions/import_upload/'),
+                {
+                    'unit_key': unit_key,
+                    'unit_type_id': unit_type_id,
+                    'upload_id': malloc['upload_id'],
+                },
+            )
+            response.raise_for_status()
+        except:  # noqa pylint:disable=bare-except
+            self._client.delete(malloc['_href'])
+            raise
+        return malloc['_href'], response.json(), size
+
+    def _poll(self, imports):
+        """Poll each unfinished import task once. Return finished imports.
+
+        An import is finished once all of its tasks, and all of the tasks they
+        spawn, are done. Its upload request is then deleted. If a task cannot
+        be polled, or is polled :data:`_POLL_LIMIT` times, the import is
+        finished with an error.
+
+        :param imports: A list of :class:`_Import` objects.
+        :returns: A list of the imports which are now finished.
+        """
+        done = []
+        for import_ in imports:
+            try:
+                import_.rounds += 1
+                pending = []
+                for href in import_.pending:
+                    response = self._client.get(href)
+                    response.raise_for_status()
+                    task = response.json()
+                    if task['state'] in _TASK_END_STATES:
+                        import_.tasks.append(task)
+                        pending.extend(
+                            child['_href'] for child in task['spawned_tasks']
+                        )
+                    else:
+                        pending.append(href)
+                import_.pending = pending
+                if pending and import_.rounds >= _POLL_LIMIT:
+                    raise exceptions.TaskTimedOutError(
+                        'Tasks {} are ongoing after {} polls.'
+                        .format(pending, _POLL_LIMIT)
+                    )
+            except Exception as err:  # pylint:disable=broad-except
+                import_.error = err
+                self._client.delete(import_.upload_href)  # don't hide err
+                done.append(import_)
+                continue
+            if not pending:
+                try:
+                    self._client.delete(import_.upload_href).raise_for_status()
+                except Exception as err:  # pylint:disable=broad-except
+                    import_.error = err
+                done.append(import_)
+        return done
+
+
+class _Import(object):  # pylint:disable=too-few-public-methods
+    """The state of a file that is sent, but not finished.
+
+    :param upload_href: The path to the file's upload request.
+    :param call_report: The call report returned by the file's import.
+    :param size: The size of the file, in bytes.
+    """
+
+    def __init__(self, upload_href, call_report, size):
+        """Initialize this object with needed instance attributes."""
+        self.upload_href = upload_href
+        self.size = size
+        self.pending = [  # paths to the tasks not yet done
+            task['_href'] for task in call_report['spawned_tasks']
+        ]
+        self.tasks = []  # bodies of the tasks that are done
+        self.rounds = 0  # the number of times the tasks have been polled
+        self.error = None
+
+
+def format_report(report):
+    """Return a human-readable summary of an :class:`UploadReport`."""
+    return (
+        'Uploaded {} files ({:.1f} MB) in {:.1f}s: {:.2f} files/s, '
+        '{:.2f} MB/s. {} import tasks failed.'.format(
+            report.files,
+            report.bytes / 10 ** 6,
+            report.seconds,
+            report.files_per_second,
+            report.megabytes_per_second,
+            len(report.errors),
+        )
+    )
+
+
+def _get_parser():
+    """Return an argument parser for :func:`main`."""
+    parser = argparse.ArgumentParser(
+        prog='python -m pulp_smash.upload',
+        description='Upload files and directories of files into a Pulp '
+        'repository.',
+    )
+    parser.add_argument('repo_href', help='The path to the repository.')
+    parser.add_argument('paths', nargs='+', help='Files and directories.')
+    parser.add_argument(
+        '--unit-type',
+        help='The unit type ID of every file. Guessed by default.',
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='The number of files to upload at once. (default: %(default)s)',
+    )
+    return parser
+
+
+def main(argv=None):
+    """Upload files, print a report, and return an exit code."""
+    args = _get_parser().parse_args(argv)
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(get_paths(path))
+        else:
+            paths.append(path)
+    report = BulkUploader(
+        config.get_config(),
+        args.repo_href,
+        args.workers,
+    ).upload(paths, args.unit_type)
+    print(format_report(report))
+    return 1 if report.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,9 +11,13 @@ except ImportError:  # pragma: no cover
 
 import requests
 
-from pulp_smash import cli, exceptions
+from pulp_smash import exceptions
 from pulp_smash.constants import PULP_SERVICES
 
+# The `cli` module (and therefore the `plumbum` library) is imported by the
+# functions that use it, so that tests which only use Pulp's API do not pay to
+# import it. See `benchmarks.bench_imports`.
+
 
 _TASK_END_STATES = ('canceled', 'error', 'finished', 'skipped', 'timed out')
 
@@ -44,7 +48,7 @@ def poll_spawned_tasks(server_config, call_report):
             yield final_task_state
 
 
-def poll_task(server_config, href):
+def poll_task(server_config, href, callback=None):
     """Wait for a task and its children to complete. Yield response bodies.
 
     Poll the task at ``href``, waiting for the task to complete. When a
@@ -53,6 +57,9 @@ def poll_task(server_config, href):
 
     :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
     :param href: The path to a task you'd like to monitor recursively.
+    :param callback: A callable. If given, it is called with every task body
+        received, including those of unfinished tasks. A
+        :class:`pulp_smash.progress.ProgressMonitor` may be passed here.
     :returns: An generator yielding response bodies.
     :raises pulp_smash.exceptions.TaskTimedOutError: If a task takes too
         long to complete.
@@ -66,10 +73,16 @@ def poll_task(server_config, href):
         )
         response.raise_for_status()
         attrs = response.json()
+        if callback is not None:
+            callback(attrs)
         if attrs['state'] in _TASK_END_STATES:
             yield attrs
             for spawned_task in attrs['spawned_tasks']:
-                yield poll_task(server_config, spawned_task['_href'])
+                yield poll_task(
+                    server_config,
+                    spawned_task['_href'],
+                    callback,
+                )
             break
         poll_counter += 1
         if poll_counter > poll_limit:
@@ -81,6 +94,58 @@ def poll_task(server_config, href):
         sleep(5)
 
 
+def poll_tasks(server_config, hrefs, callback=None, poll_limit=24):
+    """Wait for several tasks and their children to complete. Yield bodies.
+
+    This function is like :func:`poll_task`, except that it watches many tasks
+    at once. Each round, every unfinished task is polled once, and then this
+    function sleeps once. As a result, waiting for N tasks takes about as long
+    as waiting for the slowest of them, rather than the sum of their durations.
+    Task bodies are yielded in the order in which the tasks complete.
+
+    :param server_config: A :class:`pulp_smash.config.ServerConfig` object.
+    :param hrefs: An iterable of paths to tasks you'd like to monitor.
+    :param callback: A callable. If given, it is called with every task body
+        received, as with :func:`poll_task`.
+    :param poll_limit: The number of rounds after which to give up. Rounds are
+        five seconds apart, so the default is two minutes.
+    :returns: A generator yielding response bodies.
+    :raises pulp_smash.exceptions.TaskTimedOutError: If the tasks take too
+        long to complete.
+    """
+    poll_counter = 0
+    pending = list(hrefs)
+    while pending:
+        unfinished = []
+        spawned = []
+        for href in pending:
+            response = requests.get(
+                urljoin(server_config.base_url, href),
+                **server_config.get_requests_kwargs()
+            )
+            response.raise_for_status()
+            attrs = response.json()
+            if callback is not None:
+                callback(attrs)
+            if attrs['state'] in _TASK_END_STATES:
+                yield attrs
+                spawned.extend(
+                    task['_href'] for task in attrs['spawned_tasks']
+                )
+            else:
+                unfinished.append(href)
+        pending = unfinished + spawned
+        if not unfinished:
+            continue  # Only newly spawned tasks remain. Poll them right away.
+        poll_counter += 1
+        if poll_counter > poll_limit:
+            raise exceptions.TaskTimedOutError(
+                'Tasks {} are ongoing after {} polls.'
+                .format(unfinished, poll_limit)
+            )
+        sleep(5)
+
+
 # See design discussion at: https://github.com/PulpQE/pulp-smash/issues/31
 def get_broker(server_config):
     """Build an object for managing the target system's AMQP broker.
@@ -100,6 +165,7 @@ def get_broker(server_config):
     # for login shells. (See pathmunge() in /etc/profile.) As a result, logging
     # into a system and executing `which qpidd` and remotely executing `ssh
     # pulp.example.com which qpidd` may return different results.
+    from pulp_smash import cli
     client = cli.Client(server_config, cli.echo_handler)
     executables = ('qpidd', 'rabbitmq')  # ordering indicates preference
     for executable in executables:
@@ -113,26 +179,33 @@ def get_broker(server_config):
     )
 
 
-def reset_pulp(server_config):
+def reset_pulp(server_config, callback=None):
     """Stop Pulp, reset its database, remove certain files, and start it.
 
+    Pulp's services are stopped and started on every host on which they run,
+    concurrently. (See :class:`pulp_smash.cli.Cluster`.)
+
     :param pulp_smash.config.ServerConfig server_config: Information about the
         Pulp server being targeted.
+    :param callback: A function that accepts a ``(name, line)`` tuple. It is
+        called with each line of output from ``pulp-manage-db`` as soon as the
+        line is read. (See :meth:`pulp_smash.cli.Client.stream`.)
     :returns: Nothing.
     """
-    services = tuple((
-        cli.Service(server_config, service) for service in PULP_SERVICES
-    ))
-    for service in services:
-        service.stop()
+    from pulp_smash import cli
+    cluster = cli.Cluster(server_config)
+    cluster.service(PULP_SERVICES, 'stop')
 
     # Reset the database and nuke accumulated files.
     client = cli.Client(server_config)
     prefix = '' if client.run(('id', '-u')).stdout.strip() == '0' else 'sudo '
     client.run('mongo pulp_database --eval db.dropDatabase()'.split())
-    client.run('sudo -u apache pulp-manage-db'.split())
+    process = client.stream('sudo -u apache pulp-manage-db'.split())
+    for output in process:
+        if callback is not None:
+            callback(output)
+    process.wait()
     client.run((prefix + 'rm -rf /var/lib/pulp/content/*').split())
     client.run((prefix + 'rm -rf /var/lib/pulp/published/*').split())
 
-    for service in services:
-        service.start()
+    cluster.service(PULP_SERVICES, 'start')
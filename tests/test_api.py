@@ -2,7 +2,12 @@
 """Unit tests for :mod:`pulp_smash.api`."""
 from __future__ import unicode_literals
 
+import copy
+import threading
+import time
+
 import mock
+import requests
 import unittest2
 
 from pulp_smash import api, config
@@ -75,6 +80,78 @@ class JsonHandlerTestCase(unittest2.TestCase):
         self.assertEqual(handle_202.call_count, 1)
 
 
+def _make_response(status_code, body=b'{"id": "a"}'):
+    """Return a ``requests.Response`` as if it had been received."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = 'Reason'
+    response.url = 'http://example.com/a/'
+    response.headers['Content-Type'] = 'application/json'
+    response.headers['Server'] = 'Apache'
+    response._content = body  # pylint:disable=protected-access
+    return response
+
+
+class CompactHandlerTestCase(unittest2.TestCase):
+    """Tests for :func:`pulp_smash.api.compact_handler`."""
+
+    def test_return(self):
+        """Assert a record of the passed-in ``response`` is returned."""
+        with mock.patch.object(api, '_handle_202') as handle_202:
+            record = api.compact_handler(mock.Mock(), _make_response(200))
+        self.assertIsInstance(record, api.CompactResponse)
+        self.assertEqual(handle_202.call_count, 1)
+
+    def test_raise_for_status(self):
+        """Assert an error is raised for an HTTP 4XX status code."""
+        with self.assertRaises(requests.HTTPError):
+            api.compact_handler(mock.Mock(), _make_response(404))
+
+    def test_echo(self):
+        """Assert ``compact_echo_handler`` checks nothing."""
+        with mock.patch.object(api, '_handle_202') as handle_202:
+            record = api.compact_echo_handler(
+                mock.Mock(),
+                _make_response(404),
+            )
+        self.assertEqual(record.status_code, 404)
+        self.assertEqual(handle_202.call_count, 0)
+
+
+class CompactResponseTestCase(unittest2.TestCase):
+    """Tests for :class:`pulp_smash.api.CompactResponse`."""
+
+    def test_attributes(self):
+        """Assert the status, selected headers and body are kept."""
+        record = api.CompactResponse(_make_response(201))
+        self.assertEqual(record.status_code, 201)
+        self.assertEqual(record.headers, {'Content-Type': 'application/json'})
+        self.assertEqual(record.content, b'{"id": "a"}')
+        self.assertEqual(record.text, '{"id": "a"}')
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_json(self):
+        """Assert the body is decoded afresh on each call."""
+        record = api.CompactResponse(_make_response(200))
+        record.json()['id'] = 'b'
+        self.assertEqual(record.json(), {'id': 'a'})
+
+    def test_raise_for_status(self):
+        """Assert only HTTP 4XX and 5XX status codes raise errors."""
+        for status_code in (200, 202, 301):
+            with self.subTest(status_code=status_code):
+                api.CompactResponse(
+                    _make_response(status_code)
+                ).raise_for_status()
+        for status_code in (400, 409, 500):
+            with self.subTest(status_code=status_code):
+                record = api.CompactResponse(_make_response(status_code))
+                with self.assertRaises(requests.HTTPError) as context:
+                    record.raise_for_status()
+                self.assertIs(context.exception.response, record)
+                self.assertIn(str(status_code), str(context.exception))
+
+
 class ClientTestCase(unittest2.TestCase):
     """Tests for :class:`pulp_smash.api.Client`."""
 
@@ -129,3 +206,254 @@ class ClientTestCase2(unittest2.TestCase):
                 with mock.patch.object(client, 'request') as request:
                     getattr(client, method)('some url', json)
                 self.assertIs(request.call_args[1]['json'], json)
+
+
+class RetryPolicyTestCase(unittest2.TestCase):
+    """Tests for :class:`pulp_smash.api.RetryPolicy`."""
+
+    def setUp(self):
+        """Create a policy, and stop it from sleeping."""
+        self.policy = api.RetryPolicy(max_retries=2)
+        patcher = mock.patch.object(api.time, 'sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def response(status_code, headers=None):
+        """Return a mock response with the given status code and headers."""
+        return mock.Mock(status_code=status_code, headers=headers or {})
+
+    def test_retry_status(self):
+        """Assert a GET request is retried after a transient failure."""
+        responses = [self.response(503), self.response(200)]
+        send = mock.Mock(side_effect=responses)
+        self.assertIs(self.policy.send(send, 'GET'), responses[1])
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(self.policy.metrics['retries.status.503'], 1)
+        self.assertEqual(self.policy.metrics['retries.GET'], 1)
+
+    def test_retry_error(self):
+        """Assert a request is retried after a connection error."""
+        response = self.response(200)
+        send = mock.Mock(side_effect=[api.requests.ConnectionError, response])
+        self.assertIs(self.policy.send(send, 'PUT'), response)
+        self.assertEqual(
+            self.policy.metrics['retries.error.ConnectionError'], 1
+        )
+
+    def test_post(self):
+        """Assert a POST request is retried only if marked idempotent."""
+        for idempotent, call_count in ((None, 1), (True, 2)):
+            with self.subTest(idempotent=idempotent):
+                send = mock.Mock(
+                    side_effect=[self.response(503), self.response(200)]
+                )
+                self.policy.send(send, 'POST', idempotent)
+                self.assertEqual(send.call_count, call_count)
+
+    def test_exhausted(self):
+        """Assert the last response is returned once retries run out."""
+        responses = [self.response(503) for _ in range(3)]
+        send = mock.Mock(side_effect=responses)
+        self.assertIs(self.policy.send(send, 'GET'), responses[-1])
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(self.policy.metrics['exhausted'], 1)
+
+    def test_budget(self):
+        """Assert no request is retried once the budget is spent."""
+        self.policy.budget = 1
+        for call_count in (2, 1):
+            with self.subTest(call_count=call_count):
+                send = mock.Mock(return_value=self.response(503))
+                self.policy.send(send, 'GET')
+                self.assertEqual(send.call_count, call_count)
+        self.assertEqual(self.policy.metrics['budget_exhausted'], 2)
+
+    def test_retry_after(self):
+        """Assert a ``Retry-After`` header is obeyed, within limits."""
+        for value, delay in (('2', 2), ('120', 30)):
+            with self.subTest(value=value):
+                response = self.response(429, {'Retry-After': value})
+                self.assertEqual(self.policy.get_delay(0, response), delay)
+
+    def test_backoff(self):
+        """Assert the backoff grows exponentially and is capped."""
+        with mock.patch.object(api.random, 'uniform') as uniform:
+            uniform.side_effect = lambda low, high: high
+            self.assertEqual(
+                [self.policy.get_delay(retry) for retry in (0, 1, 2, 10)],
+                [0.5, 1, 2, 30],
+            )
+
+
+class ClientRetryTestCase(unittest2.TestCase):
+    """Test how :class:`pulp_smash.api.Client` retries requests."""
+
+    def test_idempotent(self):
+        """Assert ``idempotent`` goes to the retry policy, not Requests."""
+        policy = mock.Mock()
+        client = api.Client(
+            config.ServerConfig('http://example.com'),
+            api.echo_handler,
+            retry_policy=policy,
+        )
+        with mock.patch.object(api.requests, 'request') as request:
+            client.post('', {}, idempotent=True)
+            policy.send.call_args[0][0]()  # call the `send` callback
+        self.assertEqual(policy.send.call_args[0][1:], ('POST', True))
+        self.assertNotIn('idempotent', request.call_args[1])
+
+    def test_default_policy(self):
+        """Assert clients share one retry policy by default."""
+        cfg = config.ServerConfig('http://example.com')
+        self.assertIs(
+            api.Client(cfg).retry_policy,
+            api.Client(cfg).retry_policy,
+        )
+
+    def test_opt_in(self):
+        """Assert requests are retried only if asked for."""
+        for environ, max_retries in (
+                ({}, 0),
+                ({'PULP_SMASH_RETRIES': '3'}, 3)):
+            with self.subTest(environ=environ):
+                with mock.patch.dict(api.os.environ, environ, clear=True):
+                    with mock.patch.object(api, '_RETRY_POLICY', None):
+                        policy = api.get_retry_policy()
+                self.assertEqual(policy.max_retries, max_retries)
+
+
+class SingleFlightTestCase(unittest2.TestCase):
+    """Tests for :class:`pulp_smash.api.SingleFlight`."""
+
+    def setUp(self):
+        """Create a single-flight group, and a function that blocks."""
+        self.group = api.SingleFlight()
+        self.release = threading.Event()
+        self.func = mock.Mock(side_effect=self.wait)
+
+    def wait(self):
+        """Block until released, then return a new dict."""
+        self.release.wait()
+        return {'id': 1}
+
+    def call_concurrently(self, count, key=lambda i: 'key'):
+        """Call ``self.func`` in ``count`` threads. Return their results."""
+        results = [None] * count
+
+        def target(i):
+            """Store the result of one call."""
+            results[i] = self.group.do(key(i), self.func)
+
+        threads = [
+            threading.Thread(target=target, args=(i,)) for i in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        while self.group.metrics['calls'] < count:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_coalesced(self):
+        """Assert concurrent calls with one key share one call."""
+        results = self.call_concurrently(4)
+        self.assertEqual(self.func.call_count, 1)
+        self.assertEqual(results, [{'id': 1}] * 4)
+        self.assertEqual(self.group.coalescing_ratio, 0.75)
+
+    def test_not_aliased(self):
+        """Assert callers sharing a call do not share a mutable result."""
+        results = self.call_concurrently(2)
+        self.assertIsNot(results[0], results[1])
+
+    def test_leader_mutates(self):
+        """Assert waiters get the original result if the leader changes it.
+
+        Waiters copy the result only after the leader's caller has changed
+        its own result.
+        """
+        mutated = threading.Event()
+        results = {}
+
+        def copy_later(obj):
+            """Copy ``obj`` once the leader has changed its result."""
+            if threading.current_thread().name != 'leader':
+                mutated.wait(5)
+            return copy.deepcopy(obj)
+
+        def lead():
+            """Make the first call, and change its result."""
+            results['leader'] = self.group.do('key', self.func)
+            results['leader']['id'] = 2
+            mutated.set()
+
+        def wait(name):
+            """Make a call that shares the leader's outcome."""
+            results[name] = self.group.do('key', self.func)
+
+        threads = [threading.Thread(target=lead, name='leader')]
+        threads.extend(
+            threading.Thread(target=wait, args=(i,)) for i in range(2)
+        )
+        with mock.patch.object(api, 'copy') as copy_module:
+            copy_module.deepcopy.side_effect = copy_later
+            threads[0].start()
+            while self.group.metrics['calls'] < 1:
+                time.sleep(0.001)
+            for thread in threads[1:]:
+                thread.start()
+            while self.group.metrics['calls'] < 3:
+                time.sleep(0.001)
+            self.release.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results['leader'], {'id': 2})
+        self.assertEqual([results[0], results[1]], [{'id': 1}] * 2)
+
+    def test_distinct_keys(self):
+        """Assert calls with distinct keys are not coalesced."""
+        self.call_concurrently(3, key=lambda i: i)
+        self.assertEqual(self.func.call_count, 3)
+        self.assertEqual(self.group.coalescing_ratio, 0)
+
+    def test_not_cached(self):
+        """Assert a completed call's result is not reused."""
+        self.release.set()
+        for _ in range(2):
+            self.group.do('key', self.func)
+        self.assertEqual(self.func.call_count, 2)
+
+    def test_error(self):
+        """Assert an exception is raised to its caller."""
+        with self.assertRaises(ValueError):
+            self.group.do('key', mock.Mock(side_effect=ValueError))
+        self.assertEqual(self.group.do('key', lambda: 1), 1)
+
+
+class ClientSingleFlightTestCase(unittest2.TestCase):
+    """Test how :class:`pulp_smash.api.Client` coalesces requests."""
+
+    def setUp(self):
+        """Create a client with a mock single-flight group."""
+        self.client = api.Client(
+            config.ServerConfig('http://example.com'),
+            api.echo_handler,
+            single_flight=mock.Mock(),
+        )
+
+    def test_get(self):
+        """Assert GET requests are coalesced by method, URL and handler."""
+        self.client.get('/foo/')
+        key = self.client.single_flight.do.call_args[0][0]
+        self.assertEqual(key[:2], ('GET', api.echo_handler))
+        self.assertIn('http://example.com/foo/', key[2])
+
+    def test_not_coalesced(self):
+        """Assert other requests and streamed requests are not coalesced."""
+        with mock.patch.object(api.requests, 'request'):
+            self.client.post('/foo/')
+            self.client.get('/foo/', stream=True)
+        self.assertEqual(self.client.single_flight.do.call_count, 0)
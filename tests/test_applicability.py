@@ -0,0 +1,187 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.applicability`."""
+from __future__ import unicode_literals
+
+import threading
+
+import mock
+import unittest2
+
+from pulp_smash import applicability, config
+
+
+def _task(href, start, finish):
+    """Return a finished task body."""
+    return {
+        '_href': href,
+        'finish_time': '2016-01-05T19:05:{:02}Z'.format(finish),
+        'spawned_tasks': [],
+        'start_time': '2016-01-05T19:05:{:02}Z'.format(start),
+        'state': 'finished',
+    }
+
+
+class MakeProfileTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.applicability.make_profile`."""
+
+    def test_upgradable(self):
+        """Assert upgradable packages are old, and count towards the size."""
+        profile = applicability.make_profile(3, ('bear',))
+        self.assertEqual(
+            [(package['name'], package['version']) for package in profile],
+            [
+                ('bear', '0.1'),
+                ('pulp-smash-synthetic-0', '1.0'),
+                ('pulp-smash-synthetic-1', '1.0'),
+            ],
+        )
+        self.assertEqual(len(applicability.make_profile(1, ('a', 'b'))), 1)
+
+
+class RegisterConsumersTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.applicability.register_consumers`."""
+
+    def test_register(self):
+        """Assert each consumer is registered, profiled and bound."""
+        paths = []
+        lock = threading.Lock()
+
+        def post(path, body):
+            """Record ``path``, and return a registered consumer."""
+            with lock:
+                paths.append(path)
+            return {'consumer': {'id': body.get('id')}}
+
+        with mock.patch.object(applicability.api, 'Client') as client:
+            client.return_value.post.side_effect = post
+            consumers = applicability.register_consumers(
+                config.ServerConfig('http://example.com'),
+                5,
+                applicability.make_profile(2),
+                [('repo1', 'dist1'), ('repo2', 'dist2')],
+                workers=2,
+            )
+        self.assertEqual(len(consumers), 5)
+        self.assertEqual(len(set(c['_href'] for c in consumers)), 5)
+        for consumer in consumers:
+            self.assertEqual(
+                consumer['_href'],
+                '/pulp/api/v2/consumers/{}/'.format(consumer['id']),
+            )
+        self.assertEqual(
+            [path.split('/')[-2] for path in paths].count('bindings'),
+            10,
+        )
+        self.assertEqual(len(paths), 20)
+
+    def test_partial_failure(self):
+        """Assert consumers registered before a failure are still reported."""
+        failed = []
+        lock = threading.Lock()
+
+        def post(path, body):
+            """Fail to bind the first consumer that is bound."""
+            if path.endswith('/bindings/'):
+                with lock:
+                    if not failed:
+                        failed.append(path)
+                        raise RuntimeError('oops')
+            return {'consumer': {'id': body.get('id')}}
+
+        created = []
+        with mock.patch.object(applicability.api, 'Client') as client:
+            client.return_value.post.side_effect = post
+            with self.assertRaises(RuntimeError):
+                applicability.register_consumers(
+                    config.ServerConfig('http://example.com'),
+                    4,
+                    applicability.make_profile(2),
+                    [('repo1', 'dist1')],
+                    workers=2,
+                    created=created,
+                )
+        self.assertEqual(len(created), 4)
+        self.assertIn(
+            failed[0],
+            [consumer['_href'] + 'bindings/' for consumer in created],
+        )
+
+
+class RegenerateTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.applicability.regenerate`."""
+
+    def setUp(self):
+        """Provide a server config."""
+        self.cfg = config.ServerConfig('http://example.com')
+
+    def test_series(self):
+        """Assert the tasks in a call report are polled."""
+        tasks = (_task('/tasks/1/', 0, 4),)
+        with mock.patch.object(applicability.api, 'Client') as client:
+            client.return_value.post.return_value.json.return_value = {
+                'spawned_tasks': [{'_href': '/tasks/1/'}],
+            }
+            with mock.patch.object(
+                    applicability.utils,
+                    'poll_tasks',
+                    return_value=iter(tasks)) as poll_tasks:
+                result = applicability.regenerate(
+                    self.cfg,
+                    'repos-series',
+                    8,
+                    applicability.REPO_REGENERATE_PATH,
+                    {'repo_criteria': {}},
+                )
+        self.assertEqual(poll_tasks.call_args[0][1], ['/tasks/1/'])
+        self.assertEqual(
+            result,
+            applicability.Regeneration('repos-series', 8, 4, tasks),
+        )
+        self.assertEqual(
+            applicability.format_report([result]),
+            'repos-series: 4.00s for 8 consumers (2.0 consumers/s), 1 tasks',
+        )
+
+    def test_parallel(self):
+        """Assert a task group is polled until all of its tasks stop."""
+        tasks = [_task('/tasks/1/', 0, 3), _task('/tasks/2/', 1, 5)]
+        summaries = iter((
+            {'finished': 1, 'running': 1, 'total': 2},
+            {'finished': 1, 'error': 1, 'total': 2},
+        ))
+        report = mock.Mock()
+        report.json.return_value = {
+            '_href': '/pulp/api/v2/task_groups/g1/',
+            'group_id': 'g1',
+        }
+        with mock.patch.object(applicability.api, 'Client') as client:
+            # The regeneration request, and then the search for tasks.
+            client.return_value.post.side_effect = [report, tasks]
+            client.return_value.get.side_effect = lambda path: next(summaries)
+            with mock.patch.object(applicability.time, 'sleep') as sleep:
+                result = applicability.regenerate(
+                    self.cfg,
+                    'repos-parallel',
+                    8,
+                    applicability.REPO_REGENERATE_PATH,
+                    {'repo_criteria': {}, 'parallel': True},
+                )
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(
+            client.return_value.get.call_args[0][0],
+            '/pulp/api/v2/task_groups/g1/state-summary/',
+        )
+        self.assertEqual(result.seconds, 5)
+        self.assertEqual(len(result.tasks), 2)
+
+    def test_timeout(self):
+        """Assert polling a task group gives up eventually."""
+        with mock.patch.object(applicability.api, 'Client') as client:
+            client.return_value.get.return_value = {
+                'running': 1, 'total': 1,
+            }
+            with mock.patch.object(applicability.time, 'sleep'):
+                with self.assertRaises(
+                        applicability.exceptions.TaskTimedOutError):
+                    applicability.poll_task_group(self.cfg, 'g1', 3)
+        self.assertEqual(client.return_value.get.call_count, 3)
@@ -0,0 +1,138 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.artifacts`."""
+from __future__ import unicode_literals
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+import mock
+import requests
+import unittest2
+
+from pulp_smash import artifacts, utils
+
+
+def _mock_response(content, status_code=200, headers=None):
+    """Return a mock response with the given body, status code and headers."""
+    response = mock.Mock(status_code=status_code, headers=headers or {})
+    response.iter_content.return_value = iter((content,))
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError
+    return response
+
+
+class ArtifactCacheTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.artifacts.ArtifactCache`."""
+
+    def setUp(self):
+        """Create a cache in a temporary directory."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.session = mock.Mock()
+        self.cache = artifacts.ArtifactCache(
+            self.directory,
+            max_size=10,
+            session=self.session,
+        )
+        self.url = 'http://example.com/' + utils.uuid4()
+
+    def test_get_path(self):
+        """Assert a file is stored under its checksum."""
+        self.session.get.return_value = _mock_response(b'abc')
+        path = self.cache.get_path(self.url)
+        self.assertEqual(
+            os.path.basename(path),
+            hashlib.sha256(b'abc').hexdigest(),
+        )
+        with open(path, 'rb') as handle:
+            self.assertEqual(handle.read(), b'abc')
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'tmp')), [])
+
+    def test_hit(self):
+        """Assert a fresh file is downloaded once."""
+        self.session.get.return_value = _mock_response(b'abc')
+        paths = [self.cache.get_path(self.url) for _ in range(2)]
+        self.assertEqual(paths[0], paths[1])
+        self.assertEqual(self.session.get.call_count, 1)
+
+    def test_shared(self):
+        """Assert caches in the same directory share files."""
+        self.session.get.return_value = _mock_response(b'abc')
+        self.cache.get_path(self.url)
+        session = mock.Mock()
+        artifacts.ArtifactCache(self.directory, session=session).get_path(
+            self.url
+        )
+        self.assertEqual(session.get.call_count, 0)
+
+    def test_revalidate(self):
+        """Assert a stale file is revalidated, and not downloaded again."""
+        self.cache.max_age = 0
+        self.session.get.return_value = _mock_response(
+            b'abc',
+            headers={'ETag': '"x"', 'Last-Modified': 'yesterday'},
+        )
+        path = self.cache.get_path(self.url)
+        response = _mock_response(b'', status_code=304)
+        self.session.get.return_value = response
+        self.assertEqual(self.cache.get_path(self.url), path)
+        self.assertTrue(response.close.called)
+        headers = self.session.get.call_args[1]['headers']
+        self.assertEqual(headers['If-None-Match'], '"x"')
+        self.assertEqual(headers['If-Modified-Since'], 'yesterday')
+
+    def test_changed(self):
+        """Assert a stale file is replaced if it has changed upstream."""
+        self.cache.max_age = 0
+        self.session.get.return_value = _mock_response(b'abc')
+        self.cache.get_path(self.url)
+        self.session.get.return_value = _mock_response(b'def')
+        with self.cache.open(self.url) as handle:
+            self.assertEqual(handle.read(), b'def')
+
+    def test_failure(self):
+        """Assert a failed download raises an exception and caches nothing."""
+        self.session.get.return_value = _mock_response(b'', status_code=404)
+        with self.assertRaises(requests.HTTPError):
+            self.cache.get_path(self.url)
+        self.assertEqual(
+            os.listdir(os.path.join(self.directory, 'index')),
+            [],
+        )
+
+    def test_mmap(self):
+        """Assert a cached file can be memory mapped."""
+        self.session.get.return_value = _mock_response(b'abc')
+        mapping = self.cache.mmap(self.url)
+        self.addCleanup(mapping.close)
+        self.assertEqual(mapping[:], b'abc')
+
+    def test_evict(self):
+        """Assert the least recently used files are evicted."""
+        paths = []
+        self.cache.max_size = 100
+        for i, content in enumerate((b'aaaa', b'bbbb', b'cccc')):
+            self.session.get.return_value = _mock_response(content)
+            paths.append(self.cache.get_path(self.url + type('')(i)))
+            os.utime(paths[-1], (i, i))
+        self.cache.get_path(self.url + '0')  # bump the first file
+        self.cache.max_size = 10
+        self.assertEqual(self.cache.evict(), 4)
+        self.assertEqual(
+            [os.path.exists(path) for path in paths],
+            [True, False, True],
+        )
+
+    def test_evict_large(self):
+        """Assert a file larger than the cache is still handed back."""
+        self.session.get.return_value = _mock_response(b'a' * 4)
+        small = self.cache.get_path(self.url + '0')
+        os.utime(small, (0, 0))
+        self.session.get.return_value = _mock_response(b'b' * 20)
+        path = self.cache.get_path(self.url + '1')
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.exists(small))
+        self.assertEqual(self.cache.evict(), 0)  # e.g. by another process
+        self.assertTrue(os.path.exists(path))
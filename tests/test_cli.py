@@ -2,8 +2,11 @@
 """Unit tests for :mod:`pulp_smash.api`."""
 from __future__ import unicode_literals
 
+import io
 import socket
 import subprocess
+import threading
+import time
 
 import mock
 import unittest2
@@ -126,6 +129,13 @@ class ClientTestCase(unittest2.TestCase):
         cfg = config.ServerConfig(utils.uuid4(), cli_transport='local')
         self.assertIs(cli.Client(cfg).response_handler, cli.code_handler)
 
+    def test_explicit_hostname(self):
+        """Assert it is possible to target a host other than ``base_url``."""
+        cfg = config.ServerConfig('pulp.example.com')
+        with mock.patch.object(cli.plumbum.machines, 'SshMachine') as ssh:
+            cli.Client(cfg, hostname='w1.example.com')
+        ssh.assert_called_once_with('w1.example.com')
+
     def test_explicit_response_handler(self):
         """Assert it is possible to explicitly set a response handler."""
         cfg = config.ServerConfig(utils.uuid4(), cli_transport='local')
@@ -133,6 +143,155 @@ class ClientTestCase(unittest2.TestCase):
         self.assertIs(cli.Client(cfg, handler).response_handler, handler)
 
 
+class ClusterTestCase(unittest2.TestCase):
+    """Tests for :class:`pulp_smash.cli.Cluster`."""
+
+    def setUp(self):
+        """Describe a deployment with two worker hosts."""
+        self.cfg = config.ServerConfig(
+            'https://pulp.example.com',
+            hosts={'pulp_workers': ['w1.example.com', 'w2.example.com']},
+        )
+        self.cluster = cli.Cluster(self.cfg)
+
+    def test_get_hosts(self):
+        """Assert groups not listed consist of the ``base_url`` host."""
+        self.assertEqual(
+            self.cluster.get_hosts('pulp_workers'),
+            ('w1.example.com', 'w2.example.com'),
+        )
+        self.assertEqual(
+            self.cluster.get_hosts('httpd'),
+            ('pulp.example.com',),
+        )
+        self.assertEqual(
+            cli.Cluster(self.cfg.freeze()).get_hosts('pulp_workers'),
+            ('w1.example.com', 'w2.example.com'),
+        )
+
+    def test_run(self):
+        """Assert a command runs on every host of a group at once."""
+        barrier = []
+        lock = threading.Lock()
+
+        def run(args):
+            """Wait until both hosts are running the command."""
+            with lock:
+                barrier.append(args)
+            while len(barrier) < 2:
+                time.sleep(0.01)
+            return args
+
+        with mock.patch.object(cli, 'Client') as client:
+            client.return_value.run.side_effect = run
+            results = self.cluster.run('pulp_workers', ('id', '-u'))
+        self.assertEqual(
+            [result.hostname for result in results],
+            ['w1.example.com', 'w2.example.com'],
+        )
+        self.assertEqual(results[0].result, ('id', '-u'))
+        self.assertGreaterEqual(results[0].seconds, 0)
+        self.assertEqual(
+            sorted(call[0][2] for call in client.call_args_list),
+            ['w1.example.com', 'w2.example.com'],
+        )
+
+    def test_service(self):
+        """Assert each service is acted on on each of its hosts."""
+        with mock.patch.object(cli, 'Service') as service:
+            results = self.cluster.service(('pulp_workers', 'httpd'), 'stop')
+        self.assertEqual(
+            [result.hostname for result in results],
+            ['pulp.example.com', 'w1.example.com', 'w2.example.com'],
+        )
+        self.assertEqual(
+            sorted(call[0][1:] for call in service.call_args_list),
+            [
+                ('httpd', 'pulp.example.com'),
+                ('pulp_workers', 'w1.example.com'),
+                ('pulp_workers', 'w2.example.com'),
+            ],
+        )
+        self.assertEqual(service.return_value.stop.call_count, 3)
+
+
+class StreamTestCase(unittest2.TestCase):
+    """Tests for :meth:`pulp_smash.cli.Client.stream`."""
+
+    def setUp(self):
+        """Create a client whose machine runs nothing."""
+        cfg = config.ServerConfig(utils.uuid4(), cli_transport='local')
+        self.client = cli.Client(cfg, cli.echo_handler)
+        self.client.machine = mock.MagicMock()
+        self.popen = (
+            self.client.machine.__getitem__.return_value
+            .__getitem__.return_value.popen.return_value
+        )
+        self.popen.stdout = io.BytesIO(b'one\ntwo\nthree')
+        self.popen.stderr = io.BytesIO(b'warning\n')
+        self.popen.wait.return_value = 0
+
+    def test_lines(self):
+        """Assert every line is yielded, in order within each stream."""
+        lines = list(self.client.stream(('foo',)))
+        self.assertEqual(
+            [line for name, line in lines if name == 'stdout'],
+            ['one\n', 'two\n', 'three'],
+        )
+        self.assertEqual(
+            [line for name, line in lines if name == 'stderr'],
+            ['warning\n'],
+        )
+
+    def test_keep(self):
+        """Assert only the end of each stream is kept."""
+        completed_proc = self.client.stream(('foo',), keep=7).wait()
+        self.assertEqual(completed_proc.returncode, 0)
+        self.assertEqual(completed_proc.stdout, 'o\nthree')
+        self.assertEqual(completed_proc.stderr, 'arning\n')
+
+    def test_timeout(self):
+        """Assert commands with a timeout are run with ``timeout(1)``."""
+        self.client.stream(('foo', 'bar'), timeout=60).wait()
+        args = self.client.machine.__getitem__.call_args[0] + (
+            self.client.machine.__getitem__.return_value
+            .__getitem__.call_args[0][0]
+        )
+        self.assertEqual(args[0], 'timeout')
+        self.assertEqual(args[-3:], ('60', 'foo', 'bar'))
+
+    def test_deadline(self):
+        """Assert the local process is killed if the deadline passes."""
+        self.popen.stdout = mock.Mock()
+        self.popen.stdout.readline.side_effect = lambda: (
+            b'' if self.popen.kill.called else time.sleep(0.01) or b'...\n'
+        )
+        process = cli.StreamingProcess(
+            self.client, ('foo',), self.popen, 10, time.time() + 0.05
+        )
+        process.wait()
+        self.assertTrue(self.popen.kill.called)
+
+
+class RingBufferTestCase(unittest2.TestCase):
+    """Tests for ``pulp_smash.cli._RingBuffer``."""
+
+    def test_bounded(self):
+        """Assert only the last ``max_size`` characters are kept."""
+        buf = cli._RingBuffer(5)  # pylint:disable=protected-access
+        for text in ('ab', 'cdef', 'g'):
+            buf.append(text)
+        self.assertEqual(buf.getvalue(), 'cdefg')
+        buf.append('hijklmn')
+        self.assertEqual(buf.getvalue(), 'jklmn')
+
+    def test_unbounded(self):
+        """Assert everything is kept if ``max_size`` is ``None``."""
+        buf = cli._RingBuffer(None)  # pylint:disable=protected-access
+        buf.append('a' * 1000)
+        self.assertEqual(len(buf.getvalue()), 1000)
+
+
 class ServiceTestCase(unittest2.TestCase):
     """Tests for :class:`pulp_smash.cli.Service`."""
 
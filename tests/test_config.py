@@ -2,18 +2,19 @@
 """Unit tests for :mod:`pulp_smash.config`."""
 from __future__ import unicode_literals
 
+import copy
 import itertools
 import json
 import os
 import random
-try:  # try Python 3 import first
-    import builtins
-except ImportError:
-    import __builtin__ as builtins  # pylint:disable=C0411,E0401
+import shutil
+import stat
+import tempfile
 
 import mock
 import unittest2
 import xdg
+from packaging.version import Version
 
 from pulp_smash import config, exceptions, utils
 
@@ -29,6 +30,7 @@ def _gen_attrs():
         key: utils.uuid4() for key in ('base_url', 'cli_transport', 'verify')
     }
     attrs['auth'] = [utils.uuid4() for _ in range(2)]
+    attrs['hosts'] = {utils.uuid4(): [utils.uuid4() for _ in range(2)]}
     attrs['version'] = '.'.join(
         type('')(random.randint(1, 150)) for _ in range(4)
     )
@@ -52,6 +54,42 @@ class GetConfigTestCase(unittest2.TestCase):
                 config.get_config()
         self.assertEqual(read.call_count, 1)
 
+    def test_copy(self):
+        """A mutable copy of the cached config is returned."""
+        cached = config.ServerConfig(**_gen_attrs()).freeze()
+        with mock.patch.object(config, '_CONFIG', cached):
+            cfg = config.get_config()
+        self.assertIsInstance(cfg, config.ServerConfig)
+        self.assertEqual(repr(cfg.freeze()), repr(cached))
+
+
+class GetFrozenConfigTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.config.get_frozen_config`."""
+
+    def test_no_copy(self):
+        """The cached config object itself is returned."""
+        cached = config.ServerConfig(**_gen_attrs()).freeze()
+        with mock.patch.object(config, '_CONFIG', cached):
+            self.assertIs(config.get_frozen_config(), cached)
+
+    def test_cache_empty(self):
+        """A config is read from disk and frozen if the cache is empty."""
+        with mock.patch.object(config, '_CONFIG', None):
+            with mock.patch.object(config.ServerConfig, 'read') as read:
+                cfg = config.get_frozen_config()
+        self.assertEqual(read.call_count, 1)
+        self.assertIs(cfg, read.return_value.freeze.return_value)
+
+    def test_section(self):
+        """The section named by ``PULP_SMASH_CONFIG_SECTION`` is read."""
+        section = utils.uuid4()
+        environ = {'PULP_SMASH_CONFIG_SECTION': section}
+        with mock.patch.object(config, '_CONFIG', None):
+            with mock.patch.dict(os.environ, environ):
+                with mock.patch.object(config.ServerConfig, 'read') as read:
+                    config.get_frozen_config()
+        read.assert_called_once_with(section)
+
 
 class InitTestCase(unittest2.TestCase):
     """Test :class:`pulp_smash.config.ServerConfig` instantiation."""
@@ -96,54 +134,115 @@ class PulpSmashConfigFileTestCase(unittest2.TestCase):
         self.assertEqual(cfg._xdg_config_file, 'settings.json')
 
 
-class ReadTestCase(unittest2.TestCase):
-    """Test :meth:`pulp_smash.config.ServerConfig.read`."""
+class _ConfigFileTestCase(unittest2.TestCase):
+    """Provide a temporary configuration directory, and reset caches."""
 
-    @classmethod
-    def setUpClass(cls):
-        """Read a mock configuration file section. Save relevant objects."""
-        cls.attrs = _gen_attrs()  # config section values
-        cls.open_ = mock.mock_open(
-            read_data=json.dumps({'default': cls.attrs})
+    def setUp(self):
+        """Create a temporary directory and a path to a file within it."""
+        self.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.config_dir)
+        self.path = os.path.join(self.config_dir, 'settings.json')
+        # pylint:disable=protected-access
+        patchers = (
+            mock.patch.dict(config._PATH_CACHE, clear=True),
+            mock.patch.dict(config._FILE_CACHE, clear=True),
+            mock.patch.object(
+                config,
+                '_get_config_file_path',
+                return_value=self.path,
+            ),
+            mock.patch.object(
+                xdg.BaseDirectory,
+                'save_config_path',
+                return_value=self.config_dir,
+            ),
         )
-        with mock.patch.object(builtins, 'open', cls.open_):
-            with mock.patch.object(config, '_get_config_file_path'):
-                cls.cfg = config.ServerConfig().read()
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write(self, contents):
+        """Write ``contents`` to the configuration file, as JSON.
+
+        Bump the file's modification time, so that a rewrite is noticed even
+        if the file system has a coarse timestamp granularity.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime + 10
+        except OSError:
+            mtime = None
+        with open(self.path, 'w') as handle:
+            json.dump(contents, handle)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def read(self):
+        """Return the decoded contents of the configuration file."""
+        with open(self.path) as handle:
+            return json.load(handle)
+
+
+class ReadTestCase(_ConfigFileTestCase):
+    """Test :meth:`pulp_smash.config.ServerConfig.read`."""
+
+    def setUp(self):
+        """Write a configuration file."""
+        super(ReadTestCase, self).setUp()
+        self.attrs = _gen_attrs()  # config section values
+        self.write({'default': self.attrs})
 
     def test_attrs(self):
         """Assert that config file values are assigned to a config obj."""
-        attrs = config._public_attrs(self.cfg)  # pylint:disable=W0212
+        cfg = config.ServerConfig().read()
+        attrs = config._public_attrs(cfg)  # pylint:disable=W0212
         attrs['version'] = type('')(attrs['version'])
         self.assertEqual(self.attrs, attrs)
 
-    def test_open(self):
-        """Assert that ``open`` was called once."""
-        self.assertEqual(self.open_.call_count, 1)
+    def test_parse_once(self):
+        """Assert that an unchanged file is parsed only once."""
+        with mock.patch.object(config.json, 'load', wraps=json.load) as load:
+            for _ in range(3):
+                config.ServerConfig().read()
+        self.assertEqual(load.call_count, 1)
+
+    def test_reparse(self):
+        """Assert that a changed file is parsed again."""
+        config.ServerConfig().read()
+        self.attrs['base_url'] = utils.uuid4()
+        self.write({'default': self.attrs})
+        cfg = config.ServerConfig().read()
+        self.assertEqual(cfg.base_url, self.attrs['base_url'])
+
+    def test_no_aliasing(self):
+        """Assert that modifying a config doesn't affect later reads."""
+        config.ServerConfig().read().auth.append(utils.uuid4())
+        self.assertEqual(config.ServerConfig().read().auth, self.attrs['auth'])
 
 
-class SectionsTestCase(unittest2.TestCase):
+class SectionsTestCase(_ConfigFileTestCase):
     """Test :meth:`pulp_smash.config.ServerConfig.sections`."""
 
-    @classmethod
-    def setUpClass(cls):
-        """Read a mock configuration file's sections. Save relevant objects."""
-        cls.config = random.choice((
+    def setUp(self):
+        """Write a configuration file."""
+        super(SectionsTestCase, self).setUp()
+        self.config = random.choice((
             {},
             {'foo': None},
             {'foo': None, 'bar': None, 'biz': None},
         ))
-        cls.open_ = mock.mock_open(read_data=json.dumps(cls.config))
-        with mock.patch.object(builtins, 'open', cls.open_):
-            with mock.patch.object(config, '_get_config_file_path'):
-                cls.sections = config.ServerConfig().sections()
+        self.write(self.config)
 
     def test_sections(self):
         """Assert that the correct section names are returned."""
-        self.assertEqual(set(self.config.keys()), self.sections)
+        sections = config.ServerConfig().sections()
+        self.assertEqual(set(self.config.keys()), sections)
 
-    def test_open(self):
-        """Assert that ``open`` was called once."""
-        self.assertEqual(self.open_.call_count, 1)
+    def test_parse_once(self):
+        """Assert that the file is parsed once for reads and sections."""
+        with mock.patch.object(config.json, 'load', wraps=json.load) as load:
+            config.ServerConfig().sections()
+            config.ServerConfig().sections()
+        self.assertEqual(load.call_count, 1)
 
 
 class GetRequestsKwargsTestCase(unittest2.TestCase):
@@ -159,7 +258,7 @@ class GetRequestsKwargsTestCase(unittest2.TestCase):
     def test_kwargs(self):
         """Assert that the method returns correct values."""
         attrs = self.attrs.copy()
-        for key in ('base_url', 'cli_transport', 'version'):
+        for key in ('base_url', 'cli_transport', 'hosts', 'version'):
             del attrs[key]
         attrs['auth'] = tuple(attrs['auth'])
         self.assertEqual(attrs, self.kwargs)
@@ -203,40 +302,118 @@ class ReprTestCase(unittest2.TestCase):
         self.assertEqual(self.result, repr(eval(self.result)))
 
 
-class DeleteTestCase(unittest2.TestCase):
+class FrozenServerConfigTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.config.FrozenServerConfig`."""
+
+    def setUp(self):
+        """Generate attributes and freeze a config."""
+        self.attrs = _gen_attrs()
+        self.cfg = config.ServerConfig(**self.attrs).freeze()
+
+    def test_attrs(self):
+        """Assert the frozen config has the attributes it was given."""
+        for key, value in self.attrs.items():
+            if key == 'auth':
+                value = tuple(value)
+            elif key == 'version':
+                value = Version(value)
+            elif key == 'hosts':
+                value = tuple(
+                    (group, tuple(hostnames))
+                    for group, hostnames in value.items()
+                )
+            with self.subTest(key=key):
+                self.assertEqual(getattr(self.cfg, key), value)
+
+    def test_immutable(self):
+        """Assert attributes cannot be set, deleted or added."""
+        with self.assertRaises(AttributeError):
+            self.cfg.base_url = utils.uuid4()
+        with self.assertRaises(AttributeError):
+            del self.cfg.base_url
+        with self.assertRaises(AttributeError):
+            setattr(self.cfg, 'foo', utils.uuid4())
+
+    def test_no_copy(self):
+        """Assert copying the object returns the object itself."""
+        self.assertIs(copy.copy(self.cfg), self.cfg)
+        self.assertIs(copy.deepcopy(self.cfg), self.cfg)
+
+    def test_evolve(self):
+        """Assert ``evolve`` returns a modified copy."""
+        base_url = utils.uuid4()
+        evolved = self.cfg.evolve(base_url=base_url)
+        self.assertEqual(evolved.base_url, base_url)
+        self.assertNotEqual(self.cfg.base_url, base_url)
+        self.assertEqual(evolved.evolve(base_url=self.cfg.base_url), self.cfg)
+
+    def test_thaw(self):
+        """Assert ``thaw`` returns an equivalent mutable config."""
+        thawed = self.cfg.thaw()
+        self.assertIsInstance(thawed, config.ServerConfig)
+        attrs = config._public_attrs(thawed)  # pylint:disable=W0212
+        attrs['version'] = type('')(attrs['version'])
+        self.assertEqual(self.attrs, attrs)
+        self.assertEqual(thawed.freeze(), self.cfg)
+
+    def test_get_requests_kwargs(self):
+        """Assert requests kwargs match those of a ``ServerConfig``."""
+        kwargs = self.cfg.get_requests_kwargs()
+        self.assertEqual(
+            kwargs,
+            config.ServerConfig(**self.attrs).get_requests_kwargs(),
+        )
+        kwargs['auth'] = None
+        self.assertIsNotNone(self.cfg.get_requests_kwargs()['auth'])
+
+    def test_hash(self):
+        """Assert equal configs have equal hashes."""
+        other = config.ServerConfig(**self.attrs).freeze()
+        self.assertEqual(self.cfg, other)
+        self.assertEqual(hash(self.cfg), hash(other))
+
+    def test_can_eval(self):
+        """Assert that ``repr`` can be parsed by ``eval``."""
+        from pulp_smash.config import FrozenServerConfig  # noqa
+        # pylint:disable=eval-used
+        self.assertEqual(eval(repr(self.cfg)), self.cfg)
+
+
+class DeleteTestCase(_ConfigFileTestCase):
     """Test :meth:`pulp_smash.config.ServerConfig.delete`."""
 
     def test_delete_default(self):
         """Assert that the method can delete the default section."""
-        open_ = mock.mock_open(read_data=json.dumps({'default': {}}))
-        with mock.patch.object(builtins, 'open', open_):
-            with mock.patch.object(config, '_get_config_file_path'):
-                config.ServerConfig().delete()
-        self.assertEqual(_get_written_json(open_), {})
+        self.write({'default': {}})
+        config.ServerConfig().delete()
+        self.assertEqual(self.read(), {})
 
     def test_delete_section(self):
         """Assert that the method can delete a specified section."""
         attrs = {'foo': {}, 'bar': {}}
         section = random.choice(tuple(attrs.keys()))
-        open_ = mock.mock_open(read_data=json.dumps(attrs))
-        with mock.patch.object(builtins, 'open', open_):
-            with mock.patch.object(config, '_get_config_file_path'):
-                config.ServerConfig().delete(section)
+        self.write(attrs)
+        config.ServerConfig().delete(section)
         del attrs[section]
-        self.assertEqual(_get_written_json(open_), attrs)
+        self.assertEqual(self.read(), attrs)
+
+    def test_read_after_delete(self):
+        """Assert that a deleted section cannot be read."""
+        self.write({'default': _gen_attrs()})
+        config.ServerConfig().read()
+        config.ServerConfig().delete()
+        with self.assertRaises(KeyError):
+            config.ServerConfig().read()
 
 
-class SaveTestCase(unittest2.TestCase):
+class SaveTestCase(_ConfigFileTestCase):
     """Test :meth:`pulp_smash.config.ServerConfig.save`."""
 
     def test_save_default(self):
         """Assert that the method can save the default section."""
         attrs = _gen_attrs()
-        open_ = mock.mock_open(read_data=json.dumps({}))
-        with mock.patch.object(builtins, 'open', open_):
-            with mock.patch.object(config, '_get_config_file_path'):
-                config.ServerConfig(**attrs).save()
-        self.assertEqual(_get_written_json(open_), {'default': attrs})
+        config.ServerConfig(**attrs).save()
+        self.assertEqual(self.read(), {'default': attrs})
 
     def test_save_section(self):
         """Assert that the method can save a specified section."""
@@ -245,12 +422,34 @@ class SaveTestCase(unittest2.TestCase):
         cfg = {'existing': {}}
         section = utils.uuid4()
         attrs = _gen_attrs()
-        open_ = mock.mock_open(read_data=json.dumps(cfg))
-        with mock.patch.object(builtins, 'open', open_):
-            with mock.patch.object(config, '_get_config_file_path'):
-                config.ServerConfig(**attrs).save(section)
+        self.write(cfg)
+        config.ServerConfig(**attrs).save(section)
         cfg[section] = attrs
-        self.assertEqual(_get_written_json(open_), cfg)
+        self.assertEqual(self.read(), cfg)
+
+    def test_atomic(self):
+        """Assert the file is replaced, and no temporary files are left."""
+        self.write({})
+        inode = os.stat(self.path).st_ino
+        config.ServerConfig(**_gen_attrs()).save()
+        self.assertNotEqual(os.stat(self.path).st_ino, inode)
+        self.assertEqual(os.listdir(self.config_dir), ['settings.json'])
+
+    def test_permissions(self):
+        """Assert the file's permissions are preserved."""
+        self.write({})
+        os.chmod(self.path, 0o640)
+        config.ServerConfig(**_gen_attrs()).save()
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+
+    def test_read_after_save(self):
+        """Assert that a saved section can be read without parsing."""
+        attrs = _gen_attrs()
+        config.ServerConfig(**attrs).save()
+        with mock.patch.object(config.json, 'load') as load:
+            cfg = config.ServerConfig().read()
+        self.assertEqual(load.call_count, 0)
+        self.assertEqual(cfg.base_url, attrs['base_url'])
 
 
 class GetConfigFilePathTestCase(unittest2.TestCase):
@@ -276,13 +475,3 @@ class GetConfigFilePathTestCase(unittest2.TestCase):
                     # pylint:disable=protected-access
                     config._get_config_file_path(utils.uuid4(), utils.uuid4())
         self.assertGreater(isfile.call_count, 0)
-
-
-def _get_written_json(mock_obj):
-    """Return the JSON that has been written to a mock `open` object."""
-    # json.dump() calls write() for each individual JSON token.
-    return json.loads(''.join(
-        tuple(call_obj)[1][0]
-        for call_obj
-        in mock_obj().write.mock_calls
-    ))
@@ -0,0 +1,116 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.fanout`."""
+from __future__ import unicode_literals
+
+import mock
+import unittest2
+
+from pulp_smash import config, fanout
+
+
+def _task(href, start, finish, spawned=()):
+    """Return a finished task body."""
+    return {
+        '_href': href,
+        'finish_time': '2016-01-05T19:05:{:02}Z'.format(finish),
+        'spawned_tasks': [{'_href': child} for child in spawned],
+        'start_time': '2016-01-05T19:05:{:02}Z'.format(start),
+        'state': 'finished',
+    }
+
+
+class FanOutTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.fanout.fan_out`."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Fan out to two targets, with all HTTP calls mocked out."""
+        cls.targets = [{'_href': '/repos/a/'}, {'_href': '/repos/b/'}]
+
+        def post(path, body):
+            """Return a call report or distributor, depending on ``path``."""
+            response = mock.Mock()
+            if path.endswith('distributors/'):
+                response.json.return_value = {'id': body['distributor_id']}
+            else:
+                name = path.split('/')[2]  # 'a' or 'b'
+                phase = path.split('/')[-2]
+                response.json.return_value = {'spawned_tasks': [
+                    {'_href': '/tasks/{}-{}/'.format(phase, name)}
+                ]}
+            return response
+
+        tasks = {
+            'associate': [
+                _task('/tasks/associate-a/', 0, 2, ['/tasks/child-a/']),
+                _task('/tasks/associate-b/', 0, 1),
+                _task('/tasks/child-a/', 2, 5),
+            ],
+            'publish': [
+                _task('/tasks/publish-a/', 10, 13),
+                _task('/tasks/publish-b/', 10, 14),
+            ],
+        }
+        cls.polled = []
+
+        def poll_tasks(_, hrefs):
+            """Return the tasks of the phase to which ``hrefs`` belong."""
+            cls.polled.append(sorted(hrefs))
+            return iter(tasks['associate' if 'associate' in hrefs[0]
+                              else 'publish'])
+
+        distributors = iter(({'distributor_id': 'x'}, {'distributor_id': 'y'}))
+        with mock.patch.object(fanout.api, 'Client') as client:
+            client.return_value.post.side_effect = post
+            with mock.patch.object(
+                    fanout.utils, 'poll_tasks', side_effect=poll_tasks):
+                cls.result = fanout.fan_out(
+                    config.ServerConfig('http://example.com'),
+                    {'id': 'source'},
+                    cls.targets,
+                    lambda: next(distributors),
+                )
+        cls.posts = [
+            call[0] for call in client.return_value.post.call_args_list
+        ]
+
+    def test_batched(self):
+        """Assert the tasks of each phase are polled together."""
+        self.assertEqual(self.polled, [
+            ['/tasks/associate-a/', '/tasks/associate-b/'],
+            ['/tasks/publish-a/', '/tasks/publish-b/'],
+        ])
+
+    def test_phases(self):
+        """Assert phases are run in order, with all requests in each."""
+        self.assertEqual(
+            [path.split('/')[-2] for path, _ in self.posts],
+            ['associate'] * 2 + ['distributors'] * 2 + ['publish'] * 2,
+        )
+
+    def test_publish_body(self):
+        """Assert each target is published with its own distributor."""
+        self.assertEqual(
+            sorted((path, body['id']) for path, body in self.posts[4:]),
+            [('/repos/a/actions/publish/', 'x'),
+             ('/repos/b/actions/publish/', 'y')],
+        )
+
+    def test_per_target(self):
+        """Assert tasks, including child tasks, are timed per target."""
+        phases = {phase.name: phase for phase in self.result.phases}
+        self.assertEqual(
+            phases['associate'].targets,
+            {'/repos/a/': 5, '/repos/b/': 1},
+        )
+        self.assertEqual(
+            phases['publish'].targets,
+            {'/repos/a/': 3, '/repos/b/': 4},
+        )
+
+    def test_format_report(self):
+        """Assert the report mentions every phase."""
+        report = fanout.format_report(self.result)
+        for name in ('associate', 'distribute', 'publish'):
+            with self.subTest(name=name):
+                self.assertIn(name, report)
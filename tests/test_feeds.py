@@ -0,0 +1,273 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.feeds`."""
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import mock
+import requests
+import unittest2
+
+from pulp_smash import feeds
+
+_REPOMD = b"""<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <data type="primary">
+    <location href="repodata/primary.xml"/>
+  </data>
+</repomd>
+"""
+
+_PRIMARY = b"""<?xml version="1.0" encoding="UTF-8"?>
+<metadata xmlns="http://linux.duke.edu/metadata/common" packages="1">
+  <package type="rpm">
+    <location href="bear-4.1-1.noarch.rpm"/>
+  </package>
+</metadata>
+"""
+
+
+_RELEASE = {
+    'file_uri': '/v3/files/pulp-pulp-1.0.0.tar.gz',
+    'metadata': {'summary': 'Pulp', 'tags': ['pulp']},
+    'module': {'name': 'pulp', 'owner': {'username': 'pulp'}},
+    'version': '1.0.0',
+}
+
+
+def _mock_get(contents):
+    """Return a function that mocks ``requests.Session.get``.
+
+    :param contents: A dict mapping URLs to response bodies.
+    """
+    def get(url, **_):
+        """Return a mock response for ``url``."""
+        response = mock.Mock()
+        response.iter_content.return_value = iter((contents[url],))
+        return response
+    return get
+
+
+class ResolveTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.feeds.resolve`."""
+
+    def test_no_mirror(self):
+        """Assert URLs are unchanged if no mirror is configured."""
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertEqual(
+                feeds.resolve('http://example.com/foo/'),
+                'http://example.com/foo/',
+            )
+
+    def test_mirror(self):
+        """Assert URLs are rewritten to point at a mirror."""
+        environ = {'PULP_SMASH_FEED_MIRROR': 'http://mirror:8000/'}
+        with mock.patch.dict(os.environ, environ):
+            for url, resolved in (
+                    ('http://example.com/foo/',
+                     'http://mirror:8000/example.com/foo/'),
+                    ('https://example.com',
+                     'http://mirror:8000/example.com'),
+                    ('http://example.com/modules.json?q=a',
+                     'http://mirror:8000/example.com/modules.json?q=a')):
+                with self.subTest(url=url):
+                    self.assertEqual(feeds.resolve(url), resolved)
+
+
+class MirrorTestCase(unittest2.TestCase):
+    """Test the functions that populate a mirror."""
+
+    def setUp(self):
+        """Create a directory for a mirror."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_get_path(self):
+        """Assert URLs are mapped to paths within the mirror."""
+        self.assertEqual(
+            feeds.get_path(self.root, 'http://example.com/a/b.json?q=c'),
+            os.path.join(self.root, 'example.com', 'a', 'b.json'),
+        )
+
+    def test_get_path_escape(self):
+        """Assert URLs cannot map to paths outside of the mirror."""
+        with self.assertRaises(ValueError):
+            feeds.get_path(self.root, 'http://example.com/../../etc/passwd')
+
+    def test_mirror_file(self):
+        """Assert a file is downloaded to the correct path."""
+        session = mock.Mock()
+        session.get.side_effect = _mock_get({'http://a.com/b/c': b'abc'})
+        path = feeds.mirror_file(self.root, 'http://a.com/b/c', session)
+        with open(path, 'rb') as handle:
+            self.assertEqual(handle.read(), b'abc')
+        self.assertEqual(os.listdir(os.path.dirname(path)), ['c'])
+
+    def test_mirror_file_failure(self):
+        """Assert a failed download leaves no files behind."""
+        session = mock.Mock()
+        response = session.get.return_value
+        response.iter_content.side_effect = requests.ConnectionError
+        with self.assertRaises(requests.ConnectionError):
+            feeds.mirror_file(self.root, 'http://a.com/b', session)
+        self.assertEqual(os.listdir(os.path.join(self.root, 'a.com')), [])
+
+    def test_mirror_yum_repo(self):
+        """Assert a yum repository's metadata and packages are mirrored."""
+        url = 'http://a.com/zoo/'
+        session = mock.Mock()
+        session.get.side_effect = _mock_get({
+            url + 'repodata/repomd.xml': _REPOMD,
+            url + 'repodata/primary.xml': _PRIMARY,
+            url + 'bear-4.1-1.noarch.rpm': b'bear',
+        })
+        paths = feeds.mirror_yum_repo(self.root, url, session)
+        self.assertEqual(len(paths), 3)
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.root, 'a.com', 'zoo', 'bear-4.1-1.noarch.rpm')
+        ))
+
+    def test_mirror_forge(self):
+        """Assert a module's releases are listed, paged and downloaded."""
+        url = 'http://a.com'
+        pages = {
+            url + '/v3/releases?module=pulp-pulp&limit=100': {
+                'pagination': {'next': '/v3/releases?module=pulp-pulp&p=2'},
+                'results': [_RELEASE],
+            },
+            url + '/v3/releases?module=pulp-pulp&p=2': {
+                'pagination': {'next': None},
+                'results': [dict(
+                    _RELEASE,
+                    file_uri='/v3/files/pulp-pulp-0.1.0.tar.gz',
+                    version='0.1.0',
+                )],
+            },
+        }
+        get = _mock_get({
+            url + '/v3/files/pulp-pulp-1.0.0.tar.gz': b'new',
+            url + '/v3/files/pulp-pulp-0.1.0.tar.gz': b'old',
+        })
+
+        def get_page(url, **kwargs):
+            """Return a page of releases, or a file."""
+            if url in pages:
+                response = mock.Mock()
+                response.json.return_value = pages[url]
+                return response
+            return get(url, **kwargs)
+
+        session = mock.Mock()
+        session.get.side_effect = get_page
+        paths = feeds.mirror_forge(self.root, url, ['pulp/pulp'], session)
+        self.assertEqual(len(paths), 3)
+        with open(paths[-1]) as handle:
+            releases = json.load(handle)
+        self.assertEqual(
+            [release['version'] for release in releases],
+            ['1.0.0', '0.1.0'],
+        )
+        self.assertTrue(os.path.isfile(os.path.join(
+            self.root, 'a.com', 'v3', 'files', 'pulp-pulp-0.1.0.tar.gz'
+        )))
+
+    def test_write_manifest(self):
+        """Assert a manifest lists each file's name, checksum and size."""
+        for name in ('b.iso', 'a.iso'):
+            with open(os.path.join(self.root, name), 'wb') as handle:
+                handle.write(name.encode('utf-8'))
+        os.mkdir(os.path.join(self.root, 'subdir'))
+        with open(feeds.write_manifest(self.root)) as handle:
+            lines = handle.read().splitlines()
+        self.assertEqual(lines, [
+            '{},{},5'.format(name, hashlib.sha256(name.encode()).hexdigest())
+            for name in ('a.iso', 'b.iso')
+        ])
+
+
+class FeedServerTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.feeds.FeedServer`."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start a server for a mirror containing one file."""
+        cls.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(cls.root, 'a.com'))
+        with open(os.path.join(cls.root, 'a.com', 'b.json'), 'wb') as handle:
+            handle.write(b'[]')
+        forge = os.path.join(cls.root, 'forge.com')
+        os.makedirs(os.path.join(forge, 'v3', 'files'))
+        os.makedirs(os.path.join(forge, 'v3', 'releases'))
+        path = os.path.join(forge, 'v3', 'releases', 'pulp-pulp.json')
+        with open(path, 'w') as handle:
+            json.dump([_RELEASE], handle)
+        path = os.path.join(forge, 'v3', 'files', 'pulp-pulp-1.0.0.tar.gz')
+        with open(path, 'wb') as handle:
+            handle.write(b'module')
+        cls.server = feeds.FeedServer(cls.root, host='127.0.0.1')
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the server and remove the mirror."""
+        cls.server.stop()
+        shutil.rmtree(cls.root)
+
+    def test_get(self):
+        """Assert a mirrored file is served, ignoring the query string."""
+        response = requests.get(self.server.url + '/a.com/b.json?q=c')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'[]')
+
+    def test_not_found(self):
+        """Assert a missing file results in an HTTP 404."""
+        response = requests.get(self.server.url + '/a.com/missing')
+        self.assertEqual(response.status_code, 404)
+
+    def test_forge_modules(self):
+        """Assert a Forge's v1 module search is answered."""
+        for query, names in (
+                ('pulp_pulp', ['pulp/pulp']),
+                ('pulp', ['pulp/pulp']),
+                ('apache', [])):
+            with self.subTest(query=query):
+                response = requests.get(
+                    self.server.url + '/forge.com/modules.json',
+                    params={'q': query},
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [module['full_name'] for module in response.json()],
+                    names,
+                )
+        module = requests.get(
+            self.server.url + '/forge.com/modules.json?q=pulp-pulp'
+        ).json()[0]
+        self.assertEqual(
+            (module['author'], module['name'], module['releases']),
+            ('pulp', 'pulp', [{'version': '1.0.0'}]),
+        )
+
+    def test_forge_releases(self):
+        """Assert a Forge's v3 release list is answered."""
+        response = requests.get(
+            self.server.url + '/forge.com/v3/releases',
+            params={'module': 'pulp/pulp'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [_RELEASE])
+        self.assertIsNone(response.json()['pagination']['next'])
+
+    def test_forge_file(self):
+        """Assert a module is served where Pulp downloads it from a Forge."""
+        for path in (
+                '/forge.com/system/releases/p/pulp/pulp-pulp-1.0.0.tar.gz',
+                '/forge.com/v3/files/pulp-pulp-1.0.0.tar.gz'):
+            with self.subTest(path=path):
+                response = requests.get(self.server.url + path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, b'module')
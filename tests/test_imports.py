@@ -0,0 +1,34 @@
+# coding=utf-8
+"""Test that Pulp Smash's modules import their heavy dependencies lazily.
+
+See :mod:`benchmarks.bench_imports`.
+"""
+from __future__ import unicode_literals
+
+import unittest2
+
+from benchmarks import bench_imports
+
+
+class LazyImportsTestCase(unittest2.TestCase):
+    """Assert modules do not import heavy dependencies when imported."""
+
+    def test_modules(self):
+        """Import each module in a fresh interpreter, and check what loads."""
+        for module, names in bench_imports.MODULES:
+            with self.subTest(module=module):
+                self.assertEqual(bench_imports.get_loaded(module, names), [])
+
+
+class ParseImporttimeTestCase(unittest2.TestCase):
+    """Test :func:`benchmarks.bench_imports.parse_importtime`."""
+
+    def test_parse(self):
+        """Assert self times are summed, and other lines are ignored."""
+        text = '\n'.join((
+            'import time: self [us] | cumulative | imported package',
+            'import time:       100 |        100 |   json.decoder',
+            'import time:        50 |        150 | json',
+            'hello',
+        ))
+        self.assertEqual(bench_imports.parse_importtime(text), 150)
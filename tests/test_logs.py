@@ -0,0 +1,217 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.logs`."""
+from __future__ import unicode_literals
+
+import base64
+import gzip
+import io
+
+import mock
+import unittest2
+
+from pulp_smash import cli, config, logs
+
+
+def _compress(text):
+    """Compress and encode ``text`` like the remote collection command."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as handle:
+        handle.write(text.encode('utf-8'))
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+class MarkTestCase(unittest2.TestCase):
+    """Test :meth:`pulp_smash.logs.LogCollector.mark`."""
+
+    def test_hosts(self):
+        """Assert each host is marked once, for the services it runs."""
+        cfg = config.ServerConfig(
+            'http://example.com',
+            hosts={'pulp_workers': ['w1.example.com', 'w2.example.com']},
+        )
+        with mock.patch.object(cli, 'Client') as client:
+            client.return_value.run.return_value = cli.CompletedProcess(
+                ('sh',),
+                0,
+                'CURSOR s=1;i=2\nSIZE 10 /var/log/httpd/error_log\n',
+                '',
+            )
+            marks = logs.LogCollector(cfg).mark()
+        self.assertEqual(
+            [(mark.hostname, mark.services) for mark in marks],
+            [
+                ('example.com', (
+                    'httpd', 'pulp_celerybeat', 'pulp_resource_manager'
+                )),
+                ('w1.example.com', ('pulp_workers',)),
+                ('w2.example.com', ('pulp_workers',)),
+            ],
+        )
+        self.assertEqual(marks[0].cursor, 's=1;i=2')
+        self.assertEqual(
+            marks[0].offsets,
+            (('/var/log/httpd/error_log', 10),),
+        )
+        hostnames = [call[1]['hostname'] for call in client.call_args_list]
+        self.assertEqual(
+            sorted(hostnames),
+            ['example.com', 'w1.example.com', 'w2.example.com'],
+        )
+        args = [call[0][0] for call in client.return_value.run.call_args_list]
+        self.assertIn(logs.LOG_FILES['httpd'], [arg[4:] for arg in args])
+
+
+class CollectTestCase(unittest2.TestCase):
+    """Test :meth:`pulp_smash.logs.LogCollector.collect`."""
+
+    def test_collect(self):
+        """Assert one compressed slice of each log is fetched."""
+        cfg = config.ServerConfig('http://example.com')
+        mark = logs.Mark(
+            'example.com',
+            ('httpd', 'pulp_workers'),
+            's=1',
+            (('/var/log/httpd/error_log', 10),),
+        )
+        stdout = _compress(
+            '==> journal <==\nworker died\n'
+            '==> /var/log/httpd/error_log <==\n'
+        )
+        with mock.patch.object(cli, 'Client') as client:
+            client.return_value.run.return_value = cli.CompletedProcess(
+                ('sh',), 0, stdout, ''
+            )
+            slices = logs.LogCollector(cfg, max_bytes=100).collect([mark])
+        self.assertEqual(slices, [
+            logs.LogSlice('example.com', 'journal', 'worker died\n'),
+            logs.LogSlice('example.com', '/var/log/httpd/error_log', ''),
+        ])
+        args = client.return_value.run.call_args[0][0]
+        self.assertEqual(args[4:], (
+            '100', 's=1', 'httpd', 'pulp_worker-*', '--',
+            '/var/log/httpd/error_log', '10',
+        ))
+        text = logs.format_slices(slices)
+        self.assertIn('--- example.com journal\nworker died', text)
+        self.assertNotIn('error_log', text)
+
+
+class WatchTestCase(unittest2.TestCase):
+    """Test :meth:`pulp_smash.logs.LogCollector.watch`."""
+
+    def setUp(self):
+        """Provide a collector which does not touch any server."""
+        self.collector = logs.LogCollector(
+            config.ServerConfig('http://example.com')
+        )
+        for name in ('mark', 'collect'):
+            patcher = mock.patch.object(self.collector, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        self.collect.return_value = [
+            logs.LogSlice('example.com', 'journal', 'worker died\n')
+        ]
+
+    def _run(self, *test_cases):
+        """Run ``test_cases`` while watching them, and return the result."""
+        suite = unittest2.TestSuite(
+            unittest2.defaultTestLoader.loadTestsFromTestCase(test_case)
+            for test_case in test_cases
+        )
+        result = unittest2.TestResult()
+        self.collector.watch(suite)(result)
+        return result
+
+    def test_failure(self):
+        """Assert logs are collected only for classes that fail."""
+        class Passing(unittest2.TestCase):
+            """A passing test case class."""
+
+            def test_pass(self):
+                """Pass."""
+
+        class Failing(unittest2.TestCase):
+            """A failing test case class."""
+
+            def test_fail(self):
+                """Fail."""
+                self.fail('oops')
+
+            def test_pass(self):
+                """Pass."""
+
+        result = self._run(Passing, Failing)
+        self.assertEqual(self.mark.call_count, 2)
+        self.assertEqual(self.collect.call_count, 1)
+        self.assertEqual(len(result.failures), 1)
+        self.assertIn('oops', result.failures[0][1])
+        self.assertIn('worker died', result.failures[0][1])
+
+    def test_set_up_class(self):
+        """Assert logs are collected if ``setUpClass`` fails."""
+        class Broken(unittest2.TestCase):
+            """A test case class which cannot be set up."""
+
+            @classmethod
+            def setUpClass(cls):
+                """Fail."""
+                raise RuntimeError('no server')
+
+            def test_pass(self):
+                """Pass."""
+
+        result = self._run(Broken)
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn('no server', result.errors[0][1])
+        self.assertIn('worker died', result.errors[0][1])
+
+    def test_subclass(self):
+        """Assert a subclass calling ``super`` sets up itself, once."""
+        class Parent(unittest2.TestCase):
+            """A test case class whose subclass calls ``super``."""
+
+            @classmethod
+            def setUpClass(cls):
+                """Record which class is being set up."""
+                cls.who = cls.__name__
+
+            @classmethod
+            def tearDownClass(cls):
+                """Do nothing."""
+
+            def test_who(self):
+                """Assert this class was set up."""
+                self.assertEqual(self.who, type(self).__name__)
+
+        class Child(Parent):
+            """A test case class that extends its parent's fixtures."""
+
+            @classmethod
+            def setUpClass(cls):
+                """Call the parent's ``setUpClass``."""
+                super(Child, cls).setUpClass()
+
+            @classmethod
+            def tearDownClass(cls):
+                """Call the parent's ``tearDownClass``."""
+                super(Child, cls).tearDownClass()
+
+        result = self._run(Parent, Child)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.failures, [])
+        self.assertEqual(self.mark.call_count, 2)
+
+    def test_unreachable(self):
+        """Assert a failure to mark logs does not fail any test."""
+        class Failing(unittest2.TestCase):
+            """A failing test case class."""
+
+            def test_fail(self):
+                """Fail."""
+                self.fail('oops')
+
+        self.mark.side_effect = OSError('unreachable')
+        result = self._run(Failing)
+        self.assertEqual(self.collect.call_count, 0)
+        self.assertEqual(len(result.failures), 1)
+        self.assertIn('Cannot mark the server logs', result.failures[0][1])
@@ -0,0 +1,183 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.perf`."""
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+import mock
+import unittest2
+
+from pulp_smash import config, perf
+
+
+class SkipUnlessEnabledTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.perf.skip_unless_enabled`."""
+
+    def test_disabled(self):
+        """Assert benchmarks are skipped by default."""
+        with mock.patch.dict(os.environ, clear=True):
+            with self.assertRaises(unittest2.SkipTest):
+                perf.skip_unless_enabled()
+
+    def test_enabled(self):
+        """Assert benchmarks run if enabled."""
+        with mock.patch.dict(os.environ, {'PULP_SMASH_BENCHMARKS': '1'}):
+            perf.skip_unless_enabled()
+
+
+class GetDurationTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.perf.get_duration`."""
+
+    def test_duration(self):
+        """Assert the span from the first start to the last finish is used."""
+        tasks = (
+            {
+                'start_time': '2016-01-05T19:04:56Z',
+                'finish_time': '2016-01-05T19:05:06Z',
+            },
+            {
+                'start_time': '2016-01-05T19:05:00Z',
+                'finish_time': '2016-01-05T19:05:10.5Z',
+            },
+        )
+        self.assertEqual(perf.get_duration(tasks), 14.5)
+
+    def test_invalid(self):
+        """Assert bad input raises ``ValueError``."""
+        for tasks in ((), ({'start_time': None, 'finish_time': None},)):
+            with self.subTest(tasks=tasks):
+                with self.assertRaises(ValueError):
+                    perf.get_duration(tasks)
+
+
+class WelchTTestTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.perf.welch_t_test`."""
+
+    def test_p_value(self):
+        """Assert a known p-value is computed."""
+        # t = -2.0 with 8 degrees of freedom.
+        p_value = perf.welch_t_test((1, 2, 3, 4, 5), (3, 4, 5, 6, 7))
+        self.assertAlmostEqual(p_value, 0.0805, places=4)
+
+    def test_identical(self):
+        """Assert identical samples have a p-value of one."""
+        self.assertEqual(perf.welch_t_test((1, 1), (1, 1)), 1)
+
+    def test_too_small(self):
+        """Assert samples with fewer than two numbers are rejected."""
+        with self.assertRaises(ValueError):
+            perf.welch_t_test((1,), (1, 2))
+
+
+class HistoryTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.perf.History` and its comparisons."""
+
+    def setUp(self):
+        """Create a history database in a temporary directory."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.history = perf.History(os.path.join(directory, 'perf.db'))
+        self.addCleanup(self.history.close)
+
+    def record(self, version, seconds):
+        """Record a sync taking ``seconds`` against Pulp ``version``."""
+        cfg = config.ServerConfig('http://example.com', version=version)
+        self.history.record(cfg, 'rpm', {'sync': seconds})
+
+    def test_get_samples(self):
+        """Assert measurements are grouped by operation and version."""
+        self.record('2.7', 1)
+        self.record('2.7', 2)
+        self.record('2.8', 3)
+        self.assertEqual(
+            self.history.get_samples(),
+            {('rpm', 'sync'): {'2.7': [1, 2], '2.8': [3]}},
+        )
+
+    def test_regression(self):
+        """Assert a significant slowdown is flagged as a regression."""
+        for version, samples in (
+                ('2.10', (20.1, 20.3, 19.9, 20.0)),
+                ('2.7', (10.1, 10.3, 9.9, 10.0)),
+                ('2.8', (10.2, 10.0, 10.1, 9.8)),
+                ('2.9', (0.5,))):  # too few samples to compare
+            for seconds in samples:
+                self.record(version, seconds)
+        comparisons = perf.compare(self.history)
+        self.assertEqual(
+            [(comp.old_version, comp.new_version, comp.regression)
+             for comp in comparisons],
+            [('2.7', '2.8', False), ('2.8', '2.10', True)],
+        )
+
+
+class TearDownOnErrorTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.perf.tear_down_on_error`."""
+
+    def test_error(self):
+        """Assert the sampler and resources are cleaned up after an error."""
+        class Broken(perf.BenchmarkTestCase):
+            """A benchmark which cannot be set up."""
+
+            @classmethod
+            @perf.tear_down_on_error
+            def setUpClass(cls):
+                """Create a resource, and fail."""
+                super(Broken, cls).setUpClass()
+                cls.resources.add('a')
+                with cls.span('create'):
+                    raise RuntimeError('oops')
+
+        cfg = config.ServerConfig('http://example.com')
+        with mock.patch.dict(os.environ, {'PULP_SMASH_SAMPLER': '1'}):
+            with mock.patch.object(
+                    config, 'get_frozen_config', return_value=cfg):
+                with mock.patch('pulp_smash.sampler.Sampler') as sampler:
+                    with mock.patch.object(perf, 'teardown') as teardown:
+                        with mock.patch.object(perf, 'record') as record:
+                            with self.assertRaises(RuntimeError):
+                                Broken.setUpClass()
+        self.assertEqual(sampler.return_value.start.call_count, 1)
+        self.assertEqual(sampler.return_value.stop.call_count, 1)
+        sampler.return_value.span.assert_called_once_with('create')
+        teardown.delete.assert_called_once_with(cfg, {'a'})
+        self.assertEqual(record.call_count, 0)
+
+    def test_span(self):
+        """Assert a span does nothing if resource usage is not sampled."""
+        class Passing(perf.BenchmarkTestCase):
+            """A benchmark which is set up without errors."""
+
+            @classmethod
+            @perf.tear_down_on_error
+            def setUpClass(cls):
+                """Time nothing."""
+                super(Passing, cls).setUpClass()
+                with cls.span('create'):
+                    pass
+
+        with mock.patch.dict(os.environ, clear=True):
+            with mock.patch.object(config, 'get_frozen_config'):
+                with mock.patch.object(perf, 'teardown') as teardown:
+                    Passing.setUpClass()
+        self.assertIsNone(Passing.sampler)
+        self.assertEqual(teardown.delete.call_count, 0)
+
+
+class MainTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.perf.main`."""
+
+    def test_exit_code(self):
+        """Assert the exit code reflects whether regressions were found."""
+        for regression, code in ((False, 0), (True, 1)):
+            comparison = perf.Comparison(
+                'rpm', 'sync', '2.7', '2.8', 1, 2, 0.01, regression
+            )
+            with self.subTest(regression=regression):
+                with mock.patch.object(perf, 'History'):
+                    with mock.patch.object(
+                            perf, 'compare', return_value=[comparison]):
+                        with mock.patch.object(perf, 'print', create=True):
+                            self.assertEqual(perf.main(['report']), code)
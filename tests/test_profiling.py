@@ -0,0 +1,215 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.profiling`."""
+from __future__ import unicode_literals
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from xml.etree import ElementTree
+
+import mock
+import unittest2
+
+from pulp_smash import profiling
+
+
+def _spin(seconds):
+    """Keep the CPU busy for ``seconds``."""
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        pass
+
+
+class StackSamplerTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.profiling.StackSampler`."""
+
+    def test_fold(self):
+        """Assert a stack is folded outermost first."""
+        # pylint:disable=protected-access
+        stack = profiling.fold(sys._getframe()).split(';')
+        self.assertEqual(stack[-1], __name__ + ':test_fold')
+        self.assertGreater(len(stack), 1)
+
+    def test_sample(self):
+        """Assert the calling thread's stacks are sampled."""
+        sampler = profiling.StackSampler(interval=0.001)
+        sampler.start()
+        try:
+            deadline = time.time() + 5
+            while not sampler.stacks and time.time() < deadline:
+                _spin(0.01)
+        finally:
+            sampler.stop()
+        self.assertTrue(any(
+            stack.endswith(':_spin') for stack in sampler.stacks
+        ))
+
+
+class ProfilerTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.profiling.Profiler`."""
+
+    def setUp(self):
+        """Provide a temporary directory for profiles."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_watch(self):
+        """Assert each matching class' profiles are written once it's done."""
+        class Profiled(unittest2.TestCase):
+            """A test case class to profile."""
+
+            @classmethod
+            def setUpClass(cls):
+                """Keep busy."""
+                _spin(0.02)
+
+            def test_spin(self):
+                """Keep busy."""
+                _spin(0.02)
+
+        class Ignored(unittest2.TestCase):
+            """A test case class to leave alone."""
+
+            def test_pass(self):
+                """Pass."""
+
+        profiler = profiling.Profiler(
+            profiling.PROFILERS,
+            self.directory,
+            ('*.Profiled',),
+            'default.',
+        )
+        suite = unittest2.TestSuite(
+            unittest2.defaultTestLoader.loadTestsFromTestCase(test_case)
+            for test_case in (Profiled, Ignored)
+        )
+        profiler.watch(suite)
+        result = unittest2.TestResult()
+        suite(result)
+        self.assertTrue(result.wasSuccessful())
+        prefix = 'default.{}.Profiled'.format(__name__)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            [prefix + '.folded', prefix + '.prof'],
+        )
+        written = profiling.merge(self.directory)
+        self.assertEqual(
+            [os.path.basename(path) for path in written],
+            ['merged.folded', 'flamegraph.svg', 'merged.prof'],
+        )
+
+    def test_watch_subclass(self):
+        """Assert a subclass calling ``super`` sets up and profiles itself."""
+        class Parent(unittest2.TestCase):
+            """A test case class whose subclass calls ``super``."""
+
+            @classmethod
+            def setUpClass(cls):
+                """Record which class is being set up."""
+                cls.who = cls.__name__
+
+            def test_who(self):
+                """Assert this class was set up."""
+                self.assertEqual(self.who, type(self).__name__)
+
+        class Child(Parent):
+            """A test case class that extends its parent's setup."""
+
+            @classmethod
+            def setUpClass(cls):
+                """Call the parent's ``setUpClass``."""
+                super(Child, cls).setUpClass()
+
+        profiler = profiling.Profiler(('sample',), self.directory)
+        suite = unittest2.TestSuite(
+            unittest2.defaultTestLoader.loadTestsFromTestCase(test_case)
+            for test_case in (Parent, Child)
+        )
+        profiler.watch(suite)
+        result = unittest2.TestResult()
+        suite(result)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.failures, [])
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ['{}.{}.folded'.format(__name__, name)
+             for name in ('Child', 'Parent')],
+        )
+
+    def test_nested_enable(self):
+        """Assert profiling stops only when the outermost call ends."""
+        profile = profiling.ClassProfile(('sample',))
+        profile.enable()
+        profile.enable()
+        profile.disable()
+        self.assertTrue(profile.active)
+        profile.disable()
+        self.assertFalse(profile.active)
+
+    def test_unknown(self):
+        """Assert unknown profilers are rejected."""
+        with self.assertRaises(ValueError):
+            profiling.Profiler(('sample', 'perf'), self.directory)
+
+    def test_get_profiler(self):
+        """Assert profiling is configured by environment variables."""
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(profiling.get_profiler())
+        with mock.patch.dict(os.environ, {
+            'PULP_SMASH_PROFILE': 'sample, cprofile',
+            'PULP_SMASH_PROFILE_CLASSES': 'a.*,b.*',
+            'PULP_SMASH_PROFILE_DIR': self.directory,
+        }):
+            profiler = profiling.get_profiler('pulp28')
+        self.assertEqual(profiler.profilers, ('sample', 'cprofile'))
+        self.assertEqual(profiler.patterns, ('a.*', 'b.*'))
+        self.assertEqual(profiler.directory, self.directory)
+        self.assertEqual(profiler.prefix, 'pulp28.')
+
+
+class MergeTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.profiling.merge`."""
+
+    def setUp(self):
+        """Write sampled stacks for two classes."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        profiling.write_folded(
+            os.path.join(self.directory, 'a.folded'),
+            {'main;api:request': 3, 'main;api:poll_task': 1},
+        )
+        profiling.write_folded(
+            os.path.join(self.directory, 'b.folded'),
+            {'main;api:request': 2, 'main;copy:<deepcopy>': 4},
+        )
+
+    def test_merge(self):
+        """Assert stacks are summed, and drawn as a flame graph."""
+        profiling.merge(self.directory)
+        self.assertEqual(
+            profiling.read_folded(
+                os.path.join(self.directory, 'merged.folded')
+            ),
+            {
+                'main;api:request': 5,
+                'main;api:poll_task': 1,
+                'main;copy:<deepcopy>': 4,
+            },
+        )
+        svg = ElementTree.parse(os.path.join(self.directory, 'flamegraph.svg'))
+        titles = [
+            element.text for element in svg.iter()
+            if element.tag.endswith('title')
+        ]
+        self.assertEqual(titles, [
+            'main (10 samples, 100.00%)',
+            'api:poll_task (1 samples, 10.00%)',
+            'api:request (5 samples, 50.00%)',
+            'copy:<deepcopy> (4 samples, 40.00%)',
+        ])
+
+    def test_since(self):
+        """Assert profiles left over from earlier runs are not merged."""
+        self.assertEqual(profiling.merge(self.directory, time.time() + 60), [])
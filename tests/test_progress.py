@@ -0,0 +1,104 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.progress`."""
+from __future__ import unicode_literals
+
+import mock
+import unittest2
+
+from pulp_smash import config, exceptions, progress
+
+
+def _yum_task(items_left, size_left, state='running'):
+    """Return a task body with a yum importer progress report."""
+    return {
+        '_href': '/pulp/api/v2/tasks/1/',
+        'state': state,
+        'progress_report': {'yum_importer': {
+            'content': {
+                'items_total': 10,
+                'items_left': items_left,
+                'size_total': 1000,
+                'size_left': size_left,
+            },
+            'errata': {'state': 'NOT_STARTED'},
+        }},
+    }
+
+
+class SummarizeTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.progress.summarize`."""
+
+    def test_empty(self):
+        """Assert an empty progress report is all zeroes."""
+        self.assertEqual(progress.summarize({}), (0, 0, 0, 0))
+
+    def test_yum(self):
+        """Assert a yum importer's progress report is summarized."""
+        report = _yum_task(4, 300)['progress_report']
+        self.assertEqual(progress.summarize(report), (6, 10, 700, 1000))
+
+    def test_iso_and_puppet(self):
+        """Assert ISO and Puppet importers' progress reports are summarized."""
+        report = {
+            'iso_importer': {
+                'num_isos': 3,
+                'num_isos_finished': 1,
+                'total_bytes': 30,
+                'finished_bytes': 10,
+            },
+            'puppet_importer': {
+                'modules': {'total_count': 5, 'finished_count': 5},
+            },
+        }
+        self.assertEqual(progress.summarize(report), (6, 8, 10, 30))
+
+
+class ProgressMonitorTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.progress.ProgressMonitor`."""
+
+    def test_metrics(self):
+        """Assert deltas, rates and an ETA are derived from task bodies."""
+        callback = mock.Mock()
+        monitor = progress.ProgressMonitor(callback)
+        first = monitor(_yum_task(10, 1000), now=100)
+        second = monitor(_yum_task(5, 600), now=104)
+        self.assertEqual(first.elapsed, 0)
+        self.assertIsNone(first.eta)
+        self.assertEqual(second.units_delta, 5)
+        self.assertEqual(second.bytes_delta, 400)
+        self.assertEqual(second.bytes_per_second, 100)
+        self.assertEqual(second.eta, 6)  # 600 bytes left at 100 bytes/sec
+        self.assertEqual(callback.call_count, 2)
+        self.assertEqual(
+            monitor.history['/pulp/api/v2/tasks/1/'],
+            [first, second],
+        )
+
+
+class StreamTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.progress.stream`."""
+
+    def setUp(self):
+        """Provide a server config."""
+        self.cfg = config.ServerConfig('http://example.com')
+
+    def test_stream(self):
+        """Assert progress is yielded until the task ends."""
+        tasks = [_yum_task(5, 500), _yum_task(0, 0, 'finished')]
+        with mock.patch.object(progress, 'requests') as requests:
+            requests.get.return_value.json.side_effect = tasks
+            with mock.patch.object(progress.time, 'sleep'):
+                reports = tuple(progress.stream(self.cfg, 'tasks/1/'))
+        self.assertEqual(
+            [report.state for report in reports],
+            ['running', 'finished'],
+        )
+        self.assertEqual(reports[-1].units_done, 10)
+
+    def test_timeout(self):
+        """Assert an exception is raised if the task does not end in time."""
+        with mock.patch.object(progress, 'requests') as requests:
+            requests.get.return_value.json.return_value = _yum_task(5, 500)
+            with mock.patch.object(progress.time, 'sleep'):
+                with self.assertRaises(exceptions.TaskTimedOutError):
+                    tuple(progress.stream(self.cfg, 'tasks/1/', poll_limit=3))
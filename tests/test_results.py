@@ -0,0 +1,114 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.results`."""
+from __future__ import unicode_literals
+
+import shutil
+import tempfile
+
+import mock
+import unittest2
+
+from pulp_smash import cli, config, results
+
+
+def _result(**kwargs):
+    """Return a result dict. Override its items with ``kwargs``."""
+    result = {
+        'tests_run': 1,
+        'failures': 0,
+        'errors': 0,
+        'skipped': 0,
+        'bugs': {},
+        'output': '',
+    }
+    result.update(kwargs)
+    return result
+
+
+class ResultCacheTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.results.ResultCache`."""
+
+    def setUp(self):
+        """Create a cache in a temporary directory."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = results.ResultCache(self.directory)
+        self.cfg = config.ServerConfig('http://example.com')
+        self.key = {
+            'server': {'version': '2.8', 'packages': []},
+            'source': 'a',
+        }
+
+    def test_reused(self):
+        """Assert a passing result is reused if its key is unchanged."""
+        self.cache.put(self.cfg, 'm1', self.key, _result())
+        self.assertEqual(self.cache.get(self.cfg, 'm1', self.key), _result())
+
+    def test_changed(self):
+        """Assert a result is not reused for another key, node or server."""
+        self.cache.put(self.cfg, 'm1', self.key, _result())
+        key = dict(self.key, source='b')
+        other_cfg = config.ServerConfig('http://example.org')
+        for args in (
+                (self.cfg, 'm1', key),
+                (self.cfg, 'm2', self.key),
+                (other_cfg, 'm1', self.key)):
+            with self.subTest(args=args):
+                self.assertIsNone(self.cache.get(*args))
+
+    def test_failed(self):
+        """Assert a result with failures or errors is not reused."""
+        for counter in ('failures', 'errors'):
+            with self.subTest(counter=counter):
+                self.cache.put(self.cfg, 'm1', self.key, _result(**{
+                    counter: 1
+                }))
+                self.assertIsNone(self.cache.get(self.cfg, 'm1', self.key))
+
+    def test_bugs(self):
+        """Assert a result is not reused if a bug's status has changed."""
+        self.cache.put(self.cfg, 'm1', self.key, _result(bugs={'1': 'NEW'}))
+        with mock.patch.object(results.selectors, 'get_bug_status') as get:
+            get.return_value = 'NEW'
+            self.assertIsNotNone(self.cache.get(self.cfg, 'm1', self.key))
+            get.return_value = 'MODIFIED'
+            self.assertIsNone(self.cache.get(self.cfg, 'm1', self.key))
+        get.assert_called_with(1)
+
+
+class GetKeyTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.results.get_key` and its helpers."""
+
+    def test_fingerprint(self):
+        """Assert installed Pulp packages are listed with ``rpm``."""
+        cfg = config.ServerConfig('http://example.com', version='2.8')
+        with mock.patch.object(cli, 'Client') as client:
+            client.return_value.run.return_value = cli.CompletedProcess(
+                ('rpm',), 0, 'pulp-server-2.8.0-1\npulp-admin-2.8.0-1\n', ''
+            )
+            fingerprint = results.get_server_fingerprint(cfg)
+        self.assertEqual(fingerprint, {
+            'version': '2.8',
+            'packages': ['pulp-admin-2.8.0-1', 'pulp-server-2.8.0-1'],
+        })
+
+    def test_unknown_packages(self):
+        """Assert nothing is reused if packages cannot be listed."""
+        cfg = config.ServerConfig('http://example.com', version='2.8')
+        with mock.patch.object(cli, 'Client', side_effect=OSError):
+            with mock.patch.object(results.warnings, 'warn') as warn:
+                fingerprint = results.get_server_fingerprint(cfg)
+        self.assertIsNone(fingerprint['packages'])
+        self.assertEqual(warn.call_count, 1)
+        self.assertIsNone(results.get_key(fingerprint, __name__))
+
+    def test_source(self):
+        """Assert a class shares the source hash of its module."""
+        fingerprint = {'version': '2.8', 'packages': []}
+        key = results.get_key(fingerprint, __name__)
+        self.assertEqual(key['server'], fingerprint)
+        self.assertEqual(
+            key['source'],
+            results.get_source_hash(__name__ + '.GetKeyTestCase'),
+        )
+        self.assertIsNone(results.get_key(fingerprint, 'missing_module'))
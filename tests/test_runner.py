@@ -0,0 +1,324 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.runner`."""
+from __future__ import unicode_literals
+
+import json
+import sys
+import threading
+import types
+
+import mock
+import unittest2
+
+from pulp_smash import config, runner, selectors
+
+
+def _result(**kwargs):
+    """Return a per-module result dict. Override counters with ``kwargs``."""
+    result = {
+        'tests_run': 1,
+        'failures': 0,
+        'errors': 0,
+        'skipped': 0,
+        'output': '',
+    }
+    result.update(kwargs)
+    return result
+
+
+class GetTestModulesTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.runner.get_test_modules`."""
+
+    def test_modules(self):
+        """Assert only test modules are returned, in sorted order."""
+        modules = runner.get_test_modules()
+        self.assertIn('pulp_smash.tests.platform.api_v2.test_login', modules)
+        self.assertNotIn('pulp_smash.tests.platform.api_v2', modules)
+        self.assertEqual(list(modules), sorted(modules))
+
+
+class RunMatrixTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.runner.run_matrix`."""
+
+    def test_run_matrix(self):
+        """Assert every module runs against every section, and is merged."""
+        def spawn(section, module):
+            """Fail one module on one section."""
+            if (section, module) == ('b', 'm2'):
+                return _result(tests_run=2, failures=1)
+            return _result()
+
+        with mock.patch.object(runner, '_spawn', side_effect=spawn) as spawn_:
+            reports = runner.run_matrix(('a', 'b'), ('m1', 'm2'), workers=2)
+        self.assertEqual(
+            set(call[0] for call in spawn_.call_args_list),
+            {('a', 'm1'), ('a', 'm2'), ('b', 'm1'), ('b', 'm2')},
+        )
+        self.assertEqual(set(reports), {'a', 'b'})
+        self.assertEqual(reports['a']['tests_run'], 2)
+        self.assertEqual(reports['a']['failures'], 0)
+        self.assertEqual(reports['b']['tests_run'], 3)
+        self.assertEqual(reports['b']['failures'], 1)
+        self.assertEqual(set(reports['b']['modules']), {'m1', 'm2'})
+
+    def test_no_sections(self):
+        """Assert nothing is run if no sections are given."""
+        with mock.patch.object(runner, '_spawn') as spawn:
+            self.assertEqual(runner.run_matrix((), ('m1',)), {})
+        self.assertEqual(spawn.call_count, 0)
+
+
+class PruneTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.runner.prune`."""
+
+    def setUp(self):
+        """Create test modules that declare requirements."""
+        def make_module(name, *test_cases, **kwargs):
+            """Create a module holding the given test case classes."""
+            module = types.ModuleType(str(name))
+            for i, requirements in enumerate(test_cases):
+                test_case = type(str('TestCase{}'.format(i)), (
+                    unittest2.TestCase,
+                ), {'test_foo': lambda self: None, '__module__': name})
+                if requirements is not None:
+                    test_case = selectors.skip_unless(**requirements)(
+                        test_case
+                    )
+                setattr(module, test_case.__name__, test_case)
+            if 'set_up_module' in kwargs:
+                module.setUpModule = selectors.skip_unless(
+                    **kwargs['set_up_module']
+                )(lambda: None)
+            return module
+
+        modules = {
+            'all_skipped': make_module(
+                'all_skipped', {'version': '2.8'}, {'version': '2.9'}
+            ),
+            'some_skipped': make_module(
+                'some_skipped', None, {'version': '2.8'}
+            ),
+            'module_skipped': make_module(
+                'module_skipped', None, set_up_module={'version': '2.8'}
+            ),
+            'none_skipped': make_module('none_skipped', {'version': '2.7'}),
+        }
+        patcher = mock.patch.dict(sys.modules, modules)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.selected, self.pruned = runner.prune(
+            config.ServerConfig('http://example.com', version='2.7'),
+            sorted(modules) + ['missing_module'],
+        )
+
+    def test_selected(self):
+        """Assert only modules that are entirely skipped are pruned."""
+        self.assertEqual(
+            self.selected,
+            ('none_skipped', 'some_skipped', 'missing_module'),
+        )
+
+    def test_pruned(self):
+        """Assert every pruned module and class is reported."""
+        self.assertEqual(
+            set(self.pruned),
+            {
+                'all_skipped.TestCase0',
+                'all_skipped.TestCase1',
+                'module_skipped',
+                'some_skipped.TestCase1',
+            },
+        )
+        self.assertIn('2.8', self.pruned['module_skipped'])
+
+
+class GetGraphTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.runner.get_graph`."""
+
+    def test_graph(self):
+        """Assert only modules that declare dependencies are split."""
+        def make_test_case(module, name, *prerequisites):
+            """Create a test case class in ``module``."""
+            test_case = type(str(name), (unittest2.TestCase,), {
+                'test_foo': lambda self: None,
+                '__module__': module.__name__,
+            })
+            if prerequisites:
+                test_case = selectors.depends_on(*prerequisites)(test_case)
+            setattr(module, name, test_case)
+            return test_case
+
+        plain = types.ModuleType(str('plain'))
+        other = make_test_case(plain, 'Other')
+        tree = types.ModuleType(str('tree'))
+        create = make_test_case(tree, 'Create', other)
+        read = make_test_case(tree, 'Read', create)
+        make_test_case(tree, 'Update', read)
+        make_test_case(tree, 'Delete', create)
+        outside = types.ModuleType(str('outside'))
+        make_test_case(tree, 'Search', make_test_case(outside, 'Outside'))
+        modules = {'plain': plain, 'tree': tree, 'outside': outside}
+        with mock.patch.dict(sys.modules, modules):
+            graph = runner.get_graph(
+                ('plain', 'tree', 'missing_module'),
+                {'tree.Delete': 'pruned'},
+            )
+        self.assertEqual(graph, {
+            'missing_module': set(),
+            'plain': set(),
+            'tree.Create': {'plain'},
+            'tree.Read': {'tree.Create'},
+            'tree.Search': set(),
+            'tree.Update': {'tree.Read'},
+        })
+
+
+class ScheduleTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.runner.schedule`."""
+
+    def setUp(self):
+        """Provide a graph with two independent branches."""
+        self.graph = {
+            'a': set(),
+            'a.b': {'a'},
+            'a.b.c': {'a.b'},
+            'a.d': {'a'},
+            'e': set(),
+        }
+
+    def test_order(self):
+        """Assert every node runs after the nodes it depends on."""
+        calls = []
+        lock = threading.Lock()
+
+        def func(node):
+            """Record the node."""
+            with lock:
+                calls.append(node)
+            return _result()
+
+        results, short_circuited = runner.schedule(self.graph, func, 3)
+        self.assertEqual(set(results), set(self.graph))
+        self.assertEqual(short_circuited, {})
+        for node, prerequisites in self.graph.items():
+            for prerequisite in prerequisites:
+                with self.subTest(node=node, prerequisite=prerequisite):
+                    self.assertLess(
+                        calls.index(prerequisite),
+                        calls.index(node),
+                    )
+
+    def test_short_circuit(self):
+        """Assert the dependents of a failed node are not run."""
+        def func(node):
+            """Fail node ``a.b``."""
+            return _result(failures=int(node == 'a.b'))
+
+        results, short_circuited = runner.schedule(self.graph, func, 2)
+        self.assertEqual(set(results), {'a', 'a.b', 'a.d', 'e'})
+        self.assertEqual(short_circuited, {'a.b.c': 'a.b failed'})
+        report = runner.format_report({'s': {
+            'tests_run': 4,
+            'failures': 1,
+            'errors': 0,
+            'skipped': 0,
+            'duration': 1,
+            'modules': results,
+            'pruned': {},
+            'short_circuited': short_circuited,
+        }})
+        self.assertIn('a.b.c: a.b failed', report)
+
+    def test_cycle(self):
+        """Assert a graph with a cycle is rejected before anything runs."""
+        func = mock.Mock(return_value=_result())
+        self.graph['a'] = {'a.b.c'}
+        with self.assertRaises(ValueError):
+            runner.schedule(self.graph, func)
+        self.assertEqual(func.call_count, 0)
+
+
+class RunSectionTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.runner.run_section` with a result cache."""
+
+    def test_reused(self):
+        """Assert cached results are reused, and new results are cached."""
+        cache = mock.Mock()
+        cache.get.side_effect = lambda cfg, node, key: (
+            _result(tests_run=3) if node == 'm1' else None
+        )
+        with mock.patch.object(runner.config, 'ServerConfig'):
+            with mock.patch.object(runner, 'prune') as prune:
+                prune.return_value = (('m1', 'm2'), {})
+                with mock.patch.object(runner, 'results') as results:
+                    results.get_key.return_value = {'source': 'a'}
+                    with mock.patch.object(
+                            runner, '_spawn', return_value=_result()) as spawn:
+                        report = runner.run_section(
+                            'a', ('m1', 'm2'), 2, cache
+                        )
+        spawn.assert_called_once_with('a', 'm2')
+        self.assertEqual(report['reused'], ['m1'])
+        self.assertEqual(report['tests_run'], 4)
+        self.assertEqual(cache.put.call_count, 1)
+        self.assertEqual(cache.put.call_args[0][1:], (
+            'm2', {'source': 'a'}, _result()
+        ))
+
+
+class SpawnTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.runner._spawn`."""
+
+    def test_environment(self):
+        """Assert the child process targets the given section."""
+        with mock.patch.object(runner.subprocess, 'Popen') as popen:
+            popen.return_value.communicate.return_value = (
+                json.dumps(_result(output=None)).encode('utf-8'),
+                b'',
+            )
+            result = runner._spawn('foo', 'm1')  # pylint:disable=W0212
+        env = popen.call_args[1]['env']
+        self.assertEqual(env['PULP_SMASH_CONFIG_SECTION'], 'foo')
+        self.assertEqual(result, _result())
+
+    def test_crash(self):
+        """Assert a child that fails to report is counted as an error."""
+        with mock.patch.object(runner.subprocess, 'Popen') as popen:
+            popen.return_value.communicate.return_value = (b'', b'boom')
+            result = runner._spawn('foo', 'm1')  # pylint:disable=W0212
+        self.assertEqual(result['errors'], 1)
+        self.assertEqual(result['output'], 'boom')
+
+
+class MainTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.runner.main`."""
+
+    def test_exit_code(self):
+        """Assert the exit code reflects whether any tests failed."""
+        for failures, code in ((0, 0), (1, 1)):
+            with self.subTest(failures=failures):
+                report = {
+                    'tests_run': 1,
+                    'failures': failures,
+                    'errors': 0,
+                    'skipped': 0,
+                    'duration': 1,
+                    'modules': {'m1': _result(failures=failures)},
+                    'pruned': {},
+                    'short_circuited': {},
+                    'reused': [],
+                }
+                with mock.patch.object(
+                        runner, 'run_matrix', return_value={'a': report}):
+                    with mock.patch.object(runner, 'print', create=True):
+                        code_ = runner.main(['--module', 'm1', 'a'])
+                self.assertEqual(code_, code)
+
+    def test_all_sections(self):
+        """Assert all sections are tested if none are named."""
+        with mock.patch.object(runner, 'run_matrix', return_value={}) as run:
+            with mock.patch.object(runner.config, 'ServerConfig') as cfg:
+                cfg.return_value.sections.return_value = {'b', 'a'}
+                with mock.patch.object(runner, 'print', create=True):
+                    runner.main(['--module', 'm1'])
+        run.assert_called_once_with(['a', 'b'], ['m1'], 1, None)
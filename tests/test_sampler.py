@@ -0,0 +1,118 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.sampler`."""
+from __future__ import unicode_literals
+
+import mock
+import unittest2
+
+from pulp_smash import config, sampler
+
+
+def _lines(user, iowait, paged_in, worker_cpu):
+    """Return the output of one iteration of the remote loop."""
+    return [
+        'cpu  {} 0 10 100 {} 0 0 0 0 0'.format(user, iowait),
+        'LOAD 1.50 1.00 0.50 2/300 4242',
+        'pgpgin {}'.format(paged_in),
+        'pgpgout 0',
+        'PS  2048 00:00:{:02} /usr/bin/python celery worker '
+        '-n reserved_resource_worker-0@host'.format(worker_cpu),
+        'PS  1024 00:00:01 /usr/bin/python celery worker '
+        '-n reserved_resource_worker-1@host',
+        'PS  4096 1-00:00:00 /usr/bin/mongod --quiet',
+        'PS   512 00:00:00 -bash',
+    ]
+
+
+class ParseSampleTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.sampler.parse_sample`."""
+
+    def test_parse(self):
+        """Assert every counter is parsed, and processes are grouped."""
+        sample = sampler.parse_sample(5, _lines(20, 30, 1024, 2))
+        self.assertEqual(sample.timestamp, 5)
+        self.assertEqual(sample.cpu, {
+            'user': 20, 'system': 10, 'idle': 100, 'iowait': 30,
+        })
+        self.assertEqual(sample.load, 1.5)
+        self.assertEqual((sample.paged_in, sample.paged_out), (1024, 0))
+        self.assertEqual(sample.services, {
+            'mongod': (4096, 86400),
+            'pulp_workers': (3072, 3),
+        })
+
+    def test_incomplete(self):
+        """Assert a sample without CPU counters is rejected."""
+        with self.assertRaises(ValueError):
+            sampler.parse_sample(5, _lines(20, 30, 1024, 2)[1:])
+
+
+class SummarizeTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.sampler.summarize`."""
+
+    def setUp(self):
+        """Provide one sample per second for four seconds."""
+        self.samples = [
+            sampler.parse_sample(timestamp, _lines(
+                20 + timestamp * 10,
+                30 + timestamp * 90,
+                1024 * timestamp ** 2,
+                timestamp,
+            ))
+            for timestamp in range(4)
+        ]
+
+    def test_summarize(self):
+        """Assert counters are compared across the span."""
+        stats = sampler.summarize(
+            self.samples,
+            sampler.Span('sync', 0.5, 2.5),
+        )
+        self.assertEqual(stats.samples, 2)  # at 1 and 2 seconds
+        self.assertEqual(stats.cpu['user'], 10)
+        self.assertEqual(stats.cpu['iowait'], 90)
+        self.assertEqual(stats.read_mb_per_second, 2)
+        self.assertEqual(stats.services['pulp_workers'], (3, 100))
+        self.assertEqual(stats.services['mongod'], (4, 0))
+
+    def test_too_short(self):
+        """Assert a span between two samples is not summarized."""
+        span = sampler.Span('create', 1.2, 1.4)
+        self.assertIsNone(sampler.summarize(self.samples, span))
+
+    def test_format_report(self):
+        """Assert every span is reported."""
+        smp = sampler.Sampler(config.ServerConfig('http://example.com'))
+        smp.samples.extend(self.samples)
+        smp.add_span('sync', 0.5, 2.5)
+        smp.add_span('create', 1.2, 1.4)
+        report = sampler.format_report(smp)
+        self.assertIn('sync (2.0s): cpu user 10%', report)
+        self.assertIn('create (0.2s): too short to sample', report)
+
+
+class SamplerTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.sampler.Sampler`."""
+
+    def test_one_command(self):
+        """Assert samples are read from one streaming command."""
+        output = []
+        for i in range(3):
+            output.append('T\n')
+            output.extend(line + '\n' for line in _lines(i, i, i, i))
+            output.append('END\n')
+        output.append('T\n')  # cut short by `stop`
+        with mock.patch.object(sampler.cli, 'Client') as client:
+            process = client.return_value.stream.return_value
+            process.__iter__.return_value = iter(
+                [('stderr', 'noise\n')] +
+                [('stdout', line) for line in output]
+            )
+            with sampler.Sampler(
+                    config.ServerConfig('http://example.com')) as smp:
+                with smp.span('sync'):
+                    pass
+        self.assertEqual(client.return_value.stream.call_count, 1)
+        self.assertEqual(process.kill.call_count, 1)
+        self.assertEqual(len(smp.samples), 3)
+        self.assertEqual([span.name for span in smp.spans], ['sync'])
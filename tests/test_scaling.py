@@ -0,0 +1,140 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.scaling`."""
+from __future__ import unicode_literals
+
+import json
+
+import mock
+import unittest2
+
+from pulp_smash import config, scaling
+
+
+class FitExponentTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.scaling.fit_exponent`."""
+
+    def test_growth(self):
+        """Assert constant, linear and quadratic growth are recognized."""
+        sizes = (1000, 10000, 100000)
+        for exponent in (0, 1, 2):
+            with self.subTest(exponent=exponent):
+                points = [(size, 0.01 * size ** exponent) for size in sizes]
+                self.assertAlmostEqual(
+                    scaling.fit_exponent(points),
+                    exponent,
+                )
+
+    def test_too_few(self):
+        """Assert nothing is estimated from fewer than two sizes."""
+        self.assertIsNone(scaling.fit_exponent([(1000, 0.5)]))
+        self.assertIsNone(scaling.fit_exponent([(1000, 0.5), (1000, 0.6)]))
+        self.assertIsNone(scaling.fit_exponent([(1000, 0.5), (10000, 0)]))
+
+
+class PopulateTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.scaling.populate`."""
+
+    def test_populate(self):
+        """Assert one resource is created per body."""
+        with mock.patch.object(scaling.api, 'Client') as client:
+            client.return_value.post.side_effect = lambda path, body: body
+            created = scaling.populate(
+                config.ServerConfig('http://example.com'),
+                '/users/',
+                lambda: {'login': 'a'},
+                5,
+                workers=2,
+            )
+            self.assertEqual(created, [{'login': 'a'}] * 5)
+            self.assertEqual(
+                scaling.populate(None, '/users/', dict, 0),
+                [],
+            )
+        self.assertEqual(client.return_value.post.call_count, 5)
+
+    def test_partial_failure(self):
+        """Assert resources created before a failure are still reported."""
+        bodies = iter(range(5))
+
+        def post(path, body):  # pylint:disable=unused-argument
+            """Fail to create the third resource."""
+            if body == 2:
+                raise RuntimeError('oops')
+            return body
+
+        created = []
+        with mock.patch.object(scaling.api, 'Client') as client:
+            client.return_value.post.side_effect = post
+            with self.assertRaises(RuntimeError):
+                scaling.populate(
+                    config.ServerConfig('http://example.com'),
+                    '/users/',
+                    lambda: next(bodies),
+                    5,
+                    workers=2,
+                    created=created,
+                )
+        self.assertEqual(sorted(created), [0, 1, 3, 4])
+
+
+class MeasureTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.scaling.measure` and its report."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Measure searches of 1000 resources, with HTTP calls mocked out."""
+        cls.ids = ['id{}'.format(i) for i in range(1000)]
+        with mock.patch.object(scaling.api, 'Client') as client:
+            cls.latencies = scaling.measure(
+                config.ServerConfig('http://example.com'),
+                '/users/search/',
+                cls.ids,
+                repeat=3,
+            )
+        cls.calls = client.return_value.request.call_args_list
+
+    def test_requests(self):
+        """Assert each search is repeated, with GET wherever possible."""
+        self.assertEqual(len(self.calls), 3 * len(self.latencies))
+        self.assertEqual(
+            sorted(key for key in self.latencies if key[0] == 'field'),
+            [('field', 'get'), ('field', 'post')],
+        )
+        self.assertIn(('skip-deep', 'get'), self.latencies)
+        self.assertNotIn(('sort', 'get'), self.latencies)
+
+    def test_deep_skip(self):
+        """Assert the deep skip asks for the last page."""
+        criteria = [
+            call[1]['json']['criteria'] for call in self.calls
+            if 'skip' in call[1].get('json', {}).get('criteria', {})
+        ]
+        self.assertEqual(criteria[0]['skip'], 900)
+        self.assertEqual(criteria[0]['limit'], 100)
+        params = [
+            call[1]['params'] for call in self.calls
+            if 'skip' in call[1].get('params', {})
+        ]
+        self.assertEqual(params[0], {'limit': 100, 'skip': 900})
+
+    def test_filters(self):
+        """Assert GET searches encode filters as JSON."""
+        params = [
+            call[1]['params'] for call in self.calls
+            if 'filters' in call[1].get('params', {})
+        ]
+        ids = json.loads(params[-1]['filters'])['id']['$in']
+        self.assertEqual(len(ids), 100)
+        self.assertTrue(set(ids) <= set(self.ids))
+
+    def test_report(self):
+        """Assert the report has one row per search and method."""
+        latencies = {
+            1000: {('limit', 'get'): 0.01, ('limit', 'post'): 0.02},
+            10000: {('limit', 'get'): 0.1},
+        }
+        lines = scaling.format_report(latencies).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('n=10000', lines[0])
+        self.assertTrue(lines[1].endswith('n^1.00'), lines[1])
+        self.assertTrue(lines[2].endswith('-  -'), lines[2])
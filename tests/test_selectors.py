@@ -8,7 +8,7 @@ import mock
 import requests
 import unittest2
 
-from pulp_smash import exceptions, selectors
+from pulp_smash import config, exceptions, selectors
 
 
 class BugIsTestableTestCase(unittest2.TestCase):
@@ -59,3 +59,109 @@ class BugIsTestableTestCase(unittest2.TestCase):
         ):
             with self.assertWarns(RuntimeWarning):
                 self.assertTrue(selectors.bug_is_testable(None))
+
+
+class GetBugStatusesTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.selectors.get_bug_statuses`."""
+
+    def test_copy(self):
+        """Assert the statuses looked up so far are returned in a copy."""
+        with mock.patch.object(selectors, '_BUG_STATUS_CACHE', {1356: 'NEW'}):
+            statuses = selectors.get_bug_statuses()
+            self.assertEqual(selectors.get_bug_status(1356), 'NEW')
+            statuses[1357] = 'NEW'
+            self.assertEqual(selectors.get_bug_statuses(), {1356: 'NEW'})
+
+
+class SkipUnlessTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.selectors.skip_unless`."""
+
+    def setUp(self):
+        """Provide a config for Pulp 2.7, and a class to decorate."""
+        self.cfg = config.ServerConfig('http://example.com', version='2.7')
+        patcher = mock.patch.object(
+            selectors.config,
+            'get_frozen_config',
+            return_value=self.cfg,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = []
+        calls = self.calls
+
+        class BaseTestCase(unittest2.TestCase):
+            """A test case which records calls to ``setUpClass``."""
+
+            @classmethod
+            def setUpClass(cls):
+                """Record a call."""
+                calls.append(cls)
+
+            def test_foo(self):
+                """Do nothing."""
+
+        self.test_case = BaseTestCase
+
+    def test_skipped(self):
+        """Assert ``setUpClass`` is not run if a requirement is not met."""
+        test_case = selectors.skip_unless(version='2.8')(self.test_case)
+        with self.assertRaises(unittest2.SkipTest):
+            test_case.setUpClass()
+        self.assertEqual(self.calls, [])
+
+    def test_run(self):
+        """Assert ``setUpClass`` is run if all requirements are met."""
+        test_case = selectors.skip_unless(version='2.7')(self.test_case)
+        test_case.setUpClass()
+        self.assertEqual(self.calls, [test_case])
+
+    def test_inherited(self):
+        """Assert subclasses inherit requirements and ``setUpClass``."""
+        base = selectors.skip_unless(version='2.7')(self.test_case)
+        child = type(str('Child'), (base,), {})
+        child = selectors.skip_unless(bugs=(1,))(child)
+        with mock.patch.object(selectors, 'bug_is_untestable') as untestable:
+            untestable.return_value = False
+            child.setUpClass()
+            self.assertEqual(self.calls, [child])
+            untestable.return_value = True
+            self.assertEqual(
+                selectors.get_skip_reason(child, self.cfg),
+                'https://pulp.plan.io/issues/1',
+            )
+            self.assertIsNone(selectors.get_skip_reason(base, self.cfg))
+
+    def test_module(self):
+        """Assert ``setUpModule`` functions can be decorated."""
+        set_up_module = mock.Mock(__name__=str('setUpModule'))
+        module = mock.Mock(setUpModule=selectors.skip_unless(
+            plugins=('rpm', 'iso')
+        )(set_up_module))
+        with mock.patch.object(
+                selectors, 'get_plugins', return_value={'rpm'}):
+            with self.assertRaises(unittest2.SkipTest):
+                module.setUpModule()
+            self.assertEqual(
+                selectors.get_skip_reason(module, self.cfg),
+                'These tests require these Pulp plugins: iso',
+            )
+        self.assertEqual(set_up_module.call_count, 0)
+
+    def test_undecorated(self):
+        """Assert undecorated objects are never skipped."""
+        self.assertIsNone(selectors.get_skip_reason(self.test_case, self.cfg))
+
+
+class DependsOnTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.selectors.depends_on`."""
+
+    def test_prerequisites(self):
+        """Assert prerequisites are recorded, and not inherited."""
+        base = type(str('Base'), (unittest2.TestCase,), {})
+        child = selectors.depends_on(base)(
+            type(str('Child'), (unittest2.TestCase,), {})
+        )
+        grandchild = type(str('Grandchild'), (child,), {})
+        self.assertEqual(selectors.get_prerequisites(base), ())
+        self.assertEqual(selectors.get_prerequisites(child), (base,))
+        self.assertEqual(selectors.get_prerequisites(grandchild), ())
@@ -0,0 +1,198 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.teardown`."""
+from __future__ import unicode_literals
+
+import os
+
+import mock
+import requests
+import unittest2
+
+from pulp_smash import api, config, teardown, utils
+
+
+def _mock_response(status_code, spawned_tasks=()):
+    """Return a mock response with the given status code and call report."""
+    response = mock.Mock(
+        status_code=status_code,
+        headers={'Content-Type': 'application/json'},
+    )
+    response.json.return_value = {
+        'spawned_tasks': [{'_href': href} for href in spawned_tasks],
+    }
+    return response
+
+
+class ReaperTestCase(unittest2.TestCase):
+    """Tests for :class:`pulp_smash.teardown.Reaper`."""
+
+    def setUp(self):
+        """Create a reaper."""
+        cfg = config.ServerConfig('http://example.com')
+        self.reaper = teardown.Reaper(cfg)
+
+    def test_reap_empty(self):
+        """Assert nothing is deleted if nothing is queued."""
+        with mock.patch.object(api, 'Client') as client:
+            self.assertEqual(self.reaper.reap(), ())
+        self.assertEqual(client.call_count, 0)
+
+    def test_reap(self):
+        """Assert each resource is deleted and spawned tasks are polled."""
+        responses = {
+            'a': _mock_response(200),
+            'b': _mock_response(202, ('task1',)),
+            'c': _mock_response(202, ('task2', 'task3')),
+        }
+        self.reaper.update(responses.keys())
+        with mock.patch.object(api, 'Client') as client:
+            client.return_value.delete.side_effect = responses.get
+            with mock.patch.object(utils, 'poll_tasks') as poll_tasks:
+                poll_tasks.return_value = iter(('body',))
+                self.assertEqual(self.reaper.reap(), ('body',))
+        calls = client.return_value.delete.call_args_list
+        self.assertEqual(
+            set(call[0][0] for call in calls),
+            set(responses.keys()),
+        )
+        self.assertEqual(
+            set(poll_tasks.call_args[0][1]),
+            {'task1', 'task2', 'task3'},
+        )
+
+    def test_reap_twice(self):
+        """Assert the queue is emptied by a call to ``reap``."""
+        self.reaper.add('a')
+        with mock.patch.object(api, 'Client') as client:
+            client.return_value.delete.return_value = _mock_response(200)
+            with mock.patch.object(utils, 'poll_tasks', return_value=()):
+                self.reaper.reap()
+                self.reaper.reap()
+        self.assertEqual(client.return_value.delete.call_count, 1)
+
+    def test_not_found(self):
+        """Assert a resource that is already gone causes only a warning."""
+        self.reaper.add('a')
+        with mock.patch.object(api, 'Client') as client:
+            response = _mock_response(404)
+            response.raise_for_status.side_effect = requests.HTTPError
+            client.return_value.delete.return_value = response
+            with mock.patch.object(utils, 'poll_tasks', return_value=()):
+                with mock.patch.object(teardown.warnings, 'warn') as warn:
+                    self.reaper.reap()
+        self.assertEqual(response.raise_for_status.call_count, 0)
+        self.assertEqual(warn.call_count, 1)
+        self.assertIn('a', warn.call_args[0][0])
+
+    def test_content_type(self):
+        """Assert a warning is issued if a 202 response isn't JSON."""
+        self.reaper.add('a')
+        with mock.patch.object(api, 'Client') as client:
+            response = _mock_response(202, ('task1',))
+            response.headers = {'Content-Type': 'text/html'}
+            client.return_value.delete.return_value = response
+            with mock.patch.object(utils, 'poll_tasks', return_value=()):
+                with mock.patch.object(api.warnings, 'warn') as warn:
+                    self.reaper.reap()
+        self.assertEqual(warn.call_count, 1)
+        self.assertIn('text/html', warn.call_args[0][0])
+
+    def test_json_content_type(self):
+        """Assert no warning is issued if a 202 response is JSON."""
+        self.reaper.add('a')
+        with mock.patch.object(api, 'Client') as client:
+            client.return_value.delete.return_value = _mock_response(202)
+            with mock.patch.object(utils, 'poll_tasks', return_value=()):
+                with mock.patch.object(api.warnings, 'warn') as warn:
+                    self.reaper.reap()
+        self.assertEqual(warn.call_count, 0)
+
+    def test_failure(self):
+        """Assert a failed deletion raises an exception."""
+        self.reaper.add('a')
+        with mock.patch.object(api, 'Client') as client:
+            response = _mock_response(500)
+            response.raise_for_status.side_effect = requests.HTTPError
+            client.return_value.delete.return_value = response
+            with self.assertRaises(requests.HTTPError):
+                self.reaper.reap()
+
+    def test_partial_failure(self):
+        """Assert tasks are polled even if another deletion fails."""
+        failure = _mock_response(500)
+        failure.raise_for_status.side_effect = requests.HTTPError
+        responses = {
+            'a': failure,
+            'b': _mock_response(202, ('task1',)),
+        }
+        self.reaper.update(responses.keys())
+        with mock.patch.object(api, 'Client') as client:
+            client.return_value.delete.side_effect = responses.get
+            with mock.patch.object(utils, 'poll_tasks') as poll_tasks:
+                poll_tasks.return_value = iter(('body',))
+                with self.assertRaises(requests.HTTPError):
+                    self.reaper.reap()
+        self.assertEqual(poll_tasks.call_args[0][1], ['task1'])
+
+    def test_reap_in_background(self):
+        """Assert background errors are collected instead of raised."""
+        def reap():
+            """Fail if the queue is not empty, and empty it."""
+            queue = self.reaper._queue  # pylint:disable=protected-access
+            if queue:
+                del queue[:]
+                raise ValueError
+
+        self.reaper.add('a')
+        with mock.patch.object(self.reaper, 'reap', side_effect=reap):
+            self.reaper.reap_in_background()
+            self.reaper.flush()
+        self.assertEqual(len(self.reaper.errors), 1)
+        self.assertIsInstance(self.reaper.errors[0], ValueError)
+
+
+class DeleteTestCase(unittest2.TestCase):
+    """Tests for :func:`pulp_smash.teardown.delete`."""
+
+    def setUp(self):
+        """Provide a server config."""
+        self.cfg = config.ServerConfig('http://' + utils.uuid4())
+
+    def test_shared_reaper(self):
+        """Assert servers with the same base URL share one reaper."""
+        self.assertIs(
+            teardown.get_reaper(self.cfg),
+            teardown.get_reaper(config.ServerConfig(self.cfg.base_url)),
+        )
+
+    def test_modes(self):
+        """Assert each mode triggers the correct reaper method."""
+        for mode, method in (
+                ('immediate', 'reap'),
+                ('background', 'reap_in_background')):
+            with self.subTest(mode=mode):
+                reaper = mock.Mock()
+                environ = {'PULP_SMASH_TEARDOWN': mode}
+                with mock.patch.dict(os.environ, environ):
+                    with mock.patch.object(
+                            teardown, 'get_reaper', return_value=reaper):
+                        teardown.delete(self.cfg, ('a', 'b'))
+                reaper.update.assert_called_once_with(('a', 'b'))
+                self.assertEqual(getattr(reaper, method).call_count, 1)
+
+    def test_exit_mode(self):
+        """Assert resources are only queued in the "exit" mode."""
+        reaper = mock.Mock()
+        with mock.patch.dict(os.environ, {'PULP_SMASH_TEARDOWN': 'exit'}):
+            with mock.patch.object(
+                    teardown, 'get_reaper', return_value=reaper):
+                teardown.delete(self.cfg, ('a',))
+        self.assertEqual(reaper.update.call_count, 1)
+        self.assertEqual(reaper.reap.call_count, 0)
+        self.assertEqual(reaper.reap_in_background.call_count, 0)
+
+    def test_invalid_mode(self):
+        """Assert an unknown mode causes an exception to be raised."""
+        with mock.patch.dict(os.environ, {'PULP_SMASH_TEARDOWN': 'never'}):
+            with self.assertRaises(ValueError):
+                teardown.delete(self.cfg, ())
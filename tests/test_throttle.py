@@ -0,0 +1,170 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.throttle`."""
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+import mock
+import unittest2
+
+from pulp_smash import throttle
+
+
+class GetEndpointClassTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.throttle.get_endpoint_class`."""
+
+    def test_classes(self):
+        """Assert safe methods are reads, and all others are writes."""
+        for method, endpoint_class in (
+                ('get', 'read'),
+                ('HEAD', 'read'),
+                ('POST', 'write'),
+                ('DELETE', 'write')):
+            with self.subTest(method=method):
+                self.assertEqual(
+                    throttle.get_endpoint_class(method),
+                    endpoint_class,
+                )
+
+
+class ParseLimitsTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.throttle.parse_limits`."""
+
+    def test_parse(self):
+        """Assert limits are parsed, and ``burst`` defaults to ``rate``."""
+        self.assertEqual(
+            throttle.parse_limits(
+                '{"read": {"rate": 5}, "write": {"max_in_flight": 2}}'
+            ),
+            {
+                'read': throttle.Limit(5, 5, None),
+                'write': throttle.Limit(None, None, 2),
+            },
+        )
+
+    def test_invalid(self):
+        """Assert bad input raises ``ValueError``."""
+        for text in ('{"foo": {}}', '{"read": {"foo": 1}}', 'not json'):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    throttle.parse_limits(text)
+
+
+class ThrottleTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.throttle.Throttle`."""
+
+    def setUp(self):
+        """Create a state directory, and replace the clock with a fake one."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.now = 1000.0
+        for name, side_effect in (
+                ('time', lambda: self.now),
+                ('sleep', self.sleep)):
+            patcher = mock.patch.object(
+                throttle.time, name, side_effect=side_effect
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        """Pretend to sleep."""
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def make_throttle(self, **kwargs):
+        """Return a throttle that limits writes."""
+        return throttle.Throttle(
+            'http://example.com',
+            {'write': throttle.Limit(**kwargs)},
+            self.directory,
+        )
+
+    def test_rate(self):
+        """Assert requests beyond the burst size wait for tokens."""
+        throttle_ = self.make_throttle(rate=2, burst=2)
+        for _ in range(3):
+            with throttle_.limit('POST'):
+                pass
+        self.assertEqual(self.sleeps, [0.5])
+
+    def test_shared(self):
+        """Assert throttles with the same key share one token bucket."""
+        for _ in range(2):
+            with self.make_throttle(rate=1).limit('POST'):
+                pass
+        self.assertEqual(self.sleeps, [1])
+
+    def test_unlimited(self):
+        """Assert requests in an unlimited endpoint class never wait."""
+        throttle_ = self.make_throttle(rate=1)
+        for _ in range(3):
+            with throttle_.limit('GET'):
+                pass
+        self.assertEqual(self.sleeps, [])
+        self.assertFalse(os.listdir(self.directory))
+
+    def test_max_in_flight(self):
+        """Assert no more than ``max_in_flight`` requests are in flight."""
+        throttle_ = self.make_throttle(max_in_flight=1)
+        throttle_.acquire('write')
+        with throttle_._lock() as state:  # pylint:disable=protected-access
+            self.assertEqual(
+                throttle._take(  # pylint:disable=protected-access
+                    state['write'], throttle_.limits['write'], self.now
+                ),
+                throttle._POLL_INTERVAL,  # pylint:disable=protected-access
+            )
+        throttle_.release('write')
+        with throttle_.limit('POST'):
+            pass
+        self.assertEqual(self.sleeps, [])
+
+    def test_dead_process(self):
+        """Assert requests in flight from dead processes are forgotten."""
+        throttle_ = self.make_throttle(max_in_flight=1)
+        with throttle_._lock() as state:  # pylint:disable=protected-access
+            state['write'] = {'in_flight': {'999999': 1}}
+        with mock.patch.object(throttle, '_is_alive', return_value=False):
+            with throttle_.limit('POST'):
+                pass
+        self.assertEqual(self.sleeps, [])
+
+    def test_no_fcntl(self):
+        """Assert throttling works where ``fcntl`` is unavailable."""
+        with mock.patch.object(throttle, 'fcntl', None):
+            throttle_ = self.make_throttle(rate=2, burst=2)
+            for _ in range(3):
+                with throttle_.limit('POST'):
+                    pass
+        self.assertEqual(self.sleeps, [0.5])
+
+
+class GetThrottleTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.throttle.get_throttle`."""
+
+    def setUp(self):
+        """Clear the cache of throttles."""
+        patcher = mock.patch.dict(throttle._THROTTLES, clear=True)  # noqa pylint:disable=protected-access
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unconfigured(self):
+        """Assert nothing is throttled by default."""
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertEqual(throttle.get_throttle('http://a').limits, {})
+
+    def test_cached(self):
+        """Assert one throttle is made per base URL."""
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertIs(
+                throttle.get_throttle('http://a'),
+                throttle.get_throttle('http://a'),
+            )
+            self.assertIsNot(
+                throttle.get_throttle('http://a'),
+                throttle.get_throttle('http://b'),
+            )
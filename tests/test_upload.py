@@ -0,0 +1,254 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.upload`."""
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import mock
+import requests
+import unittest2
+
+from pulp_smash import config, upload
+
+
+class GetUnitTypeTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.upload.get_unit_type`."""
+
+    def test_known(self):
+        """Assert the unit type is guessed from the file name."""
+        for path, unit_type_id in (
+                ('bear-4.1-1.noarch.rpm', 'rpm'),
+                ('/tmp/1.iso', 'iso'),
+                ('pulp-pulp-1.0.0.tar.gz', 'puppet_module')):
+            with self.subTest(path=path):
+                self.assertEqual(upload.get_unit_type(path), unit_type_id)
+
+    def test_unknown(self):
+        """Assert ``ValueError`` is raised for unknown file types."""
+        with self.assertRaises(ValueError):
+            upload.get_unit_type('repomd.xml')
+
+
+class UploadReportTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.upload.UploadReport`."""
+
+    def test_rates(self):
+        """Assert throughput is calculated correctly."""
+        report = upload.UploadReport(4, 2 * 10 ** 6, 2, ())
+        self.assertEqual(report.files_per_second, 2)
+        self.assertEqual(report.megabytes_per_second, 1)
+
+    def test_errors(self):
+        """Assert only unfinished tasks are errors."""
+        tasks = ({'state': 'finished'}, {'state': 'error'})
+        self.assertEqual(
+            upload.UploadReport(2, 0, 0, tasks).errors,
+            tasks[1:],
+        )
+
+
+class BulkUploaderTestCase(unittest2.TestCase):
+    """Test :class:`pulp_smash.upload.BulkUploader`."""
+
+    def setUp(self):
+        """Create a directory of files, and mock out all HTTP calls."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for name, size in (('a.rpm', 5), ('b.iso', 3), ('repomd.xml', 1)):
+            with open(os.path.join(self.directory, name), 'wb') as handle:
+                handle.write(b'x' * size)
+        self.uploader = upload.BulkUploader(
+            config.ServerConfig('http://example.com'),
+            '/pulp/api/v2/repositories/foo/',
+            chunk_size=2,
+        )
+        self.client = mock.Mock()
+        self.client.post.return_value.json.return_value = {
+            '_href': '/pulp/api/v2/content/uploads/1/',
+            'spawned_tasks': [{'_href': '/pulp/api/v2/tasks/1/'}],
+            'upload_id': '1',
+        }
+        self.uploader._client = self.client  # pylint:disable=protected-access
+
+        # Mock objects may lose calls made from several threads at once.
+        self.puts = []
+        lock = threading.Lock()
+
+        def put(path, data):  # pylint:disable=unused-argument
+            """Record the path."""
+            with lock:
+                self.puts.append(path)
+            return mock.DEFAULT
+
+        self.client.put.side_effect = put
+        self.client.get.return_value.json.return_value = {
+            '_href': '/pulp/api/v2/tasks/1/',
+            'spawned_tasks': [],
+            'state': 'finished',
+        }
+        patcher = mock.patch.object(upload, 'sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_paths(self):
+        """Assert only files of known types are found."""
+        self.assertEqual(
+            [os.path.basename(path)
+             for path in upload.get_paths(self.directory)],
+            ['a.rpm', 'b.iso'],
+        )
+
+    def test_upload(self):
+        """Assert each file is uploaded in chunks, imported and freed."""
+        report = self.uploader.upload(upload.get_paths(self.directory))
+        self.assertEqual(report[:2], (2, 8))
+        self.assertEqual(len(report.tasks), 2)
+        self.assertEqual(
+            sorted(self.puts),
+            ['/pulp/api/v2/content/uploads/1/{}/'.format(offset)
+             for offset in (0, 0, 2, 2, 4)],
+        )
+        self.assertEqual(self.client.delete.call_count, 2)
+
+    def test_iso_unit_key(self):
+        """Assert an ISO's unit key is computed while it is uploaded."""
+        self.uploader.upload([os.path.join(self.directory, 'b.iso')])
+        body = self.client.post.call_args[0][1]
+        self.assertEqual(body['unit_type_id'], 'iso')
+        self.assertEqual(
+            (body['unit_key']['name'], body['unit_key']['size']),
+            ('b.iso', 3),
+        )
+
+    def test_failure(self):
+        """Assert an upload request is freed if uploading into it fails."""
+        self.client.put.return_value.raise_for_status.side_effect = (
+            requests.exceptions.HTTPError
+        )
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.uploader.upload([os.path.join(self.directory, 'a.rpm')])
+        self.assertEqual(self.client.delete.call_count, 1)
+
+    def test_partial_failure(self):
+        """Assert other uploads are finished if one file cannot be sent."""
+        with self.assertRaises(EnvironmentError):
+            self.uploader.upload([
+                os.path.join(self.directory, 'a.rpm'),
+                os.path.join(self.directory, 'missing.rpm'),
+            ])
+        self.assertEqual(self.client.get.call_count, 1)
+        self.assertEqual(self.client.delete.call_count, 2)
+
+    def test_finish_failure(self):
+        """Assert an error from an import task is raised, not hidden."""
+        self.client.get.return_value.raise_for_status.side_effect = (
+            RuntimeError('task failed')
+        )
+        self.client.delete.return_value.raise_for_status.side_effect = (
+            requests.exceptions.HTTPError
+        )
+        with self.assertRaisesRegex(RuntimeError, 'task failed'):
+            self.uploader.upload([os.path.join(self.directory, 'a.rpm')])
+        self.assertEqual(self.client.delete.call_count, 1)
+
+    def serve_tasks(self, on_import=None):
+        """Give each file its own import task, which runs for one round.
+
+        :param on_import: A callable. If given, it is called each time an
+            import is started.
+        """
+        states = {}
+        count = [0]
+        lock = threading.Lock()
+
+        def post(path, body=None):  # pylint:disable=unused-argument
+            """Return a distinct upload request or import task."""
+            if on_import is not None and path.endswith('/import_upload/'):
+                on_import()
+            with lock:
+                count[0] += 1
+                response = mock.Mock()
+                response.json.return_value = {
+                    '_href': '/pulp/api/v2/content/uploads/{}/'.format(
+                        count[0]
+                    ),
+                    'spawned_tasks': [
+                        {'_href': '/pulp/api/v2/tasks/{}/'.format(count[0])}
+                    ],
+                    'upload_id': count[0],
+                }
+                return response
+
+        def get(href):
+            """Report each task as running when it is first polled."""
+            with lock:
+                states[href] = 'finished' if href in states else 'running'
+                response = mock.Mock()
+                response.json.return_value = {
+                    '_href': href, 'spawned_tasks': [], 'state': states[href],
+                }
+                return response
+
+        self.client.post.side_effect = post
+        self.client.get.side_effect = get
+
+    def test_poll_together(self):
+        """Assert all import tasks are polled in each round, then freed."""
+        self.serve_tasks()
+        report = self.uploader.upload(upload.get_paths(self.directory))
+        self.assertEqual(len(report.tasks), 2)
+        self.assertEqual(self.client.delete.call_count, 2)
+        self.assertLessEqual(self.sleep.call_count, 2)
+
+    def test_in_flight_limit(self):
+        """Assert no more than ``workers`` files are sent but not finished."""
+        for i in range(8):
+            path = os.path.join(self.directory, '{}.rpm'.format(i))
+            with open(path, 'wb') as handle:
+                handle.write(b'x')
+        in_flight = [0]
+        peaks = []
+        lock = threading.Lock()
+
+        def on_import():
+            """Count the files whose import is started."""
+            with lock:
+                in_flight[0] += 1
+                peaks.append(in_flight[0])
+
+        def delete(path):  # pylint:disable=unused-argument
+            """Count the files which are finished."""
+            with lock:
+                in_flight[0] -= 1
+            return mock.DEFAULT
+
+        self.serve_tasks(on_import)
+        self.client.delete.side_effect = delete
+        # Give the senders a chance to run ahead of the finished imports.
+        self.sleep.side_effect = lambda seconds: time.sleep(0.01)
+        self.uploader.workers = 2
+        report = self.uploader.upload(upload.get_paths(self.directory))
+        self.assertEqual(report.files, 10)
+        self.assertEqual(max(peaks), 2)
+
+    def test_interrupted(self):
+        """Assert every upload request is freed if polling is interrupted."""
+        for i in range(4):
+            path = os.path.join(self.directory, '{}.rpm'.format(i))
+            with open(path, 'wb') as handle:
+                handle.write(b'x')
+        self.serve_tasks()
+        self.sleep.side_effect = KeyboardInterrupt
+        self.uploader.workers = 2
+        with self.assertRaises(KeyboardInterrupt):
+            self.uploader.upload(upload.get_paths(self.directory))
+        imports = [
+            call for call in self.client.post.call_args_list
+            if call[0][0].endswith('/import_upload/')
+        ]
+        self.assertGreater(len(imports), 0)
+        self.assertEqual(self.client.delete.call_count, len(imports))
@@ -46,3 +46,81 @@ class GetBrokerTestCase(unittest2.TestCase):
             client.return_value.run.return_value.returncode = 1
             with self.assertRaises(exceptions.NoKnownBrokerError):
                 utils.get_broker(mock.Mock())
+
+
+class PollTasksTestCase(unittest2.TestCase):
+    """Test :func:`pulp_smash.utils.poll_tasks`."""
+
+    def test_spawned_tasks(self):
+        """Assert finished tasks and their spawned tasks are yielded."""
+        bodies = {
+            'parent': {'state': 'finished', 'spawned_tasks': [
+                {'_href': 'child'},
+            ]},
+            'child': {'state': 'finished', 'spawned_tasks': []},
+            'other': {'state': 'error', 'spawned_tasks': []},
+        }
+        server_config = mock.Mock(base_url='http://example.com/')
+        server_config.get_requests_kwargs.return_value = {}
+        with mock.patch.object(utils, 'requests') as requests:
+            requests.get.side_effect = lambda url: mock.Mock(**{
+                'json.return_value': bodies[url.rsplit('/', 1)[1]],
+            })
+            with mock.patch.object(utils, 'sleep') as sleep:
+                hrefs = ('parent', 'other')
+                tasks = tuple(utils.poll_tasks(server_config, hrefs))
+        self.assertEqual(
+            tasks,
+            (bodies['parent'], bodies['other'], bodies['child']),
+        )
+        self.assertEqual(sleep.call_count, 0)
+
+    def test_one_sleep_per_round(self):
+        """Assert many unfinished tasks cause one sleep per polling round."""
+        server_config = mock.Mock(base_url='http://example.com/')
+        server_config.get_requests_kwargs.return_value = {}
+        states = iter(['running'] * 3 + ['finished'] * 3)
+        with mock.patch.object(utils, 'requests') as requests:
+            requests.get.side_effect = lambda url: mock.Mock(**{
+                'json.return_value': {
+                    'state': next(states),
+                    'spawned_tasks': [],
+                },
+            })
+            with mock.patch.object(utils, 'sleep') as sleep:
+                tasks = tuple(utils.poll_tasks(
+                    server_config,
+                    ['/tasks/a/', '/tasks/b/', '/tasks/c/'],
+                ))
+        self.assertEqual(len(tasks), 3)
+        self.assertEqual(sleep.call_count, 1)
+
+    def test_callback(self):
+        """Assert the callback is given every task body, finished or not."""
+        server_config = mock.Mock(base_url='http://example.com/')
+        server_config.get_requests_kwargs.return_value = {}
+        callback = mock.Mock()
+        states = iter(('running', 'finished'))
+        with mock.patch.object(utils, 'requests') as requests:
+            requests.get.side_effect = lambda url: mock.Mock(**{
+                'json.return_value': {
+                    'state': next(states),
+                    'spawned_tasks': [],
+                },
+            })
+            with mock.patch.object(utils, 'sleep'):
+                tuple(utils.poll_tasks(server_config, ('a',), callback))
+        self.assertEqual(
+            [call[0][0]['state'] for call in callback.call_args_list],
+            ['running', 'finished'],
+        )
+
+    def test_timeout(self):
+        """Assert ``TaskTimedOutError`` is raised if tasks never finish."""
+        server_config = mock.Mock(base_url='http://example.com/')
+        server_config.get_requests_kwargs.return_value = {}
+        with mock.patch.object(utils, 'requests') as requests:
+            requests.get.return_value.json.return_value = {'state': 'running'}
+            with mock.patch.object(utils, 'sleep'):
+                with self.assertRaises(exceptions.TaskTimedOutError):
+                    tuple(utils.poll_tasks(server_config, ('task',)))